@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.checksum Checksum functions for MI
+@file mi/core/checksum.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief Table driven CRC and additive checksums shared by drivers and parsers.
+All functions accept anything supporting the buffer protocol (str, bytearray,
+mmap, memoryview) plus start and end offsets, so callers can checksum a
+record in place without slicing it out of a larger buffer first.
+"""
+
+__author__ = 'Ocean Observatories Initiative <contactooici@oceanobservatories.org>'
+__license__ = 'Apache 2.0'
+
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from mi.core.log import get_logger ; log = get_logger()
+
+# reflected polynomial for CRC-16/X-25 (0x1021 bit reversed)
+CRC16_X25_POLY = 0x8408
+CRC16_X25_INIT = 0xFFFF
+
+# below this many bytes a numpy sum costs more than it saves
+NUMPY_SUM_MIN_BYTES = 256
+
+
+def build_crc16_table(poly):
+    """
+    Build the 256 entry lookup table for a reflected 16 bit CRC
+    @param poly reflected generator polynomial
+    @retval tuple of 256 table values
+    """
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ poly
+            else:
+                crc >>= 1
+        table.append(crc)
+    return tuple(table)
+
+CRC16_X25_TABLE = build_crc16_table(CRC16_X25_POLY)
+
+
+def _unpack_bytes(data, start, end):
+    """
+    Unpack the unsigned bytes of data[start:end] without copying the slice
+    @param data buffer to read from
+    @param start first byte offset
+    @param end offset past the last byte, None for the end of the buffer
+    @retval tuple of ints
+    """
+    if end is None:
+        end = len(data)
+    if end <= start:
+        return ()
+    return struct.unpack_from('%dB' % (end - start), data, start)
+
+
+def crc16_x25(data, start=0, end=None):
+    """
+    Calculate the CRC-16/X-25 of data[start:end], as used in SIO headers
+    @param data buffer to checksum
+    @param start first byte offset
+    @param end offset past the last byte, None for the end of the buffer
+    @retval unsigned 16 bit crc, 0 for an empty range
+    """
+    values = _unpack_bytes(data, start, end)
+    if not values:
+        return 0
+    table = CRC16_X25_TABLE
+    crc = CRC16_X25_INIT
+    for byte in values:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return ~crc & 0xFFFF
+
+
+def sum8(data, start=0, end=None, mask=0xFFFF):
+    """
+    Add up the unsigned bytes of data[start:end]
+    @param data buffer to checksum
+    @param start first byte offset
+    @param end offset past the last byte, None for the end of the buffer
+    @param mask mask applied to the total
+    @retval masked sum of the bytes
+    """
+    if numpy is not None:
+        if end is None:
+            end = len(data)
+        if end - start >= NUMPY_SUM_MIN_BYTES:
+            try:
+                values = numpy.frombuffer(data, dtype=numpy.uint8, count=end - start, offset=start)
+            except (AttributeError, TypeError):
+                # numpy can not read every buffer type (e.g. memoryview on
+                # python 2), fall through to the struct version
+                pass
+            else:
+                return int(values.sum()) & mask
+    return sum(_unpack_bytes(data, start, end)) & mask
+
+
+def sum16_le(data, start=0, end=None, seed=0, mask=0xFFFF):
+    """
+    Add up the little endian unsigned 16 bit words of data[start:end]. A
+    trailing odd byte is ignored.
+    @param data buffer to checksum
+    @param start first byte offset
+    @param end offset past the last byte, None for the end of the buffer
+    @param seed initial value of the sum
+    @param mask mask applied to the total
+    @retval masked sum of the words plus the seed
+    """
+    if end is None:
+        end = len(data)
+    count = (end - start) // 2
+    if count <= 0:
+        return seed & mask
+    return (seed + sum(struct.unpack_from('<%dH' % count, data, start))) & mask
@@ -119,8 +119,28 @@ class BaseEnum(object):
     @classmethod
     def list(cls):
         """List the values of this enum."""
-        return [getattr(cls,attr) for attr in dir(cls) if\
-                not callable(getattr(cls,attr)) and not attr.startswith('__')]
+        return list(cls._values()[0])
+
+    @classmethod
+    def _values(cls):
+        """
+        Find the values of this enum once per class. Enums aren't changed
+        once they are defined, so the values are kept in the class
+        dictionary, where subclasses don't see them and find their own.
+        @retval tuple of (tuple of values, frozenset of values or None if
+            some value can't be hashed)
+        """
+        values = cls.__dict__.get('__enum_values__')
+        if values is None:
+            value_list = tuple(getattr(cls,attr) for attr in dir(cls) if\
+                               not callable(getattr(cls,attr)) and not attr.startswith('__'))
+            try:
+                value_set = frozenset(value_list)
+            except TypeError:
+                value_set = None
+            values = (value_list, value_set)
+            cls.__enum_values__ = values
+        return values
 
     @classmethod
     def dict(cls):
@@ -144,7 +164,13 @@ class BaseEnum(object):
         @retval True if one of the class attributes has value item, false
         otherwise.
         """
-        return item in cls.list()
+        (value_list, value_set) = cls._values()
+        if value_set is not None:
+            try:
+                return item in value_set
+            except TypeError:
+                pass
+        return item in value_list
 
 class EventKey(BaseEnum):
     """Keys to the event dictionary fields as used by the InstrumentProtocol
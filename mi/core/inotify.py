@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.inotify Linux inotify directory watches
+@file mi/core/inotify.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief A minimal ctypes wrapper around the Linux inotify calls, so a harvester
+can block on a file descriptor until files in a directory change instead of
+listing the directory on a timer. Nothing outside the standard library is
+needed; on systems without inotify DirectoryWatch raises OSError.
+"""
+
+__author__ = 'Ocean Observatories Initiative <contactooici@oceanobservatories.org>'
+__license__ = 'Apache 2.0'
+
+import os
+import errno
+import struct
+import ctypes
+import ctypes.util
+
+from mi.core.log import get_logger ; log = get_logger()
+
+# event masks from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+# inotify_init1 flags, the same values as the matching open flags
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# a file has been completely written into or moved into the directory
+IN_FILE_READY = IN_CLOSE_WRITE | IN_MOVED_TO
+# the watched directory itself has gone away
+IN_WATCH_GONE = IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED
+
+# struct inotify_event header: wd, mask, cookie, len, followed by len bytes of name
+EVENT_HEADER = struct.Struct('iIII')
+READ_SIZE = 65536
+
+_libc = None
+
+
+def _get_libc():
+    """
+    Load the inotify functions from libc
+    @raise OSError if this libc doesn't have inotify
+    """
+    global _libc
+    if _libc is None:
+        name = ctypes.util.find_library('c')
+        if name is None:
+            raise OSError(errno.ENOSYS, "libc not found")
+        libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        _libc = libc
+    return _libc
+
+
+def inotify_available():
+    """
+    @retval True if inotify watches can be created on this system
+    """
+    try:
+        _get_libc()
+    except (OSError, AttributeError):
+        return False
+    return True
+
+
+def parse_events(data):
+    """
+    Split raw data read from an inotify file descriptor into events
+    @param data String of one or more struct inotify_event
+    @retval list of (mask, name) tuples, name is '' for events on the watch itself
+    """
+    events = []
+    offset = 0
+    while offset + EVENT_HEADER.size <= len(data):
+        (wd, mask, cookie, length) = EVENT_HEADER.unpack_from(data, offset)
+        offset += EVENT_HEADER.size
+        name = data[offset:offset + length].rstrip('\0')
+        offset += length
+        events.append((mask, name))
+    return events
+
+
+class DirectoryWatch(object):
+    """
+    Non blocking inotify watch on a single directory. Use fileno() with select
+    to wait for events, then read_events() to collect them.
+    """
+
+    def __init__(self, directory, mask=IN_FILE_READY | IN_WATCH_GONE):
+        """
+        @param directory The directory to watch
+        @param mask The inotify event mask to watch for
+        @raise OSError if inotify is not available or the watch can't be added
+        """
+        libc = _get_libc()
+        self.directory = directory
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, "inotify_init1: %s" % os.strerror(error))
+        wd = libc.inotify_add_watch(self._fd, directory, mask | IN_ONLYDIR)
+        if wd < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            self._fd = None
+            raise OSError(error, "inotify_add_watch %s: %s" % (directory, os.strerror(error)))
+        log.debug("Added inotify watch on %s", directory)
+
+    def fileno(self):
+        return self._fd
+
+    def read_events(self):
+        """
+        Read all the events that are currently queued
+        @retval list of (mask, name) tuples, empty if there are none
+        """
+        chunks = []
+        while True:
+            try:
+                data = os.read(self._fd, READ_SIZE)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EINTR):
+                    break
+                raise
+            if not data:
+                break
+            chunks.append(data)
+        return parse_events(''.join(chunks))
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    @property
+    def closed(self):
+        return self._fd is None
@@ -11,6 +11,10 @@
 __author__ = 'Steve Foley'
 __license__ = 'Apache 2.0'
 
+import re
+from bisect import bisect_right
+from collections import deque
+
 from mi.core.log import get_logger ; log = get_logger()
 
 from mi.core.exceptions import SampleException
@@ -60,26 +64,40 @@ class Chunker(object):
         @param timestamp The time (in NTP4 float format) that the data was
             collected at the port agent
         """
+        self.add_chunks([(raw_data, timestamp)])
+
+    def add_chunks(self, chunks):
+        """
+        Adds several chunks of data to the end of the buffer, each with its
+        own timestamp in the raw_chunk_list, then looks for data blocks once
+        for all of them.
+
+        @param chunks A list of (raw_data, timestamp) tuples
+        """
         assert isinstance(self.buffer, str) or isinstance(self.buffer, list)
-        assert isinstance(timestamp, float)
-        # Append raw
-        start_index = len(self.buffer)
-        
+        if not chunks:
+            return
+
         if self.data_chunk_list == []:
             last_data_index = 0
         else:
             last_data_index = self.data_chunk_list[-1][1] 
-        end_index = start_index + len(raw_data)
-        
-        if isinstance(self.buffer, str):
-            self.buffer += raw_data
-        else:
-            self.buffer.append(raw_data)
-            
-        self.raw_chunk_list.append((start_index, end_index, timestamp))
+
+        # Append raw
+        for (raw_data, timestamp) in chunks:
+            assert isinstance(timestamp, float)
+            start_index = len(self.buffer)
+            end_index = start_index + len(raw_data)
+
+            if isinstance(self.buffer, str):
+                self.buffer += raw_data
+            else:
+                self.buffer.append(raw_data)
+
+            self.raw_chunk_list.append((start_index, end_index, timestamp))
 
         # find data
-        result = self._generate_data_lists(timestamp,
+        result = self._generate_data_lists(chunks[0][1],
                                            start_index=last_data_index)
         assert result != None
         
@@ -454,6 +472,23 @@ class Chunker(object):
     
         return return_list
 
+    @staticmethod
+    def compiled_sieve_function(raw_data, regex_list=[], sync_specs=[]):
+        """
+        A drop in replacement for regex_sieve_function that runs all the
+        regexes in a single pass over the raw data, see RegexSieve. The
+        compiled sieve is cached, so this can be used with functools.partial()
+        the same way:
+        StringChunker(partial(StringChunker.compiled_sieve_function, regex_list=[regex]))
+        @param raw_data The raw data to run through this regex sieve
+        @param regex_list a list of pre-compiled regexes that will identify some
+        flavor of a pattern in the raw data for matching.
+        @param sync_specs a list of (sync_bytes, record_length) tuples for
+        fixed length binary records
+        @retval A sorted list of non overlapping (start, end) tuples
+        """
+        return compile_sieve(regex_list, sync_specs)(raw_data)
+
     
 class StringChunker(Chunker):
     """
@@ -473,4 +508,502 @@ class BinaryChunker(Chunker):
     def __init__(self, data_sieve_fn):
         Chunker.__init__(self, data_sieve_fn)
         self.buffer = []
-    
\ No newline at end of file
+    
+
+class IncrementalChunker(Chunker):
+    """
+    A drop in replacement for the StringChunker and BinaryChunker that keeps
+    its data in a single growable bytearray with a read offset instead of
+    rebuilding a string on every fragment and every fetch.
+
+    Internally every index is an absolute byte position in the stream that
+    has been fed to the chunker. The public methods translate these back to
+    positions relative to the unconsumed head of the buffer so that callers
+    see exactly the same indices as with the StringChunker.
+
+    Fragments are only sieved from the end of the last data block found
+    (the saved scan position). If the largest record the sieve can match is
+    known, pass it in as max_record_size and the sieve will only be shown the
+    newly added bytes plus enough of the old ones to complete a record, so
+    a long run of non-data does not get rescanned on every add.
+
+    Consumed bytes are dropped from the front of the buffer lazily, once
+    they make up more than compact_size bytes and more than half of the
+    buffer.
+    """
+    def __init__(self, data_sieve_fn, max_record_size=None, compact_size=65536):
+        """
+        Initialize the buffer and indexing structures. The base class
+        constructor is not used because the buffer and chunk lists are read
+        only views here.
+
+        @param data_sieve_fn A sieve function, see Chunker.__init__
+        @param max_record_size The length in bytes of the largest block the
+            sieve will ever return, None if unknown. When None the sieve is
+            rerun from the end of the last data block on every add, like the
+            StringChunker.
+        @param compact_size The number of consumed bytes to allow at the front
+            of the buffer before compacting it
+        """
+        self.sieve = data_sieve_fn
+        self._max_record_size = max_record_size
+        self._compact_size = compact_size
+        self.reset()
+
+    def reset(self):
+        """
+        Throw away all buffered data and index information.
+        """
+        self._buffer = bytearray()
+        # absolute position of self._buffer[0]
+        self._base = 0
+        # absolute position of the first unconsumed byte
+        self._offset = 0
+        # absolute position the next sieve pass starts from
+        self._scan_pos = 0
+
+        # raw chunks are kept in a list with a head index so timestamps can
+        # be found with a bisect on the chunk end positions
+        self._raw_list = []
+        self._raw_ends = []
+        self._raw_head = 0
+
+        self._data_list = deque()
+        self._nondata_list = deque()
+
+    @property
+    def buffer(self):
+        """
+        The unconsumed data as a string
+        """
+        return str(self._buffer[self._offset - self._base:])
+
+    @property
+    def raw_chunk_list(self):
+        return self._relative_list(self._raw_list[self._raw_head:])
+
+    @property
+    def data_chunk_list(self):
+        return self._relative_list(self._data_list)
+
+    @property
+    def nondata_chunk_list(self):
+        return self._relative_list(self._nondata_list)
+
+    def _relative_list(self, chunk_list):
+        """
+        Rebase a list of absolute (start, end, timestamp) tuples onto the
+        unconsumed head of the buffer.
+        """
+        return [(s - self._offset, e - self._offset, t) for (s, e, t) in chunk_list]
+
+    def add_chunk(self, raw_data, timestamp):
+        """
+        Adds a chunk of data to the end of the buffer, then sieves the new
+        data (and any incomplete fragment before it) for data blocks.
+
+        @param raw_data The bunch of raw data as a string, bytearray or
+            anything else that supports the buffer interface
+        @param timestamp The time (in NTP4 float format) that the data was
+            collected at the port agent
+        @throws SampleException if the sieve returns overlapping blocks
+        """
+        self.add_chunks([(raw_data, timestamp)])
+
+    def add_chunks(self, chunks):
+        """
+        Adds several chunks of data to the end of the buffer, each with its
+        own timestamp, then sieves the new data once for all of them.
+
+        @param chunks A list of (raw_data, timestamp) tuples
+        @throws SampleException if the sieve returns overlapping blocks
+        """
+        start_index = self._base + len(self._buffer)
+        for (raw_data, timestamp) in chunks:
+            assert isinstance(timestamp, float)
+            if not raw_data:
+                continue
+            chunk_start = self._base + len(self._buffer)
+            self._buffer.extend(raw_data)
+            end_index = self._base + len(self._buffer)
+            self._raw_list.append((chunk_start, end_index, timestamp))
+            self._raw_ends.append(end_index)
+
+        end_index = self._base + len(self._buffer)
+        if end_index == start_index:
+            return
+
+        scan_start = self._scan_pos
+        if self._max_record_size is not None:
+            scan_start = max(scan_start, start_index - self._max_record_size + 1)
+
+        result = self.sieve(str(self._buffer[scan_start - self._base:]))
+        if self.overlaps(result):
+            raise SampleException("Overlapping blocks in sieve list: %s" % result)
+        result.sort()
+
+        # any non-data after the scan position is tentative, it may have
+        # been the first part of a fragment, so work it out again.
+        tentative_time = None
+        while self._nondata_list and self._nondata_list[-1][0] >= self._scan_pos:
+            tentative_time = self._nondata_list.pop()[2]
+
+        if not result:
+            if tentative_time is None:
+                tentative_time = self._timestamp_at(max(self._scan_pos, start_index))
+            self._nondata_list.append((self._scan_pos, end_index, tentative_time))
+            return
+
+        previous_end = self._scan_pos
+        for (s, e) in result:
+            s += scan_start
+            e += scan_start
+            if s > previous_end:
+                if previous_end == self._scan_pos and tentative_time is not None:
+                    gap_time = tentative_time
+                else:
+                    gap_time = self._timestamp_at(previous_end)
+                self._nondata_list.append((previous_end, s, gap_time))
+            self._data_list.append((s, e, self._timestamp_at(s)))
+            previous_end = e
+
+        self._scan_pos = previous_end
+
+    def _timestamp_at(self, index):
+        """
+        Find the timestamp of the raw chunk holding an absolute index
+        @param index The absolute position in the stream
+        @retval The timestamp of the raw chunk that position arrived in
+        """
+        raw_index = bisect_right(self._raw_ends, index, self._raw_head)
+        return self._raw_list[raw_index][2]
+
+    def get_next_data_with_index(self, clean=True):
+        """
+        Get the next chunk of data from the buffer. By default, it clears all
+        that comes before it. This method returns the start and end indices in
+        the resulting tuple.
+
+        @param clean If set to false, do not clear the buffer when fetching the
+            data, but simply return the data block and make no further changes.
+        @return A tuple of (timestamp, data_chunk, start_index, end_index) where timestamp is in NTP4
+            float format and data chunk is a section of buffer with indices
+            between (start, end). If no data, returns (None, None, None, None)
+        """
+        return self._next_chunk(self._data_list, clean)
+
+    def get_next_non_data_with_index(self, clean=True):
+        """
+        Get the next chunk of non-data from the buffer, clearing all that comes
+        before it. Default behavior is to clear the buffer before and including
+        this data.
+
+        @param clean Remove the buffer contents before and including this data
+        @return A tuple of (timestamp, data_chunk, next_start, next_end)
+            where timestamp is in NTP4 float format and data chunk is a
+            (start, end) tuple, (None, None) if no data
+        """
+        return self._next_chunk(self._nondata_list, clean)
+
+    def get_next_raw(self, clean=True):
+        """
+        Get the next chunk of raw characters from the buffer, clearing all
+        that comes before it. Any data block that was only partly consumed is
+        moved to the non-data list.
+
+        @param clean Remove the buffer contents before and including this data
+        @return A tuple of (timestamp, data_chunk) where timestamp is in NTP4
+            float format and data chunk is a (start, end) tuple,
+            (None, None) if empty list
+        """
+        if self._raw_head == len(self._raw_list):
+            return (None, None)
+
+        (next_start, next_end, next_time) = self._raw_list[self._raw_head]
+        next_block = self._slice(next_start, next_end)
+
+        if clean:
+            torn_data = None
+            while self._data_list and self._data_list[0][0] < next_end:
+                (s, e, t) = self._data_list.popleft()
+                if e > next_end:
+                    torn_data = (next_end, e, t)
+            self._consume(next_end)
+            if torn_data is not None:
+                self._nondata_list.appendleft(torn_data)
+
+        return (next_time, next_block)
+
+    def _next_chunk(self, chunk_list, clean):
+        """
+        Fetch the first entry of a data or non-data list.
+
+        @param chunk_list The deque of absolute (start, end, timestamp)
+            tuples to take the entry from
+        @param clean Consume the buffer up to the end of the entry
+        @retval A tuple of (timestamp, data_chunk, start_index, end_index),
+            with indices relative to the unconsumed buffer, or
+            (None, None, None, None) if the list is empty
+        """
+        if not chunk_list:
+            return (None, None, None, None)
+
+        (next_start, next_end, timestamp) = chunk_list[0]
+        next_block = self._slice(next_start, next_end)
+        result = (timestamp, next_block,
+                  next_start - self._offset, next_end - self._offset)
+
+        if clean:
+            self._consume(next_end)
+
+        return result
+
+    def _slice(self, start, end):
+        """
+        @retval The absolute range [start, end) of the buffer as a string
+        """
+        return str(self._buffer[start - self._base:end - self._base])
+
+    def _consume(self, end_index):
+        """
+        Mark everything before an absolute index as consumed, trimming the
+        chunk lists to match, and compact the buffer if it is worth it.
+        @param end_index The absolute index to consume up to
+        """
+        self._offset = end_index
+        if self._scan_pos < end_index:
+            self._scan_pos = end_index
+
+        self._raw_head = bisect_right(self._raw_ends, end_index, self._raw_head)
+        if self._raw_head < len(self._raw_list):
+            (s, e, t) = self._raw_list[self._raw_head]
+            if s < end_index:
+                self._raw_list[self._raw_head] = (end_index, e, t)
+
+        for chunk_list in (self._data_list, self._nondata_list):
+            while chunk_list and chunk_list[0][1] <= end_index:
+                chunk_list.popleft()
+            if chunk_list and chunk_list[0][0] < end_index:
+                (s, e, t) = chunk_list.popleft()
+                chunk_list.appendleft((end_index, e, t))
+
+        self._compact()
+
+    def _compact(self):
+        """
+        Drop consumed bytes and raw chunks from the front of the buffer once
+        they outweigh the live ones.
+        """
+        consumed = self._offset - self._base
+        if consumed > self._compact_size and consumed * 2 > len(self._buffer):
+            del self._buffer[:consumed]
+            self._base = self._offset
+
+        if self._raw_head > 1024 and self._raw_head * 2 > len(self._raw_list):
+            del self._raw_list[:self._raw_head]
+            del self._raw_ends[:self._raw_head]
+            self._raw_head = 0
+
+
+class RegexSieve(object):
+    """
+    A sieve function compiled from a list of regexes and fixed length binary
+    record specs. The patterns are combined into one alternation, so the raw
+    data is scanned once no matter how many record types there are, instead
+    of once per regex.
+
+    Capturing groups are turned into non capturing ones and '.' is rewritten
+    for patterns compiled without DOTALL, so regexes with different DOTALL
+    settings can share a scanner. Patterns that can't be combined (back
+    references, inline flags, VERBOSE) are scanned on their own.
+
+    Spans never overlap. The match that starts first wins, and where two
+    patterns match at the same place the one earlier in the regex list wins,
+    with sync specs after the regexes. Within a combined scanner the regex
+    engine picks the winning alternative; matches from separate scanners
+    that overlap a winning span are dropped with a warning.
+    """
+    # python 2 re supports at most 100 groups per pattern, each record type needs one
+    MAX_SCANNER_TYPES = 99
+
+    def __init__(self, regex_list=(), sync_specs=()):
+        """
+        @param regex_list a list of pre-compiled regexes
+        @param sync_specs a list of (sync_bytes, record_length) tuples, each is
+            a record of record_length bytes starting with sync_bytes
+        """
+        entries = [(regex.pattern, regex.flags, regex, regex) for regex in regex_list]
+        for (sync_bytes, length) in sync_specs:
+            if length < len(sync_bytes):
+                raise SampleException("Sync spec %r is longer than its record length %d" % (sync_bytes, length))
+            pattern = '%s.{%d}' % (re.escape(sync_bytes), length - len(sync_bytes))
+            entries.append((pattern, re.DOTALL, None, (sync_bytes, length)))
+
+        self.record_types = [record_type for (_, _, _, record_type) in entries]
+        # list of (compiled regex, record types by alternative or None if not combined)
+        self._scanners = []
+
+        groups = {}
+        group_order = []
+        for (index, (pattern, flags, regex, record_type)) in enumerate(entries):
+            alternative = None
+            if not flags & re.VERBOSE:
+                alternative = self._ungroup(pattern, flags & re.DOTALL)
+            if alternative is None:
+                self._scanners.append((regex or re.compile(pattern, flags), [index], False))
+                continue
+            key = flags & ~re.DOTALL
+            if key not in groups:
+                groups[key] = []
+                group_order.append(key)
+            groups[key].append((index, alternative))
+
+        for key in group_order:
+            members = groups[key]
+            for start in range(0, len(members), self.MAX_SCANNER_TYPES):
+                self._add_combined(members[start:start + self.MAX_SCANNER_TYPES], key, entries)
+
+    def _add_combined(self, members, flags, entries):
+        """
+        Compile a group of patterns with the same flags into one scanner.
+        Each alternative ends with an empty group so the match's lastindex
+        tells which one matched.
+        """
+        combined = '|'.join('%s()' % alternative for (_, alternative) in members)
+        indexes = [index for (index, _) in members]
+        try:
+            regex = re.compile(combined, flags | re.DOTALL)
+        except (re.error, AssertionError, OverflowError) as e:
+            log.debug("Unable to combine sieve patterns, scanning them separately: %s", e)
+            for index in indexes:
+                (pattern, pattern_flags, regex, _) = entries[index]
+                self._scanners.append((regex or re.compile(pattern, pattern_flags), [index], False))
+            return
+        self._scanners.append((regex, indexes, True))
+
+    @staticmethod
+    def _ungroup(pattern, dotall):
+        """
+        Rewrite a pattern so it can be one alternative in a combined DOTALL
+        regex: capturing and named groups become non capturing, and '.' only
+        matches newlines if the pattern was DOTALL.
+        @param pattern The regex source
+        @param dotall True if the pattern was compiled with DOTALL
+        @retval The rewritten pattern, or None if it can't be combined
+        """
+        result = []
+        index = 0
+        length = len(pattern)
+        while index < length:
+            char = pattern[index]
+            if char == '\\':
+                escaped = pattern[index + 1:index + 2]
+                if escaped and escaped in '123456789':
+                    # back reference to a group number
+                    return None
+                result.append(pattern[index:index + 2])
+                index += 2
+            elif char == '[':
+                end = index + 1
+                if pattern[end:end + 1] == '^':
+                    end += 1
+                if pattern[end:end + 1] == ']':
+                    end += 1
+                while end < length and pattern[end] != ']':
+                    end += 2 if pattern[end] == '\\' else 1
+                result.append(pattern[index:end + 1])
+                index = end + 1
+            elif char == '(':
+                if pattern[index + 1:index + 2] != '?':
+                    result.append('(?:')
+                    index += 1
+                    continue
+                extension = pattern[index + 2:index + 3]
+                if extension == 'P' and pattern[index + 3:index + 4] == '<':
+                    result.append('(?:')
+                    index = pattern.index('>', index) + 1
+                elif extension in (':', '=', '!', '<', '#'):
+                    result.append(char)
+                    index += 1
+                else:
+                    # named back references, conditionals and inline flags
+                    return None
+            elif char == '.' and not dotall:
+                result.append('[^\\n]')
+                index += 1
+            else:
+                result.append(char)
+                index += 1
+        return ''.join(result)
+
+    def spans(self, raw_data):
+        """
+        Find the records in the raw data
+        @param raw_data The raw data to sieve
+        @retval A sorted list of non overlapping (start, end, record_type)
+            tuples. record_type is the compiled regex from the regex list, or
+            the (sync_bytes, record_length) tuple from the sync specs.
+        """
+        record_types = self.record_types
+        if len(self._scanners) == 1:
+            (regex, indexes, combined) = self._scanners[0]
+            if combined:
+                return [(match.start(), match.end(), record_types[indexes[match.lastindex - 1]])
+                        for match in regex.finditer(raw_data) if match.end() > match.start()]
+            return [(match.start(), match.end(), record_types[indexes[0]])
+                    for match in regex.finditer(raw_data) if match.end() > match.start()]
+
+        found = []
+        for (regex, indexes, combined) in self._scanners:
+            for match in regex.finditer(raw_data):
+                if match.end() > match.start():
+                    index = indexes[match.lastindex - 1] if combined else indexes[0]
+                    found.append((match.start(), index, match.end()))
+        found.sort()
+
+        result = []
+        last_end = 0
+        for (start, index, end) in found:
+            if start >= last_end:
+                result.append((start, end, record_types[index]))
+                last_end = end
+            else:
+                (kept_start, kept_end, kept_type) = result[-1]
+                log.warn("Sieve dropped a %r match at %d-%d overlapping a %r match at %d-%d",
+                         self._describe(record_types[index]), start, end,
+                         self._describe(kept_type), kept_start, kept_end)
+        return result
+
+    @staticmethod
+    def _describe(record_type):
+        """
+        @retval the regex pattern or sync spec of a record type, for logging
+        """
+        return getattr(record_type, 'pattern', record_type)
+
+    def __call__(self, raw_data):
+        """
+        Sieve function interface for the chunkers
+        @param raw_data The raw data to sieve
+        @retval A sorted list of non overlapping (start, end) tuples
+        """
+        return [(start, end) for (start, end, _) in self.spans(raw_data)]
+
+
+_compiled_sieves = {}
+
+
+def compile_sieve(regex_list, sync_specs=()):
+    """
+    Get a RegexSieve for a list of regexes and sync specs, compiling it the
+    first time the combination is seen
+    @param regex_list a list of pre-compiled regexes
+    @param sync_specs a list of (sync_bytes, record_length) tuples
+    @retval RegexSieve
+    """
+    key = (tuple(regex_list), tuple(sync_specs))
+    sieve = _compiled_sieves.get(key)
+    if sieve is None:
+        sieve = RegexSieve(regex_list, sync_specs)
+        _compiled_sieves[key] = sieve
+    return sieve
@@ -58,6 +58,74 @@ class DataParticleValue(BaseEnum):
     INVALID = "invalid"
     QUESTIONABLE = "questionable"
     
+
+# compiled encoders, one for each particle class
+_PARTICLE_ENCODERS = {}
+
+
+class ParticleEncoder(object):
+    """
+    JSON encoder compiled once for a data particle class.  Particle classes that
+    define _encoding_rules and _build_raw_values, or that override _build_value_pairs,
+    are encoded from lists of value ids and values, applying the encoding functions
+    in one pass instead of calling _encode_value for each value.  The particle is
+    then written with a single json.dumps call, so the output is exactly what
+    json.dumps(particle.generate_dict()) gives.
+    """
+
+    def __init__(self, particle_class):
+        """
+        @param particle_class The DataParticle subclass to compile an encoder for
+        """
+        rules = particle_class._encoding_rules or ()
+        self.value_ids = [value_id for (value_id, encoding_function) in rules]
+        self._encoding_functions = [encoding_function for (value_id, encoding_function) in rules]
+
+        # value pairs can only be used if the particle builds its values the standard way
+        self.uses_value_pairs = bool(rules) or \
+            _method_function(particle_class, '_build_value_pairs') is not _method_function(DataParticle, '_build_value_pairs')
+        for name in ('_build_parsed_values', 'generate_dict', '_build_base_structure'):
+            if _method_function(particle_class, name) is not _method_function(DataParticle, name):
+                self.uses_value_pairs = False
+
+    def encode(self, particle, raw_values):
+        """
+        Apply the encoding rules to a tuple of raw values
+        @param particle The particle being encoded, which records any encoding errors
+        @param raw_values Sequence of raw values, in the same order as the encoding rules
+        @retval list of encoded values, None for values that failed to encode
+        @raise SampleException if the number of values does not match the rules
+        """
+        if len(raw_values) != len(self._encoding_functions):
+            raise SampleException("%s: expected %d values, got %d" %
+                                  (particle.data_particle_type(), len(self._encoding_functions), len(raw_values)))
+        try:
+            return [encoding_function(value) for (encoding_function, value)
+                    in zip(self._encoding_functions, raw_values)]
+        except Exception:
+            # go back through one at a time to record which values failed
+            return [particle._encode_value(value_id, value, encoding_function)[DataParticleKey.VALUE]
+                    for (value_id, encoding_function, value)
+                    in zip(self.value_ids, self._encoding_functions, raw_values)]
+
+    @staticmethod
+    def dumps(result, value_ids, values):
+        """
+        Write a particle as JSON
+        @param result The particle dictionary without its values, as built by generate_dict
+        @param value_ids List of value ids
+        @param values List of values, in the same order as the value ids
+        @retval JSON string
+        """
+        result[DataParticleKey.VALUES] = [{DataParticleKey.VALUE_ID: value_id, DataParticleKey.VALUE: value}
+                                          for (value_id, value) in zip(value_ids, values)]
+        return json.dumps(result)
+
+
+def _method_function(cls, name):
+    return getattr(cls, name).im_func
+
+
 class DataParticle(object):
     """
     This class is responsible for storing and ultimately generating data
@@ -75,6 +143,11 @@ class DataParticle(object):
     # data_particle_type()
     _data_particle_type = None
 
+    # Optional list of (value id, encoding function) tuples.  A particle class that sets this
+    # implements _build_raw_values instead of _build_parsed_values, returning a tuple of raw
+    # values in the same order, and is encoded without building a dictionary for each value.
+    _encoding_rules = None
+
     def __init__(self, raw_data,
                  port_timestamp=None,
                  internal_timestamp=None,
@@ -123,6 +196,17 @@ class DataParticle(object):
                           arg.contents[DataParticleKey.INTERNAL_TIMESTAMP])
             return False
 
+    @classmethod
+    def encoder(cls):
+        """
+        Get the compiled JSON encoder for this particle class, compiling it the first time
+        @return: ParticleEncoder
+        """
+        encoder = _PARTICLE_ENCODERS.get(cls)
+        if encoder is None:
+            encoder = _PARTICLE_ENCODERS[cls] = ParticleEncoder(cls)
+        return encoder
+
     @classmethod
     def type(cls):
         """
@@ -229,10 +313,22 @@ class DataParticle(object):
            and driver timestamp
         @throws InstrumentDriverException If there is a problem with the inputs
         """
-        result = self.generate_dict()
-        json_result = json.dumps(result, sort_keys=sorted)
-        return json_result
-        
+        if sorted:
+            return json.dumps(self.generate_dict(), sort_keys=True)
+
+        encoder = self.encoder()
+        if not encoder.uses_value_pairs:
+            return json.dumps(self.generate_dict())
+
+        # the same steps as generate_dict, without building the value dictionaries
+        if not self._check_preferred_timestamps():
+            raise SampleException("Preferred timestamp not in particle!")
+        self._encoding_errors = []
+        value_pairs = self._build_value_pairs()
+        result = self._build_base_structure()
+        result[DataParticleKey.STREAM_NAME] = self.data_particle_type()
+        return encoder.dumps(result, *value_pairs)
+
     def _build_parsed_values(self):
         """
         Build values of a parsed structure. Just the values are built so
@@ -242,7 +338,34 @@ class DataParticle(object):
         @return the values tag for this data structure ready to JSONify
         @raises SampleException when parsed values can not be properly returned
         """
-        raise SampleException("Parsed values block not overridden")
+        value_pairs = self._build_value_pairs()
+        if value_pairs is None:
+            raise SampleException("Parsed values block not overridden")
+        return [{DataParticleKey.VALUE_ID: value_id, DataParticleKey.VALUE: value}
+                for (value_id, value) in zip(*value_pairs)]
+
+    def _build_value_pairs(self):
+        """
+        Build the value ids and values of a parsed structure as two lists, rather than
+        as a dictionary for each value.  Particles with _encoding_rules get this from
+        _build_raw_values, others may override it in place of _build_parsed_values.
+
+        @return (value ids, values) tuple, or None if not supported by this particle
+        @raises SampleException when parsed values can not be properly returned
+        """
+        if self._encoding_rules is None:
+            return None
+        encoder = self.encoder()
+        return (encoder.value_ids, encoder.encode(self, self._build_raw_values()))
+
+    def _build_raw_values(self):
+        """
+        Build the raw values of a particle with _encoding_rules, before encoding
+
+        @return tuple of values in the same order as _encoding_rules
+        @raises SampleException when the values can not be properly returned
+        """
+        raise SampleException("Raw values block not overridden")
 
 
     def _build_base_structure(self):
@@ -19,6 +19,7 @@ import os
 import sys
 import time
 import traceback
+from collections import deque
 from mi.core.exceptions import InstrumentException, InstrumentCommandException
 from mi.core.instrument.instrument_driver import DriverAsyncEvent
 
@@ -56,7 +57,7 @@ class DriverProcess(object):
         self.driver_class = driver_class
         self.ppid = ppid
         self.driver = None
-        self.events = []
+        self.events = deque()
         self.messaging_started = False
         
     def construct_driver(self):
@@ -145,7 +146,8 @@ class DriverProcess(object):
             return'stop_driver_process'
         elif cmd == 'test_events':
             events = kwargs['events']
-            self.events += events
+            self.events.extend(events)
+            self.notify_events()
             reply = 'test_events'
         elif cmd == 'process_echo':
             reply = 'ping from resource ppid:%s, resource:%s' % (str(self.ppid), str(self.driver))
@@ -187,9 +189,17 @@ class DriverProcess(object):
             
     def send_event(self, evt):
         """
-        Append an event to the list to be sent by the event threaed.
+        Append an event to the queue to be sent by the event thread.
         """
         self.events.append(evt)
+        self.notify_events()
+
+    def notify_events(self):
+        """
+        Signal that events have been queued. Overridden in subclasses
+        whose event thread blocks waiting for them.
+        """
+        pass
             
     def run(self):
         """
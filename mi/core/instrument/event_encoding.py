@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.event_encoding Driver event wire formats
+@file mi/core/instrument/event_encoding.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief Encoding of batches of driver events sent from a driver process to
+its client. A batch goes out as one multipart message, a frame naming the
+format followed by one frame per event. The msgpack format needs the msgpack
+package, which is optional; without it events are pickled.
+"""
+
+__author__ = 'Ocean Observatories Initiative <contactooici@oceanobservatories.org>'
+__license__ = 'Apache 2.0'
+
+import cPickle as pickle
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from mi.core.common import BaseEnum
+from mi.core.exceptions import InstrumentParameterException
+
+# msgpack extension type code for values msgpack can't represent exactly
+PICKLED_EXT_TYPE = 1
+
+
+class EventFormat(BaseEnum):
+    """
+    Wire formats for batches of driver events
+    """
+    MSGPACK = 'msgpack'
+    PICKLE = 'pickle'
+
+
+def available_formats():
+    """
+    @retval list of the event formats this process can encode and decode,
+        most compact first
+    """
+    if msgpack is None:
+        return [EventFormat.PICKLE]
+    return [EventFormat.MSGPACK, EventFormat.PICKLE]
+
+
+def _pickle_ext(value):
+    """
+    msgpack default hook, tuples, subclasses of the basic types and any
+    other objects are pickled so they decode as exactly the same type
+    """
+    return msgpack.ExtType(PICKLED_EXT_TYPE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def _unpickle_ext(code, data):
+    """
+    msgpack ext hook, the reverse of _pickle_ext
+    """
+    if code == PICKLED_EXT_TYPE:
+        return pickle.loads(data)
+    return msgpack.ExtType(code, data)
+
+
+def encode_events(event_format, events):
+    """
+    Encode a batch of events into message frames
+    @param event_format The EventFormat to use
+    @param events list of events
+    @retval list of frames, the format name followed by one frame per event
+    @raise InstrumentParameterException if the format is not available
+    """
+    if event_format not in available_formats():
+        raise InstrumentParameterException("Event format %s is not available" % event_format)
+
+    if event_format == EventFormat.MSGPACK:
+        # str and unicode are packed as bin and str so each decodes as the
+        # type it was encoded from
+        packer = msgpack.Packer(use_bin_type=True, strict_types=True, default=_pickle_ext)
+        frames = [packer.pack(evt) for evt in events]
+    else:
+        frames = [pickle.dumps(evt, pickle.HIGHEST_PROTOCOL) for evt in events]
+
+    frames.insert(0, event_format)
+    return frames
+
+
+def decode_events(frames):
+    """
+    Decode the message frames of a batch of events
+    @param frames list of frames as produced by encode_events
+    @retval list of events
+    @raise InstrumentParameterException if the format is not available
+    """
+    event_format = frames[0]
+    if event_format not in available_formats():
+        raise InstrumentParameterException("Event format %s is not available" % event_format)
+
+    if event_format == EventFormat.MSGPACK:
+        return [msgpack.unpackb(frame, raw=False, ext_hook=_unpickle_ext) for frame in frames[1:]]
+    return [pickle.loads(frame) for frame in frames[1:]]
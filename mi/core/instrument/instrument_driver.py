@@ -368,6 +368,9 @@ class InstrumentDriver(object):
             self._send_event(event)
         
         elif type == DriverAsyncEvent.SAMPLE:
+            # protocols publish particle dictionaries, agents expect JSON
+            if isinstance(val, dict):
+                val = json.dumps(val)
             event['value'] = val
             self._send_event(event)
             
@@ -470,6 +473,9 @@ class SingleConnectionInstrumentDriver(InstrumentDriver):
         # This set to false when a connection is established to
         # allow for lost callback to become activated.
         self._connection_lost = True
+
+        # Record state machine handler latencies, see set_handler_timing.
+        self._handler_timing = False
         
     #############################################################
     # Device connection interface.
@@ -754,6 +760,31 @@ class SingleConnectionInstrumentDriver(InstrumentDriver):
         """
         return self._connection_fsm.on_event(DriverEvent.STOP_DIRECT, DriverEvent.STOP_DIRECT)
 
+    def set_handler_timing(self, enabled=True):
+        """
+        Start or stop recording how long the connection and protocol state
+        machine handlers take, so slow handlers can be found in a running
+        driver. A protocol built after this is called inherits the setting.
+        @param enabled True to record handler latencies
+        """
+        self._handler_timing = enabled
+        self._connection_fsm.set_handler_timing(enabled)
+        protocol_fsm = getattr(self._protocol, '_protocol_fsm', None)
+        if protocol_fsm:
+            protocol_fsm.set_handler_timing(enabled)
+
+    def get_handler_timing(self):
+        """
+        Get the handler latency histograms recorded since handler timing
+        was turned on.
+        @retval dict with the histograms of the connection and protocol
+            state machines under 'connection' and 'protocol', see
+            InstrumentFSM.get_handler_timing
+        """
+        protocol_fsm = getattr(self._protocol, '_protocol_fsm', None)
+        return {'connection': self._connection_fsm.get_handler_timing(),
+                'protocol': protocol_fsm.get_handler_timing() if protocol_fsm else None}
+
     def test_force_state(self, *args, **kwargs):
         """
         Force driver into a given state for the purposes of unit testing 
@@ -903,10 +934,17 @@ class SingleConnectionInstrumentDriver(InstrumentDriver):
         result = None
         self._build_protocol()
         try:
-            self._connection.init_comms(self._protocol.got_data, 
-                                        self._protocol.got_raw,
-                                        self._got_exception,
-                                        self._lost_connection_callback)
+            if self._protocol._batch_packets():
+                self._connection.init_comms(self._protocol.got_data_batch,
+                                            self._protocol.got_raw_batch,
+                                            self._got_exception,
+                                            self._lost_connection_callback,
+                                            batch=True)
+            else:
+                self._connection.init_comms(self._protocol.got_data, 
+                                            self._protocol.got_raw,
+                                            self._got_exception,
+                                            self._lost_connection_callback)
             self._protocol._connection = self._connection
             next_state = DriverConnectionState.CONNECTED
         except InstrumentConnectionException as e:
@@ -927,6 +965,8 @@ class SingleConnectionInstrumentDriver(InstrumentDriver):
         """
         # Send state change event to agent.
         self._connection_lost = False
+        if self._handler_timing:
+            self.set_handler_timing()
         self._driver_event(DriverAsyncEvent.STATE_CHANGE)
 
     def _handler_connected_exit(self, *args, **kwargs):
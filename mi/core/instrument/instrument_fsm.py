@@ -10,13 +10,69 @@
 __author__ = 'Edward Hunter'
 __license__ = 'Apache 2.0'
 
-from threading import RLock
+import time
+from bisect import bisect_left
+from threading import Lock, RLock
 
 from mi.core.exceptions import InstrumentStateException
 
 from mi.core.log import get_logger,LoggerManager
 log = get_logger()
 
+# Upper bounds in seconds of the handler timing histogram buckets. There is
+# one more bucket for handlers that took longer than the last bound.
+HANDLER_TIMING_BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0)
+
+
+class HandlerTimer(object):
+    """
+    Latency histograms of state machine handlers, one for each state and
+    event pair.
+    """
+
+    def __init__(self, buckets=HANDLER_TIMING_BUCKETS):
+        """
+        @param buckets Ascending upper bounds in seconds of the histogram
+            buckets
+        """
+        self.buckets = tuple(buckets)
+        self._stats = {}
+        self._lock = Lock()
+
+    def record(self, state, event, elapsed):
+        """
+        Add a handler call to the histogram for its state and event
+        @param state The state the handler ran in
+        @param event The event it handled
+        @param elapsed How long it took in seconds
+        """
+        index = bisect_left(self.buckets, elapsed)
+        with self._lock:
+            stats = self._stats.get((state, event))
+            if stats is None:
+                stats = [0, 0.0, 0.0, [0] * (len(self.buckets) + 1)]
+                self._stats[(state, event)] = stats
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            stats[3][index] += 1
+
+    def get_stats(self):
+        """
+        @retval dict with the bucket bounds under 'buckets' and, under
+            'handlers', a dict of state to a dict of event to the count,
+            total and max seconds and histogram of the handler calls
+        """
+        handlers = {}
+        with self._lock:
+            for ((state, event), (count, total, longest, histogram)) in self._stats.iteritems():
+                handlers.setdefault(state, {})[event] = {'count': count,
+                                                         'total': total,
+                                                         'max': longest,
+                                                         'histogram': list(histogram)}
+        return {'buckets': list(self.buckets), 'handlers': handlers}
+
+
 class InstrumentFSM(object):
     """
     Simple state mahcine for driver and agent classes.
@@ -40,6 +96,14 @@ class InstrumentFSM(object):
         self.enter_event = enter_event
         self.exit_event = exit_event
 
+        # Built when the FSM starts, see _freeze
+        self._dispatch = None
+        self._state_set = None
+        self._event_set = None
+
+        # HandlerTimer while handler timing is on
+        self._timer = None
+
     def get_current_state(self):
         """
         Return current state.
@@ -63,8 +127,58 @@ class InstrumentFSM(object):
             return False
 
         self.state_handlers[(state,event)] = handler
+        if self._dispatch is not None:
+            self._dispatch.setdefault(state, {})[event] = handler
         return True
-        
+
+    def _freeze(self):
+        """
+        Build the dispatch table of handlers by state then event along with
+        the sets of states and events, so handling an event doesn't search
+        the state and event enums.
+        """
+        self._state_set = frozenset(self.states.list())
+        self._event_set = frozenset(self.events.list())
+        dispatch = dict((state, {}) for state in self._state_set)
+        for ((state, event), handler) in self.state_handlers.iteritems():
+            dispatch.setdefault(state, {})[event] = handler
+        self._dispatch = dispatch
+
+    def set_handler_timing(self, enabled=True):
+        """
+        Start or stop recording how long handlers take. Stopping discards
+        what has been recorded.
+        @param enabled True to record handler latencies
+        """
+        if not enabled:
+            self._timer = None
+        elif self._timer is None:
+            self._timer = HandlerTimer()
+
+    def get_handler_timing(self):
+        """
+        @retval Handler latency histograms as returned by
+            HandlerTimer.get_stats, or None if timing is off
+        """
+        timer = self._timer
+        if timer is None:
+            return None
+        return timer.get_stats()
+
+    def _call_handler(self, state, event, handler, *args, **kwargs):
+        """
+        Call a handler, timing it if handler timing is on
+        @retval result of the handler
+        """
+        timer = self._timer
+        if timer is None:
+            return handler(*args, **kwargs)
+        start_time = time.time()
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            timer.record(state, event, time.time() - start_time)
+
     def start(self, state, *args, **kwargs):
         """
         Start the state machine. Initializes current state and fires the
@@ -78,11 +192,12 @@ class InstrumentFSM(object):
 
         if not self.states.has(state):
             return False
-                
+
+        self._freeze()
         self.current_state = state
-        handler = self.state_handlers.get((state, self.enter_event), None)
+        handler = self._dispatch[state].get(self.enter_event)
         if handler:
-            handler(*args, **kwargs)
+            self._call_handler(state, self.enter_event, handler, *args, **kwargs)
         return True
 
     def on_event(self, event, *args, **kwargs):
@@ -97,23 +212,31 @@ class InstrumentFSM(object):
         @raises Any exception raised by the handlers.
         """
 
-        next_state = None
-        result = None
+        if self._dispatch is None:
+            self._freeze()
 
-        if self.events.has(event):
-            handler = self.state_handlers.get((self.current_state, event), None)
-            if handler:
-                (next_state, result) = handler(*args, **kwargs)
-            else:
-                raise InstrumentStateException('Command (%s) not handled in current state (%s).' % (event, self.current_state))
-        else:
+        try:
+            known_event = event in self._event_set
+        except TypeError:
+            known_event = False
+        if not known_event:
             raise InstrumentStateException(str(event) + " was not handled by InstrumentFSM.on_event()")
 
-        if self.states.has(next_state):
+        state = self.current_state
+        handler = self._dispatch.get(state, {}).get(event)
+        if not handler:
+            raise InstrumentStateException('Command (%s) not handled in current state (%s).' % (event, state))
+
+        if self._timer is None:
+            (next_state, result) = handler(*args, **kwargs)
+        else:
+            (next_state, result) = self._call_handler(state, event, handler, *args, **kwargs)
+
+        if next_state in self._state_set:
             self._on_transition(next_state, *args, **kwargs)
         else:
-            log.debug("No next state'" + repr(next_state) + "', remaining in current_state.")
-                
+            log.debug("No next state '%r', remaining in current_state.", next_state)
+
         return result
             
     def _on_transition(self, next_state, *args, **kwargs):
@@ -126,14 +249,14 @@ class InstrumentFSM(object):
         @raises Any exception raised by the handlers.
         """
 
-        handler = self.state_handlers.get((self.current_state, self.exit_event), None)
+        handler = self._dispatch.get(self.current_state, {}).get(self.exit_event)
         if handler:
-            handler(*args, **kwargs)
+            self._call_handler(self.current_state, self.exit_event, handler, *args, **kwargs)
         self.previous_state = self.current_state
         self.current_state = next_state
-        handler = self.state_handlers.get((self.current_state, self.enter_event), None)
+        handler = self._dispatch[next_state].get(self.enter_event)
         if handler:
-            handler(*args, **kwargs)
+            self._call_handler(next_state, self.enter_event, handler, *args, **kwargs)
 
     def get_events(self, current_state=True):
         """
@@ -20,11 +20,12 @@ from functools import partial
 
 from mi.core.log import get_logger ; log = get_logger()
 
-from threading import Thread
+from threading import Thread, Condition
 
 from mi.core.instrument.protocol_param_dict import ParameterDictVisibility
 from mi.core.common import BaseEnum, InstErrorCode
-from mi.core.instrument.data_particle import RawDataParticle
+from mi.core.instrument.data_particle import DataParticle, RawDataParticle
+from mi.core.instrument.ring_buffer import RingBuffer
 from mi.core.instrument.instrument_driver import DriverConfigKey
 from mi.core.driver_scheduler import DriverScheduler
 from mi.core.driver_scheduler import DriverSchedulerConfigKey
@@ -48,6 +49,9 @@ MAX_BUFFER_SIZE=32768
 DEFAULT_CMD_TIMEOUT=20
 DEFAULT_WRITE_DELAY=0
 RE_PATTERN = type(re.compile(""))
+# longest time a response waiter sleeps without being notified of new data,
+# covers code that sets the line and prompt buffers directly
+BUFFER_POLL_INTERVAL = .1
 
 class InterfaceType(BaseEnum):
     """The methods of connecting to a device"""
@@ -182,6 +186,48 @@ class InstrumentProtocol(object):
         log.error("base got_data.  Who called me?")
         pass
 
+    def got_data_batch(self, port_agent_packets):
+        """
+        Called by the instrument connection in batch mode with every data
+        packet read from the port agent in one go.  By default each packet is
+        handed to got_data; subclasses override this to process the whole
+        batch at once.
+        @param port_agent_packets list of port agent packets
+        """
+        for port_agent_packet in port_agent_packets:
+            self.got_data(port_agent_packet)
+
+    def got_raw_batch(self, port_agent_packets):
+        """
+        Called by the instrument connection in batch mode with every raw
+        packet read from the port agent in one go.
+        @param port_agent_packets list of port agent packets
+        """
+        self.publish_raw_batch(port_agent_packets)
+
+    def publish_raw_batch(self, port_agent_packets):
+        """
+        Publish raw data for a batch of packets.  Each packet gets its own
+        raw particle, with its own checksum and timestamp, sent in its own
+        sample event since the agent expects a single particle per event.
+        @param port_agent_packets list of port agent packets
+        """
+        if not self._driver_event:
+            return
+
+        for port_agent_packet in port_agent_packets:
+            particle = RawDataParticle(port_agent_packet.get_as_dict(),
+                                       port_timestamp=port_agent_packet.get_timestamp())
+            self._driver_event(DriverAsyncEvent.SAMPLE, particle.generate())
+
+    def _batch_packets(self):
+        """
+        Override to return True to have the driver connect to the port agent
+        in batch mode, delivering packets through got_data_batch and
+        got_raw_batch.
+        """
+        return False
+
     def _get_param_result(self,param_list, expire_time):
         """
         return a dictionary of the parameters and values
@@ -252,12 +298,30 @@ class InstrumentProtocol(object):
         if regex.match(line):
         
             particle = particle_class(line, port_timestamp=timestamp)
-            parsed_sample = particle.generate()
+            sample = self._publish_sample(particle, publish)
 
+        return sample
+
+    def _publish_sample(self, particle, publish=True):
+        """
+        Generate a particle and publish it. The particle dictionary is built
+        once, published and returned; the driver serializes it to JSON when
+        the event leaves the driver. Particle classes that override
+        generate() are published with their own JSON instead.
+
+        @param particle The data particle to publish
+        @param publish boolean to publish the sample (default True)
+        @retval the particle dictionary
+        """
+        if type(particle).generate.im_func is not DataParticle.generate.im_func:
             if publish and self._driver_event:
+                parsed_sample = particle.generate()
                 self._driver_event(DriverAsyncEvent.SAMPLE, parsed_sample)
-    
-            sample = json.loads(parsed_sample)
+                return json.loads(parsed_sample)
+
+        sample = particle.generate_dict()
+        if publish and self._driver_event:
+            self._driver_event(DriverAsyncEvent.SAMPLE, sample)
 
         return sample
 
@@ -786,6 +850,39 @@ class InstrumentProtocol(object):
         else:
             return param_list
 
+class PromptScanner(object):
+    """
+    Finds the first of a list of prompts in a growing buffer. When the buffer
+    has only been appended to since the last call, the search resumes from
+    just before the end of the text that was already searched.
+    """
+    def __init__(self, prompt_list):
+        """
+        @param prompt_list The prompts to look for, in order of preference
+        """
+        self.prompt_list = prompt_list
+        self._buffer = None
+
+    def find(self, buffer):
+        """
+        @param buffer The buffer to search
+        @retval (prompt, buffer up to and including the prompt), or None if no
+            prompt has been found
+        """
+        previous = self._buffer
+        if buffer is previous:
+            return None
+        self._buffer = buffer
+
+        resume = previous is not None and len(buffer) > len(previous) and buffer.startswith(previous)
+        for item in self.prompt_list:
+            start = max(len(previous) - len(item) + 1, 0) if resume else 0
+            index = buffer.find(item, start)
+            if index >= 0:
+                return item, buffer[0:index+len(item)]
+        return None
+
+
 class CommandResponseInstrumentProtocol(InstrumentProtocol):
     """
     Base class for text-based command-response instruments.
@@ -810,11 +907,11 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
         self._prompts = prompts
     
         # Line buffer for input from device.
-        self._linebuf = ''
+        self._line_buffer = RingBuffer(self._max_buffer_size())
         
         # Short buffer to look for prompts from device in command-response
         # mode.
-        self._promptbuf = ''
+        self._prompt_buffer = RingBuffer(self._max_buffer_size())
         
         # Lines of data awaiting further processing.
         self._datalines = []
@@ -827,6 +924,28 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
 
         self._last_data_receive_timestamp = None
 
+        # Notified by add_to_buffer so response waiters wake up on new data.
+        self._buffer_condition = Condition()
+        self._buffer_updates = 0
+
+    def _get_linebuf(self):
+        return self._line_buffer.getvalue()
+
+    def _set_linebuf(self, value):
+        self._line_buffer.set(value)
+
+    # The line and prompt buffers are ring buffers, these give the rest of
+    # the protocol and the drivers their contents as strings.
+    _linebuf = property(_get_linebuf, _set_linebuf)
+
+    def _get_promptbuf(self):
+        return self._prompt_buffer.getvalue()
+
+    def _set_promptbuf(self, value):
+        self._prompt_buffer.set(value)
+
+    _promptbuf = property(_get_promptbuf, _set_promptbuf)
+
     def _get_prompts(self):
         """
         Return a list of prompts order from longest to shortest.  The
@@ -889,23 +1008,29 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
 
         log.debug('_get_response: timeout=%s, prompt_list=%s, expected_prompt=%s, response_regex=%r, promptbuf=%s',
                   timeout, prompt_list, expected_prompt, pattern, self._promptbuf)
+        scanner = PromptScanner(prompt_list)
+        searched = None
         while True:
+            updates = self._buffer_updates
             if response_regex:
-                match = response_regex.search(self._linebuf)
-                if match:
-                    return match.groups()
+                # a match can start anywhere in the buffer, so the regex is
+                # searched from the start, but only when the buffer changed
+                linebuf = self._linebuf
+                if linebuf is not searched:
+                    searched = linebuf
+                    match = response_regex.search(linebuf)
+                    if match:
+                        return match.groups()
             else:
-                for item in prompt_list:
-                    index = self._promptbuf.find(item)
-                    if index >= 0:
-                        result = self._promptbuf[0:index+len(item)]
-                        return item, result
-
-            time.sleep(.1)
+                found = scanner.find(self._promptbuf)
+                if found:
+                    return found
 
             if time.time() > starttime + timeout:
                 raise InstrumentTimeoutException("in InstrumentProtocol._get_response()")
 
+            self._wait_for_buffer(updates, starttime + timeout)
+
     def _get_raw_response(self, timeout=10, expected_prompt=None):
         """
         Get a response from the instrument, but don't trim whitespace. Used in
@@ -929,15 +1054,38 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
                 prompt_list = expected_prompt
 
         while True:
+            updates = self._buffer_updates
+            promptbuf = self._promptbuf.rstrip(strip_chars)
             for item in prompt_list:
-                if self._promptbuf.rstrip(strip_chars).endswith(item.rstrip(strip_chars)):
+                if promptbuf.endswith(item.rstrip(strip_chars)):
                     return (item, self._linebuf)
-                else:
-                    time.sleep(.1)
 
             if time.time() > starttime + timeout:
                 raise InstrumentTimeoutException("in InstrumentProtocol._get_raw_response()")
 
+            self._wait_for_buffer(updates, starttime + timeout)
+
+    def _wait_for_buffer(self, updates, deadline):
+        """
+        Block until add_to_buffer is called, the deadline passes, or
+        BUFFER_POLL_INTERVAL elapses, whichever is first.
+        @param updates The value of _buffer_updates when the caller last
+            looked at the buffers. If data has been added since, return at once.
+        @param deadline time.time() value to wait until at the latest
+        """
+        with self._buffer_condition:
+            if self._buffer_updates == updates:
+                self._buffer_condition.wait(max(min(deadline - time.time(), BUFFER_POLL_INTERVAL), 0))
+
+    def _notify_buffer_update(self):
+        """
+        Wake up anything waiting on new data in the line and prompt buffers.
+        Call after updating the buffers when overriding add_to_buffer.
+        """
+        with self._buffer_condition:
+            self._buffer_updates += 1
+            self._buffer_condition.notify_all()
+
     def _do_cmd_resp(self, cmd, *args, **kwargs):
         """
         Perform a command-response on the device.
@@ -1099,6 +1247,35 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
                 self._got_chunk(chunk, timestamp)
                 (timestamp, chunk) = self._chunker.get_next_data()
 
+    def got_data_batch(self, port_agent_packets):
+        """
+        Called by the instrument connection in batch mode.  The packets are
+        added to the chunker in one call, each with its own timestamp, and
+        the line and prompt buffers are appended to and the chunker drained
+        once for the whole batch.
+        @param port_agent_packets list of port agent packets
+        """
+        chunks = [(port_agent_packet.get_data(), port_agent_packet.get_timestamp())
+                  for port_agent_packet in port_agent_packets
+                  if port_agent_packet.get_data_length() > 0]
+        if not chunks:
+            return
+
+        self._chunker.add_chunks(chunks)
+
+        data = "".join([chunk_data for (chunk_data, timestamp) in chunks])
+        log.debug("Got Data Batch of %d packets: %r", len(chunks), data)
+
+        if self.get_current_state() == DriverProtocolState.DIRECT_ACCESS:
+            self._driver_event(DriverAsyncEvent.DIRECT_ACCESS, data)
+
+        self.add_to_buffer(data)
+
+        (timestamp, chunk) = self._chunker.get_next_data()
+        while(chunk):
+            self._got_chunk(chunk, timestamp)
+            (timestamp, chunk) = self._chunker.get_next_data()
+
     ########################################################################
     # Incoming raw data callback.
     ########################################################################            
@@ -1126,23 +1303,19 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
         buffers implemented as lifo ring buffer
         @param data: bytes to add to the buffer
         '''
-        # Update the line and prompt buffers.
-        self._linebuf += data
-        self._promptbuf += data
+        # Update the line and prompt buffers. Once a buffer exceeds the max
+        # allowable size the leading characters are dropped on the floor.
+        max_size = self._max_buffer_size()
+        for buf in (self._line_buffer, self._prompt_buffer):
+            if buf.capacity != max_size:
+                buf.resize(max_size)
+            buf.append(data)
         self._last_data_timestamp = time.time()
 
-        # If our buffer exceeds the max allowable size then drop the leading
-        # characters on the floor.
-        if(len(self._linebuf) > self._max_buffer_size()):
-            self._linebuf = self._linebuf[self._max_buffer_size()*-1:]
-
-        # If our buffer exceeds the max allowable size then drop the leading
-        # characters on the floor.
-        if(len(self._promptbuf) > self._max_buffer_size()):
-            self._promptbuf = self._linebuf[self._max_buffer_size()*-1:]
+        log.trace("Added %d bytes, line buffer %d bytes, prompt buffer %d bytes",
+                  len(data), len(self._line_buffer), len(self._prompt_buffer))
 
-        log.debug("LINE BUF: %s", self._linebuf)
-        log.debug("PROMPT BUF: %s", self._promptbuf)
+        self._notify_buffer_update()
 
     def _max_buffer_size(self):
         return MAX_BUFFER_SIZE
@@ -1171,24 +1344,26 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
         
         # Grab time for timeout.
         starttime = time.time()
+        scanner = PromptScanner(self._get_prompts())
+        log.debug("Prompts: %s", scanner.prompt_list)
         
         while True:
-            # Send a line return and wait a sec.
+            # Send a line return and wait up to a sec for a prompt.
             log.trace('Sending wakeup. timeout=%s', timeout)
             self._send_wakeup()
-            time.sleep(delay)
-
-            log.debug("Prompts: %s", self._get_prompts())
-
-            for item in self._get_prompts():
-                log.debug("buffer: %s", self._promptbuf)
-                log.debug("find prompt: %s", item)
-                index = self._promptbuf.find(item)
-                log.debug("Got prompt (index: %s): %s ", index, repr(self._promptbuf))
-                if index >= 0:
-                    log.trace('wakeup got prompt: %s', repr(item))
-                    return item
-            log.debug("Searched for all prompts")
+            wakeup_time = time.time()
+
+            while True:
+                updates = self._buffer_updates
+                found = scanner.find(self._promptbuf)
+                if found:
+                    log.trace('wakeup got prompt: %s', repr(found[0]))
+                    return found[0]
+                if time.time() > wakeup_time + delay:
+                    break
+                self._wait_for_buffer(updates, wakeup_time + delay)
+
+            log.debug("Searched for all prompts in buffer: %r", self._promptbuf)
 
             if time.time() > starttime + timeout:
                 raise InstrumentTimeoutException("in _wakeup()")
@@ -28,6 +28,7 @@ from mi.core.exceptions import InstrumentConnectionException
 HEADER_SIZE = 16 # BBBBHHLL = 1 + 1 + 1 + 1 + 2 + 2 + 4 + 4 = 16
 
 
+OFFSET_P_LENGTH = 4
 OFFSET_P_CHECKSUM_LOW = 6
 OFFSET_P_CHECKSUM_HIGH = 7
 
@@ -58,8 +59,153 @@ MIN_RETRY_WINDOW = 2 # 2 seconds
 
 MAX_SEND_ATTEMPTS = 15              # Max number of times we can get EAGAIN
 
+READ_BUFFER_SIZE = 65536            # Initial size of the listener receive buffer
+
 
 class SocketClosed(Exception): pass
+class PacketFramingError(Exception): pass
+
+SYNC_BYTES = '\xa3\x9d\x7a'
+
+
+def xor_checksum(data):
+    """
+    XOR all of the bytes in a buffer together. The buffer is read as one big
+    integer and folded in half until a single byte is left, so the work is
+    done a whole buffer at a time instead of a byte at a time.
+    @param data a str, bytearray, buffer or memoryview
+    @retval the XOR of every byte in data, 0 if it is empty
+    """
+    width = len(data)
+    if width == 0:
+        return 0
+
+    value = int(binascii.hexlify(data), 16)
+    while width > 1:
+        half = (width + 1) // 2
+        bits = half * 8
+        value = (value >> bits) ^ (value & ((1 << bits) - 1))
+        width = half
+
+    return value
+
+
+class PacketReader(object):
+    """
+    Frames port agent packets out of a socket. Reads are done with large
+    recv_into calls into a receive buffer that is reused for the life of the
+    reader, so a burst of small packets costs a single system call. Complete
+    packets are handed back as memoryview slices of that buffer.
+    """
+    def __init__(self, sock, buffer_size=READ_BUFFER_SIZE):
+        """
+        @param sock The socket to read from
+        @param buffer_size The initial size of the receive buffer. The buffer
+            grows if a single packet is larger than this.
+        """
+        self.sock = sock
+        self._set_buffer(bytearray(buffer_size))
+        self._read_pos = 0
+        self._write_pos = 0
+
+    def read(self):
+        """
+        Read whatever the socket has available into the receive buffer.
+        @retval the number of bytes received, 0 if the socket would block
+        @throws SocketClosed if the other end has closed the connection
+        @throws socket.error on any other socket error
+        """
+        self._make_room()
+        try:
+            bytesrx = self.sock.recv_into(self._view[self._write_pos:])
+        except socket.error as e:
+            if e.errno == errno.EWOULDBLOCK:
+                return 0
+            raise
+
+        log.trace('RX BYTES %d SOCK %r', bytesrx, self.sock)
+        if bytesrx <= 0:
+            raise SocketClosed()
+        self._write_pos += bytesrx
+        return bytesrx
+
+    def next_packet(self):
+        """
+        Take the next complete packet out of the receive buffer. The returned
+        view is only valid until the next call to read().
+        @retval a memoryview of the whole packet, header included, or None
+            if no complete packet has been received yet
+        @throws PacketFramingError if the packet at the read position has a
+            bad sync or length field.  The reader skips ahead to the next
+            sync bytes, so the next call carries on from there.
+        """
+        packet_size = self._pending_packet_size()
+        if packet_size is None:
+            return None
+        if packet_size < HEADER_SIZE or \
+                self._view[self._read_pos:self._read_pos + len(SYNC_BYTES)].tobytes() != SYNC_BYTES:
+            self._resync()
+            raise PacketFramingError("Bad port agent packet header, length %d" % packet_size)
+        if self._write_pos - self._read_pos < packet_size:
+            return None
+
+        start = self._read_pos
+        self._read_pos += packet_size
+        return self._view[start:self._read_pos]
+
+    def _pending_packet_size(self):
+        """
+        @retval the total size of the packet at the read position, None if its
+            header has not been completely received
+        """
+        if self._write_pos - self._read_pos < HEADER_SIZE:
+            return None
+        return struct.unpack_from('>H', self._view, self._read_pos + OFFSET_P_LENGTH)[0]
+
+    def _resync(self):
+        """
+        Skip the read position past a bad header to the next sync bytes in
+        the buffer, or to the end of the buffer less a partial sync.
+        """
+        received = self._buffer[self._read_pos + 1:self._write_pos]
+        index = received.find(SYNC_BYTES)
+        if index < 0:
+            index = max(len(received) - len(SYNC_BYTES) + 1, 0)
+        log.warn("Skipping %d bytes to resync with the port agent stream", index + 1)
+        self._read_pos += index + 1
+
+    def _set_buffer(self, buf):
+        self._buffer = buf
+        self._view = memoryview(buf)
+        self._address = ctypes.addressof((ctypes.c_char * len(buf)).from_buffer(buf))
+
+    def _make_room(self):
+        """
+        Make sure there is space after the write position for the rest of
+        the current packet, moving the partial packet to the front of the
+        buffer or growing the buffer if needed.
+        """
+        if self._read_pos == self._write_pos:
+            self._read_pos = self._write_pos = 0
+            return
+
+        needed = self._pending_packet_size()
+        if needed is None or needed < HEADER_SIZE:
+            needed = HEADER_SIZE
+        if self._read_pos + needed <= len(self._buffer) and \
+                self._write_pos < len(self._buffer):
+            return
+
+        pending = self._write_pos - self._read_pos
+        if needed > len(self._buffer):
+            old_view = self._view[self._read_pos:self._write_pos]
+            self._set_buffer(bytearray(needed))
+            self._buffer[0:pending] = old_view
+        else:
+            # move the partial packet to the front in place
+            ctypes.memmove(self._address, self._address + self._read_pos, pending)
+        self._read_pos = 0
+        self._write_pos = pending
 
 
 class PortAgentPacket():
@@ -165,32 +311,24 @@ class PortAgentPacket():
         self.__data = data
 
     def calculate_checksum(self):
-        checksum = 0
-        for i in range(HEADER_SIZE):
-            if i < OFFSET_P_CHECKSUM_LOW or i > OFFSET_P_CHECKSUM_HIGH:
-                checksum ^= struct.unpack_from('B', str(self.__header[i]))[0]
-                
-        for i in range(self.__length):
-            checksum ^= struct.unpack_from('B', str(self.__data[i]))[0]
-            
+        """
+        XOR together every header byte except the checksum field and every
+        data byte.  Each buffer is folded in one piece rather than unpacking
+        it a byte at a time.
+        @retval the checksum
+        """
+        header = self.__header
+        checksum = xor_checksum(buffer(header, 0, OFFSET_P_CHECKSUM_LOW))
+        checksum ^= xor_checksum(buffer(header, OFFSET_P_CHECKSUM_HIGH + 1,
+                                        HEADER_SIZE - OFFSET_P_CHECKSUM_HIGH - 1))
+        checksum ^= xor_checksum(buffer(self.__data, 0, self.__length))
         return checksum
-            
-                                
+
     def verify_checksum(self):
-        checksum = 0
-        for i in range(HEADER_SIZE):
-            if i < OFFSET_P_CHECKSUM_LOW or i > OFFSET_P_CHECKSUM_HIGH:
-                checksum ^= struct.unpack_from('B', self.__header[i])[0]
-                
-        for i in range(self.__length):
-            checksum ^= struct.unpack_from('B', self.__data[i])[0]
-            
-        if checksum == self.__recv_checksum:
+        if self.calculate_checksum() == self.__recv_checksum:
             self.__isValid = True
         else:
             self.__isValid = False
-            
-        #log.debug('checksum: %i.' %(checksum))
 
     def get_header(self):
         return self.__header
@@ -278,6 +416,7 @@ class PortAgentClient(object):
         self.listener_callback_error = None
         self.last_retry_time = None
         self.recovery_mutex = threading.Lock()
+        self.batch = False
         
     def _init_comms(self):
         """
@@ -302,15 +441,23 @@ class PortAgentClient(object):
             # start the listener thread if instructed to
             ###
             if self.start_listener:
+                if self.batch:
+                    callback_data = self.callback_data_batch
+                    callback_raw = self.callback_raw_batch
+                else:
+                    callback_data = self.callback_data
+                    callback_raw = self.callback_raw
+
                 self.listener_thread = Listener(self.sock,  
                                                 self.recovery_attempts,
                                                 self.delim, self.heartbeat, 
                                                 self.max_missed_heartbeats, 
-                                                self.callback_data,
-                                                self.callback_raw,
+                                                callback_data,
+                                                callback_raw,
                                                 self.listener_callback_error,
                                                 self.callback_error,
-                                                self.user_callback_error)
+                                                self.user_callback_error,
+                                                batch=self.batch)
                 self.listener_thread.start()
 
             ###
@@ -363,7 +510,14 @@ class PortAgentClient(object):
     def init_comms(self, user_callback_data = None, user_callback_raw = None,
                    listener_callback_error = None,
                    user_callback_error = None, heartbeat = 0,
-                   max_missed_heartbeats = None, start_listener = True):
+                   max_missed_heartbeats = None, start_listener = True,
+                   batch = False):
+        """
+        Connect to the port agent and start listening.
+        @param batch If True the data and raw callbacks are called with a
+        list of every packet drained from the socket in one read instead of
+        once per packet.
+        """
         
         self.user_callback_data = user_callback_data        
         self.user_callback_raw = user_callback_raw
@@ -372,6 +526,7 @@ class PortAgentClient(object):
         self.heartbeat = heartbeat
         self.max_missed_heartbeats = max_missed_heartbeats
         self.start_listener = start_listener 
+        self.batch = batch
 
         if  False == self._init_comms():
             error_string = ' port_agent_client private _init_comms failed.'
@@ -421,6 +576,28 @@ class PortAgentClient(object):
         else:
             log.error("No user_callback_raw defined")
 
+    def callback_data_batch(self, paPackets):
+        """
+        A batch of packets has been received from the port agent.
+        """
+        if (self.user_callback_data):
+            for paPacket in paPackets:
+                paPacket.verify_checksum()
+            self.user_callback_data(paPackets)
+        else:
+            log.error("No user_callback_data defined")
+
+    def callback_raw_batch(self, paPackets):
+        """
+        A batch of packets has been received from the port agent.
+        """
+        if (self.user_callback_raw):
+            for paPacket in paPackets:
+                paPacket.verify_checksum()
+            self.user_callback_raw(paPackets)
+        else:
+            log.error("No user_callback_raw defined")
+
     def callback_error(self, errorString = "No error string passed."):
         """
         A catastrophic error has occurred; attempt to recover, but only
@@ -594,7 +771,8 @@ class Listener(threading.Thread):
                  callback_data = None, callback_raw = None,
                  default_callback_error = None,
                  local_callback_error = None,
-                 user_callback_error = None):
+                 user_callback_error = None,
+                 batch = False):
         """
         Listener thread constructor.
         @param sock The socket to listen on.
@@ -609,9 +787,13 @@ class Listener(threading.Thread):
         @param default_callback_data A callback to handle non-network exceptions
         @param local_callback_data The local callback when error encountered.
         @param user_callback_data The user callback on error_encountered.
+        @param batch If True, every complete packet drained from the socket
+        in one read is handed to handle_packets and the data and raw
+        callbacks get lists of packets.
         """
         threading.Thread.__init__(self)
         self.sock = sock
+        self.batch = batch
         self.recovery_attempt = recovery_attempt
         self._done = False
         self.linebuf = ''
@@ -771,12 +953,41 @@ class Listener(threading.Thread):
             self.heartbeat_missed_count = self.max_missed_heartbeats
 
 
+    def handle_packets(self, paPackets):
+        """
+        Dispatch a batch of packets, calling the raw and data callbacks once
+        each with every packet that would have gone to them through
+        handle_packet.
+        """
+        raw_packets = []
+        data_packets = []
+
+        for paPacket in paPackets:
+            packet_type = paPacket.get_header_type()
+
+            if packet_type == PortAgentPacket.HEARTBEAT:
+                log.debug("HEARTBEAT Packet Received")
+                if 0 < self.heartbeat:
+                    self.start_heartbeat_timer()
+
+                self.heartbeat_missed_count = self.max_missed_heartbeats
+            elif packet_type in (PortAgentPacket.DATA_FROM_INSTRUMENT,
+                                 PortAgentPacket.PICKLED_DATA_FROM_INSTRUMENT):
+                raw_packets.append(paPacket)
+                data_packets.append(paPacket)
+            else:
+                raw_packets.append(paPacket)
+
+        if raw_packets:
+            self.callback_raw(raw_packets)
+        if data_packets:
+            self.callback_data(data_packets)
+
     def run(self):
         """
-        Listener thread processing loop. Block on receive from port agent.
-        Receive HEADER_SIZE bytes to receive the entire header.  From that,
-        get the length of the whole packet (including header); compute the
-        length of the remaining data and read that.  
+        Listener thread processing loop. Read whatever the port agent has
+        sent into the packet reader's buffer, then hand off every complete
+        packet in it before reading again.
         """
         self.thread_name = str(threading.current_thread().name)
         log.info('PortAgentClient listener thread: %s started.', self.thread_name)
@@ -784,60 +995,32 @@ class Listener(threading.Thread):
         if self.heartbeat:
             self.start_heartbeat_timer()
 
+        reader = PacketReader(self.sock)
+
         while not self._done:
             try:
-                log.debug('RX NEW PACKET')
-                header = bytearray(HEADER_SIZE)
-                headerview = memoryview(header)
-                bytes_left = HEADER_SIZE
-                while bytes_left and not self._done:
-                    try:
-                        bytesrx = self.sock.recv_into(headerview[HEADER_SIZE - bytes_left:], bytes_left)
-                        log.debug('RX HEADER BYTES %d LEFT %d SOCK %r' % (
-                                                    bytesrx, bytes_left, self.sock,))
-                        if bytesrx <= 0:
-                            raise SocketClosed()
-                        bytes_left -= bytesrx
-                    except socket.error as e:
-                        if e.errno == errno.EWOULDBLOCK:
-                            time.sleep(.1)
-                        else:
-                            raise
+                packet = reader.next_packet()
+                if packet is None:
+                    if not reader.read():
+                        time.sleep(.1)
+                    continue
 
                 """
-                Only do this if we've received the whole header, otherwise (ex. during shutdown)
-                we can have a completely invalid header, resulting in negative count exceptions.
+                Should have complete port agent packet.
                 """
-                if (bytes_left == 0):
-                    paPacket = PortAgentPacket()
-                    paPacket.unpack_header(str(header))
-                    data_size = paPacket.get_data_length()
-                    bytes_left = data_size
-                    data = bytearray(data_size)
-                    dataview = memoryview(data)
-                    log.debug('Expecting DATA BYTES %d' % data_size)
-                    
-                while bytes_left and not self._done:
+                if self.batch:
+                    paPackets = []
                     try:
-                        bytesrx = self.sock.recv_into(dataview[data_size - bytes_left:], bytes_left)
-                        log.debug('RX DATA BYTES %d LEFT %d SOCK %r' % (
-                                                    bytesrx, bytes_left, self.sock,))
-                        if bytesrx <= 0:
-                            raise SocketClosed()
-                        bytes_left -= bytesrx
-                    except socket.error as e:
-                        if e.errno == errno.EWOULDBLOCK:
-                            time.sleep(.1)
-                        else:
-                            raise
-
-                if not self._done:
-                    """
-                    Should have complete port agent packet.
-                    """
-                    paPacket.attach_data(str(data))
+                        while packet is not None:
+                            paPackets.append(self._build_packet(packet))
+                            packet = reader.next_packet()
+                    finally:
+                        # hand on the good packets ahead of a framing error
+                        log.debug("HANDLE %d PACKETS", len(paPackets))
+                        self.handle_packets(paPackets)
+                else:
                     log.debug("HANDLE PACKET")
-                    self.handle_packet(paPacket)
+                    self.handle_packet(self._build_packet(packet))
 
             except SocketClosed:
                 errorString = 'Listener thread: %s SocketClosed exception from port_agent socket' \
@@ -870,6 +1053,17 @@ class Listener(threading.Thread):
 
         log.info('Port_agent_client thread done listening; going away.')
 
+    def _build_packet(self, packet):
+        """
+        Build a port agent packet from a packet reader buffer slice
+        @param packet memoryview of the whole packet, header included
+        @retval a PortAgentPacket with the header unpacked and data attached
+        """
+        paPacket = PortAgentPacket()
+        paPacket.unpack_header(packet[:HEADER_SIZE].tobytes())
+        paPacket.attach_data(packet[HEADER_SIZE:].tobytes())
+        return paPacket
+
     def _invoke_error_callback(self, recovery_attempt, error_string = "No error string passed."):
         """
         Invoke either the user_error_callback or the local_error_callback, depending upon the
@@ -12,6 +12,8 @@ __author__ = 'Edward Hunter'
 __license__ = 'Apache 2.0'
 
 import re
+import sre_parse
+import sre_constants
 import ntplib
 import time
 import yaml
@@ -27,6 +29,73 @@ from mi.core.log import get_logger ; log = get_logger()
 EGG_PATH = "resource"
 DEFAULT_FILENAME = "strings.yml"
 
+# (pattern, flags) : literal every match of the pattern contains
+_required_literals = {}
+
+def _literal_runs(subpattern):
+    """
+    Yield the runs of literal characters that every match of a parsed
+    pattern has to contain. Characters outside ascii end a run, so runs can
+    be searched for in both str and unicode input.
+    @param subpattern An sre_parse.SubPattern
+    """
+    run = []
+    for (op, av) in subpattern:
+        if op == sre_constants.LITERAL and av < 128:
+            run.append(chr(av))
+            continue
+        if run:
+            yield ''.join(run)
+            run = []
+        if op == sre_constants.SUBPATTERN:
+            for literal in _literal_runs(av[1]):
+                yield literal
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] > 0:
+            for literal in _literal_runs(av[2]):
+                yield literal
+    if run:
+        yield ''.join(run)
+
+def required_literal(regex):
+    """
+    Find the longest string that any text a compiled regex matches has to
+    contain, so text without it can be skipped without running the regex.
+    @param regex A compiled regex
+    @retval The literal string, or None if there isn't one
+    """
+    key = (regex.pattern, regex.flags)
+    if key not in _required_literals:
+        literal = None
+        if not regex.flags & re.IGNORECASE:
+            try:
+                literal = max(_literal_runs(sre_parse.parse(regex.pattern, regex.flags)), key=len)
+            except (ValueError, sre_constants.error):
+                # no literals, or a pattern sre_parse won't take apart
+                pass
+        _required_literals[key] = literal
+    return _required_literals[key]
+
+def leading_literal(regex):
+    """
+    Find the literal string every match of a compiled regex starts with, so
+    a search can start where that string first occurs instead of at the
+    start of the input.
+    @param regex A compiled regex
+    @retval The literal string, '' if matches don't start with one
+    """
+    if regex.flags & re.IGNORECASE:
+        return ''
+    run = []
+    try:
+        for (op, av) in sre_parse.parse(regex.pattern, regex.flags):
+            if op != sre_constants.LITERAL or av >= 128:
+                break
+            run.append(chr(av))
+    except sre_constants.error:
+        # a pattern sre_parse won't take apart
+        return ''
+    return ''.join(run)
+
 class ParameterDictType(BaseEnum):
     BOOL = "bool"
     INT = "int"
@@ -384,6 +453,59 @@ class FunctionParameter(Parameter):
         else:
             return False
 
+class ParameterMatchIndex(object):
+    """
+    Finds which parameters of a dictionary could match an input in one pass
+    over it, rather than running every parameter's regex.
+    """
+    def __init__(self, param_dict):
+        """
+        @param param_dict The name : Parameter dictionary to index
+        """
+        # a copy to tell when the dictionary changes
+        self.params = dict(param_dict)
+        self.position = {}
+        # parameters that have to be tried on every input
+        self.always = set()
+        by_literal = {}
+        for (i, (name, val)) in enumerate(param_dict.iteritems()):
+            self.position[name] = i
+            literal = None
+            if isinstance(val, RegexParameter):
+                literal = required_literal(val.regex)
+            if literal is None:
+                self.always.add(name)
+            else:
+                by_literal.setdefault(literal, []).append(name)
+
+        # Longest first, so where several literals start at the same place
+        # the search finds the longest. Any others there are its prefixes.
+        literals = sorted(by_literal, key=len, reverse=True)
+        self.regex = None
+        if literals:
+            self.regex = re.compile('|'.join(re.escape(literal) for literal in literals))
+        self.closure = {}
+        for literal in literals:
+            self.closure[literal] = [name for other in literals if literal.startswith(other)
+                                     for name in by_literal[other]]
+
+    def candidates(self, text):
+        """
+        @param text The str the parameters would be searched in, None to
+        consider every parameter
+        @retval set of names of the parameters that could match text
+        """
+        if text is None:
+            return set(self.position)
+        names = set(self.always)
+        if self.regex is not None:
+            search = self.regex.search
+            match = search(text)
+            while match:
+                names.update(self.closure[match.group()])
+                match = search(text, match.start() + 1)
+        return names
+
 class ProtocolParameterDict(InstrumentDict):
     """
     Protocol parameter dictionary. Manages, matches and formats device
@@ -394,6 +516,8 @@ class ProtocolParameterDict(InstrumentDict):
         Constructor.        
         """
         self._param_dict = {}
+        # built when first needed, see _candidates
+        self._match_index = None
         
     def add(self,
             name,
@@ -673,7 +797,7 @@ class ProtocolParameterDict(InstrumentDict):
         """
         hit_count = 0
         multi_mode = False
-        for (name, val) in self._param_dict.iteritems():
+        for (name, val) in self._candidates(None, input):
             if multi_mode == True and val.description.multi_match == False:
                 continue
             if val.update(input):
@@ -694,7 +818,7 @@ class ProtocolParameterDict(InstrumentDict):
         @retval A dict with the names and values that were updated
         """
         result = {}
-        for (name, val) in self._param_dict.iteritems():
+        for (name, val) in self._candidates(None, input):
             update_result = val.update(input)
             if update_result:
                 result[name] = update_result 
@@ -726,13 +850,46 @@ class ProtocolParameterDict(InstrumentDict):
         else:
             raise InstrumentParameterException("invalid target_params, must be name or list")
 
-        for name in params:
+        for (name, val) in self._candidates(params, input):
             log.trace("update param dict name: %s", name)
-            val = self._param_dict[name]
             if val.update(input):
                 found = True
         return found
 
+    def _candidates(self, names, input):
+        """
+        Yield the parameters whose update could succeed on the input, in
+        order. RegexParameters whose regex requires a literal the input
+        doesn't contain are skipped without running the regex.
+        @param names The parameter names to consider, in order, or None for
+        all of them in dictionary order
+        @param input The input the parameters will be updated from
+        @retval generator of (name, parameter) tuples
+        @raise KeyError on invalid parameter name
+        """
+        # parameters can be replaced or added straight into _param_dict, so
+        # check the index is still for the same parameter objects
+        if self._match_index is None or self._match_index.params != self._param_dict:
+            self._match_index = ParameterMatchIndex(self._param_dict)
+        index = self._match_index
+
+        # RegexParameter searches the str of anything that isn't a str
+        text = input
+        if not isinstance(text, str):
+            try:
+                text = str(text)
+            except Exception:
+                # let the parameters raise as they would have
+                text = None
+        matches = index.candidates(text)
+
+        if names is None:
+            names = sorted(matches, key=index.position.get)
+        for name in names:
+            val = self._param_dict[name]
+            if name in matches:
+                yield (name, val)
+
     def get_all(self, timestamp=None):
         """
         Retrive the configuration (all settable key values).
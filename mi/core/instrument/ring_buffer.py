@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.ring_buffer Fixed capacity byte ring buffer
+@file mi/core/instrument/ring_buffer.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief A fixed capacity buffer that keeps the most recent bytes written to
+it. Appending costs the size of the new data rather than the size of the
+buffer, which is what the protocol line and prompt buffers need when an
+instrument streams data in autosample mode and nobody is reading them.
+"""
+
+__author__ = 'Ocean Observatories Initiative <contactooici@oceanobservatories.org>'
+__license__ = 'Apache 2.0'
+
+
+class RingBuffer(object):
+    """
+    Byte buffer holding at most capacity bytes. When more are appended the
+    oldest bytes are dropped. The contents are only joined into a string
+    when they are asked for, and that string is kept until the buffer next
+    changes, so repeated reads return the same object.
+    """
+
+    def __init__(self, capacity, data=''):
+        """
+        @param capacity The maximum number of bytes to hold
+        @param data Initial contents
+        """
+        if capacity < 1:
+            raise ValueError("Ring buffer capacity must be positive, not %s" % capacity)
+        self._capacity = capacity
+        self._data = bytearray(capacity)
+        self._start = 0
+        self._length = 0
+        self._value = ''
+        if data:
+            self.append(data)
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def __len__(self):
+        return self._length
+
+    def append(self, data):
+        """
+        Add bytes to the end of the buffer, dropping the oldest bytes if
+        the buffer is full
+        @param data String of bytes to add
+        """
+        count = len(data)
+        if count == 0:
+            return
+        capacity = self._capacity
+        self._value = None
+
+        if count >= capacity:
+            self._data[:] = data[-capacity:]
+            self._start = 0
+            self._length = capacity
+            return
+
+        end = (self._start + self._length) % capacity
+        first = min(count, capacity - end)
+        self._data[end:end + first] = data[:first]
+        if first < count:
+            self._data[:count - first] = data[first:]
+
+        overflow = self._length + count - capacity
+        if overflow > 0:
+            self._start = (self._start + overflow) % capacity
+            self._length = capacity
+        else:
+            self._length += count
+
+    def clear(self):
+        """
+        Empty the buffer
+        """
+        self._start = 0
+        self._length = 0
+        self._value = ''
+
+    def resize(self, capacity):
+        """
+        Change the capacity, keeping the most recent bytes that fit
+        @param capacity The new maximum number of bytes to hold
+        """
+        if capacity == self._capacity:
+            return
+        value = self.getvalue()
+        self.__init__(capacity, value)
+
+    def set(self, data):
+        """
+        Replace the contents of the buffer
+        @param data String of bytes
+        """
+        self.clear()
+        self.append(data)
+
+    def getvalue(self):
+        """
+        @retval The contents of the buffer as a string
+        """
+        if self._value is None:
+            end = self._start + self._length
+            if end <= self._capacity:
+                self._value = str(self._data[self._start:end])
+            else:
+                self._value = str(self._data[self._start:]) + str(self._data[:end - self._capacity])
+        return self._value
+
+    def __str__(self):
+        return self.getvalue()
@@ -12,6 +12,7 @@ __license__ = 'Apache 2.0'
 
 import unittest
 import re
+import time
 from functools import partial
 from mi.core.unit_test import MiUnitTest, MiUnitTestCase
 from nose.plugins.attrib import attr
@@ -20,6 +21,16 @@ from ooi.logging import log
 
 from mi.core.exceptions import SampleException
 from mi.core.instrument.chunker import StringChunker
+from mi.core.instrument.chunker import IncrementalChunker
+from mi.core.instrument.chunker import RegexSieve
+import mi.core.instrument.chunker as chunker_module
+
+from mi.instrument.nortek.driver import NORTEK_COMMON_REGEXES
+from mi.instrument.nortek.vector.ooicore.driver import VECTOR_SAMPLE_REGEX
+from mi.instrument.seabird.sbe37smb.ooicore.driver import SAMPLE_PATTERN_MATCHER
+from mi.instrument.seabird.sbe37smb.ooicore.driver import STATUS_DATA_REGEX_MATCHER
+from mi.instrument.seabird.sbe37smb.ooicore.driver import CALIBRATION_DATA_REGEX_MATCHER
+from mi.instrument.seabird.sbe37smb.ooicore.test.sample_data import SAMPLE, SAMPLE_DC
 
 @attr('UNIT', group='mi')
 class UnitTestStringChunker(MiUnitTestCase):
@@ -279,6 +290,29 @@ class UnitTestStringChunker(MiUnitTestCase):
         self.assertEquals(result, None)
         self.assertEquals(time, None)
         
+    def test_add_chunks(self):
+        """
+        Several chunks added in one call keep their own timestamps
+        """
+        self._chunker.add_chunks([(self.FRAGMENT_1, self.TIMESTAMP_1),
+                                  (self.FRAGMENT_2 + "\r\n" + self.SAMPLE_2, self.TIMESTAMP_2),
+                                  ("\r\n" + self.SAMPLE_3[:10], self.TIMESTAMP_3)])
+        self.assertEquals(len(self._chunker.raw_chunk_list), 3)
+        self.assertEquals(len(self._chunker.data_chunk_list), 2)
+        (time, result) = self._chunker.get_next_data()
+        self.assertEquals(result, self.FRAGMENT_SAMPLE)
+        self.assertEquals(time, self.TIMESTAMP_1)
+        (time, result) = self._chunker.get_next_data()
+        self.assertEquals(result, self.SAMPLE_2)
+        self.assertEquals(time, self.TIMESTAMP_2)
+        (time, result) = self._chunker.get_next_data()
+        self.assertEquals(result, None)
+
+        self._chunker.add_chunks([(self.SAMPLE_3[10:], self.TIMESTAMP_1)])
+        (time, result) = self._chunker.get_next_data()
+        self.assertEquals(result, self.SAMPLE_3)
+        self.assertEquals(time, self.TIMESTAMP_3)
+
     def test_get_raw(self):
         """
         Test the ability to get raw data, but not totally hose data strings
@@ -331,6 +365,217 @@ class UnitTestStringChunker(MiUnitTestCase):
         self.assertRaises(SampleException,
                           self._chunker.add_chunk, "foobar", self.TIMESTAMP_1)
 
+@attr('UNIT', group='mi')
+class UnitTestIncrementalChunker(UnitTestStringChunker):
+    """
+    Run the string chunker tests against the incremental chunker, plus some
+    tests for the bits only it has.
+    """
+    def setUp(self):
+        """ Setup a chunker for use in tests """
+        self._chunker = IncrementalChunker(UnitTestStringChunker.sieve_function)
+
+    def test_funky_chunks(self):
+        def funky_sieve(data):
+            return [(3,6),(0,3)]
+
+        self._chunker = IncrementalChunker(funky_sieve)
+        self._chunker.add_chunk("BarFoo", self.TIMESTAMP_1)
+        (time, result) = self._chunker.get_next_data()
+        self.assertEquals(result, "Bar")
+        (time, result) = self._chunker.get_next_data()
+        self.assertEquals(result, "Foo")
+
+    def test_overlap(self):
+        def overlap_sieve(data):
+            return [(0,3),(2,6)]
+
+        self._chunker = IncrementalChunker(overlap_sieve)
+        self.assertRaises(SampleException,
+                          self._chunker.add_chunk, "foobar", self.TIMESTAMP_1)
+
+    def test_max_record_size(self):
+        """
+        With a max record size the sieve should only see the new bytes plus
+        enough of the old ones to finish a fragment.
+        """
+        sieved = []
+        def recording_sieve(raw_data):
+            sieved.append(raw_data)
+            return UnitTestStringChunker.sieve_function(raw_data)
+
+        self._chunker = IncrementalChunker(recording_sieve,
+                                           max_record_size=len(self.SAMPLE_1))
+        self._chunker.add_chunk("X" * 100, self.TIMESTAMP_1)
+        self._chunker.add_chunk(self.FRAGMENT_1, self.TIMESTAMP_2)
+        self.assertEquals(len(sieved[-1]), len(self.SAMPLE_1) - 1 + len(self.FRAGMENT_1))
+        self._chunker.add_chunk(self.FRAGMENT_2, self.TIMESTAMP_3)
+
+        (time, result, start, end) = self._chunker.get_next_data_with_index(clean=False)
+        self.assertEquals(result, self.FRAGMENT_SAMPLE)
+        self.assertEquals(time, self.TIMESTAMP_2)
+        self.assertEquals((start, end), (100, 131))
+
+        (time, result) = self._chunker.get_next_non_data()
+        self.assertEquals(result, "X" * 100)
+        self.assertEquals(time, self.TIMESTAMP_1)
+        (time, result) = self._chunker.get_next_data()
+        self.assertEquals(result, self.FRAGMENT_SAMPLE)
+        self.assertEquals(self._chunker.buffer, "")
+
+    def test_compaction(self):
+        """
+        Consumed data is dropped from the buffer without disturbing indices
+        """
+        self._chunker = IncrementalChunker(UnitTestStringChunker.sieve_function,
+                                           compact_size=64)
+        for i in range(10):
+            self._chunker.add_chunk("\r\n" + self.SAMPLE_1, self.TIMESTAMP_1)
+            (time, result, start, end) = self._chunker.get_next_data_with_index()
+            self.assertEquals(result, self.SAMPLE_1)
+            self.assertEquals((start, end), (2, 33))
+            (time, result) = self._chunker.get_next_non_data()
+            self.assertEquals(result, None)
+
+        self.assertLess(len(self._chunker._buffer), 128)
+        self.assertEquals(self._chunker.buffer, "")
+
+    def test_performance(self):
+        """
+        Feed fragments in without draining the buffer and make sure the bytes
+        sieved per byte fed do not grow with the buffer.
+        """
+        def ingest(count):
+            sieved = [0]
+            def sieve_function(raw_data):
+                sieved[0] += len(raw_data)
+                return UnitTestStringChunker.sieve_function(raw_data)
+            chunker = IncrementalChunker(sieve_function)
+            data = (self.SAMPLE_1 + "\r\n") * count
+            for index in range(0, len(data), 16):
+                chunker.add_chunk(data[index:index+16], self.TIMESTAMP_1)
+            return float(sieved[0]) / len(data)
+
+        small = ingest(200)
+        large = ingest(2000)
+        log.info("Incremental chunker bytes sieved per byte: %s (200 records), %s (2000 records)", small, large)
+        # each fragment only rescans the partial record after the last one found
+        self.assertAlmostEqual(large, small, places=1)
+        self.assertLess(large, 4)
+
+@attr('UNIT', group='mi')
+class UnitTestRegexSieve(MiUnitTestCase):
+    """
+    Test the single pass regex sieve against the one regex at a time sieve
+    """
+    # Nortek vector samples, from the Nortek driver tests
+    NORTEK_HW_CONFIG = ("a505180056454320383138312020202020200400ffff00000400900004000000ffff0000ffff"
+                        "ffff0000332e3336b048").decode('hex')
+    NORTEK_VELOCITY = "a51000db00008f10000049f041f72303303132120918d8f7".decode('hex')
+    NORTEK_VELOCITY_HEADER = ("a512150012491711121270032f2f2e0002090d00000000000000000000000000000000000000"
+                              "00005d70").decode('hex')
+    NORTEK_SYSTEM = "a5110e0003261317121294007c3b83041301cdfe0a08007b0000e4d9".decode('hex')
+    NORTEK_CLOCK = "0907021110120606".decode('hex')
+    NORTEK_BATTERY = "a71f0606".decode('hex')
+    NORTEK_ID = "41514420313231352020202020200606".decode('hex')
+
+    NORTEK_REGEXES = NORTEK_COMMON_REGEXES + VECTOR_SAMPLE_REGEX
+    SBE37_REGEXES = [SAMPLE_PATTERN_MATCHER, STATUS_DATA_REGEX_MATCHER, CALIBRATION_DATA_REGEX_MATCHER]
+
+    def nortek_data(self):
+        return (self.NORTEK_HW_CONFIG + self.NORTEK_VELOCITY_HEADER + self.NORTEK_VELOCITY * 50 +
+                self.NORTEK_SYSTEM + "noise" + self.NORTEK_CLOCK + self.NORTEK_BATTERY + self.NORTEK_ID) * 20
+
+    def sbe37_data(self):
+        return (SAMPLE * 30 + SAMPLE_DC + "\r\nS>" + SAMPLE * 30 + "junk\r\n") * 5
+
+    def test_spans(self):
+        """
+        Test the record types of the spans, and that regexes with groups,
+        different DOTALL settings and back references can be combined
+        """
+        number = re.compile(r'(?P<value>\d+)\.(\d+)')
+        block = re.compile(r'<(.*?)>', re.DOTALL)
+        line = re.compile(r'\[.*\]')
+        pair = re.compile(r'(\w)\1!')
+        sieve = RegexSieve([number, block, line, pair])
+        self.assertEqual(len(sieve._scanners), 2)
+
+        data = "x 12.5 <a\nb> [c\nd] [e] zz! 3.25"
+        self.assertEqual(sieve.spans(data), [(2, 6, number), (7, 12, block), (19, 22, line),
+                                             (23, 26, pair), (27, 31, number)])
+        self.assertEqual(sieve(data), [(2, 6), (7, 12), (19, 22), (23, 26), (27, 31)])
+
+        # the first match wins, then the earlier regex where two start at the same place
+        self.assertEqual(RegexSieve([block, line]).spans("[<a>]"), [(0, 5, line)])
+        short = re.compile(r'<a')
+        self.assertEqual(RegexSieve([short, block]).spans("<a>"), [(0, 2, short)])
+        self.assertEqual(RegexSieve([block, short]).spans("<a>"), [(0, 3, block)])
+        self.assertEqual(RegexSieve([]).spans(data), [])
+
+    def test_overlap_logged(self):
+        """
+        Test a match from a separate scanner that overlaps one already kept
+        is dropped with a warning
+        """
+        run = re.compile(r'a+')
+        repeat = re.compile(r'(a)\1b')
+        sieve = RegexSieve([run, repeat])
+        self.assertEqual(len(sieve._scanners), 2)
+
+        warnings = []
+        original_warn = chunker_module.log.warn
+        chunker_module.log.warn = lambda *args: warnings.append(args)
+        try:
+            self.assertEqual(sieve.spans("xaab aa"), [(1, 3, run), (5, 7, run)])
+        finally:
+            chunker_module.log.warn = original_warn
+        self.assertEqual(len(warnings), 1)
+        self.assertEqual(warnings[0][1:], (r'(a)\1b', 1, 4, 'a+', 1, 3))
+
+    def test_sync_specs(self):
+        """
+        Test fixed length binary records
+        """
+        velocity = ('\xa5\x10', 24)
+        system = ('\xa5\x11\x0e\x00', 28)
+        sieve = RegexSieve([NORTEK_COMMON_REGEXES[-1]], [velocity, system])
+        data = self.NORTEK_VELOCITY + "\x00\xa5" + self.NORTEK_SYSTEM + self.NORTEK_CLOCK + "\xa5\x10\x00"
+        self.assertEqual(sieve.spans(data), [(0, 24, velocity), (26, 54, system),
+                                             (54, 62, NORTEK_COMMON_REGEXES[-1])])
+        self.assertRaises(SampleException, RegexSieve, [], [('\xa5\x10', 1)])
+
+    def test_chunker(self):
+        """
+        Test the compiled sieve function through a chunker, with fragments
+        """
+        chunker = StringChunker(partial(StringChunker.compiled_sieve_function, regex_list=self.SBE37_REGEXES))
+        chunker.add_chunk(SAMPLE[:20], 1.0)
+        chunker.add_chunk(SAMPLE[20:] + SAMPLE_DC, 2.0)
+        self.assertEqual(chunker.get_next_data(), (1.0, SAMPLE.strip()))
+        self.assertEqual(chunker.get_next_data(), (2.0, SAMPLE_DC))
+        self.assertEqual(chunker.get_next_data(), (None, None))
+
+    def test_performance(self):
+        """
+        Compare the single pass sieve against running each regex over the
+        Nortek and SBE37 test data
+        """
+        def sieve_time(sieve, data):
+            start_time = time.time()
+            for i in range(50):
+                result = sieve(data)
+            return (time.time() - start_time, result)
+
+        for (name, regexes, data) in [('Nortek', self.NORTEK_REGEXES, self.nortek_data()),
+                                      ('SBE37', self.SBE37_REGEXES, self.sbe37_data())]:
+            (regex_time, expected) = sieve_time(partial(StringChunker.regex_sieve_function,
+                                                        regex_list=regexes), data)
+            (compiled_time, result) = sieve_time(RegexSieve(regexes), data)
+            log.info("%s sieve of %d bytes, %d records: %s per regex, %s single pass",
+                     name, len(data), len(result), regex_time, compiled_time)
+            self.assertEqual(result, sorted(expected))
+
 @unittest.skip("Write this when a binary chunker is needed")
 @attr('UNIT', group='mi')
 class UnitTestBinaryChunker(MiUnitTestCase):
@@ -11,11 +11,15 @@ __author__ = 'Steve Foley'
 __license__ = 'Apache 2.0'
 
 
+import os
 import json
 import base64
 import time
+import struct
 import ntplib
 
+import mi
+
 from nose.plugins.attrib import attr
 from mi.core.unit_test import MiUnitTestCase
 
@@ -55,6 +59,33 @@ class TestUnitDataParticle(MiUnitTestCase):
                        DataParticleKey.VALUE: "305.16"}]
             return result
 
+    class RulesDataParticle(DataParticle):
+        """
+        DataParticle derivative that builds its values from encoding rules
+        """
+        _data_particle_type = TEST_PARTICLE_TYPE
+        _encoding_rules = [('temp', float), ('cond', float), ('count', int), ('name', str),
+                           ('flag', bool), ('cells', list), ('percent%s', float)]
+
+        def _build_raw_values(self):
+            return self.raw_data
+
+    class PairsDataParticle(DataParticle):
+        """
+        DataParticle derivative that builds value id and value lists
+        """
+        _data_particle_type = TEST_PARTICLE_TYPE
+
+        def _build_value_pairs(self):
+            return self.raw_data
+
+    class OverriddenDataParticle(RulesDataParticle):
+        """
+        Encoding rules particle that still overrides _build_parsed_values
+        """
+        def _build_parsed_values(self):
+            return [{DataParticleKey.VALUE_ID: 'only', DataParticleKey.VALUE: 1}]
+
     class BadDataParticle(DataParticle):
          """
          Define a data particle that doesn't initialize _data_particle_type.
@@ -147,6 +178,103 @@ class TestUnitDataParticle(MiUnitTestCase):
         standard = json.dumps(self.sample_parsed_particle, sort_keys=True)
         self.assertEqual(parsed_result, standard)
 
+    def test_encoding_rules(self):
+        """
+        Test particles built from encoding rules generate the same JSON as
+        encoding their dictionary
+        """
+        raw_values = ('23.45', 15.9, '12', 'a "quoted", [name]', 1, (1, 2, 3), float('nan'))
+        particle = self.RulesDataParticle(raw_values, port_timestamp=self.sample_port_timestamp,
+                                          internal_timestamp=self.sample_internal_timestamp,
+                                          new_sequence=True)
+        self.assertTrue(particle.encoder().uses_value_pairs)
+        self.assertEqual(particle.generate(), json.dumps(particle.generate_dict()))
+        values = particle.generate_dict()[DataParticleKey.VALUES]
+        self.assertEqual(values[0], {DataParticleKey.VALUE_ID: 'temp', DataParticleKey.VALUE: 23.45})
+        self.assertEqual(values[5], {DataParticleKey.VALUE_ID: 'cells', DataParticleKey.VALUE: [1, 2, 3]})
+        self.assertEqual(particle.get_encoding_errors(), [])
+        self.assertEqual(json.loads(particle.generate(sorted=True)), json.loads(particle.generate()))
+
+        # values that fail to encode are None and recorded as errors
+        particle = self.RulesDataParticle(('bad', 15.9, None, 'name', 0, [], 1.0))
+        self.assertEqual(particle.generate(), json.dumps(particle.generate_dict()))
+        self.assertEqual(particle.get_encoding_errors(), [{'temp': 'bad'}, {'count': None}])
+        self.assertIsNone(particle.generate_dict()[DataParticleKey.VALUES][0][DataParticleKey.VALUE])
+
+        # the wrong number of values
+        particle = self.RulesDataParticle(('23.45', 15.9))
+        self.assertRaises(SampleException, particle.generate)
+
+    def test_value_pairs(self):
+        """
+        Test particles built from value id and value lists generate the same JSON as
+        encoding their dictionary, including when the value ids change between particles
+        """
+        for pairs in [(['a', 'b'], [1.5, None]),
+                      (['b', 'c', 'd'], [u'caf\xe9', -2L, {'nested': [1, 'x, y]']}]),
+                      ([], [])]:
+            particle = self.PairsDataParticle(pairs, port_timestamp=self.sample_port_timestamp)
+            self.assertEqual(particle.generate(), json.dumps(particle.generate_dict()))
+
+        # strings that look like the particle JSON around them
+        particle = self.PairsDataParticle((['values', 'b'], ['"values": [', ', ']),
+                                          port_timestamp=self.sample_port_timestamp)
+        self.assertEqual(particle.generate(), json.dumps(particle.generate_dict()))
+
+    def test_generate_performance(self):
+        """
+        Compare generate() with encoding the particle dictionary for CTD, PD0
+        and glider particles
+        """
+        # imported here so the core tests only load the parsers for this benchmark
+        from mi.dataset.parser.ctdpf_ckl_wfp import CtdpfCklWfpParserDataParticle
+        from mi.dataset.parser.adcps_jln import AdcpsJlnParticle
+        from mi.dataset.parser.glider import CtdgvDataParticle
+
+        pd0_path = os.path.join(os.path.dirname(mi.__file__), 'dataset', 'driver', 'adcps_jln',
+                                'stc', 'resource', 'ADCP_CCE1T_20.000')
+        with open(pd0_path, 'rb') as pd0_file:
+            pd0_data = pd0_file.read()
+        # the record length, plus the two checksum bytes
+        pd0_ensemble = pd0_data[:struct.unpack_from('<H', pd0_data, 2)[0] + 2]
+
+        glider_row = dict([(key, {'Name': key, 'Data': value}) for (key, value) in
+                           [('m_present_time', 1378349241.82), ('sci_ctd41cp_timestamp', 1378349241.8),
+                            ('sci_water_cond', 4.25), ('sci_water_pressure', 0.71),
+                            ('sci_water_temp', float('nan')), ('m_gps_lat', 44.6)]])
+
+        particles = [(CtdpfCklWfpParserDataParticle, "\x00\x1a\x88\x03\xe3\x3b\x00\x03\xeb\x0a\xc8"),
+                     (AdcpsJlnParticle, pd0_ensemble),
+                     (CtdgvDataParticle, glider_row)]
+        iterations = 200
+        for (particle_class, raw_data) in particles:
+            particle = particle_class(raw_data, internal_timestamp=self.sample_internal_timestamp)
+            self.assertEqual(particle.generate(), json.dumps(particle.generate_dict()))
+
+            start_time = time.time()
+            for _ in range(iterations):
+                particle_class(raw_data, internal_timestamp=self.sample_internal_timestamp).generate()
+            generate_time = time.time() - start_time
+
+            start_time = time.time()
+            for _ in range(iterations):
+                json.dumps(particle_class(raw_data, internal_timestamp=self.sample_internal_timestamp).generate_dict())
+            dict_time = time.time() - start_time
+
+            log.info("%s x %d: generate %.4fs, dumps(generate_dict) %.4fs, value pairs %s",
+                     particle_class.__name__, iterations, generate_time, dict_time,
+                     particle.encoder().uses_value_pairs)
+
+    def test_overridden_parsed_values(self):
+        """
+        Test subclasses that override _build_parsed_values still use it
+        """
+        particle = self.OverriddenDataParticle(())
+        self.assertFalse(particle.encoder().uses_value_pairs)
+        self.assertFalse(self.TestDataParticle.encoder().uses_value_pairs)
+        self.assertEqual(json.loads(particle.generate())[DataParticleKey.VALUES],
+                         [{DataParticleKey.VALUE_ID: 'only', DataParticleKey.VALUE: 1}])
+
     def test_new_sequence_flag(self):
         """
         Verify that we can set the new sequence flag
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_event_encoding
+@file mi/core/instrument/test/test_event_encoding.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief Test code for the driver event wire formats
+"""
+
+from nose.plugins.attrib import attr
+from mi.core.unit_test import MiUnitTest
+from mi.core.exceptions import InstrumentParameterException
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
+from mi.core.instrument.event_encoding import EventFormat, available_formats
+from mi.core.instrument.event_encoding import encode_events, decode_events
+
+
+@attr('UNIT', group='mi')
+class TestEventEncoding(MiUnitTest):
+
+    def test_round_trip(self):
+        """
+        Test events decode as exactly what was encoded in every available
+        format, including types msgpack can't represent directly
+        """
+        events = [{'type': DriverAsyncEvent.SAMPLE, 'value': '{"values": []}', 'time': 3600000000.5},
+                  {'type': DriverAsyncEvent.STATE_CHANGE, 'value': u'DRIVER_STATE_COMMAND', 'time': 1},
+                  {'type': DriverAsyncEvent.CONFIG_CHANGE, 'value': {'param': [1, 2.5, None, True]}},
+                  (400, 'InstrumentCommandException: Unknown driver command.', []),
+                  'string event']
+
+        self.assertIn(EventFormat.PICKLE, available_formats())
+        for event_format in available_formats():
+            frames = encode_events(event_format, events)
+            self.assertEqual(frames[0], event_format)
+            self.assertEqual(len(frames), len(events) + 1)
+
+            decoded = decode_events(frames)
+            self.assertEqual(decoded, events)
+            self.assertEqual([type(evt) for evt in decoded], [type(evt) for evt in events])
+            self.assertIsInstance(decoded[1]['value'], unicode)
+
+        self.assertRaises(InstrumentParameterException, encode_events, 'json', events)
+        self.assertRaises(InstrumentParameterException, decode_events, ['json', '{}'])
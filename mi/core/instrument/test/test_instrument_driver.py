@@ -25,6 +25,8 @@ from mi.core.exceptions import TestModeException
 from mi.core.exceptions import InstrumentParameterException
 from mi.core.exceptions import NotImplementedException
 from mi.core.instrument.instrument_driver import DriverEvent
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
+from mi.core.instrument.instrument_driver import DriverConnectionState
 from mi.core.instrument.instrument_driver import SingleConnectionInstrumentDriver
 from mi.core.instrument.instrument_driver import DriverParameter
 from mi.core.instrument.instrument_driver import ConfigMetadataKey
@@ -170,7 +172,37 @@ class TestUnitInstrumentDriver(MiUnitTestCase):
         """
         self.assertRaises(NotImplementedException,
                           self.driver.apply_startup_params)
-        
+
+    def test_handler_timing(self):
+        """
+        Test state machine handler latencies can be read back from the
+        driver once handler timing is on
+        """
+        self.assertEquals(self.driver.get_handler_timing(), {'connection': None, 'protocol': None})
+
+        self.driver.set_handler_timing()
+        self.driver.initialize()
+        handlers = self.driver.get_handler_timing()['connection']['handlers']
+        self.assertEquals(handlers[DriverConnectionState.UNCONFIGURED][DriverEvent.INITIALIZE]['count'], 1)
+
+        self.driver.set_handler_timing(False)
+        self.assertEquals(self.driver.get_handler_timing()['connection'], None)
+
+    def test_publish_sample(self):
+        """
+        Test sample dictionaries published by the protocol are sent to the
+        agent as JSON and string samples are sent unchanged
+        """
+        sample = {'stream_name': 'test', 'values': [{'value_id': 'temp', 'value': 23.45}]}
+        self.driver._driver_event(DriverAsyncEvent.SAMPLE, sample)
+        self.driver._driver_event(DriverAsyncEvent.SAMPLE, json.dumps(sample))
+
+        self.assertEquals(self.mock.callback.call_count, 2)
+        for ((event,), kwargs) in self.mock.callback.call_args_list:
+            self.assertEquals(event['type'], DriverAsyncEvent.SAMPLE)
+            self.assertIsInstance(event['value'], str)
+            self.assertEquals(json.loads(event['value']), sample)
+
     def test_config_metadata(self):
         """
         Test the metadata structure fetch
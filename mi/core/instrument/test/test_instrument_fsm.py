@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_instrument_fsm
+@file mi/core/instrument/test/test_instrument_fsm.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief Test code for the instrument state machine
+"""
+
+import time
+
+from mock import patch
+from nose.plugins.attrib import attr
+from mi.core.unit_test import MiUnitTest
+from mi.core.log import get_logger ; log = get_logger()
+
+from mi.core.common import BaseEnum
+from mi.core.exceptions import InstrumentStateException
+from mi.core.instrument.instrument_fsm import InstrumentFSM, ThreadSafeFSM
+from mi.core.instrument.instrument_fsm import HandlerTimer, HANDLER_TIMING_BUCKETS
+
+
+class State(BaseEnum):
+    COMMAND = 'STATE_COMMAND'
+    AUTOSAMPLE = 'STATE_AUTOSAMPLE'
+
+
+class Event(BaseEnum):
+    ENTER = 'EVENT_ENTER'
+    EXIT = 'EVENT_EXIT'
+    START = 'EVENT_START'
+    STOP = 'EVENT_STOP'
+    SAMPLE = 'EVENT_SAMPLE'
+
+
+class ExtendedEvent(Event):
+    CLOCK_SYNC = 'EVENT_CLOCK_SYNC'
+
+
+@attr('UNIT', group='mi')
+class TestInstrumentFSM(MiUnitTest):
+
+    def setUp(self):
+        self.calls = []
+        self.fsm = ThreadSafeFSM(State, Event, Event.ENTER, Event.EXIT)
+        for (state, event, next_state) in [(State.COMMAND, Event.ENTER, None),
+                                           (State.COMMAND, Event.EXIT, None),
+                                           (State.COMMAND, Event.START, State.AUTOSAMPLE),
+                                           (State.AUTOSAMPLE, Event.ENTER, None),
+                                           (State.AUTOSAMPLE, Event.SAMPLE, None),
+                                           (State.AUTOSAMPLE, Event.STOP, State.COMMAND)]:
+            self.assertTrue(self.fsm.add_handler(state, event, self._handler(state, event, next_state)))
+
+    def _handler(self, state, event, next_state):
+        def handler(*args, **kwargs):
+            self.calls.append((state, event))
+            return (next_state, args)
+        return handler
+
+    def test_enum_values(self):
+        """
+        Test enum values are found once per class, subclasses included
+        """
+        self.assertEqual(sorted(Event.list()), sorted(['EVENT_ENTER', 'EVENT_EXIT', 'EVENT_START',
+                                                       'EVENT_STOP', 'EVENT_SAMPLE']))
+        self.assertTrue(Event.has(Event.SAMPLE))
+        self.assertFalse(Event.has(ExtendedEvent.CLOCK_SYNC))
+        self.assertTrue(ExtendedEvent.has(ExtendedEvent.CLOCK_SYNC))
+        self.assertTrue(ExtendedEvent.has(Event.SAMPLE))
+        self.assertFalse(Event.has(['EVENT_SAMPLE']))
+        self.assertEqual(Event.dict()['SAMPLE'], Event.SAMPLE)
+
+        # the list handed out can be changed without changing the enum
+        Event.list().append('EVENT_BOGUS')
+        self.assertFalse(Event.has('EVENT_BOGUS'))
+
+    def test_dispatch(self):
+        """
+        Test handlers run and states change through the dispatch table
+        """
+        self.assertFalse(self.fsm.add_handler('STATE_BOGUS', Event.SAMPLE, None))
+        self.assertFalse(self.fsm.add_handler(State.COMMAND, 'EVENT_BOGUS', None))
+        self.assertFalse(self.fsm.start('STATE_BOGUS'))
+        self.assertTrue(self.fsm.start(State.COMMAND))
+        self.assertEqual(self.calls, [(State.COMMAND, Event.ENTER)])
+
+        self.assertEqual(self.fsm.on_event(Event.START, 1, 2), (1, 2))
+        self.assertEqual(self.fsm.get_current_state(), State.AUTOSAMPLE)
+        self.assertEqual(self.fsm.previous_state, State.COMMAND)
+        self.assertEqual(self.calls[1:], [(State.COMMAND, Event.START),
+                                          (State.COMMAND, Event.EXIT),
+                                          (State.AUTOSAMPLE, Event.ENTER)])
+
+        self.fsm.on_event(Event.SAMPLE)
+        self.assertEqual(self.fsm.get_current_state(), State.AUTOSAMPLE)
+        self.assertRaises(InstrumentStateException, self.fsm.on_event, Event.START)
+        self.assertRaises(InstrumentStateException, self.fsm.on_event, 'EVENT_BOGUS')
+        self.assertRaises(InstrumentStateException, self.fsm.on_event, [Event.SAMPLE])
+
+        # handlers added after the start are used
+        self.assertTrue(self.fsm.add_handler(State.AUTOSAMPLE, Event.START,
+                                             self._handler(State.AUTOSAMPLE, Event.START, None)))
+        self.fsm.on_event(Event.START)
+        self.assertEqual(self.calls[-1], (State.AUTOSAMPLE, Event.START))
+        self.assertEqual(sorted(self.fsm.get_events()), sorted([Event.START, Event.STOP, Event.SAMPLE]))
+
+        # an FSM that was never started doesn't handle anything
+        fsm = InstrumentFSM(State, Event, Event.ENTER, Event.EXIT)
+        self.assertRaises(InstrumentStateException, fsm.on_event, Event.START)
+
+    def test_handler_timing(self):
+        """
+        Test handler latencies are recorded per state and event while
+        handler timing is on
+        """
+        self.fsm.start(State.COMMAND)
+        self.assertIsNone(self.fsm.get_handler_timing())
+        self.fsm.set_handler_timing()
+
+        # a clock that only moves while the autosample start handler runs
+        clock = [1000.0]
+        def slow_handler():
+            clock[0] += 0.02
+            return (None, None)
+
+        self.fsm.add_handler(State.AUTOSAMPLE, Event.START, slow_handler)
+        with patch('mi.core.instrument.instrument_fsm.time') as mock_time:
+            mock_time.time.side_effect = lambda: clock[0]
+            self.fsm.on_event(Event.START)
+            for i in range(3):
+                self.fsm.on_event(Event.SAMPLE)
+            self.fsm.on_event(Event.START)
+
+        timing = self.fsm.get_handler_timing()
+        self.assertEqual(timing['buckets'], list(HANDLER_TIMING_BUCKETS))
+        handlers = timing['handlers']
+        self.assertEqual(sorted(handlers), sorted(State.list()))
+        self.assertEqual(sorted(handlers[State.COMMAND]), sorted([Event.START, Event.EXIT]))
+        self.assertEqual(sorted(handlers[State.AUTOSAMPLE]), sorted([Event.ENTER, Event.SAMPLE, Event.START]))
+
+        stats = handlers[State.AUTOSAMPLE][Event.SAMPLE]
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(stats['total'], 0)
+        self.assertEqual(stats['histogram'], [3, 0, 0, 0, 0, 0])
+
+        stats = handlers[State.AUTOSAMPLE][Event.START]
+        self.assertEqual(stats['count'], 1)
+        self.assertAlmostEqual(stats['max'], 0.02)
+        self.assertEqual(stats['histogram'], [0, 0, 1, 0, 0, 0])
+
+        # stopping discards what was recorded
+        self.fsm.set_handler_timing(False)
+        self.fsm.on_event(Event.SAMPLE)
+        self.assertIsNone(self.fsm.get_handler_timing())
+
+    def test_handler_timer(self):
+        """
+        Test handler calls are counted in the first bucket whose bound is
+        not below their latency, and in the last bucket past every bound
+        """
+        timer = HandlerTimer(buckets=[0.01, 0.1])
+        for elapsed in [0, 0.01, 0.05, 0.1, 0.5, 2.0]:
+            timer.record(State.COMMAND, Event.START, elapsed)
+        timer.record(State.AUTOSAMPLE, Event.STOP, 0.2)
+
+        stats = timer.get_stats()
+        self.assertEqual(stats['buckets'], [0.01, 0.1])
+        start = stats['handlers'][State.COMMAND][Event.START]
+        self.assertEqual(start['count'], 6)
+        self.assertAlmostEqual(start['total'], 2.66)
+        self.assertEqual(start['max'], 2.0)
+        self.assertEqual(start['histogram'], [2, 2, 2])
+        self.assertEqual(stats['handlers'][State.AUTOSAMPLE][Event.STOP]['histogram'], [0, 0, 1])
+
+    def test_event_rate(self):
+        """
+        Log events per second through the dispatch table against looking
+        up states and events in the enums for every event
+        """
+        def uncached_has(enum, item):
+            return item in [getattr(enum, name) for name in dir(enum)
+                            if not callable(getattr(enum, name)) and not name.startswith('__')]
+
+        def reference_on_event(fsm, event):
+            if uncached_has(fsm.events, event):
+                handler = fsm.state_handlers.get((fsm.current_state, event))
+                (next_state, result) = handler()
+            if uncached_has(fsm.states, next_state):
+                fsm._on_transition(next_state)
+            return result
+
+        def events_per_second(on_event, count=5000):
+            start_time = time.time()
+            for i in range(count):
+                on_event(Event.SAMPLE)
+            return count / (time.time() - start_time)
+
+        # samples move to the same state so neither version logs that it
+        # stayed in the current state
+        fsm = InstrumentFSM(State, Event, Event.ENTER, Event.EXIT)
+        fsm.add_handler(State.AUTOSAMPLE, Event.SAMPLE, lambda: (State.AUTOSAMPLE, None))
+        fsm.start(State.AUTOSAMPLE)
+        before = events_per_second(lambda event: reference_on_event(fsm, event))
+        after = events_per_second(fsm.on_event)
+        self.assertEqual(fsm.get_current_state(), State.AUTOSAMPLE)
+
+        fsm.set_handler_timing()
+        timed = events_per_second(fsm.on_event)
+        self.assertEqual(fsm.get_handler_timing()['handlers'][State.AUTOSAMPLE][Event.SAMPLE]['count'], 5000)
+
+        log.info("FSM events per second: %d searching the enums, %d dispatched, %d dispatched and timed",
+                 before, after, timed)
@@ -12,9 +12,13 @@ __license__ = 'Apache 2.0'
 
 import re
 import time
+import json
+import base64
 import ntplib
 import datetime
-from mock import Mock
+from functools import partial
+from threading import Timer
+from mock import Mock, patch
 from nose.plugins.attrib import attr
 from mi.core.log import get_logger ; log = get_logger()
 from mi.core.instrument.instrument_fsm import ThreadSafeFSM
@@ -22,12 +26,17 @@ from mi.core.instrument.instrument_driver import DriverParameter
 from mi.core.instrument.instrument_protocol import InstrumentProtocol
 from mi.core.instrument.instrument_protocol import MenuInstrumentProtocol
 from mi.core.instrument.instrument_protocol import CommandResponseInstrumentProtocol
+from mi.core.instrument.instrument_protocol import PromptScanner
 from mi.core.instrument.protocol_param_dict import ParameterDictVisibility
 from mi.core.instrument.instrument_driver import ConfigMetadataKey
 from mi.instrument.satlantic.par_ser_600m.driver import SAMPLE_REGEX
 from mi.instrument.satlantic.par_ser_600m.driver import SatlanticPARDataParticle
+from mi.core.instrument.data_particle import DataParticle, DataParticleKey
 
 from mi.core.instrument.protocol_cmd_dict import Command, CommandArgument
+from mi.core.instrument.port_agent_client import PortAgentPacket
+from mi.core.instrument.chunker import StringChunker
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
 from mi.core.instrument.driver_dict import DriverDictKey
 from mi.core.driver_scheduler import DriverScheduler
 from mi.core.instrument.instrument_driver import DriverConfigKey
@@ -44,6 +53,21 @@ from mi.core.common import BaseEnum
 
 Directions = MenuInstrumentProtocol.MenuTree.Directions
 
+STUB_SAMPLE = "#55.9044,41.40609, 572.170\r\n"
+STUB_SAMPLE_REGEX = re.compile(r'#([\d.]+),\s*([\d.]+),\s*([\d.]+)\r\n')
+
+class StubDataParticle(DataParticle):
+    """
+    Particle for STUB_SAMPLE lines
+    """
+    _data_particle_type = 'stub_parsed'
+
+    def _build_parsed_values(self):
+        match = STUB_SAMPLE_REGEX.match(self.raw_data)
+        return [{DataParticleKey.VALUE_ID: name,
+                 DataParticleKey.VALUE: float(match.group(index + 1))}
+                for (index, name) in enumerate(['temp', 'cond', 'depth'])]
+
 @attr('UNIT', group='mi')
 class TestUnitInstrumentProtocol(MiUnitTestCase):
     """
@@ -192,6 +216,36 @@ class TestUnitInstrumentProtocol(MiUnitTestCase):
         self.assertEqual(self.protocol._linebuf, "defgh")
         self.assertEqual(self.protocol._promptbuf, "defgh")
 
+        # assigning the buffers still works, and a new max size is picked up
+        self.protocol._linebuf = ''
+        self.protocol._max_buffer_size = Mock(return_value=3)
+        self.protocol.add_to_buffer("ijkl")
+        self.assertEqual(self.protocol._linebuf, "jkl")
+        self.assertEqual(self.protocol._promptbuf, "jkl")
+
+    def test_buffer_throughput(self):
+        """
+        In autosample mode nothing reads the line and prompt buffers, so
+        they stay full. Log how fast packets are added to full buffers of
+        different sizes and check the buffers stay at their maximum size.
+        """
+        def packets_per_second(max_size, count=20000):
+            protocol = CommandResponseInstrumentProtocol(['S>'], '\r\n', self.event_callback)
+            protocol._max_buffer_size = lambda: max_size
+            protocol.add_to_buffer('x' * max_size)
+            start_time = time.time()
+            for i in range(count):
+                protocol.add_to_buffer(STUB_SAMPLE)
+            rate = count / (time.time() - start_time)
+            self.assertEqual(len(protocol._linebuf), max_size)
+            self.assertTrue(protocol._promptbuf.endswith(STUB_SAMPLE))
+            return rate
+
+        small = packets_per_second(1024)
+        large = packets_per_second(1024 * 1024)
+
+        log.info("Packets per second: %d with 1 KiB buffers, %d with 1 MiB buffers", small, large)
+
     @unittest.skip('Not Written')
     def test_publish_raw(self):
         """
@@ -207,14 +261,56 @@ class TestUnitInstrumentProtocol(MiUnitTestCase):
         
         self.assertTrue(False)
 
-    @unittest.skip('Not Written')
     def test_publish_parsed_data(self):
         """
         Tests to see if parsed data is appropriately published back to the
         InstrumentAgent via the event callback.
         """
-        # similar to above
-        self.assertTrue(False)
+        events = []
+        self.protocol = InstrumentProtocol(lambda event, value=None: events.append((event, value)))
+        result = self.protocol._extract_sample(StubDataParticle, STUB_SAMPLE_REGEX, STUB_SAMPLE, 3600000000.0)
+
+        self.assertEqual(len(events), 1)
+        (event, value) = events[0]
+        self.assertEqual(event, DriverAsyncEvent.SAMPLE)
+        # the dictionary is published as is, the driver serializes it
+        self.assertIs(value, result)
+        self.assertEqual(result[DataParticleKey.STREAM_NAME], 'stub_parsed')
+        self.assertEqual(result[DataParticleKey.VALUES][0],
+                         {DataParticleKey.VALUE_ID: 'temp', DataParticleKey.VALUE: 55.9044})
+
+        self.assertIsNone(self.protocol._extract_sample(StubDataParticle, STUB_SAMPLE_REGEX, "junk", 3600000000.0))
+        result = self.protocol._extract_sample(StubDataParticle, STUB_SAMPLE_REGEX, STUB_SAMPLE, 3600000000.0,
+                                               publish=False)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(result[DataParticleKey.VALUES], value[DataParticleKey.VALUES])
+
+    def test_publish_sample_generate(self):
+        """
+        Particle classes that override generate() are published with their
+        own JSON.
+        """
+        class OverrideParticle(StubDataParticle):
+            def generate(self, sorted=False):
+                sample = json.loads(StubDataParticle.generate(self, sorted))
+                sample['override'] = True
+                return json.dumps(sample)
+
+        events = []
+        self.protocol = InstrumentProtocol(lambda event, value=None: events.append(value))
+
+        result = self.protocol._extract_sample(OverrideParticle, STUB_SAMPLE_REGEX, STUB_SAMPLE, 3600000000.0)
+        self.assertEqual(len(events), 1)
+        self.assertIsInstance(events[0], str)
+        self.assertTrue(result['override'])
+        self.assertEqual(json.loads(events[0]), result)
+
+        # unpublished samples are the particle dictionary
+        result = self.protocol._extract_sample(OverrideParticle, STUB_SAMPLE_REGEX, STUB_SAMPLE, 3600000000.0,
+                                               publish=False)
+        self.assertEqual(len(events), 1)
+        self.assertNotIn('override', result)
+        self.assertEqual(result['values'], json.loads(events[0])['values'])
 
     @unittest.skip('Not Written')
     def test_publish_engineering_data(self):
@@ -608,6 +704,108 @@ class TestUnitCommandInstrumentProtocol(MiUnitTestCase):
                           self.protocol._do_cmd_resp,
                           self.TestEvent.TEST, expected_prompt=">", response_regex=regex1)
 
+    def test_prompt_scanner(self):
+        """
+        Test prompts are found when they arrive split across appends, and
+        the buffer is searched again from the start after it is cleared
+        """
+        scanner = PromptScanner(["S>", ">"])
+        self.assertIsNone(scanner.find("response S"))
+        self.assertIsNone(scanner.find("response S"))
+        self.assertEqual(scanner.find("response S>"), ("S>", "response S>"))
+        self.assertEqual(scanner.find("x>"), (">", "x>"))
+        self.assertEqual(scanner.find("S> a >"), ("S>", "S>"))
+
+    def test_cmd_response_latency(self):
+        """
+        Commands against a simulated instrument that answers after a couple
+        of milliseconds are woken by the reply, not by the polling interval
+        or the 1 second wakeup delay running out.
+        """
+        def reply_later(data):
+            timer = Timer(.002, self.protocol.add_to_buffer, [data])
+            timer.start()
+
+        self.protocol._connection.send = lambda x: reply_later("%s\r\nS>" % x)
+        self.protocol._send_wakeup = lambda: reply_later("\r\nS>")
+        regex = re.compile(r'(do it)')
+
+        # record whether each wait ended with new data in the buffers
+        woken = []
+        wait_for_buffer = self.protocol._wait_for_buffer
+        def record_wait(updates, deadline):
+            wait_for_buffer(updates, deadline)
+            woken.append(self.protocol._buffer_updates != updates)
+        self.protocol._wait_for_buffer = record_wait
+
+        count = 20
+        start_time = time.time()
+        # a poll interval longer than the test, so only a notify ends a wait early
+        with patch('mi.core.instrument.instrument_protocol.BUFFER_POLL_INTERVAL', 60):
+            for i in range(count):
+                self.protocol._do_cmd_resp(self.TestEvent.TEST, expected_prompt="S>")
+                self.protocol._do_cmd_resp(self.TestEvent.TEST, response_regex=regex)
+        latency = (time.time() - start_time) / (count * 2)
+
+        log.info("Command response latency: %.4f seconds over %d waits", latency, len(woken))
+        self.assertTrue(woken)
+        self.assertNotIn(False, woken)
+
+        # the raw response waits for the prompt at the end of the buffer
+        self.protocol._promptbuf = ''
+        reply_later("raw\r\nS>  ")
+        self.assertEqual(self.protocol._get_raw_response(timeout=1, expected_prompt="S>"),
+                         ("S>", self.protocol._linebuf))
+
+    def _build_packet(self, data, timestamp, packet_type=PortAgentPacket.DATA_FROM_INSTRUMENT):
+        packet = PortAgentPacket(packet_type)
+        packet.attach_data(data)
+        packet.pack_header()
+        packet.attach_timestamp(timestamp)
+        return packet
+
+    def test_got_data_batch(self):
+        """
+        A batch of packets should fill the buffers once and produce the same
+        chunks, with the same timestamps, as feeding the packets one by one.
+        """
+        chunks = []
+        self.protocol._chunker = StringChunker(partial(StringChunker.regex_sieve_function,
+                                                       regex_list=[SAMPLE_REGEX]))
+        self.protocol._got_chunk = lambda chunk, timestamp: chunks.append((chunk, timestamp))
+        self.protocol.add_to_buffer = Mock()
+
+        packets = [self._build_packet("SATPAR0229,10.01,22067", 1.0),
+                   self._build_packet("48544,234\r\nSATPAR0229,10.01,2206748544,235\r\n", 2.0),
+                   self._build_packet("", 3.0)]
+        self.protocol.got_data_batch(packets)
+
+        self.assertEqual(self.protocol.add_to_buffer.call_count, 1)
+        self.assertEqual(chunks, [("SATPAR0229,10.01,2206748544,234\r\n", 1.0),
+                                  ("SATPAR0229,10.01,2206748544,235\r\n", 2.0)])
+
+    def test_publish_raw_batch(self):
+        """
+        Every packet gets its own raw particle in its own sample event
+        """
+        events = []
+        self.protocol._driver_event = lambda event, value=None: events.append((event, value))
+
+        packets = [self._build_packet("abc", 1.0),
+                   self._build_packet("def", 2.0),
+                   self._build_packet("ghi", 3.0, PortAgentPacket.DATA_FROM_DRIVER)]
+        self.protocol.publish_raw_batch(packets)
+
+        self.assertEqual([event for (event, sample) in events], [DriverAsyncEvent.SAMPLE] * 3)
+
+        for ((event, sample), packet) in zip(events, packets):
+            particle = json.loads(sample)
+            values = dict([(v['value_id'], v['value']) for v in particle['values']])
+            self.assertEqual(base64.b64decode(values['raw']), packet.get_data())
+            self.assertEqual(values['length'], 3)
+            self.assertEqual(values['checksum'], packet.get_header_checksum())
+            self.assertEqual(particle['port_timestamp'], packet.get_timestamp())
+
 
 @attr('UNIT', group='mi')
 class TestUnitMenuInstrumentProtocol(MiUnitTestCase):
@@ -22,6 +22,7 @@ import datetime
 import array
 import struct
 import ctypes
+import socket
 from nose.plugins.attrib import attr
 from mock import Mock
 
@@ -39,7 +40,8 @@ from mi.idk.unit_test import InstrumentDriverUnitTestCase
 from mi.idk.unit_test import InstrumentDriverIntegrationTestCase
 
 from mi.core.instrument.port_agent_client import PortAgentClient, PortAgentPacket, Listener
-from mi.core.instrument.port_agent_client import HEADER_SIZE
+from mi.core.instrument.port_agent_client import HEADER_SIZE, OFFSET_P_LENGTH
+from mi.core.instrument.port_agent_client import PacketReader, SocketClosed, PacketFramingError, xor_checksum
 from mi.core.instrument.instrument_driver import DriverConnectionState
 from mi.core.instrument.instrument_driver import DriverProtocolState
 
@@ -226,6 +228,31 @@ class PAClientUnitTestCase(InstrumentDriverUnitTestCase):
         self.assertFalse(self.errorCallbackCalled)
         self.assertFalse(self.listenerCallbackCalled)
 
+    def test_handle_packets(self):
+        """
+        In batch mode the raw and data callbacks each get one list per batch
+        and heartbeats are filtered out.
+        """
+        raw_batches = []
+        data_batches = []
+        paListener = Listener(None, None, 0, 0, 5, data_batches.append, raw_batches.append,
+                              self.myGotListenerError, self.myGotError, batch=True)
+
+        paPackets = []
+        for packet_type in [PortAgentPacket.DATA_FROM_INSTRUMENT,
+                            PortAgentPacket.HEARTBEAT,
+                            PortAgentPacket.PORT_AGENT_STATUS,
+                            PortAgentPacket.DATA_FROM_INSTRUMENT]:
+            paPacket = PortAgentPacket(packet_type)
+            paPacket.attach_data("This is a great big test")
+            paPacket.pack_header()
+            paPackets.append(paPacket)
+
+        paListener.handle_packets(paPackets)
+
+        self.assertEqual(raw_batches, [[paPackets[0], paPackets[2], paPackets[3]]])
+        self.assertEqual(data_batches, [[paPackets[0], paPackets[3]]])
+
     def test_heartbeat_timeout(self):
         """
         Initialize the Listener with a heartbeat value, then
@@ -420,6 +447,189 @@ class PAClientTestPortAgentPacket(MiUnitTest):
         #self.assertEqual(got_timestamp, 1105890970.110589)
         self.assertEqual(self.pap.get_header_recv_checksum(), 3729) 
 
+    def _build_packet(self, data, packet_type=PortAgentPacket.DATA_FROM_INSTRUMENT):
+        """
+        Build a raw port agent packet with a valid checksum
+        """
+        header = bytearray(struct.pack('>BBBBHHII', 0xa3, 0x9d, 0x7a, packet_type,
+                                       len(data) + HEADER_SIZE, 0, 3590000000, 0))
+        checksum = xor_checksum(header) ^ xor_checksum(data)
+        struct.pack_into('>H', header, 6, checksum)
+        return str(header) + data
+
+    def test_xor_checksum(self):
+        """
+        The folded checksum must match a byte by byte XOR for every length
+        """
+        data = "".join(chr((i * 37 + 11) % 256) for i in range(600))
+        for length in range(len(data)):
+            expected = 0
+            for char in data[:length]:
+                expected ^= ord(char)
+            self.assertEqual(xor_checksum(data[:length]), expected)
+            self.assertEqual(xor_checksum(memoryview(bytearray(data))[:length]), expected)
+
+    def test_verify_checksum(self):
+        packet = self._build_packet("This tests the checksum algorithm.")
+        self.pap.unpack_header(packet[:HEADER_SIZE])
+        self.pap.attach_data(packet[HEADER_SIZE:])
+        self.pap.verify_checksum()
+        self.assertTrue(self.pap.is_valid())
+
+        self.pap.attach_data("This tests the checksum algorithm!")
+        self.pap.verify_checksum()
+        self.assertFalse(self.pap.is_valid())
+
+    def test_packet_reader(self):
+        """
+        Send a burst of packets, one of them split across sends and one
+        larger than the receive buffer, and read them back out.
+        """
+        (client, server) = socket.socketpair()
+        client.setblocking(0)
+        reader = PacketReader(client, buffer_size=64)
+
+        payloads = ["sample %d" % i for i in range(5)] + ["x" * 200]
+        stream = "".join([self._build_packet(p) for p in payloads])
+        server.sendall(stream[:50])
+
+        received = []
+        while len(received) < len(payloads):
+            packet = reader.next_packet()
+            if packet is None:
+                if not reader.read():
+                    server.sendall(stream[50:])
+                continue
+            paPacket = PortAgentPacket()
+            paPacket.unpack_header(packet[:HEADER_SIZE].tobytes())
+            paPacket.attach_data(packet[HEADER_SIZE:].tobytes())
+            paPacket.verify_checksum()
+            self.assertTrue(paPacket.is_valid())
+            received.append(paPacket.get_data())
+
+        self.assertEqual(received, payloads)
+        self.assertEqual(reader.read(), 0)
+
+        server.close()
+        self.assertRaises(SocketClosed, reader.read)
+        client.close()
+
+    def test_packet_reader_resync(self):
+        """
+        A header with a length shorter than the header itself must be
+        rejected, and reading must carry on at the next packet.
+        """
+        (client, server) = socket.socketpair()
+        client.setblocking(0)
+        reader = PacketReader(client, buffer_size=64)
+
+        bad = bytearray(self._build_packet("corrupt"))
+        struct.pack_into('>H', bad, OFFSET_P_LENGTH, 3)
+        server.sendall(self._build_packet("first") + str(bad) + "junk" +
+                       self._build_packet("second"))
+
+        received = []
+        errors = 0
+        while len(received) < 2:
+            try:
+                packet = reader.next_packet()
+            except PacketFramingError:
+                errors += 1
+                continue
+            if packet is None:
+                reader.read()
+                continue
+            received.append(packet[HEADER_SIZE:].tobytes())
+
+        self.assertEqual(received, ["first", "second"])
+        self.assertEqual(errors, 1)
+        self.assertEqual(reader.read(), 0)
+
+        server.close()
+        client.close()
+
+    def test_checksum_performance(self):
+        """
+        Compare the folded checksum with the old byte at a time loop
+        """
+        data = "".join(chr(i % 256) for i in range(4096))
+
+        start_time = time.time()
+        for i in range(100):
+            checksum = 0
+            for j in range(len(data)):
+                checksum ^= struct.unpack_from('B', data[j])[0]
+        loop_time = time.time() - start_time
+
+        start_time = time.time()
+        for i in range(100):
+            self.assertEqual(xor_checksum(data), checksum)
+        fold_time = time.time() - start_time
+
+        log.info("4KB checksum: byte loop %f ms, folded %f ms", loop_time * 10, fold_time * 10)
+
+
+@attr('UNIT', group='mi')
+class PAClientBatchThroughputTestCase(MiUnitTest):
+    """
+    Compare per packet and batch delivery of packets sent through the port
+    agent simulator.
+    """
+    PACKET_COUNT = 20000
+
+    def _build_stream(self):
+        packets = []
+        for i in range(self.PACKET_COUNT):
+            data = "SATPAR0229,10.01,22067%05d,234\r\n" % i
+            header = bytearray(struct.pack('>BBBBHHII', 0xa3, 0x9d, 0x7a,
+                                           PortAgentPacket.DATA_FROM_INSTRUMENT,
+                                           len(data) + HEADER_SIZE, 0, 3590000000, i))
+            packets.append(str(header) + data)
+        return "".join(packets)
+
+    def _ingest(self, batch):
+        """
+        Push the packet stream through a PortAgentClient
+        @retval (data of the packets received in order, number of data callbacks)
+        """
+        received = []
+        callbacks = []
+
+        def got_data(packets):
+            if not isinstance(packets, list):
+                packets = [packets]
+            callbacks.append(len(packets))
+            received.extend(packet.get_data() for packet in packets)
+
+        server = TCPSimulatorServer()
+        self.addCleanup(server.close)
+        client = PortAgentClient('localhost', server.port, None)
+        client.init_comms(got_data, lambda packets: None, Mock(), Mock(), batch=batch)
+        self.addCleanup(client.stop_comms)
+
+        start_time = time.time()
+        server.send(self._build_stream())
+        while len(received) < self.PACKET_COUNT and time.time() < start_time + 60:
+            time.sleep(.01)
+        elapsed = time.time() - start_time
+
+        log.info("batch=%s: %d packets in %d callbacks, %f packets/sec",
+                 batch, len(received), len(callbacks), len(received) / elapsed)
+        return (received, len(callbacks))
+
+    def test_batch_throughput(self):
+        """
+        Batch delivery hands on the same packets, in order, in fewer callbacks
+        """
+        (single_received, single_callbacks) = self._ingest(False)
+        (batch_received, batch_callbacks) = self._ingest(True)
+
+        self.assertEqual(len(single_received), self.PACKET_COUNT)
+        self.assertEqual(batch_received, single_received)
+        self.assertEqual(single_callbacks, self.PACKET_COUNT)
+        self.assertLess(batch_callbacks, self.PACKET_COUNT)
+
+
 @attr('INT', group='mi')
 class PAClientIntTestCase(InstrumentDriverTestCase):
     def initialize(cls, *args, **kwargs):
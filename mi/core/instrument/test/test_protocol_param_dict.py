@@ -23,6 +23,7 @@ from mi.core.instrument.protocol_param_dict import ParameterDictVisibility
 from mi.core.instrument.protocol_param_dict import ParameterDictType
 from mi.core.instrument.protocol_param_dict import ParameterDictKey
 from mi.core.instrument.protocol_param_dict import Parameter, FunctionParameter, RegexParameter
+from mi.core.instrument.protocol_param_dict import required_literal, leading_literal
 
 @attr('UNIT', group='mi')
 class TestUnitProtocolParameterDict(TestUnitStringsDict):
@@ -653,3 +654,79 @@ bar=200, baz=300
         self.assertEqual(new_dict["baz"][ParameterDictKey.DISPLAY_NAME], "Baz")
         
         self.assertTrue('extra_param' not in new_dict)
+
+    def test_required_literal(self):
+        """
+        Test finding the literal text every match of a regex contains
+        """
+        self.assertEqual(required_literal(re.compile(r'vbatt = (\d+\.\d), vlith')), 'vbatt = ')
+        self.assertEqual(required_literal(re.compile(r'(\d+) (?:samples?|scans) = (\d+)')), ' = ')
+        self.assertEqual(required_literal(re.compile(r'(?:TC )+(\d+) ---')), ' ---')
+        self.assertEqual(required_literal(re.compile(r'TB ?(\d\d):(\d\d)')), 'TB')
+        self.assertIsNone(required_literal(re.compile(r'pump = (yes|no)', re.IGNORECASE)))
+        self.assertIsNone(required_literal(re.compile(r'yes|no')))
+        self.assertIsNone(required_literal(re.compile(r'(\d+)')))
+
+    def test_leading_literal(self):
+        """
+        Test finding the literal text every match of a regex starts with
+        """
+        self.assertEqual(leading_literal(re.compile(r'CPU\.load=(-?\d+\.\d+)')), 'CPU.load=')
+        self.assertEqual(leading_literal(re.compile(r'STATUS.msg_cnts=(\d+)')), 'STATUS')
+        self.assertEqual(leading_literal(re.compile(r'TB ?(\d\d)')), 'TB')
+        self.assertEqual(leading_literal(re.compile(r'^vbatt = (\d+)')), '')
+        self.assertEqual(leading_literal(re.compile(r'pump = (yes|no)', re.IGNORECASE)), '')
+        self.assertEqual(leading_literal(re.compile(r'yes|no')), '')
+
+    def test_update_index(self):
+        """
+        Updating from a status dump through the literal index gives the same
+        results and values as trying every parameter on every line, with
+        fewer regex searches.
+        """
+        def build():
+            pd = ProtocolParameterDict()
+            for i in range(20):
+                pd.add("param%d" % i, r'param%d = (\d+)' % i,
+                       lambda match : int(match.group(1)), str)
+            # no literal every match needs, so tried on every line
+            pd.add("pump", r'pump = (yes|no)',
+                   lambda match : match.group(1).lower(), str,
+                   regex_flags=re.IGNORECASE)
+            return pd
+
+        def count_updates(pd, calls):
+            def counted(update):
+                def update_counted(input):
+                    calls.append(input)
+                    return update(input)
+                return update_counted
+            for val in pd._param_dict.values():
+                val.update = counted(val.update)
+
+        def values(pd):
+            return dict((name, val.value.value) for (name, val) in pd._param_dict.iteritems())
+
+        lines = ["param%d = %d" % (i, i * 10) for i in range(20)] + ["PUMP = Yes", "no parameters here"]
+        (indexed, every) = (build(), build())
+        (indexed_calls, every_calls) = ([], [])
+        count_updates(indexed, indexed_calls)
+        count_updates(every, every_calls)
+
+        results = []
+        for line in lines:
+            found = False
+            for val in every._param_dict.values():
+                if val.update(line):
+                    found = True
+            results.append(found)
+        self.assertEqual([indexed.update(line) for line in lines], results)
+        self.assertEqual(results, [True] * 21 + [False])
+        self.assertEqual(values(indexed), values(every))
+        self.assertEqual(indexed.get("param7"), 70)
+        self.assertEqual(indexed.get("pump"), "yes")
+
+        # each line tries its own parameter and the pump regex, instead of
+        # all 21 parameters
+        self.assertEqual(len(every_calls), 21 * len(lines))
+        self.assertEqual(len(indexed_calls), 2 * 20 + 2)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_ring_buffer
+@file mi/core/instrument/test/test_ring_buffer.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief Test code for the fixed capacity ring buffer
+"""
+
+from nose.plugins.attrib import attr
+from mi.core.unit_test import MiUnitTest
+from mi.core.instrument.ring_buffer import RingBuffer
+
+
+@attr('UNIT', group='mi')
+class TestRingBuffer(MiUnitTest):
+
+    def test_append(self):
+        """
+        Test the buffer keeps the most recent bytes as it wraps around
+        """
+        buf = RingBuffer(8)
+        expected = ''
+        for data in ['abc', 'defgh', 'ij', '', 'klmnopq', 'rstuvwxyz0123', '4']:
+            buf.append(data)
+            expected = (expected + data)[-8:]
+            self.assertEqual(buf.getvalue(), expected)
+            self.assertEqual(len(buf), len(expected))
+
+        # unchanged contents are the same string object
+        self.assertIs(buf.getvalue(), buf.getvalue())
+        self.assertEqual(str(RingBuffer(4, 'abcdef')), 'cdef')
+        self.assertRaises(ValueError, RingBuffer, 0)
+
+    def test_clear(self):
+        """
+        Test clearing, replacing and resizing the buffer
+        """
+        buf = RingBuffer(6, 'abcdefgh')
+        buf.append('ijk')
+        self.assertEqual(buf.getvalue(), 'fghijk')
+        buf.set('xyz')
+        self.assertEqual(buf.getvalue(), 'xyz')
+        buf.clear()
+        self.assertEqual(len(buf), 0)
+
+        buf.set('abcdef')
+        buf.resize(3)
+        self.assertEqual((buf.capacity, buf.getvalue()), (3, 'def'))
+        buf.resize(5)
+        buf.append('gh')
+        self.assertEqual(buf.getvalue(), 'defgh')
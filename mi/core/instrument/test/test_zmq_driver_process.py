@@ -12,9 +12,18 @@ __license__ = 'Apache 2.0'
 
 from gevent import monkey; monkey.patch_all()
 
+import os
+import sys
+import json
 import time
+import cPickle as pickle
+import uuid
 import unittest
 import logging
+from subprocess import Popen
+from threading import Event
+
+import zmq
 
 from nose.plugins.attrib import attr
 
@@ -22,11 +31,30 @@ from pyon.util.unit_test import PyonTestCase
 
 from mi.core.instrument.zmq_driver_client import ZmqDriverClient
 from mi.core.instrument.zmq_driver_process import ZmqDriverProcess
+from mi.core.instrument.event_encoding import EventFormat, available_formats, encode_events
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
+from mi.core.exceptions import InstrumentTimeoutException
 import mi.core.mi_logger
+from mi.core.log import get_logger ; log = get_logger()
 from mi.core.unit_test import MiTestCase
 
 mi_logger = logging.getLogger('mi_logger')
 
+# Runs a driver process without the process entry point or a driver, which
+# both need the logging configuration from an installed egg. The commands
+# the process handles itself don't need a driver.
+DRIVER_PROCESS_SCRIPT = """
+import time
+from mi.core.instrument.zmq_driver_process import ZmqDriverProcess
+from mi.core.instrument.event_encoding import available_formats, encode_events
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
+dp = ZmqDriverProcess(None, None, '%s', '%s', %d)
+dp.start_messaging()
+while dp.messaging_started and dp.check_parent():
+    time.sleep(.1)
+dp.stop_messaging()
+"""
+
 #from pyon.public import log
 
 # Make tests verbose and provide stdout
@@ -101,6 +129,124 @@ class TestZmqDriverProcess(MiTestCase):
         pass
     
     
+    def test_messaging_performance(self):
+        """
+        Measure command round trip latency, and event throughput and size
+        in each event format, between a driver process and a client in this
+        process.
+        """
+        tag = str(uuid.uuid4())
+        cmd_port_fname = '/tmp/dvr_cmd_port_%s.txt' % tag
+        evt_port_fname = '/tmp/dvr_evt_port_%s.txt' % tag
+        script = DRIVER_PROCESS_SCRIPT % (cmd_port_fname, evt_port_fname, os.getpid())
+        driver_process = Popen([sys.executable, '-c', script], close_fds=True)
+        self.addCleanup(driver_process.wait)
+
+        for i in range(300):
+            if driver_process.poll() is not None:
+                break
+            if os.path.exists(cmd_port_fname) and os.path.exists(evt_port_fname):
+                break
+            time.sleep(.1)
+        self.assertIsNone(driver_process.poll())
+        cmd_port = ZmqDriverProcess.read_port_file(cmd_port_fname)
+        evt_port = ZmqDriverProcess.read_port_file(evt_port_fname)
+
+        received = []
+        done = Event()
+        expected = [None]
+
+        def evt_callback(evt):
+            received.append(evt)
+            if len(received) == expected[0]:
+                done.set()
+
+        driver_client = ZmqDriverClient(self.host, cmd_port, evt_port)
+        driver_client.start_messaging(evt_callback)
+        self.addCleanup(driver_client.done)
+
+        # events published before the subscription reaches the driver
+        # process are dropped, so wait until one gets through
+        expected[0] = 1
+        for i in range(50):
+            driver_client.cmd_dvr('test_events', events=['ready'])
+            if done.wait(.1):
+                break
+        self.assertTrue(done.is_set())
+
+        count = 200
+        start_time = time.time()
+        replies = [driver_client.cmd_dvr('process_echo') for i in range(count)]
+        latency = (time.time() - start_time) / count
+
+        log.info('Driver command round trip %.4f seconds', latency)
+        self.assertEqual(len(replies), count)
+        for reply in replies:
+            self.assertTrue(reply.startswith('ping from resource'))
+
+        value = json.dumps({'stream_name': 'parsed', 'pkt_format_id': 'JSON_Data', 'pkt_version': 1,
+                            'port_timestamp': 3600000000.0, 'driver_timestamp': 3600000000.5,
+                            'preferred_timestamp': 'port_timestamp', 'quality_flag': 'ok',
+                            'values': [{'value_id': 'temp', 'value': 22.5432},
+                                       {'value_id': 'conductivity', 'value': 0.00123},
+                                       {'value_id': 'pressure', 'value': 1.204}]})
+        events = [{'type': DriverAsyncEvent.SAMPLE, 'value': value, 'time': 3600000000.0 + i}
+                  for i in range(20000)]
+
+        rates = {}
+        sizes = {}
+        for event_format in [None] + available_formats():
+            if event_format is None:
+                size = len(pickle.dumps(events[0], pickle.HIGHEST_PROTOCOL))
+            else:
+                self.assertEqual(driver_client.set_event_format([event_format]), event_format)
+                frames = encode_events(event_format, events[:100])
+                size = sum(len(frame) for frame in frames) / 100.0
+
+            del received[:]
+            done.clear()
+            expected[0] = len(events)
+            start_time = time.time()
+            driver_client.cmd_dvr('test_events', events=events)
+            done.wait(60)
+            rates[event_format] = len(received) / (time.time() - start_time)
+            sizes[event_format] = size
+
+            log.info('%s events: %d per second, %d bytes per event',
+                     event_format or 'Unbatched pickle', rates[event_format], size)
+            self.assertEqual(received, events)
+
+        # batches add only the frame naming the format to pickled events,
+        # and msgpack events are smaller than pickled ones
+        for event_format in available_formats():
+            self.assertLessEqual(sizes[event_format], sizes[None] + len(event_format) / 100.0)
+        if EventFormat.MSGPACK in sizes:
+            self.assertLess(sizes[EventFormat.MSGPACK], sizes[None])
+
+    def test_cmd_timeout(self):
+        """
+        Test a command to a driver process that never replies times out,
+        and the client can still send commands afterwards.
+        """
+        context = zmq.Context()
+        self.addCleanup(context.term)
+        sock = context.socket(zmq.REP)
+        self.addCleanup(sock.close, linger=0)
+        cmd_port = sock.bind_to_random_port('tcp://127.0.0.1')
+        evt_sock = context.socket(zmq.PUB)
+        self.addCleanup(evt_sock.close, linger=0)
+        evt_port = evt_sock.bind_to_random_port('tcp://127.0.0.1')
+
+        driver_client = ZmqDriverClient('127.0.0.1', cmd_port, evt_port, cmd_timeout=1)
+        driver_client.start_messaging()
+        self.addCleanup(driver_client.stop_messaging)
+
+        for i in range(2):
+            self.assertRaises(InstrumentTimeoutException, driver_client.cmd_dvr, 'process_echo')
+            self.assertEqual(sock.recv_pyobj()['cmd'], 'process_echo')
+            # the REP socket has to reply before it can receive again
+            sock.send_pyobj('too late')
+
     def test_number_2(self):
         """
         """
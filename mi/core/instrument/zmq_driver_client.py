@@ -18,17 +18,44 @@ c = zdc.ZmqDriverClient('localhost', 5556, 5557)
 """
 
 import thread
-import logging
 import time
+import logging
+import cPickle as pickle
 
-# We import "regular" zmq, not the patched version because
-# we handle the nonblocking sockets directly as they need to work
-# with unpatched threads as well.
 import zmq
 
 from mi.core.instrument.driver_client import DriverClient
+from mi.core.instrument.event_encoding import available_formats, decode_events
+from mi.core.instrument.zmq_driver_process import EVENT_HWM
+from mi.core.exceptions import InstrumentTimeoutException
 from mi.core.log import get_logger ; log = get_logger()
 
+# How often, in milliseconds, the event thread checks its stop flag and
+# a command waiting for a reply logs that it is still waiting.
+STOP_POLL_INTERVAL = 500
+
+# Default time, in seconds, to wait for the reply to a driver command
+# before giving up on the driver process.
+CMD_TIMEOUT = 600
+
+
+def _get_zmq():
+    """
+    Get the zmq module to make sockets with. The client runs in threads
+    here, but in the agent gevent has patched them into greenlets and a
+    blocking wait on a regular zmq socket would stall every greenlet in
+    the process, so use the gevent aware sockets there.
+    @retval zmq or zmq.green
+    """
+    try:
+        import gevent.thread
+    except ImportError:
+        return zmq
+    if thread.start_new_thread is gevent.thread.start_new_thread:
+        from zmq import green
+        return green
+    return zmq
+
  
 class ZmqDriverClient(DriverClient):
     """
@@ -36,12 +63,15 @@ class ZmqDriverClient(DriverClient):
     thread for catching asynchronous driver events.
     """
     
-    def __init__(self, host, cmd_port, event_port):
+    def __init__(self, host, cmd_port, event_port, cmd_timeout=CMD_TIMEOUT):
         """
         Initialize members.
         @param host Host string address of the driver process.
         @param cmd_port Port number for the driver process command port.
         @param event_port Port number for the driver process event port.
+        @param cmd_timeout Seconds to wait for the reply to a command,
+        commands with a longer timeout or driver_timeout argument wait for
+        that long instead.
         """
         DriverClient.__init__(self)
         self.host = host
@@ -49,8 +79,10 @@ class ZmqDriverClient(DriverClient):
         self.event_port = event_port
         self.cmd_host_string = 'tcp://%s:%i' % (self.host, self.cmd_port)
         self.event_host_string = 'tcp://%s:%i' % (self.host, self.event_port)
+        self.cmd_timeout = cmd_timeout
         self.zmq_context = None
         self.zmq_cmd_socket = None
+        self.zmq_cmd_poller = None
         self.event_thread = None
         self.stop_event_thread = True
         
@@ -61,9 +93,9 @@ class ZmqDriverClient(DriverClient):
         and starts event thread that listens for events from the driver
         process independently of command request-reply.
         """
-        self.zmq_context = zmq.Context()
-        self.zmq_cmd_socket = self.zmq_context.socket(zmq.REQ)
-        self.zmq_cmd_socket.connect(self.cmd_host_string)
+        zmq_module = _get_zmq()
+        self.zmq_context = zmq_module.Context()
+        self._connect_cmd_socket()
         log.info('Driver client cmd socket connected to %s.' %
                        self.cmd_host_string)        
         self.evt_callback = evt_callback
@@ -74,27 +106,38 @@ class ZmqDriverClient(DriverClient):
             driver events. Can be run as a thread or greenlet.
             @param driver_client The client object that launches the thread.
             """
-            context = zmq.Context()
+            context = zmq_module.Context()
             sock = context.socket(zmq.SUB)
+            # leave room for bursts of events, see the driver process PUB socket
+            sock.setsockopt(zmq.RCVHWM, EVENT_HWM)
             sock.connect(driver_client.event_host_string)
             sock.setsockopt(zmq.SUBSCRIBE, '')
             log.info('Driver client event thread connected to %s.' %
                   driver_client.event_host_string)
 
+            poller = zmq_module.Poller()
+            poller.register(sock, zmq.POLLIN)
+
             driver_client.stop_event_thread = False
-            #last_time = time.time()
             while not driver_client.stop_event_thread:
-                try:
-                    evt = sock.recv_pyobj(flags=zmq.NOBLOCK)
-                    log.debug('got event: %s' % str(evt))
-                    if driver_client.evt_callback:
-                        driver_client.evt_callback(evt)
-                except zmq.ZMQError:
-                    time.sleep(.5)
-                #cur_time = time.time()
-                #if cur_time - last_time > 5:
-                #    log.info('event thread listening')
-                #    last_time = cur_time
+                if not poller.poll(STOP_POLL_INTERVAL):
+                    continue
+                # handle everything that has arrived before polling again
+                while True:
+                    try:
+                        frames = sock.recv_multipart(flags=zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+                    # a single frame is one pickled event, more are a batch
+                    # in the format named by the first frame
+                    if len(frames) == 1:
+                        evts = [pickle.loads(frames[0])]
+                    else:
+                        evts = decode_events(frames)
+                    for evt in evts:
+                        log.debug('got event: %s', evt)
+                        if driver_client.evt_callback:
+                            driver_client.evt_callback(evt)
             sock.close()
             context.term()
             log.info('Client event socket closed.')
@@ -111,6 +154,7 @@ class ZmqDriverClient(DriverClient):
         
         self.zmq_cmd_socket.close()
         self.zmq_cmd_socket = None
+        self.zmq_cmd_poller = None
         self.zmq_context.term()
         self.zmq_context = None
         self.stop_event_thread = True                    
@@ -119,50 +163,76 @@ class ZmqDriverClient(DriverClient):
         self.evt_callback = None
         log.info('Driver client messaging closed.')        
     
+    def _connect_cmd_socket(self):
+        """
+        Open the command socket and its poller, closing the old socket
+        first if there is one.
+        """
+        if self.zmq_cmd_socket is not None:
+            self.zmq_cmd_socket.close(linger=0)
+        self.zmq_cmd_socket = self.zmq_context.socket(zmq.REQ)
+        self.zmq_cmd_socket.connect(self.cmd_host_string)
+        self.zmq_cmd_poller = _get_zmq().Poller()
+        self.zmq_cmd_poller.register(self.zmq_cmd_socket, zmq.POLLIN)
+
     def cmd_dvr(self, cmd, *args, **kwargs):
         """
         Command a driver by request-reply messaging. Package command
-        message and send on blocking command socket. Block on same socket
-        to receive the reply. Return the driver reply.
+        message and send on the command socket, then block polling the
+        same socket for the reply. Return the driver reply.
         @param cmd The driver command identifier.
         @param args Positional arguments of the command.
         @param kwargs Keyword arguments of the command.
         @retval Command result.
+        @throw InstrumentTimeoutException if the driver process does not
+        reply in time, e.g. because it has died.
         """
         # Package command dictionary.
         msg = {'cmd':cmd,'args':args,'kwargs':kwargs}
         
-        log.debug('Sending command %s.' % str(msg))
-        while True:
-            try:
-                # Attempt command send. Retry if necessary.
-                self.zmq_cmd_socket.send_pyobj(msg)
-                if msg == 'stop_driver_process':
-                    return 'driver stopping'
-
-                # Command sent, break out and wait for reply.
-                break    
-
-            except zmq.ZMQError:
-                # Socket not ready to accept send. Sleep and retry later.
-                time.sleep(.5)
-            
+        log.debug('Sending command %s.', msg)
+        self.zmq_cmd_socket.send_pyobj(msg)
+        if msg == 'stop_driver_process':
+            return 'driver stopping'
+
         log.debug('Awaiting reply.')
-        while True:
-            try:
-                # Attempt reply recv. Retry if necessary.
-                reply = self.zmq_cmd_socket.recv_pyobj(flags=zmq.NOBLOCK)
-                # Reply recieved, break and return.
-                break
-
-            except zmq.ZMQError:
-                # Socket not ready with the reply. Sleep and retry later.
-                time.sleep(.5)
-                
-        log.debug('Reply: %s.' % str(reply))
+        timeout = max(self.cmd_timeout, kwargs.get('timeout') or 0, kwargs.get('driver_timeout') or 0)
+        deadline = time.time() + timeout
+        while not self.zmq_cmd_poller.poll(STOP_POLL_INTERVAL):
+            if time.time() > deadline:
+                # a REQ socket can't send again until it gets a reply, so
+                # start over with a new one for the next command
+                self._connect_cmd_socket()
+                raise InstrumentTimeoutException('No reply from driver process to %s in %s seconds' %
+                                                 (cmd, timeout))
+            log.debug('Still awaiting reply to %s.', cmd)
+        reply = self.zmq_cmd_socket.recv_pyobj()
+
+        log.debug('Reply: %s.', reply)
         
         if isinstance(reply, Exception):
             raise reply
         else:
             return reply
-    
+
+    def set_event_format(self, formats=None, **kwargs):
+        """
+        Ask the driver process to send events in a more compact format,
+        batching them into fewer messages. Events are passed to the
+        callback as before.
+        @param formats list of EventFormat values to choose from, in order
+            of preference, defaults to all the formats available here.
+        @param kwargs batch_size and batch_window, see
+            ZmqDriverProcess.set_event_format.
+        @retval The format the driver process chose, or None if it is
+            sending events one per message.
+        """
+        if formats is None:
+            formats = available_formats()
+        reply = self.cmd_dvr('set_event_format', formats, **kwargs)
+        # driver processes that don't know the command reply with an
+        # error triple
+        if reply not in formats:
+            log.info('Driver process did not set an event format: %s', reply)
+            return None
+        return reply
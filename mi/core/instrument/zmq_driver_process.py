@@ -17,7 +17,7 @@ p = zdp.ZmqDriverProcess.launch_process(5556, 5557, 'ion.services.mi.drivers.sbe
 
 """
 
-from threading import Thread
+from threading import Thread, Lock
 from subprocess import Popen
 import os
 import time
@@ -31,9 +31,27 @@ from ooi.exception import ApplicationException
 from mi.core.exceptions import InstrumentException, UnexpectedError
 
 import mi.core.instrument.driver_process as driver_process
+from mi.core.instrument.event_encoding import available_formats, encode_events
 from mi.core.log import get_logger
 log = get_logger()
 
+# How often, in milliseconds, the messaging threads check their stop flags
+# while there is nothing to do.
+STOP_POLL_INTERVAL = 500
+
+# Driver threads queueing events wake the event thread through this socket.
+EVENT_WAKEUP_ENDPOINT = 'inproc://driver-event-wakeup'
+
+# Default largest number of events sent in one message once a client has
+# chosen an event format.
+EVENT_BATCH_SIZE = 100
+
+# Most event messages queued on the event sockets for a client. zmq's
+# default of 1000 drops events in a burst, this is enough for bursts of
+# tens of thousands without letting a client that stops reading use up
+# the memory of the driver process.
+EVENT_HWM = 100000
+
 def _encode_exception(reply):
     if isinstance(reply, InstrumentException):
         # InstrumentExceptions have corresponding IonException error code built-in
@@ -78,28 +96,33 @@ class ZmqDriverProcess(driver_process.DriverProcess):
                 
         # Call base class launch method.
         dvr_proc = driver_process.DriverProcess.launch_process(cmd_str)
+        dvr_cmd_port = cls.read_port_file(cmd_port_fname)
+        dvr_evt_port = cls.read_port_file(evt_port_fname)
+
+        return (dvr_proc, dvr_cmd_port, dvr_evt_port)
+
+    @staticmethod
+    def read_port_file(port_fname):
+        """
+        Wait for a driver process to write the port it bound a socket to,
+        then read and remove the port file.
+        @param port_fname Filename of the temp port file.
+        @retval The port number.
+        """
         while True:
-            try:                
-                cmd_port_file = file(cmd_port_fname, 'r')
-                dvr_cmd_port = int(cmd_port_file.read().strip())
-                cmd_port_file.close()
-                os.remove(cmd_port_fname)
-                break
-            
-            except IOError:
-                time.sleep(.1)
-        while True:
-            try:                
-                evt_port_file = file(evt_port_fname, 'r')
-                dvr_evt_port = int(evt_port_file.read().strip())
-                evt_port_file.close()
-                os.remove(evt_port_fname)
-                break
-            
+            try:
+                port_file = file(port_fname, 'r')
+                port = port_file.read().strip()
+                port_file.close()
+                # the file is created before the port is written into it
+                if port:
+                    os.remove(port_fname)
+                    return int(port)
+
             except IOError:
-                time.sleep(.1)
+                pass
 
-        return (dvr_proc, dvr_cmd_port, dvr_evt_port)
+            time.sleep(.1)
         
     def __init__(self, driver_module, driver_class, cmd_port_fname, evt_port_fname, ppid):
         """
@@ -122,14 +145,21 @@ class ZmqDriverProcess(driver_process.DriverProcess):
         self.stop_evt_thread = True
         self.cmd_thread = None
         self.stop_cmd_thread = True
-        
+        self._wakeup_sock = None
+        self._wakeup_lock = Lock()
+        # until a client sets a format each event is pickled into its own
+        # message, which is what older clients expect
+        self.event_format = None
+        self.event_batch_size = 1
+        self.event_batch_window = 0
+
     def start_messaging(self):
         """
         Initialize and start messaging resources for the driver, blocking
         until messaging terminates. This ZMQ implementation starts and
-        joins command and event threads, managing nonblocking send/recv calls
-        on REP and PUB sockets, respectively. Terminate loops and close
-        sockets when stop flag is set in driver process.
+        joins command and event threads, which block in zmq polls on REP
+        and PUB sockets respectively. Terminate loops and close sockets
+        when stop flag is set in driver process.
         """
         def recv_cmd_msg(zmq_driver_process):
             """
@@ -143,27 +173,23 @@ class ZmqDriverProcess(driver_process.DriverProcess):
                            zmq_driver_process.cmd_port)
             file(zmq_driver_process.cmd_port_fname,'w+').write(str(zmq_driver_process.cmd_port)+'\n')
 
+            poller = zmq.Poller()
+            poller.register(sock, zmq.POLLIN)
+
             zmq_driver_process.stop_cmd_thread = False
             while not zmq_driver_process.stop_cmd_thread:
-                try:
-                    msg = sock.recv_pyobj(flags=zmq.NOBLOCK)
-                    #log.trace('Processing message %s', msg)
-                    reply = zmq_driver_process.cmd_driver(msg)
-                    # if operation raised exception, encode as triple
-                    if isinstance(reply, Exception):
-                        reply = _encode_exception(reply)
-                    # send, send, and resend
-                    while True:
-                        try:
-                            sock.send_pyobj(reply, flags=zmq.NOBLOCK)
-                            break
-                        except zmq.ZMQError:
-                            time.sleep(.1)
-                            if zmq_driver_process.stop_cmd_thread:
-                                break
-                except zmq.ZMQError:
-                    time.sleep(.1)
-                
+                if not poller.poll(STOP_POLL_INTERVAL):
+                    continue
+                msg = sock.recv_pyobj()
+                #log.trace('Processing message %s', msg)
+                reply = zmq_driver_process.cmd_driver(msg)
+                # if operation raised exception, encode as triple
+                if isinstance(reply, Exception):
+                    reply = _encode_exception(reply)
+                # a REP socket can always send the reply to the request
+                # it just received
+                sock.send_pyobj(reply)
+
             sock.close()
             context.term()
             log.info('Driver process cmd socket closed.')
@@ -175,29 +201,69 @@ class ZmqDriverProcess(driver_process.DriverProcess):
             """
             context = zmq.Context()
             sock = context.socket(zmq.PUB)
+            # a PUB socket drops messages past its high water mark, leave
+            # room for bursts of events
+            sock.setsockopt(zmq.SNDHWM, EVENT_HWM)
             zmq_driver_process.evt_port = sock.bind_to_random_port(zmq_driver_process.event_host_string)
             log.info('Driver process event socket bound to %i', zmq_driver_process.evt_port)
             file(zmq_driver_process.evt_port_fname,'w+').write(str(zmq_driver_process.evt_port)+'\n')
 
+            wakeup = context.socket(zmq.PULL)
+            wakeup.bind(EVENT_WAKEUP_ENDPOINT)
+            with zmq_driver_process._wakeup_lock:
+                zmq_driver_process._wakeup_sock = context.socket(zmq.PUSH)
+                zmq_driver_process._wakeup_sock.connect(EVENT_WAKEUP_ENDPOINT)
+
+            poller = zmq.Poller()
+            poller.register(wakeup, zmq.POLLIN)
+
+            def drain_wakeups():
+                # Every event queued before a wakeup was sent is in the
+                # queue now, so drain all the pending wakeups at once.
+                while True:
+                    try:
+                        wakeup.recv(flags=zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+
+            def next_event():
+                evt = events.popleft()
+                #log.trace('Event thread sending event %s',evt)
+                if isinstance(evt, Exception):
+                    evt = _encode_exception(evt)
+                return evt
+
+            events = zmq_driver_process.events
             zmq_driver_process.stop_evt_thread = False
             while not zmq_driver_process.stop_evt_thread:
-                try:
-                    evt = zmq_driver_process.events.pop(0)
-                    #log.trace('Event thread sending event %s',evt)
-                    while evt:
-                        try:
-                            if isinstance(evt, Exception):
-                                evt = _encode_exception(evt)
-                            sock.send_pyobj(evt, flags=zmq.NOBLOCK)
-                            evt = None
-                            log.trace('Event sent!')
-                        except zmq.ZMQError:
-                            time.sleep(.1)
-                            if zmq_driver_process.stop_evt_thread:
-                                break
-                except IndexError:
-                    time.sleep(.1)
+                while events:
+                    event_format = zmq_driver_process.event_format
+                    if event_format is None:
+                        sock.send_pyobj(next_event())
+                        continue
 
+                    # Send what is queued as one message, waiting up to the
+                    # batch window for more events to arrive.
+                    batch = [next_event()]
+                    batch_size = zmq_driver_process.event_batch_size
+                    deadline = time.time() + zmq_driver_process.event_batch_window
+                    while len(batch) < batch_size:
+                        if events:
+                            batch.append(next_event())
+                            continue
+                        remaining = deadline - time.time()
+                        if remaining <= 0 or not poller.poll(remaining * 1000):
+                            break
+                        drain_wakeups()
+                    sock.send_multipart(encode_events(event_format, batch))
+
+                if poller.poll(STOP_POLL_INTERVAL):
+                    drain_wakeups()
+
+            with zmq_driver_process._wakeup_lock:
+                zmq_driver_process._wakeup_sock.close()
+                zmq_driver_process._wakeup_sock = None
+            wakeup.close()
             sock.close()
             context.term()
             log.info('Driver process event socket closed')
@@ -207,7 +273,57 @@ class ZmqDriverProcess(driver_process.DriverProcess):
         self.cmd_thread.start()        
         self.evt_thread.start()
         self.messaging_started = True
-    
+
+    def cmd_driver(self, msg):
+        """
+        Process a command message, handling 'set_event_format' here and
+        passing everything else to the base class.
+        @param msg A driver command message.
+        @retval The driver command result.
+        """
+        if msg.get('cmd', None) == 'set_event_format':
+            return self.set_event_format(*msg.get('args', ()), **msg.get('kwargs', {}))
+        return driver_process.DriverProcess.cmd_driver(self, msg)
+
+    def set_event_format(self, formats, batch_size=EVENT_BATCH_SIZE, batch_window=0):
+        """
+        Choose how events are sent to the client. Events are then sent in
+        batches, each one multipart message in the chosen format.
+        @param formats list of EventFormat values the client can decode, in
+            order of preference.
+        @param batch_size Largest number of events to send in one message.
+        @param batch_window Seconds to wait for more events to fill a batch,
+            0 to only batch events that are already queued.
+        @retval The chosen format, or None if none of formats are available,
+            in which case events are sent one per message as before.
+        """
+        for event_format in formats:
+            if event_format in available_formats():
+                break
+        else:
+            event_format = None
+
+        self.event_batch_size = max(int(batch_size), 1)
+        self.event_batch_window = max(float(batch_window), 0)
+        self.event_format = event_format
+        log.info('Driver process sending events as %s, batch size %d, window %s seconds',
+                 event_format, self.event_batch_size, self.event_batch_window)
+        return event_format
+
+    def notify_events(self):
+        """
+        Wake the event thread to send newly queued events. Safe to call
+        from any thread.
+        """
+        with self._wakeup_lock:
+            if self._wakeup_sock is not None:
+                try:
+                    self._wakeup_sock.send('', flags=zmq.NOBLOCK)
+                except zmq.Again:
+                    # the wakeup queue is full, so the event thread already
+                    # has wakeups to process
+                    pass
+
     def stop_messaging(self):
         """
         Close messaging resource for the driver. Set flags to cause
@@ -215,6 +331,7 @@ class ZmqDriverProcess(driver_process.DriverProcess):
         """
         self.stop_cmd_thread = True
         self.stop_evt_thread = True
+        self.notify_events()
         self.messaging_started = False
     
     def shutdown(self):
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 
+import time
+
 import _brttpkt as _brttpkt
 
 class OrbReapThrError(Exception): pass
@@ -52,6 +54,33 @@ class OrbReapThr(object):
             raise GetError()
         return pktid, srcname, pkttime, pkt
 
+    def get_many(self, maxpkts, budget=None):
+        """Get up to maxpkts queued packets, stopping early once the queue is
+        empty or budget seconds have passed.
+
+        Returns a list of (pktid, srcname, pkttime, pkt) tuples, empty if no
+        packets are queued. An error is only raised if no packets were got,
+        otherwise it is left for the next call.
+        """
+        pkts = []
+        if budget is not None:
+            deadline = time.time() + budget
+        orbreapthr_get = _brttpkt._orbreapthr_get
+        thread = self._thread
+        while len(pkts) < maxpkts:
+            rc, pktid, srcname, pkttime, pkt, nbytes = orbreapthr_get(thread)
+            if rc == _brttpkt.ORBREAPTHR_OK:
+                pkts.append((pktid, srcname, pkttime, pkt))
+                if budget is not None and time.time() >= deadline:
+                    break
+                continue
+            if rc in (_brttpkt.ORBREAPTHR_NODATA, _brttpkt.ORBREAPTHR_TIMEOUT) or pkts:
+                break
+            if rc == _brttpkt.ORBREAPTHR_STOPPED:
+                raise Stopped()
+            raise GetError()
+        return pkts
+
     def destroy(self):
         rc = _brttpkt._orbreapthr_destroy(self._thread)
         if rc < 0:
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+"""In memory stand-in for an Antelope ORB and its reap thread, for tests and
+benchmarks which don't have an orbserver to connect to.
+
+Packets put on a FakeOrb are reaped by any FakeOrbReapThr made with the
+FakeOrb's name, which has the OrbReapThr interface, so patching OrbReapThr
+with FakeOrbReapThr feeds a parser the FakeOrb's packets.
+
+Nothing here imports the compiled Antelope modules, so the exceptions raised
+are stand-ins with the same names as the brttpkt ones.
+"""
+
+import re
+import time
+
+
+class OrbReapThrError(Exception): pass
+class NoData(OrbReapThrError): pass
+class Stopped(OrbReapThrError): pass
+
+
+class FakeOrb(object):
+    orbs = {}
+
+    def __init__(self, orbname):
+        self.orbname = orbname
+        self.packets = []
+        FakeOrb.orbs[orbname] = self
+
+    def put(self, srcname, pkttime, pkt):
+        """Put a packet on the ORB, returning its pktid."""
+        pktid = len(self.packets)
+        self.packets.append((pktid, srcname, pkttime, pkt))
+        return pktid
+
+    def close(self):
+        FakeOrb.orbs.pop(self.orbname, None)
+
+
+class FakeOrbReapThr(object):
+    def __init__(self, orbname, select=None, reject=None,
+                 tafter=-1, timeout=-1, queuesize=64):
+        if orbname not in FakeOrb.orbs:
+            raise OrbReapThrError()
+        self.orbname = orbname
+        self._orb = FakeOrb.orbs[orbname]
+        self._select = re.compile(select) if select else None
+        self._reject = re.compile(reject) if reject else None
+        self._tafter = tafter
+        self._next = 0
+        self._stopped = False
+        self.calls = 0
+
+    def _reap(self):
+        packets = self._orb.packets
+        while self._next < len(packets):
+            packet = packets[self._next]
+            self._next += 1
+            (pktid, srcname, pkttime, pkt) = packet
+            if pkttime <= self._tafter:
+                continue
+            if self._select and not self._select.match(srcname):
+                continue
+            if self._reject and self._reject.match(srcname):
+                continue
+            return packet
+        return None
+
+    def stop_and_wait(self):
+        self._stopped = True
+
+    def set_to_stop(self):
+        self._stopped = True
+
+    def is_stopped(self):
+        return self._stopped
+
+    def get(self):
+        self.calls += 1
+        if self._stopped:
+            raise Stopped()
+        packet = self._reap()
+        if packet is None:
+            raise NoData()
+        return packet
+
+    def get_many(self, maxpkts, budget=None):
+        self.calls += 1
+        if self._stopped:
+            raise Stopped()
+        if budget is not None:
+            deadline = time.time() + budget
+        pkts = []
+        while len(pkts) < maxpkts:
+            packet = self._reap()
+            if packet is None:
+                break
+            pkts.append(packet)
+            if budget is not None and time.time() >= deadline:
+                break
+        return pkts
+
+    def destroy(self):
+        self._stopped = True
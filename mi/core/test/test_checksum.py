@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+__author__ = 'Ocean Observatories Initiative <contactooici@oceanobservatories.org>'
+__license__ = 'Apache 2.0'
+
+import mmap
+import random
+import struct
+import time
+
+from mi.core.log import get_logger ; log = get_logger()
+
+from mi.core.checksum import crc16_x25, sum8, sum16_le
+from nose.plugins.attrib import attr
+from mi.core.unit_test import MiUnitTest
+
+
+def bitwise_crc16_x25(data):
+    """
+    Reference bit at a time CRC-16/X-25 the SIO parser used to compute
+    """
+    if len(data) == 0:
+        return 0
+    crc = 0xFFFF
+    for char in data:
+        crc ^= ord(char)
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0x8408
+            else:
+                crc >>= 1
+    return ~crc & 0xFFFF
+
+
+def ord_sum(data):
+    """
+    Reference byte at a time sum the PD0 sieve used to compute
+    """
+    total = 0
+    for i in range(0, len(data)):
+        total += ord(data[i])
+    return total & 0xFFFF
+
+
+def word_sum(data, seed=0):
+    """
+    Reference word at a time little endian sum the VEL3D-K WFP parser used
+    to compute
+    """
+    total = seed
+    for i in range(0, len(data) - 1, 2):
+        total += struct.unpack('<H', data[i:i + 2])[0]
+    return total & 0xFFFF
+
+
+@attr('UNIT', group='mi')
+class TestChecksum(MiUnitTest):
+    """
+    Test the checksum functions
+    """
+    def setUp(self):
+        rand = random.Random(42)
+        self.data = ''.join(chr(rand.randint(0, 255)) for _ in range(4096))
+
+    def test_crc16_x25(self):
+        """
+        Test the table driven crc against known values and the bitwise version
+        """
+        # standard CRC-16/X-25 check value
+        self.assertEqual(crc16_x25('123456789'), 0x906E)
+        self.assertEqual(crc16_x25(''), 0)
+        for size in (1, 2, 17, 512):
+            self.assertEqual(crc16_x25(self.data[:size]), bitwise_crc16_x25(self.data[:size]))
+
+        # offsets checksum in place
+        self.assertEqual(crc16_x25(self.data, 100, 300), bitwise_crc16_x25(self.data[100:300]))
+        self.assertEqual(crc16_x25(self.data, 100, 100), 0)
+        self.assertEqual(crc16_x25(bytearray(self.data), 5, 50), bitwise_crc16_x25(self.data[5:50]))
+        self.assertEqual(crc16_x25(memoryview(self.data), 5), bitwise_crc16_x25(self.data[5:]))
+
+    def test_sum8(self):
+        """
+        Test the byte sum
+        """
+        self.assertEqual(sum8(''), 0)
+        self.assertEqual(sum8('\x01\x02\xff'), 0x102)
+        self.assertEqual(sum8(self.data), ord_sum(self.data))
+        self.assertEqual(sum8(self.data, 10, 20), ord_sum(self.data[10:20]))
+        self.assertEqual(sum8(self.data, mask=0xFF), ord_sum(self.data) & 0xFF)
+        self.assertEqual(sum8(bytearray(self.data), 1000), ord_sum(self.data[1000:]))
+        self.assertEqual(sum8(memoryview(self.data), 1000), ord_sum(self.data[1000:]))
+
+    def test_sum16_le(self):
+        """
+        Test the little endian word sum
+        """
+        self.assertEqual(sum16_le('', seed=0xB58C), 0xB58C)
+        self.assertEqual(sum16_le('\x01\x00\x00\x01'), 0x101)
+        self.assertEqual(sum16_le('\xff\xff\x02\x00'), 0x1)
+        # trailing odd byte is ignored
+        self.assertEqual(sum16_le('\x01\x00\x05'), 1)
+
+        words = struct.unpack('<2048H', self.data)
+        self.assertEqual(sum16_le(self.data, seed=0xB58C), (0xB58C + sum(words)) & 0xFFFF)
+        self.assertEqual(sum16_le(self.data, 2, 10), sum(words[1:5]) & 0xFFFF)
+        self.assertEqual(sum16_le(self.data[:101], seed=0xB58C), word_sum(self.data[:101], 0xB58C))
+
+    def test_mmap(self):
+        """
+        Test checksums read straight out of a memory map
+        """
+        mapped = mmap.mmap(-1, len(self.data))
+        mapped.write(self.data)
+        try:
+            self.assertEqual(crc16_x25(mapped, 10, 90), bitwise_crc16_x25(self.data[10:90]))
+            self.assertEqual(sum8(mapped, 10, 90), ord_sum(self.data[10:90]))
+        finally:
+            mapped.close()
+
+    def test_performance(self):
+        """
+        Compare the table driven and buffer based checksums against the byte
+        at a time versions they replace
+        """
+        iterations = 50
+
+        def timed(func):
+            start = time.time()
+            for _ in range(iterations):
+                func(self.data)
+            return time.time() - start
+
+        old_crc = timed(bitwise_crc16_x25)
+        new_crc = timed(crc16_x25)
+        old_sum = timed(ord_sum)
+        new_sum = timed(sum8)
+        old_word_sum = timed(word_sum)
+        new_word_sum = timed(sum16_le)
+        log.info("crc16 bitwise %.4fs table %.4fs, byte sum ord %.4fs buffer %.4fs, "
+                 "word sum unpack %.4fs buffer %.4fs, %d x %d bytes",
+                 old_crc, new_crc, old_sum, new_sum, old_word_sum, new_word_sum,
+                 iterations, len(self.data))
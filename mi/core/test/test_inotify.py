@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+__author__ = 'Ocean Observatories Initiative <contactooici@oceanobservatories.org>'
+__license__ = 'Apache 2.0'
+
+import os
+import select
+import shutil
+import tempfile
+
+from mi.core.log import get_logger ; log = get_logger()
+
+from mi.core.inotify import DirectoryWatch, parse_events, inotify_available, EVENT_HEADER
+from mi.core.inotify import IN_CLOSE_WRITE, IN_MOVED_TO, IN_IGNORED
+from nose.plugins.attrib import attr
+from nose.plugins.skip import SkipTest
+from mi.core.unit_test import MiUnitTest
+
+
+@attr('UNIT', group='mi')
+class TestInotify(MiUnitTest):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def test_parse_events(self):
+        """
+        Test splitting raw inotify data into events, with and without names
+        """
+        data = EVENT_HEADER.pack(1, IN_CLOSE_WRITE, 0, 16) + 'file.txt'.ljust(16, '\0') + \
+               EVENT_HEADER.pack(1, IN_IGNORED, 0, 0)
+        self.assertEqual(parse_events(data), [(IN_CLOSE_WRITE, 'file.txt'), (IN_IGNORED, '')])
+        self.assertEqual(parse_events(''), [])
+
+    def test_watch(self):
+        """
+        Test files written and moved into a directory are reported
+        """
+        if not inotify_available():
+            raise SkipTest("inotify is not available")
+        watch = DirectoryWatch(self.directory)
+        self.addCleanup(watch.close)
+
+        # nothing happened yet, reading doesn't block
+        self.assertEqual(watch.read_events(), [])
+
+        with open(os.path.join(self.directory, 'a.txt'), 'w') as filehandle:
+            filehandle.write('data')
+        other = os.path.join(tempfile.gettempdir(), 'inotify_test_b.txt')
+        open(other, 'w').close()
+        os.rename(other, os.path.join(self.directory, 'b.txt'))
+
+        (readable, writeable, errors) = select.select([watch], [], [], 5)
+        self.assertEqual(readable, [watch])
+        self.assertEqual(watch.read_events(), [(IN_CLOSE_WRITE, 'a.txt'), (IN_MOVED_TO, 'b.txt')])
+
+        watch.close()
+        self.assertTrue(watch.closed)
+
+    def test_not_a_directory(self):
+        """
+        Test watching something that isn't a directory raises OSError
+        """
+        if not inotify_available():
+            raise SkipTest("inotify is not available")
+        self.assertRaises(OSError, DirectoryWatch, os.path.join(self.directory, 'missing'))
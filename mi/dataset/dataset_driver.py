@@ -11,11 +11,13 @@ __author__ = 'Steve Foley'
 __license__ = 'Apache 2.0'
 
 import os
+import time
 import gevent
 import shutil
-import hashlib
 import copy
 import traceback
+import multiprocessing
+import cPickle as pickle
 
 from mi.core.log import get_logger ; log = get_logger()
 from mi.core.exceptions import InstrumentParameterException
@@ -35,6 +37,8 @@ from mi.core.instrument.driver_dict import DriverDict
 from mi.core.instrument.protocol_param_dict import ParameterDictType
 from mi.core.instrument.protocol_param_dict import Parameter
 from mi.core.common import BaseEnum
+from mi.dataset.mapped_file import MappedFile
+from mi.dataset.file_fingerprint import FINGERPRINTS
 
 class DataSourceConfigKey(BaseEnum):
     HARVESTER = 'harvester'
@@ -51,6 +55,7 @@ class DriverStateKey(BaseEnum):
     INGESTED = 'ingested'
     PARSER_STATE = 'parser_state'
     MODIFIED_STATE = 'modified_state'
+    DELTA = 'delta'
 
 # Driver parameters.
 class DriverParameter(BaseEnum):
@@ -58,10 +63,42 @@ class DriverParameter(BaseEnum):
     RECORDS_PER_SECOND = 'records_per_second'
     PUBLISHER_POLLING_INTERVAL = 'publisher_polling_interval'
     BATCHED_PARTICLE_COUNT = 'batched_particle_count'
+    PARSER_WORKERS = 'parser_workers'
+    STATE_COMMIT_COUNT = 'state_commit_count'
+    STATE_COMMIT_INTERVAL = 'state_commit_interval'
+    STATE_DELTA = 'state_delta'
+    INGESTED_STATE_LIMIT = 'ingested_state_limit'
 
 class HarvesterType(BaseEnum):
     SINGLE_DIRECTORY = 'single_directory'
     SINGLE_FILE = 'single_file'
+    # a single directory harvester driven by inotify events rather than polling
+    INOTIFY_DIRECTORY = 'inotify_directory'
+
+class ParseRecordType(BaseEnum):
+    """
+    What a parser pool worker recorded while parsing a file, replayed by the
+    driver in the order it was recorded
+    """
+    DATA = 'data'
+    EVENT = 'event'
+    STATE = 'state'
+    EXCEPTION = 'exception'
+    RAISE = 'raise'
+
+# seconds between checks for a file parsed by a parser pool worker
+PARSER_POOL_POLL_INTERVAL = 0.1
+
+# the driver a parser pool worker process parses files for, inherited when the
+# pool forks so the driver itself is never pickled
+_pool_driver = None
+
+def _init_parser_worker(driver):
+    global _pool_driver
+    _pool_driver = driver
+
+def _parse_in_worker(*args):
+    return _pool_driver._record_parse(*args)
 
 class DataSourceLocation(object):
     """
@@ -115,6 +152,10 @@ class DataSetDriverConfigKeys(BaseEnum):
     CLASS = "class"
     URI = "uri"
     CLASS_ARGS = "class_args"
+    READ_SIZE = "read_size"
+    HIGH_WATER_MARK = "high_water_mark"
+    MEMORY_MAP = "memory_map"
+    HARVESTER_TYPE = "harvester_type"
 
 class DataSetDriver(object):
     """
@@ -145,6 +186,11 @@ class DataSetDriver(object):
             'records_per_second'
             'harvester_polling_interval'
             'batched_particle_count'
+            'parser_workers'
+            'state_commit_count'
+            'state_commit_interval'
+            'state_delta'
+            'ingested_state_limit'
         }
     }
     """
@@ -152,6 +198,7 @@ class DataSetDriver(object):
         self._config = copy.deepcopy(config)
         self._data_callback = data_callback
         self._state_callback = state_callback
+        self._state_delta_callback = None
         self._event_callback = event_callback
         self._exception_callback = exception_callback
         self._memento = memento
@@ -163,8 +210,21 @@ class DataSetDriver(object):
         self._polling_interval = None
         self._generate_particle_count = None
         self._particle_count_per_second = None
+        self._parser_workers = None
+        self._state_commit_count = None
+        self._state_commit_interval = None
+        self._state_delta = None
+        self._ingested_state_limit = None
         self._resource_id = None
 
+        # paths of keys to the driver state entries changed since the state was last committed
+        self._changed_state = set()
+        self._pending_state_count = 0
+        self._state_commit_time = time.time()
+        # paths to the ingested file entries still holding their parser state, oldest
+        # first, None until the state is first compacted
+        self._ingested_state = None
+
         self._param_dict = ProtocolParameterDict()
         self._cmd_dict = ProtocolCommandDict()
         self._driver_dict = DriverDict()
@@ -191,6 +251,7 @@ class DataSetDriver(object):
 
         self._stop_sampling()
         self._stop_publisher_thread()
+        self._commit_state(flush=True)
 
     def _start_sampling(self):
         raise NotImplementedException('virtual method needs to be specialized')
@@ -278,12 +339,20 @@ class DataSetDriver(object):
 
         log.trace("set_resource: iterate through params: %s", params)
         for (key, val) in params.iteritems():
-            if key in [DriverParameter.BATCHED_PARTICLE_COUNT, DriverParameter.RECORDS_PER_SECOND]:
+            if key in [DriverParameter.BATCHED_PARTICLE_COUNT, DriverParameter.RECORDS_PER_SECOND,
+                       DriverParameter.PARSER_WORKERS, DriverParameter.STATE_COMMIT_COUNT,
+                       DriverParameter.INGESTED_STATE_LIMIT]:
                 if not isinstance(val, int): raise InstrumentParameterException("%s must be an integer" % key)
-            if key in [DriverParameter.PUBLISHER_POLLING_INTERVAL]:
+            if key in [DriverParameter.PUBLISHER_POLLING_INTERVAL, DriverParameter.STATE_COMMIT_INTERVAL]:
                 if not isinstance(val, (int, float)): raise InstrumentParameterException("%s must be an float" % key)
 
-            if val <= 0:
+            if key in [DriverParameter.STATE_DELTA]:
+                if not isinstance(val, bool): raise InstrumentParameterException("%s must be a boolean" % key)
+            elif key in [DriverParameter.STATE_COMMIT_INTERVAL, DriverParameter.INGESTED_STATE_LIMIT]:
+                # 0 turns these off
+                if val < 0:
+                    raise InstrumentParameterException("%s must be >= 0" % key)
+            elif val <= 0:
                 raise InstrumentParameterException("%s must be > 0" % key)
 
             self._param_dict.set_value(key, val)
@@ -292,8 +361,15 @@ class DataSetDriver(object):
         self._generate_particle_count = self._param_dict.get(DriverParameter.BATCHED_PARTICLE_COUNT)
         self._particle_count_per_second = self._param_dict.get(DriverParameter.RECORDS_PER_SECOND)
         self._polling_interval = self._param_dict.get(DriverParameter.PUBLISHER_POLLING_INTERVAL)
-        log.trace("Driver Parameters: %s, %s, %s", self._polling_interval, self._particle_count_per_second,
-                  self._generate_particle_count)
+        self._parser_workers = self._param_dict.get(DriverParameter.PARSER_WORKERS)
+        self._state_commit_count = self._param_dict.get(DriverParameter.STATE_COMMIT_COUNT)
+        self._state_commit_interval = self._param_dict.get(DriverParameter.STATE_COMMIT_INTERVAL)
+        self._state_delta = self._param_dict.get(DriverParameter.STATE_DELTA)
+        self._ingested_state_limit = self._param_dict.get(DriverParameter.INGESTED_STATE_LIMIT)
+        log.trace("Driver Parameters: %s, %s, %s, %s, %s, %s, %s, %s", self._polling_interval,
+                  self._particle_count_per_second, self._generate_particle_count, self._parser_workers,
+                  self._state_commit_count, self._state_commit_interval, self._state_delta,
+                  self._ingested_state_limit)
 
 
     def get_resource(self, *args, **kwargs):
@@ -368,7 +444,7 @@ class DataSetDriver(object):
 
     def _build_param_dict(self):
         """
-        Setup three common driver parameters
+        Setup the common driver parameters
         """
         self._param_dict.add_parameter(
             Parameter(
@@ -403,6 +479,64 @@ class DataSetDriver(object):
                 description="Number of particles to batch before sending to the agent")
         )
 
+        self._param_dict.add_parameter(
+            Parameter(
+                DriverParameter.PARSER_WORKERS,
+                int,
+                value=1,
+                type=ParameterDictType.INT,
+                visibility=ParameterDictVisibility.IMMUTABLE,
+                display_name="Parser Workers",
+                description="Number of worker processes parsing queued files at once, 1 parses them in the driver")
+        )
+
+        self._param_dict.add_parameter(
+            Parameter(
+                DriverParameter.STATE_COMMIT_COUNT,
+                int,
+                value=1,
+                type=ParameterDictType.INT,
+                visibility=ParameterDictVisibility.IMMUTABLE,
+                display_name="State Commit Count",
+                description="Number of driver state changes to coalesce before sending the state to the agent")
+        )
+
+        self._param_dict.add_parameter(
+            Parameter(
+                DriverParameter.STATE_COMMIT_INTERVAL,
+                float,
+                value=0,
+                type=ParameterDictType.FLOAT,
+                visibility=ParameterDictVisibility.IMMUTABLE,
+                display_name="State Commit Interval",
+                description="Seconds after which changes to the driver state are sent to the agent "
+                            "even if fewer than the state commit count, 0 to only count changes")
+        )
+
+        self._param_dict.add_parameter(
+            Parameter(
+                DriverParameter.STATE_DELTA,
+                bool,
+                value=False,
+                type=ParameterDictType.BOOL,
+                visibility=ParameterDictVisibility.IMMUTABLE,
+                display_name="State Delta",
+                description="Also send the driver state entries changed since the last state sent "
+                            "to the state delta callback")
+        )
+
+        self._param_dict.add_parameter(
+            Parameter(
+                DriverParameter.INGESTED_STATE_LIMIT,
+                int,
+                value=0,
+                type=ParameterDictType.INT,
+                visibility=ParameterDictVisibility.IMMUTABLE,
+                display_name="Ingested State Limit",
+                description="Number of the most recently ingested files to keep the parser state of, "
+                            "0 to keep them all")
+        )
+
         config = self._config.get(DataSourceConfigKey.DRIVER, {})
         log.debug("set_resource on startup with: %s", config)
         self.set_resource(config)
@@ -427,6 +561,7 @@ class DataSetDriver(object):
         try:
             while(not self._publisher_shutdown):
                 self._poll()
+                self._commit_state()
                 gevent.sleep(self._polling_interval)
         except Exception as e:
             log.error("Exception in publisher thread (resource id: %s): %s", self._resource_id, traceback.format_exc(e))
@@ -446,6 +581,153 @@ class DataSetDriver(object):
         """
         self._event_callback(event_type="ResourceAgentErrorEvent", error_msg = "%s" % exception)
 
+    def set_state_delta_callback(self, state_delta_callback):
+        """
+        Set a callback for a consumer that merges changes into the driver
+        state it holds.  If the state delta parameter is set it is called
+        with the changes each time the state is committed.  The state
+        callback still gets the whole state to persist.
+        @param state_delta_callback function called with a dict holding the
+        state version and, under DriverStateKey.DELTA, each changed entry
+        at the path of keys to it in the driver state
+        """
+        self._state_delta_callback = state_delta_callback
+
+    def _save_state(self, keys=(), flush=False):
+        """
+        Record a change to the driver state and commit the state
+        @param keys path of keys into the driver state to the changed entry,
+        empty if the whole state changed
+        @param flush True to commit the state now, False to leave it to the
+        state commit policy
+        """
+        self._state_changed(keys)
+        self._commit_state(flush)
+
+    def _state_changed(self, keys=()):
+        """
+        Record a change to the driver state to commit with the next state
+        @param keys path of keys into the driver state to the changed entry,
+        empty if the whole state changed
+        """
+        self._changed_state.add(tuple(keys))
+        self._pending_state_count += 1
+
+    def _commit_state(self, flush=False):
+        """
+        Send the driver state to the agent through the state callback if it
+        has changed.  Unless flushed, changes are coalesced until there are
+        state commit count of them or state commit interval seconds have
+        passed since the state was last sent.  If state delta is set the
+        changed entries are also sent to the state delta callback, each whole
+        with the path of keys to it.
+        @param flush True to send any changes now
+        """
+        if not self._pending_state_count:
+            return
+        now = time.time()
+        if not flush and self._pending_state_count < self._state_commit_count and \
+           not (self._state_commit_interval and now - self._state_commit_time >= self._state_commit_interval):
+            return
+
+        if self._ingested_state_limit:
+            self._compact_state()
+
+        state_delta = None
+        if self._state_delta and self._state_delta_callback:
+            if () in self._changed_state:
+                # the whole state changed
+                changes = self._driver_state
+            else:
+                changes = {}
+                for keys in self._changed_state:
+                    (entry, delta) = (self._driver_state, changes)
+                    for key in keys[:-1]:
+                        entry = entry[key]
+                        delta = delta.setdefault(key, {})
+                    delta[keys[-1]] = entry[keys[-1]]
+            state_delta = {DriverStateKey.VERSION: self._driver_state.get(DriverStateKey.VERSION),
+                           DriverStateKey.DELTA: changes}
+
+        log.trace("committing %d driver state changes", self._pending_state_count)
+        self._changed_state = set()
+        self._pending_state_count = 0
+        self._state_commit_time = now
+        self._state_callback(self._driver_state)
+        if state_delta is not None:
+            self._state_delta_callback(state_delta)
+
+    def _compact_state(self):
+        """
+        Clear the parser state of all but the ingested state limit most
+        recently ingested files.  The rest of a file entry is kept, the
+        harvester needs it to know the file has been ingested.
+        """
+        if self._ingested_state is None:
+            # files ingested before the driver started are the oldest
+            self._ingested_state = [keys for (keys, entry) in self._file_entries(self._driver_state)
+                                    if entry.get(DriverStateKey.INGESTED) and
+                                    entry.get(DriverStateKey.PARSER_STATE) is not None]
+        for keys in self._changed_state:
+            entry = self._state_entry(keys)
+            if isinstance(entry, dict) and entry.get(DriverStateKey.INGESTED) and \
+               entry.get(DriverStateKey.PARSER_STATE) is not None and keys not in self._ingested_state:
+                self._ingested_state.append(keys)
+
+        while len(self._ingested_state) > self._ingested_state_limit:
+            keys = self._ingested_state.pop(0)
+            entry = self._state_entry(keys)
+            if isinstance(entry, dict) and entry.get(DriverStateKey.INGESTED):
+                log.trace("compacting ingested file state %s", keys)
+                entry[DriverStateKey.PARSER_STATE] = None
+                self._changed_state.add(keys)
+
+    def _state_entry(self, keys):
+        """
+        @param keys path of keys into the driver state
+        @retval the driver state entry at the end of the path, None if there
+        isn't one
+        """
+        entry = self._driver_state
+        for key in keys:
+            if not isinstance(entry, dict):
+                return None
+            entry = entry.get(key)
+        return entry
+
+    def _file_entries(self, state, keys=()):
+        """
+        Generator for the file entries in the driver state, which are the
+        dictionaries holding a parser state
+        @param state the driver state, or a dictionary within it
+        @param keys path of keys into the driver state to state
+        @retval generator of (path of keys, file entry) tuples
+        """
+        for (key, entry) in state.iteritems():
+            if isinstance(entry, dict):
+                if DriverStateKey.PARSER_STATE in entry:
+                    yield (keys + (key,), entry)
+                else:
+                    for file_entry in self._file_entries(entry, keys + (key,)):
+                        yield file_entry
+
+
+    def _open_file(self, path, data_key=None):
+        """
+        Open a data file for a parser. If the parser config sets
+        DataSetDriverConfigKeys.MEMORY_MAP the file is memory mapped so the
+        parser can scan it in place, otherwise it is opened normally.
+        @param path The path of the file to open
+        @param data_key The key to index into the parser config, if any
+        @retval file-like object to hand to the parser
+        """
+        config = getattr(self, '_parser_config', None) or {}
+        if data_key is not None:
+            config = config.get(data_key) or {}
+
+        if config.get(DataSetDriverConfigKeys.MEMORY_MAP):
+            return MappedFile(path)
+        return open(path)
 
     def _raise_new_file_event(self, name):
         """
@@ -453,9 +735,7 @@ class DataSetDriver(object):
         to the payload of the event.
         """
         s = os.stat(name)
-        checksum = ""
-        with open(name, 'rb') as filehandle:
-            checksum = hashlib.md5(filehandle.read()).hexdigest()
+        checksum = FINGERPRINTS.checksum(name, s)
 
         stats = {
             'name': name,
@@ -559,7 +839,122 @@ class SimpleDataSetDriver(DataSetDriver):
         log.trace("Checking for new files in queue, count: %d", count)
         if(count > 0):
             log.debug("New file detected, resource_id: %s, array addr: %s", self._resource_id, id(self._new_file_queue))
-            self._got_file(self._new_file_queue.pop(0))
+            if self._parser_workers > 1 and count > 1:
+                files = self._new_file_queue[:self._parser_workers]
+                del self._new_file_queue[:len(files)]
+                self._got_files([(file_name,) for file_name in files])
+            else:
+                self._got_file(self._new_file_queue.pop(0))
+
+    def _got_files(self, files):
+        """
+        Parse several files at once in a pool of worker processes.  Each worker
+        records what parsing its file would publish, and the records are
+        replayed here in file order so particles are published and the driver
+        state is saved exactly as if the files had been parsed one at a time.
+        @param files list of _got_file argument tuples, one for each file, in
+        the order the files are to be published
+        """
+        log.debug("Parsing %d files in a pool of %d workers", len(files), self._parser_workers)
+        pool = multiprocessing.Pool(min(len(files), self._parser_workers), _init_parser_worker, (self,))
+        try:
+            results = [pool.apply_async(_parse_in_worker, args) for args in files]
+            pool.close()
+
+            for (args, result) in zip(files, results):
+                while not result.ready():
+                    gevent.sleep(PARSER_POOL_POLL_INTERVAL)
+
+                records = result.get()
+                if records is None:
+                    log.debug("Records for file %s could not be returned by the worker, parsing it here", args[0])
+                    self._got_file(*args)
+                else:
+                    self._replay_parse(pickle.loads(records), *args)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _record_parse(self, file_name, *args):
+        """
+        Parse a file in a parser pool worker process.  Particles, events and
+        the state of the file are recorded in the order the parser produces
+        them rather than being published.
+        @param file_name name of the file to parse
+        @param args any further _got_file arguments
+        @retval pickled list of (ParseRecordType, value) tuples, None if the
+        records can't be pickled
+        """
+        records = []
+        file_states = self._file_states(*args)
+
+        self._data_callback = lambda particles: records.append((ParseRecordType.DATA, particles))
+        self._event_callback = lambda *a, **kw: records.append((ParseRecordType.EVENT, (a, kw)))
+        self._state_callback = lambda state: records.append((ParseRecordType.STATE,
+                                                             copy.deepcopy(file_states.get(file_name))))
+        self._state_delta_callback = None
+        self._exception_callback = lambda e: records.append((ParseRecordType.EXCEPTION, e))
+        # publishing is paced when the records are replayed, parse as fast as possible here
+        self._particle_count_per_second = float('inf')
+
+        try:
+            self._got_file(file_name, *args)
+        except Exception as e:
+            records.append((ParseRecordType.RAISE, e))
+
+        try:
+            return pickle.dumps(records, pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            log.debug("Unable to pickle records for file %s: %s", file_name, e)
+            return None
+
+    def _replay_parse(self, records, file_name, *args):
+        """
+        Publish what a parser pool worker recorded while parsing a file
+        @param records list of (ParseRecordType, value) tuples
+        @param file_name name of the parsed file
+        @param args any further _got_file arguments
+        @raise the exception that stopped the worker parsing, if there was one
+        """
+        file_states = self._file_states(*args)
+        file_keys = self._file_state_keys(file_name, *args)
+        delay = None
+        if self._generate_particle_count:
+            delay = float(1) / float(self._particle_count_per_second) * float(self._generate_particle_count)
+
+        try:
+            for (record_type, value) in records:
+                if record_type == ParseRecordType.DATA:
+                    self._data_callback(value)
+                    if delay:
+                        gevent.sleep(delay)
+                elif record_type == ParseRecordType.EVENT:
+                    self._event_callback(*value[0], **value[1])
+                elif record_type == ParseRecordType.STATE:
+                    if value is not None:
+                        # update in place, the harvester shares the file state
+                        file_states.setdefault(file_name, {}).update(value)
+                    self._save_state(file_keys)
+                elif record_type == ParseRecordType.EXCEPTION:
+                    self._exception_callback(value)
+                elif record_type == ParseRecordType.RAISE:
+                    raise value
+        finally:
+            # done with this file
+            self._commit_state(flush=True)
+
+    def _file_states(self):
+        """
+        @retval dictionary of driver state for each file, keyed by file name
+        """
+        return self._driver_state
+
+    def _file_state_keys(self, file_name):
+        """
+        @param file_name name of the file
+        @retval path of keys into the driver state to the state of the file
+        """
+        return (file_name,)
 
     def _stage_input_file(self, path):
         """
@@ -636,7 +1031,7 @@ class SimpleDataSetDriver(DataSetDriver):
 
             self._raise_new_file_event(path)
             log.debug("Open new data source file: %s", path)
-            handle = open(path)
+            handle = self._open_file(path)
 
             # the file directory is initialized in the harvester, so it will exist by this point
             parser = self._build_parser(self._driver_state[file_name][DriverStateKey.PARSER_STATE], handle)
@@ -657,6 +1052,8 @@ class SimpleDataSetDriver(DataSetDriver):
 
         finally:
             self._file_in_process = None
+            # done with this file
+            self._commit_state(flush=True)
 
     def _save_parser_state(self, state, file_ingested):
         """
@@ -670,7 +1067,7 @@ class SimpleDataSetDriver(DataSetDriver):
         if file_ingested:
             log.debug("File %s fully parsed", self._file_in_process)
             self._driver_state[self._file_in_process][DriverStateKey.INGESTED] = True
-        self._state_callback(self._driver_state)
+        self._save_state((self._file_in_process,), flush=file_ingested)
 
     def _save_parser_state_after_error(self):
         """
@@ -679,7 +1076,7 @@ class SimpleDataSetDriver(DataSetDriver):
         """
         log.debug("File %s fully parsed", self._file_in_process)
         self._driver_state[self._file_in_process][DriverStateKey.INGESTED] = True
-        self._state_callback(self._driver_state)
+        self._save_state((self._file_in_process,), flush=True)
 
     def _init_state(self, memento):
         """
@@ -708,10 +1105,10 @@ class SimpleDataSetDriver(DataSetDriver):
         if file_name not in self._driver_state:
             # initialize the driver state for this file
             full_file_path = os.path.join(self._harvester_config[DataSetDriverConfigKeys.DIRECTORY], file_name)
-            mod_time = os.path.getmtime(full_file_path)
-            file_size = os.path.getsize(full_file_path)
-            with open(full_file_path, 'rb') as filehandle:
-                md5_checksum = hashlib.md5(filehandle.read()).hexdigest()
+            stat_result = os.stat(full_file_path)
+            mod_time = stat_result.st_mtime
+            file_size = stat_result.st_size
+            md5_checksum = FINGERPRINTS.checksum(full_file_path, stat_result)
             self._driver_state[file_name] = {
                 DriverStateKey.FILE_SIZE: file_size,
                 DriverStateKey.FILE_MOD_DATE: mod_time,
@@ -727,7 +1124,7 @@ class SimpleDataSetDriver(DataSetDriver):
             count = len(self._new_file_queue)
             log.trace("Current new file queue length: %d", count)
         # the harvester updates the driver state, make sure we save the newly found file state info
-        self._state_callback(self._driver_state)
+        self._save_state((file_name,))
 
     def _modified_file_callback(self, modified_state):
         """
@@ -737,7 +1134,8 @@ class SimpleDataSetDriver(DataSetDriver):
         log.debug('got modified file callback, modified state %s', modified_state)
         for filename in modified_state:
             self._driver_state[filename][DriverStateKey.MODIFIED_STATE] = modified_state[filename]
-        self._state_callback(self._driver_state)
+            self._state_changed((filename,))
+        self._commit_state()
 
 class SingleFileDataSetDriver(SimpleDataSetDriver):
     """
@@ -822,7 +1220,7 @@ class SingleFileDataSetDriver(SimpleDataSetDriver):
             # changed while we are reading it
             path = os.path.join(directory, self._filename)
             self._raise_new_file_event(path)
-            handle = open(path)
+            handle = self._open_file(path)
 
             self.pre_parse()
 
@@ -864,7 +1262,7 @@ class SingleFileDataSetDriver(SimpleDataSetDriver):
         log.trace("saving parser state: %r", state)
         # this is for the single file harvester, which does not use file name keys
         self._driver_state[self._filename][DriverStateKey.PARSER_STATE] = state
-        self._state_callback(self._driver_state)
+        self._save_state((self._filename,))
 
     def _file_changed_callback(self, new_state):
         """
@@ -889,7 +1287,7 @@ class SingleFileDataSetDriver(SimpleDataSetDriver):
                 log.debug('clearing next driver state')
             self._in_process_state = None
         log.debug('saving driver state %s', self._driver_state)
-        self._state_callback(self._driver_state)
+        self._save_state((self._filename,), flush=True)
 
     def _driver_and_next_state_equal(self):
         if self._next_driver_state == None and self._driver_state == None:
@@ -918,6 +1316,8 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         @param data_keys A list of keys, one for each harvester/parser pair to start
         @param harvester_type Optional dictionary of data keys associated with a harvester type.  If any single file
                               harvesters are in use, this must be specified, otherwise it defaults to directory harvesters.
+                              Inotify directory harvesters are single directory harvesters which wait on inotify events
+                              instead of polling.
         """
         self._data_keys = data_keys
         if harvester_type != None and not isinstance(harvester_type, dict):
@@ -926,6 +1326,16 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
 
         super(MultipleHarvesterDataSetDriver, self).__init__(config, memento, data_callback, state_callback, event_callback,
                                                              exception_callback)
+        if self._harvester_type != None and self._harvester_config:
+            # copy the harvester config so the type isn't written into the caller's config
+            self._harvester_config = dict(self._harvester_config)
+            for key in self._data_keys:
+                if self._harvester_type.get(key) == HarvesterType.INOTIFY_DIRECTORY and \
+                   isinstance(self._harvester_config.get(key), dict):
+                    # the directory harvester built for this key picks its type up from its config
+                    self._harvester_config[key] = dict(self._harvester_config[key])
+                    self._harvester_config[key][DataSetDriverConfigKeys.HARVESTER_TYPE] = \
+                        HarvesterType.INOTIFY_DIRECTORY
         self._publisher_thread = {}
         self._publisher_shutdown = {}
         self._init_queues()
@@ -982,7 +1392,8 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         for key in self._data_keys:
             # no harvester type specified defaults to all single directory harvesters
             if self._harvester_type == None or \
-                (key in self._harvester_type and self._harvester_type[key] == HarvesterType.SINGLE_DIRECTORY):
+                (key in self._harvester_type and self._harvester_type[key] in (HarvesterType.SINGLE_DIRECTORY,
+                                                                               HarvesterType.INOTIFY_DIRECTORY)):
                 # this is a multiple file harvester, poll for multiple files
                 self._publisher_thread[key] = gevent.spawn(self._publisher_loop, key)
             elif key in self._harvester_type and self._harvester_type[key] == HarvesterType.SINGLE_FILE:
@@ -1022,6 +1433,7 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         try:
             while(not self._publisher_shutdown[data_key]):
                 self._poll(data_key)
+                self._commit_state()
                 gevent.sleep(self._polling_interval)
         except Exception as e:
             log.error("Exception in publisher thread (resource id: %s): %s", self._resource_id, traceback.format_exc(e))
@@ -1040,6 +1452,7 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
             filename = self._harvester_config[data_key].get(DataSetDriverConfigKeys.PATTERN)
             while(not self._publisher_shutdown[data_key]):
                 self._poll_single_file(data_key, filename)
+                self._commit_state()
                 gevent.sleep(self._polling_interval)
         except Exception as e:
             log.error("Exception in publisher thread (resource id: %s): %s", self._resource_id, traceback.format_exc(e))
@@ -1058,7 +1471,28 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         if(count > 0):
             log.debug("New file detected, resource_id: %s, array addr: %s", self._resource_id,
                       id(self._new_file_queue[data_key]))
-            self._got_file(self._new_file_queue[data_key].pop(0), data_key)
+            if self._parser_workers > 1 and count > 1:
+                files = self._new_file_queue[data_key][:self._parser_workers]
+                del self._new_file_queue[data_key][:len(files)]
+                self._got_files([(file_name, data_key) for file_name in files])
+            else:
+                self._got_file(self._new_file_queue[data_key].pop(0), data_key)
+
+    def _file_states(self, data_key):
+        """
+        @param data_key The key to index into the driver state
+        @retval dictionary of driver state for each file found for this data
+        key, keyed by file name
+        """
+        return self._driver_state[data_key]
+
+    def _file_state_keys(self, file_name, data_key):
+        """
+        @param file_name name of the file
+        @param data_key The key to index into the driver state
+        @retval path of keys into the driver state to the state of the file
+        """
+        return (data_key, file_name)
 
     def _poll_single_file(self, data_key, filename):
         """
@@ -1116,10 +1550,12 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
             # need to mark the bad file as ingested so we don't re-ingest it
             log.debug("File %s fully parsed", file_name)
             self._driver_state[data_key][file_name][DriverStateKey.INGESTED] = True
-            self._state_callback(self._driver_state)
+            self._save_state((data_key, file_name), flush=True)
             self._sample_exception_callback(e)
         finally:
             self._file_in_process[data_key] = None
+            # done with this file
+            self._commit_state(flush=True)
 
     def _got_single_file(self, file_name, data_key):
         """
@@ -1139,7 +1575,7 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
             # make sure we have initialized the file name dictionary with the parser state
             if file_name not in self._driver_state[data_key]:
                 self._driver_state[data_key][file_name] = {DriverStateKey.PARSER_STATE: None}
-                self._state_callback(self._driver_state)
+                self._save_state((data_key, file_name))
 
             # pre_parse can be overloaded if there is anything needed to be done prior to parsing
             self.pre_parse_single(filename=file_name, data_key=data_key)
@@ -1151,6 +1587,8 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
             self._sample_exception_callback(e)
         finally:
             self._file_in_process[data_key] = None
+            # done with this file
+            self._commit_state(flush=True)
 
     def _get_parser_results(self, file_name, data_key):
         """
@@ -1174,7 +1612,7 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
 
         self._raise_new_file_event(path)
         log.debug("Open new data source file: %s", path)
-        handle = open(path)
+        handle = self._open_file(path, data_key)
 
         self._file_in_process[data_key] = file_name
 
@@ -1225,7 +1663,7 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         if file_ingested:
             log.debug("File %s fully parsed", file_name)
             self._driver_state[data_key][file_name][DriverStateKey.INGESTED] = True
-        self._state_callback(self._driver_state)
+        self._save_state((data_key, file_name), flush=file_ingested)
 
     def _file_changed_callback(self, new_state, data_key):
         """
@@ -1250,10 +1688,10 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         if file_name not in self._driver_state[data_key]:
             # initialize the driver state for this file
             full_file_path = os.path.join(self._harvester_config[data_key][DataSetDriverConfigKeys.DIRECTORY], file_name)
-            mod_time = os.path.getmtime(full_file_path)
-            file_size = os.path.getsize(full_file_path)
-            with open(full_file_path, 'rb') as filehandle:
-                md5_checksum = hashlib.md5(filehandle.read()).hexdigest()
+            stat_result = os.stat(full_file_path)
+            mod_time = stat_result.st_mtime
+            file_size = stat_result.st_size
+            md5_checksum = FINGERPRINTS.checksum(full_file_path, stat_result)
             self._driver_state[data_key][file_name] = {
                 DriverStateKey.FILE_SIZE: file_size,
                 DriverStateKey.FILE_MOD_DATE: mod_time,
@@ -1271,7 +1709,7 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
             count = len(self._new_file_queue[data_key])
             log.trace("Current new file queue length: %d", count)
         # the harvester updates the driver state, make sure we save the newly found file state info
-        self._state_callback(self._driver_state)
+        self._save_state((data_key, file_name))
 
     def _modified_file_callback(self, modified_state, data_key):
         """
@@ -1281,7 +1719,8 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         log.debug('got modified file callback, modified state %s', modified_state)
         for filename in modified_state:
             self._driver_state[data_key][filename][DriverStateKey.MODIFIED_STATE] = modified_state[filename]
-        self._state_callback(self._driver_state)
+            self._state_changed((data_key, filename))
+        self._commit_state()
 
     def _verify_config(self):
         """
@@ -1339,6 +1778,6 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
 
             self._in_process_queue[data_key] = None
         log.debug('saving driver state %s', self._driver_state)
-        self._state_callback(self._driver_state)
+        self._save_state((data_key, file_name))
 
 
@@ -14,6 +14,8 @@ __license__ = 'Apache 2.0'
 import time
 import ntplib
 
+from collections import deque
+
 from mi.core.log import get_logger
 log = get_logger()
 from mi.core.instrument.chunker import StringChunker
@@ -22,6 +24,91 @@ from mi.core.exceptions import RecoverableSampleException, SampleEncodingExcepti
 from mi.core.exceptions import NotImplementedException, UnexpectedDataException
 from mi.dataset.dataset_driver import DataSetDriverConfigKeys
 
+# bytes read from the stream handle at a time unless configured otherwise
+DEFAULT_READ_SIZE = 1024
+
+# marks a state key which was not in the state at a checkpoint
+_ABSENT = object()
+
+
+class StateCheckpoints(object):
+    """
+    The read state of a parser at each checkpoint it takes while loading
+    its record buffer. Rather than a copy of the state per record, the values
+    are appended to a list per state key, and a checkpoint is identified by
+    an increasing int token. A state dict is only built for a checkpoint
+    when it is asked for.
+    """
+    def __init__(self):
+        # (key, values at each checkpoint) for each key the state has had
+        self._columns = ()
+        # the keys in the columns
+        self._keys = set()
+        # token of the first checkpoint in the values
+        self._first = 0
+        # number of checkpoints in the values
+        self._count = 0
+        # number of discarded checkpoints at the start of the values, which are
+        # only removed from the values once they are at least half of them
+        self._discarded = 0
+
+    def add(self, state):
+        """
+        Take a checkpoint of a state
+        @param state The state dict
+        @retval The token for the state as it is now
+        """
+        columns = self._columns
+        if not self._keys.issuperset(state):
+            columns = self._add_keys(state)
+        absent = _ABSENT
+        for (key, values) in columns:
+            values.append(state.get(key, absent))
+        self._count += 1
+        return self._first + self._count - 1
+
+    def _add_keys(self, state):
+        """
+        Start holding values for keys of the state not seen before
+        @param state The state dict
+        @retval The (key, values) for every key
+        """
+        new_columns = [(key, [_ABSENT] * self._count) for key in state if key not in self._keys]
+        self._keys.update(key for (key, values) in new_columns)
+        self._columns = self._columns + tuple(new_columns)
+        return self._columns
+
+    def state_at(self, token):
+        """
+        Build the state a checkpoint was taken of
+        @param token The token of a checkpoint still held
+        @retval A shallow copy of the state at the checkpoint
+        @throws IndexError if the checkpoint has been discarded
+        """
+        index = token - self._first
+        if index < self._discarded or index >= self._count:
+            raise IndexError("No state checkpoint %d" % token)
+        state = {}
+        for (key, values) in self._columns:
+            value = values[index]
+            if value is not _ABSENT:
+                state[key] = value
+        return state
+
+    def discard(self, token):
+        """
+        Discard checkpoints up to and including a token, which are no longer
+        needed once a record with that token has been handed out
+        @param token The token of the last checkpoint to discard
+        """
+        self._discarded = max(self._discarded, min(token + 1 - self._first, self._count))
+        if self._discarded * 2 >= self._count:
+            for (key, values) in self._columns:
+                del values[:self._discarded]
+            self._first += self._discarded
+            self._count -= self._discarded
+            self._discarded = 0
+
 
 class Parser(object):
     """ abstract class to show API needed for plugin poller objects """
@@ -150,7 +237,19 @@ class BufferLoadingParser(Parser):
     records from this buffer as they are requested. Parsers dont have
     to operate this way, but it can keep memory in check and smooth out
     stream inputs if they dont all come at once.
+
+    By default the whole file is parsed into the record buffer the first
+    time records are requested. Setting DataSetDriverConfigKeys.HIGH_WATER_MARK
+    in the parser config switches to streaming, where blocks are only read
+    until the buffer holds that many records (or the number requested, if
+    larger), so memory stays bounded however big the file is.
+    DataSetDriverConfigKeys.READ_SIZE sets how many bytes each block read asks for.
     """
+    # defaults for subclasses that bypass this constructor
+    _read_size = DEFAULT_READ_SIZE
+    _high_water_mark = None
+    # created the first time a subclass takes a checkpoint
+    _checkpoints = None
 
     def __init__(self, config, stream_handle, state, sieve_fn,
                  state_callback, publish_callback, exception_callback=None):
@@ -174,12 +273,27 @@ class BufferLoadingParser(Parser):
         self._record_buffer = []
         self._timestamp = 0.0
         self.file_complete = False
+        self._read_size = config.get(DataSetDriverConfigKeys.READ_SIZE, DEFAULT_READ_SIZE)
+        self._high_water_mark = config.get(DataSetDriverConfigKeys.HIGH_WATER_MARK)
 
         super(BufferLoadingParser, self).__init__(config, stream_handle, state,
                                                   sieve_fn, state_callback,
                                                   publish_callback,
                                                   exception_callback)
 
+    @property
+    def _record_buffer(self):
+        """
+        The (particle, state) tuples parsed but not yet returned, the state
+        may be a token from _checkpoint()
+        """
+        return self._records
+
+    @_record_buffer.setter
+    def _record_buffer(self, records):
+        # parsers reset the buffer by assigning a list, keep it a deque
+        self._records = deque(records)
+
     def get_records(self, num_records):
         """
         Go ahead and execute the data parsing loop up to a point. This involves
@@ -191,8 +305,13 @@ class BufferLoadingParser(Parser):
         if num_records <= 0:
             return []
         try:
-            while len(self._record_buffer) < num_records:
-                self._load_particle_buffer()        
+            if self._high_water_mark is None:
+                while len(self._record_buffer) < num_records:
+                    self._load_particle_buffer()
+            else:
+                # buffer one record past the request so the end of the file
+                # is found before the last records are handed out
+                self._load_particle_buffer(max(num_records + 1, self._high_water_mark))
         except EOFError:
             self._process_end_of_file()
         return self._yank_particles(num_records)
@@ -228,10 +347,14 @@ class BufferLoadingParser(Parser):
                   num_records)
 
         return_list = []
-        records_to_return = self._record_buffer[:num_to_fetch]
-        self._record_buffer = self._record_buffer[num_to_fetch:]
+        records_to_return = [self._record_buffer.popleft() for _ in xrange(num_to_fetch)]
         if len(records_to_return) > 0:
             self._state = records_to_return[-1][1]  # state side of tuple of last entry
+            if self._checkpoints is not None and type(self._state) is int:
+                # the record holds a checkpoint token, build the state it stands for
+                token = self._state
+                self._state = self._checkpoints.state_at(token)
+                self._checkpoints.discard(token)
             # strip the state info off of them now that we have what we need
             for item in records_to_return:
                 log.debug("Record to return: %s", item)
@@ -246,22 +369,41 @@ class BufferLoadingParser(Parser):
 
         return return_list
 
-    def _load_particle_buffer(self):
+    def _checkpoint(self):
+        """
+        Take a checkpoint of the read state, for a record going into the
+        record buffer in place of a copy of the state. The state is only
+        built from the checkpoint if the record is the last one yanked.
+        @retval An int token for the read state as it is now
+        """
+        if self._checkpoints is None:
+            self._checkpoints = StateCheckpoints()
+        return self._checkpoints.add(self._read_state)
+
+    def _load_particle_buffer(self, high_water_mark=None):
         """
         Load up the internal record buffer with some particles based on a
         gather from the get_block method.
+        @param high_water_mark Stop reading blocks once the record buffer
+           holds this many records, None to read until the end of the file
+        @throws EOFError when the end of the file is reached
         """
-        while self.get_block():
+        while high_water_mark is None or len(self._record_buffer) < high_water_mark:
+            if not self.get_block():
+                break
             result = self.parse_chunks()
             self._record_buffer.extend(result)
 
-    def get_block(self, size=1024):
+    def get_block(self, size=None):
         """
         Get a block of characters for processing
-        @param size The size of the block to try to read
+        @param size The size of the block to try to read, defaults to the
+           configured read size
         @retval The length of data retreived
         @throws EOFError when the end of the file is reached
         """
+        if size is None:
+            size = self._read_size
         # read in some more data
         data = self._stream_handle.read(size)
         if data:
@@ -277,7 +419,8 @@ class BufferLoadingParser(Parser):
         it is a valid data piece, build a particle, update the position and
         timestamp. Go until the chunker has no more valid data.
         @retval a list of tuples with sample particles encountered in this
-            parsing, plus the state (ie "(sample, state)"). An empty list of
-            nothing was parsed.
+            parsing, plus the state (ie "(sample, state)"), which can be
+            a token from _checkpoint() rather than a copy of the read state.
+            An empty list of nothing was parsed.
         """            
         raise NotImplementedException("Must write parse_chunks()!")
@@ -96,8 +96,7 @@ class AntelopeOrbDataSetDriver(DataSetDriver):
         """
         log.trace("saving parser state: %r", state)
         self._driver_state[DriverStateKey.PARSER_STATE] = state
-        # check if file has been completely parsed by comparing the parsed position and file size
-        self._state_callback(self._driver_state)
+        self._save_state((DriverStateKey.PARSER_STATE,))
 
     def _save_parser_state_after_error(self):
         """
@@ -107,7 +106,7 @@ class AntelopeOrbDataSetDriver(DataSetDriver):
         # TODO whut? maybe take this method out? we never fully ingest an orb.
         log.debug("File %s fully parsed", self._file_in_process)
 #        self._driver_state[DriverStateKey.INGESTED] = True
-        self._state_callback(self._driver_state)
+        self._save_state(flush=True)
 
     def _build_parser(self):
         """
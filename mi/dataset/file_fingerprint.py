@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+"""
+@package mi.dataset.file_fingerprint File checksum cache for harvesters and drivers
+@file mi/dataset/file_fingerprint.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief Cache of md5 checksums of data files keyed on (inode, size, mtime), so
+a file is hashed once no matter how many pollers and drivers ask for it.
+"""
+
+__author__ = 'Ocean Observatories Initiative <contactooici@oceanobservatories.org>'
+__license__ = 'Apache 2.0'
+
+import os
+import hashlib
+from collections import OrderedDict
+
+from mi.core.log import get_logger ; log = get_logger()
+
+# bytes read from a file at a time while hashing
+HASH_BLOCK_SIZE = 1048576
+# most files to remember checksums for, the least recently used are dropped
+MAX_FINGERPRINTS = 10000
+
+
+class FileFingerprint(object):
+    """
+    The checksum of a file at a given (inode, size, mtime)
+    """
+    __slots__ = ('inode', 'size', 'mtime', 'checksum')
+
+    def __init__(self, inode, size, mtime, checksum):
+        self.inode = inode
+        self.size = size
+        self.mtime = mtime
+        self.checksum = checksum
+
+    def matches(self, stat_result):
+        return (self.inode, self.size, self.mtime) == \
+               (stat_result.st_ino, stat_result.st_size, stat_result.st_mtime)
+
+
+class FingerprintCache(object):
+    """
+    Compute and remember file checksums
+    """
+
+    def __init__(self, block_size=HASH_BLOCK_SIZE, max_entries=MAX_FINGERPRINTS):
+        """
+        @param block_size The number of bytes to read from a file at a time
+        @param max_entries The most files to remember checksums for
+        """
+        self._block_size = block_size
+        self._max_entries = max_entries
+        self._fingerprints = OrderedDict()
+
+    def checksum(self, path, stat_result=None):
+        """
+        Get the md5 hex digest of a file. The cached checksum is only used
+        if the file's inode, size and mtime all match when it was hashed,
+        otherwise the whole file is hashed again.
+        @param path The path of the file
+        @param stat_result The os.stat of the file, if the caller already has it
+        @retval md5 hex digest string
+        """
+        if stat_result is None:
+            stat_result = os.stat(path)
+
+        fingerprint = self._fingerprints.pop(path, None)
+        if fingerprint is None or not fingerprint.matches(stat_result):
+            log.debug("Hashing %s", path)
+            with open(path, 'rb') as filehandle:
+                checksum = self._hash_file(filehandle)
+            fingerprint = FileFingerprint(stat_result.st_ino, stat_result.st_size,
+                                          stat_result.st_mtime, checksum)
+
+        # (re)insert at the end, so the first entry is the least recently used
+        self._fingerprints[path] = fingerprint
+        while len(self._fingerprints) > self._max_entries:
+            self._fingerprints.popitem(last=False)
+        return fingerprint.checksum
+
+    def forget(self, path):
+        """
+        Drop the cached checksum of a file
+        @param path The path of the file
+        """
+        self._fingerprints.pop(path, None)
+
+    def _hash_file(self, filehandle):
+        """
+        Hash a file from its current position to the end
+        @param filehandle The open file
+        @retval md5 hex digest string
+        """
+        md5 = hashlib.md5()
+        for block in iter(lambda: filehandle.read(self._block_size), ''):
+            md5.update(block)
+        return md5.hexdigest()
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+
+# shared by the harvesters and drivers so each file change is only hashed once
+FINGERPRINTS = FingerprintCache()
@@ -14,17 +14,20 @@ __license__ = 'Apache 2.0'
 
 import os
 import glob
-import hashlib
 import time
 import re
+import select
+import fnmatch
 
-from threading import Thread
+from threading import Thread, Lock
 from gevent.event import Event
 
 from mi.core.log import get_logger ; log = get_logger()
 from mi.core.poller import DirectoryPoller, ConditionPoller
 from mi.core.common import BaseEnum
-from mi.dataset.dataset_driver import DriverStateKey
+from mi.core.inotify import DirectoryWatch, IN_WATCH_GONE, IN_Q_OVERFLOW
+from mi.dataset.dataset_driver import DriverStateKey, DataSetDriverConfigKeys, HarvesterType
+from mi.dataset.file_fingerprint import FINGERPRINTS
 
 
 class Harvester(object):
@@ -51,6 +54,10 @@ class Harvester(object):
 # used to determine if we should do integer sorting of the files
 NUMBER_UNDERSCORE_MATCHER = re.compile(r'_\d')
 
+# seconds between full directory scans when waiting on inotify events, in case
+# a change is made that inotify can't see (i.e. written by another host over NFS)
+INOTIFY_RESCAN_INTERVAL = 300
+
 class SingleDirectoryPoller(ConditionPoller):
     """
     Monitor a single directory to see if new files have appeared or if files have changed.
@@ -61,6 +68,8 @@ class SingleDirectoryPoller(ConditionPoller):
     @param callback - function to callback when a change in files has occured
     @param exception_callback - function to callback when an exception occurs
     @param interval - polling interval for checking this directory
+    If the config harvester_type is HarvesterType.INOTIFY_DIRECTORY the directory is only checked
+    when inotify reports a file was written or moved into it, or a file's modification wait is up.
     """
     def __init__(self, config, memento, callback, exception_callback=None, interval=1, file_mod_wait=30):
         log.debug("Initialize harvester with config: %s", config)
@@ -68,6 +77,11 @@ class SingleDirectoryPoller(ConditionPoller):
         wildcard = config.get('pattern')
         if not os.path.isdir(directory):
             raise ValueError('%s is not a directory'%directory)
+        self._directory = directory
+        self._wildcard = wildcard
+        self._harvester_type = config.get(DataSetDriverConfigKeys.HARVESTER_TYPE, HarvesterType.SINGLE_DIRECTORY)
+        # the time the next file waiting out its modification wait time can be sent
+        self._next_ready_time = None
         self.file_mod_wait = file_mod_wait
         if not isinstance(self.file_mod_wait, int) or self.file_mod_wait < 0:
             raise TypeError("File modification wait time must be an integer 0 or greater")
@@ -77,10 +91,16 @@ class SingleDirectoryPoller(ConditionPoller):
         self._path = directory + '/' + wildcard
         log.debug("Starting harvester with directory pattern: %s", self._path)
 
-        # this queue holds the names of the files that have been sent to the driver.  Each time the harvester
-        # restarts, the queue is emptied so all files that have not been ingested can be added and sent again,
+        # this set holds the names of the files that have been sent to the driver.  Each time the harvester
+        # restarts, the set is emptied so all files that have not been ingested can be added and sent again,
         # but this keeps the harvester from sending the same files over and over to not be put in the driver queue
-        self.sent_to_driver_queue = []
+        self._sent_to_driver = set()
+        # paths found on the last check, so cached checksums of files that go away can be dropped
+        self._found_paths = set()
+        # pipe written to on shutdown to wake an inotify harvester out of select, and the lock
+        # that keeps it from being written to as it is closed
+        self._wake_pipe = None
+        self._wake_lock = Lock()
         super(SingleDirectoryPoller,self).__init__(self._check_for_files, callback,
                                                    exception_callback, interval)
 
@@ -100,24 +120,42 @@ class SingleDirectoryPoller(ConditionPoller):
             else:
                 filenames.sort()
 
+        found_paths = set(filenames)
+        for removed_path in self._found_paths - found_paths:
+            FINGERPRINTS.forget(removed_path)
+        self._found_paths = found_paths
+
         new_files = []
         modified_state = {}
+        self._next_ready_time = None
         # loop over all files in the directory and compare their state to that in the harvester state dictionary
+        now = time.time()
         for i_file in filenames:
-            mod_time = os.path.getmtime(i_file)
+            file_name = os.path.basename(i_file)
+            ingested = file_name in self._found_file_state and \
+                       self._found_file_state[file_name][DriverStateKey.INGESTED]
+            if not ingested and file_name in self._sent_to_driver:
+                # already waiting in the driver, no need to look at it again
+                continue
+            try:
+                stat_result = os.stat(i_file)
+            except OSError:
+                # removed since the directory was listed
+                FINGERPRINTS.forget(i_file)
+                self._found_paths.discard(i_file)
+                continue
+            mod_time = stat_result.st_mtime
             # check if the file has not been modified in the last X seconds
-            if (mod_time + self.file_mod_wait) < time.time():
-                file_name = os.path.basename(i_file)
+            if (mod_time + self.file_mod_wait) < now:
                 # find if this file already exists in the found files
-                if file_name in self._found_file_state and self._found_file_state[file_name][DriverStateKey.INGESTED]:
+                if ingested:
                     # this file has been ingested (file size and date will only be available for ingested files)
-                    file_size = os.path.getsize(i_file)
+                    file_size = stat_result.st_size
                     if self._found_file_state[file_name][DriverStateKey.FILE_SIZE] != file_size or \
                     self._found_file_state[file_name][DriverStateKey.FILE_MOD_DATE] != mod_time:
                        # this file has been ingested, but the file size and times don't match, confirm that
                        # the checksum is different
-                        with open(i_file, 'rb') as filehandle:
-                            md5_checksum = hashlib.md5(filehandle.read()).hexdigest()
+                        md5_checksum = FINGERPRINTS.checksum(i_file, stat_result)
                         if self._found_file_state[file_name][DriverStateKey.FILE_CHECKSUM] != md5_checksum:
                             # ingested file has been modified!
                             if DriverStateKey.MODIFIED_STATE in self._found_file_state[file_name]:
@@ -143,14 +181,87 @@ class SingleDirectoryPoller(ConditionPoller):
                 else:
                     # send all files that have not been ingested yet, but keep track in a queue so
                     # duplicates are not sent
-                    if file_name not in self.sent_to_driver_queue:
-                        # only send this file once
-                        self.sent_to_driver_queue.append(file_name)
-                        new_files.append(file_name)
+                    # only send this file once
+                    self._sent_to_driver.add(file_name)
+                    new_files.append(file_name)
+            elif self._next_ready_time is None or mod_time + self.file_mod_wait < self._next_ready_time:
+                self._next_ready_time = mod_time + self.file_mod_wait
 
         log.debug('found new files: %r, modified_files: %r', new_files, modified_state)
         return (new_files, modified_state)
 
+    def shutdown(self):
+        """
+        Stop the harvester, waking it up if it is waiting on inotify events
+        """
+        super(SingleDirectoryPoller, self).shutdown()
+        with self._wake_lock:
+            if self._wake_pipe is not None:
+                os.write(self._wake_pipe[1], 'x')
+
+    def run(self):
+        """
+        Poll the directory, or wait on inotify events for an inotify harvester.  If inotify
+        is unavailable or the watch is lost this falls back to polling.
+        """
+        if self._harvester_type == HarvesterType.INOTIFY_DIRECTORY:
+            try:
+                watch = DirectoryWatch(self._directory)
+            except OSError as e:
+                log.warn("Unable to watch %s with inotify, polling instead: %s", self._directory, e)
+            else:
+                with self._wake_lock:
+                    if not self._shutdown_now.is_set():
+                        self._wake_pipe = os.pipe()
+                try:
+                    if self._wake_pipe is not None:
+                        self._watch_directory(watch)
+                except:
+                    log.error('thread failed', exc_info=True)
+                finally:
+                    watch.close()
+                    with self._wake_lock:
+                        if self._wake_pipe is not None:
+                            os.close(self._wake_pipe[0])
+                            os.close(self._wake_pipe[1])
+                            self._wake_pipe = None
+        if not self._shutdown_now.is_set():
+            super(SingleDirectoryPoller, self).run()
+
+    def _watch_directory(self, watch):
+        """
+        Check the directory each time inotify reports a matching file was written or moved into
+        it, when the next file waiting out its modification wait time is ready, and every
+        INOTIFY_RESCAN_INTERVAL seconds.  Returns on shutdown, or if the watched directory goes away.
+        Shutdown wakes this up by writing to the wake pipe.
+        @param watch - DirectoryWatch on this directory
+        """
+        # pick up anything already in the directory
+        self._check_condition()
+        next_rescan = time.time() + INOTIFY_RESCAN_INTERVAL
+        while not self._shutdown_now.is_set():
+            now = time.time()
+            wake_time = next_rescan
+            if self._next_ready_time is not None:
+                # the file mod wait check is strict, wake just after the file is ready
+                wake_time = min(wake_time, self._next_ready_time + 0.01)
+            timeout = max(wake_time - now, 0)
+            (readable, writeable, errors) = select.select([watch, self._wake_pipe[0]], [], [], timeout)
+            if self._shutdown_now.is_set():
+                break
+
+            check = time.time() >= wake_time
+            if watch in readable:
+                for (mask, name) in watch.read_events():
+                    if mask & IN_WATCH_GONE:
+                        log.warn("Lost inotify watch on %s, polling instead", self._directory)
+                        return
+                    if mask & IN_Q_OVERFLOW or fnmatch.fnmatch(name, self._wildcard):
+                        check = True
+            if check:
+                self._check_condition()
+                next_rescan = time.time() + INOTIFY_RESCAN_INTERVAL
+
     def sort_files(self, filenames):
         """
         Sorts files which have multiple indices separated by underscores in a file name.
@@ -278,8 +389,9 @@ class SingleFilePoller(ConditionPoller):
         """
         new_driver_state = None
         if os.path.exists(self._path):
-            mod_time = os.path.getmtime(self._path)
-            file_size = os.path.getsize(self._path)
+            stat_result = os.stat(self._path)
+            mod_time = stat_result.st_mtime
+            file_size = stat_result.st_size
             # check if the file has not been modified in the last X seconds
             if (mod_time + self.file_mod_wait) < time.time():
                 if DriverStateKey.FILE_SIZE in self._found_file_state:
@@ -288,8 +400,7 @@ class SingleFilePoller(ConditionPoller):
                     if self._found_file_state[DriverStateKey.FILE_SIZE] != file_size or \
                         self._found_file_state[DriverStateKey.FILE_MOD_DATE] != mod_time:
                         # size or time is different, confirm with checksum
-                        with open(self._path, 'rb') as filehandle:
-                            md5_checksum = hashlib.md5(filehandle.read()).hexdigest()
+                        md5_checksum = FINGERPRINTS.checksum(self._path, stat_result)
                         if self._found_file_state[DriverStateKey.FILE_CHECKSUM] != md5_checksum:
                             # file is different, update the state
                             self._found_file_state[DriverStateKey.FILE_SIZE] = file_size
@@ -305,8 +416,7 @@ class SingleFilePoller(ConditionPoller):
                             }
                 else:
                     # no driver state yet, first time opening this file
-                    with open(self._path, 'rb') as filehandle:
-                        md5_checksum = hashlib.md5(filehandle.read()).hexdigest()
+                    md5_checksum = FINGERPRINTS.checksum(self._path, stat_result)
 
                     self._found_file_state[DriverStateKey.FILE_SIZE] = file_size
                     self._found_file_state[DriverStateKey.FILE_MOD_DATE] = mod_time
@@ -319,6 +429,8 @@ class SingleFilePoller(ConditionPoller):
                             DriverStateKey.FILE_CHECKSUM: md5_checksum
                         }
                     }
+        else:
+            FINGERPRINTS.forget(self._path)
         return new_driver_state
     
 class SingleFileHarvester(SingleFilePoller, Harvester):
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+"""
+@package mi.dataset.mapped_file Memory mapped input for dataset parsers
+@file mi/dataset/mapped_file.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief A read only, file-like view of a memory mapped data file. Parsers that
+only read, seek and tell work on it unchanged, while parsers and sieves that
+know about it can scan the mapped bytes in place through the buffer attribute
+instead of reading the file into a string first.
+"""
+
+__author__ = 'Ocean Observatories Initiative <contactooici@oceanobservatories.org>'
+__license__ = 'Apache 2.0'
+
+import os
+import mmap
+
+from mi.core.log import get_logger ; log = get_logger()
+
+
+class MappedFile(object):
+    """
+    File-like wrapper around a read only memory map of a file
+    """
+
+    def __init__(self, path):
+        """
+        @param path The path of the file to map
+        """
+        self.name = path
+        self._file = open(path, 'rb')
+        self._position = 0
+        size = os.fstat(self._file.fileno()).st_size
+        if size > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # zero length files can't be mapped
+            self._map = None
+        log.debug("Mapped %d bytes of %s", size, path)
+
+    @property
+    def buffer(self):
+        """
+        The mapped file contents, which can be sliced, searched with re and
+        unpacked with struct.unpack_from without copying the whole file
+        """
+        if self._map is None:
+            return ''
+        return self._map
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def view(self, start, end=None):
+        """
+        Get a read only view of part of the file without copying it
+        @param start The first byte offset
+        @param end The offset past the last byte, None for the end of the file
+        @retval buffer object over the mapped bytes
+        """
+        if end is None:
+            end = len(self)
+        return buffer(self.buffer, start, max(end - start, 0))
+
+    def read(self, size=-1):
+        """
+        Read up to size bytes from the current position
+        @param size The number of bytes to read, negative for the rest of the file
+        @retval string of the bytes read, empty at the end of the file
+        """
+        if size is None or size < 0:
+            end = len(self)
+        else:
+            end = min(self._position + size, len(self))
+        data = self.buffer[self._position:end]
+        self._position = max(end, self._position)
+        return data
+
+    def readline(self, size=-1):
+        """
+        Read up to and including the next newline
+        @param size The maximum number of bytes to read, negative for no limit
+        @retval string of the line read, empty at the end of the file
+        """
+        end = self.buffer.find('\n', self._position)
+        end = len(self) if end < 0 else end + 1
+        if size is not None and size >= 0:
+            end = min(end, self._position + size)
+        return self.read(end - self._position)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """
+        Move the current position
+        @param offset The offset to move by
+        @param whence os.SEEK_SET, os.SEEK_CUR or os.SEEK_END
+        """
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += len(self)
+        if offset < 0:
+            raise IOError("Invalid seek offset %d" % offset)
+        self._position = offset
+
+    def tell(self):
+        return self._position
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        # the map itself is left for garbage collection, parsers may still
+        # hold on to the buffer after the driver closes the file
+        self._map = None
+        self._file.close()
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
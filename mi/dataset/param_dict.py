@@ -10,6 +10,7 @@ import re
 
 from mi.core.instrument.protocol_param_dict import ProtocolParameterDict, ParameterDescription
 from mi.core.instrument.protocol_param_dict import ParameterValue, ParameterDictVisibility
+from mi.core.instrument.protocol_param_dict import leading_literal
 
 from mi.core.log import get_logger ; log = get_logger()
 
@@ -148,6 +149,14 @@ class DatasetParameterDict(ProtocolParameterDict):
         val = RegexParameter(name, pattern, f_getval, f_format, value=value, regex_flags=regex_flags)
         self._param_dict[name] = val
 
+    def extraction_plan(self):
+        """
+        Compile the parameters into a plan which extracts them all from an
+        input without the dictionary.
+        @retval DatasetExtractionPlan for the parameters
+        """
+        return DatasetExtractionPlan(self._param_dict)
+
     def update(self, in_data):
         """
         Update the dictionaray with a line input. Iterate through all objects
@@ -177,3 +186,64 @@ class DatasetParameterDict(ProtocolParameterDict):
         Return the encoding errors list
         """
         return self._encoding_errors
+
+class DatasetExtractionPlan(object):
+    """
+    The regexes of a dataset parameter dictionary, compiled once so every
+    parameter can be extracted from many inputs without building and
+    updating a new dictionary for each. Parameters with the same pattern
+    share one search of the input, which starts where the pattern's leading
+    literal first occurs.
+    """
+    def __init__(self, param_dict):
+        """
+        @param param_dict The name : RegexParameter dictionary to compile
+        """
+        # names in dictionary order, so values and errors come out in the
+        # order updating the dictionary gives them
+        self.names = []
+        # (regex, leading literal, [(name, f_getval)]) for each pattern
+        self._searches = []
+        by_pattern = {}
+        for (name, val) in param_dict.iteritems():
+            self.names.append(name)
+            key = (val.regex.pattern, val.regex.flags)
+            if key not in by_pattern:
+                by_pattern[key] = (val.regex, leading_literal(val.regex), [])
+                self._searches.append(by_pattern[key])
+            by_pattern[key][2].append((name, val.f_getval))
+
+    def extract(self, in_data):
+        """
+        Extract every parameter from an input, the same as updating a new
+        DatasetParameterDict with it and getting all the values.
+        @param in_data A set of data to match parameters in
+        @retval tuple of the name : value dict, None if there was no match,
+        and the list of encoding errors
+        """
+        if not isinstance(in_data, str):
+            in_data = str(in_data)
+
+        found = {}
+        failed = set()
+        for (regex, literal, params) in self._searches:
+            # no match can start before the first occurrence of the literal
+            start = in_data.find(literal)
+            if start < 0:
+                continue
+            match = regex.search(in_data, start)
+            if match:
+                for (name, f_getval) in params:
+                    try:
+                        found[name] = f_getval(match)
+                    except Exception:
+                        failed.add(name)
+
+        values = {}
+        encoding_errors = []
+        for name in self.names:
+            values[name] = found.get(name)
+            if name in failed:
+                log.error("Dataset parameter dict error encoding Name:%s, set to None", name)
+                encoding_errors.append({name: None})
+        return (values, encoding_errors)
@@ -13,9 +13,9 @@ initial release
 __author__ = 'Jeff Roy'
 __license__ = 'Apache 2.0'
 
-import copy
 import datetime as dt
 import ntplib
+import numpy as np
 import re
 import struct
 
@@ -24,6 +24,7 @@ from calendar import timegm
 from mi.core.log import get_logger
 
 log = get_logger()
+from mi.core.checksum import sum8
 from mi.core.common import BaseEnum
 from mi.core.instrument.data_particle import \
     DataParticle, DataParticleKey, DataParticleValue
@@ -51,6 +52,11 @@ PERCENT_GOOD_BYTES_PER_CELL = 4
 ADCPS_BOTTOM_TRACK_BYTES = 85
 ADCPA_BOTTOM_TRACK_BYTES = 81
 CHECKSUM_BYTES = 2
+BEAMS_PER_CELL = 4
+
+#numpy types of one beam value in the depth cell data types
+VELOCITY_DTYPE = np.dtype('<i2')
+BEAM_BYTE_DTYPE = np.dtype('u1')
 
 #used to verify 16 bit checksum
 CHECKSUM_MODULO = 65535
@@ -763,119 +769,61 @@ class AdcpPd0DataParticle(DataParticle):
             self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.ENSEMBLE_START_TIME2,
                                                         ntp_ts, float))
 
+    def parse_depth_cells(self, data, dtype, keys):
+        """
+        Decode a depth cell data type block as a num_cells x 4 array in one
+        pass and append one list per beam column to the particle
+        @param data the data type block, starting with its ID
+        @param dtype numpy dtype of a single beam value
+        @param keys particle keys of the 4 beam columns, in order
+        """
+        num_cells = self.num_depth_cells
+        cells = np.frombuffer(data, dtype=dtype, count=num_cells * BEAMS_PER_CELL,
+                              offset=ID_BYTES).reshape(num_cells, BEAMS_PER_CELL)
+
+        for column, key in enumerate(keys):
+            # tolist hands back python ints, same as struct did
+            self.final_result.append(self._encode_value(key, cells[:, column].tolist(), list))
+
     def parse_velocity_data(self, data):
         """
         Parse the velocity portion of the particle
         """
-        num_cells = self.num_depth_cells
-        offset = ID_BYTES
-
-        water_velocity_east = []
-        water_velocity_north = []
-        water_velocity_up = []
-        error_velocity = []
-        for row in range(0, num_cells):
-            (a, b, c, d) = struct.unpack_from('<4h', data, offset)
-            water_velocity_east.append(a)
-            water_velocity_north.append(b)
-            water_velocity_up.append(c)
-            error_velocity.append(d)
-            offset += VELOCITY_BYTES_PER_CELL
-
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.WATER_VELOCITY_EAST,
-                                                    water_velocity_east, list))
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.WATER_VELOCITY_NORTH,
-                                                    water_velocity_north, list))
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.WATER_VELOCITY_UP,
-                                                    water_velocity_up, list))
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.ERROR_VELOCITY,
-                                                    error_velocity, list))
+        self.parse_depth_cells(data, VELOCITY_DTYPE,
+                               (AdcpPd0ParserDataParticleKey.WATER_VELOCITY_EAST,
+                                AdcpPd0ParserDataParticleKey.WATER_VELOCITY_NORTH,
+                                AdcpPd0ParserDataParticleKey.WATER_VELOCITY_UP,
+                                AdcpPd0ParserDataParticleKey.ERROR_VELOCITY))
 
     def parse_correlation_magnitude_data(self, data):
         """
         Parse the correlation magnitude portion of the particle
         """
-        num_cells = self.num_depth_cells
-        offset = ID_BYTES
-
-        correlation_magnitude_beam1 = []
-        correlation_magnitude_beam2 = []
-        correlation_magnitude_beam3 = []
-        correlation_magnitude_beam4 = []
-        for row in range(0, num_cells):
-            (a, b, c, d) = struct.unpack_from('<4B', data, offset)
-            correlation_magnitude_beam1.append(a)
-            correlation_magnitude_beam2.append(b)
-            correlation_magnitude_beam3.append(c)
-            correlation_magnitude_beam4.append(d)
-            offset += CORRELATION_BYTES_PER_CELL
-
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.CORRELATION_MAGNITUDE_BEAM1,
-                                                    correlation_magnitude_beam1, list))
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.CORRELATION_MAGNITUDE_BEAM2,
-                                                    correlation_magnitude_beam2, list))
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.CORRELATION_MAGNITUDE_BEAM3,
-                                                    correlation_magnitude_beam3, list))
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.CORRELATION_MAGNITUDE_BEAM4,
-                                                    correlation_magnitude_beam4, list))
+        self.parse_depth_cells(data, BEAM_BYTE_DTYPE,
+                               (AdcpPd0ParserDataParticleKey.CORRELATION_MAGNITUDE_BEAM1,
+                                AdcpPd0ParserDataParticleKey.CORRELATION_MAGNITUDE_BEAM2,
+                                AdcpPd0ParserDataParticleKey.CORRELATION_MAGNITUDE_BEAM3,
+                                AdcpPd0ParserDataParticleKey.CORRELATION_MAGNITUDE_BEAM4))
 
     def parse_echo_intensity_data(self, data):
         """
         Parse the echo intensity portion of the particle
         """
-        num_cells = self.num_depth_cells
-        offset = ID_BYTES
-
-        echo_intesity_beam1 = []
-        echo_intesity_beam2 = []
-        echo_intesity_beam3 = []
-        echo_intesity_beam4 = []
-        for row in range(0, num_cells):
-            (a, b, c, d) = struct.unpack_from('<4B', data, offset)
-            echo_intesity_beam1.append(a)
-            echo_intesity_beam2.append(b)
-            echo_intesity_beam3.append(c)
-            echo_intesity_beam4.append(d)
-            offset += ECHO_INTENSITY_BYTES_PER_CELL
-
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.ECHO_INTENSITY_BEAM1,
-                                                    echo_intesity_beam1, list))
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.ECHO_INTENSITY_BEAM2,
-                                                    echo_intesity_beam2, list))
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.ECHO_INTENSITY_BEAM3,
-                                                    echo_intesity_beam3, list))
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.ECHO_INTENSITY_BEAM4,
-                                                    echo_intesity_beam4, list))
+        self.parse_depth_cells(data, BEAM_BYTE_DTYPE,
+                               (AdcpPd0ParserDataParticleKey.ECHO_INTENSITY_BEAM1,
+                                AdcpPd0ParserDataParticleKey.ECHO_INTENSITY_BEAM2,
+                                AdcpPd0ParserDataParticleKey.ECHO_INTENSITY_BEAM3,
+                                AdcpPd0ParserDataParticleKey.ECHO_INTENSITY_BEAM4))
 
     def parse_percent_good_data(self, data):
         """
         Parse the percent good portion of the particle
-
-        @throws RecoverableSampleException If there is a problem with sample creation
         """
-        num_cells = self.num_depth_cells
-        offset = ID_BYTES
-
-        percent_good_3beam = []
-        percent_transforms_reject = []
-        percent_bad_beams = []
-        percent_good_4beam = []
-        for row in range(0, num_cells):
-            (a, b, c, d) = struct.unpack_from('<4B', data, offset)
-            percent_good_3beam.append(a)
-            percent_transforms_reject.append(b)
-            percent_bad_beams.append(c)
-            percent_good_4beam.append(d)
-            offset += PERCENT_GOOD_BYTES_PER_CELL
-
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.PERCENT_GOOD_3BEAM,
-                                                    percent_good_3beam, list))
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.PERCENT_TRANSFORMS_REJECT,
-                                                    percent_transforms_reject, list))
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.PERCENT_BAD_BEAMS,
-                                                    percent_bad_beams, list))
-        self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.PERCENT_GOOD_4BEAM,
-                                                    percent_good_4beam, list))
+        self.parse_depth_cells(data, BEAM_BYTE_DTYPE,
+                               (AdcpPd0ParserDataParticleKey.PERCENT_GOOD_3BEAM,
+                                AdcpPd0ParserDataParticleKey.PERCENT_TRANSFORMS_REJECT,
+                                AdcpPd0ParserDataParticleKey.PERCENT_BAD_BEAMS,
+                                AdcpPd0ParserDataParticleKey.PERCENT_GOOD_4BEAM))
 
     def parse_bottom_track_data(self, data):
         """
@@ -1092,7 +1040,7 @@ class AdcpPd0Parser(BufferLoadingParser):
             if sample:
                 # create particle
                 log.trace("Extracting sample chunk %s with read_state: %s", chunk, self._read_state)
-                result_particles.append((sample, copy.copy(self._read_state)))
+                result_particles.append((sample, self._checkpoint()))
 
             (nd_timestamp, non_data, non_start, non_end) = self._chunker.get_next_non_data_with_index(clean=False)
             (timestamp, chunk, start, end) = self._chunker.get_next_data_with_index()
@@ -1128,7 +1076,8 @@ class AdcpPd0Parser(BufferLoadingParser):
         #log.debug("sieve called with buffer of length %d", len(input_buffer))
 
         indices_list = []  # initialize the return list to empty
-        header_iter = ADCPS_PD0_HEADER_MATCHER.finditer(input_buffer[0: -CHECKSUM_BYTES])
+        search_end = len(input_buffer) - CHECKSUM_BYTES
+        header_iter = ADCPS_PD0_HEADER_MATCHER.finditer(input_buffer, 0, max(search_end, 0))
         #find all occurrences of the record header sentinel
         #don't look in the last 2 bytes because you will not have num bytes
 
@@ -1139,7 +1088,7 @@ class AdcpPd0Parser(BufferLoadingParser):
 
             #log.debug("sieve function found sentinel at byte  %d", record_start)
 
-            num_bytes = struct.unpack("<H", input_buffer[record_start + 2: record_start + 4])[0]
+            num_bytes = struct.unpack_from("<H", input_buffer, record_start + 2)[0]
             # get the number of bytes in the record, does not include the 2 checksum bytes
 
             record_end = record_start + num_bytes
@@ -1147,19 +1096,15 @@ class AdcpPd0Parser(BufferLoadingParser):
             #log.debug("sieve function number of bytes= %d , record end is %d", num_bytes, record_end)
 
             #if there is enough in the buffer check the record
-            if record_end <= len(input_buffer[0: -CHECKSUM_BYTES]):
+            if record_end <= search_end:
                 #make sure the checksum bytes are in the buffer too
 
-                total = 0
-                for i in range(record_start, record_end):
-                    total += ord(input_buffer[i])
                 #add up all the bytes in the record
-
-                checksum = total & CHECKSUM_MODULO  # bitwise and with 65535 or mod vs 65536
+                checksum = sum8(input_buffer, record_start, record_end, mask=CHECKSUM_MODULO)
 
                 #log.debug("sieve checksum & total = %d %d ", checksum, total)
 
-                if checksum == struct.unpack("<H", input_buffer[record_end: record_end + CHECKSUM_BYTES])[0]:
+                if checksum == struct.unpack_from("<H", input_buffer, record_end)[0]:
                     #verify the checksum
                     indices_list.append((record_start, record_end + CHECKSUM_BYTES))
                     #include the 2 checksum bytes in the chunk
@@ -20,7 +20,6 @@ Release notes:
 __author__ = 'Christopher Wingard'
 __license__ = 'Apache 2.0'
 
-import copy
 import datetime as dt
 import re
 from calendar import timegm
@@ -1048,7 +1047,7 @@ class AdcpaParser(BufferLoadingParser):
             if particle:
                 log.trace("Particle creation succeeded at position: %d to %d bytes", start, end)
                 self._increment_state(end)
-                result_particles.append((particle, copy.copy(self._read_state)))
+                result_particles.append((particle, self._checkpoint()))
             else:
                 log.trace("Particle creation failed at position: %d to %d bytes", start, end)
 
@@ -13,7 +13,6 @@ Initial Release
 __author__ = 'Maria Lutz'
 __license__ = 'Apache 2.0'
 
-import copy
 import re
 import ntplib
 import struct
@@ -354,7 +353,7 @@ class AdcpsJlnStcParser(BufferLoadingParser):
             if sample:
                 # increment by the length of the matched header and save the header          
                 self._increment_state(len(header_match.group(0)))
-                self._saved_header = (sample, copy.copy(self._read_state))
+                self._saved_header = (sample, self._checkpoint())
         else:
             log.error("File header or footer does not match header regex")
             raise SampleException("File header or footer does not match header regex")
@@ -413,7 +412,7 @@ class AdcpsJlnStcParser(BufferLoadingParser):
                             # create particle
                             log.trace("Extracting sample chunk %s with read_state: %s", chunk, self._read_state)
                             self._increment_state(len(chunk))
-                            result_particles.append((sample, copy.copy(self._read_state)))
+                            result_particles.append((sample, self._checkpoint()))
                     else:
                         if len(data_match.group(2)) < MIN_DATA_BYTES:
                             log.debug("Found record with not enough bytes 0x%s",
@@ -14,6 +14,7 @@ __author__ = 'Jeff Laughlin <jeff@jefflaughlinconsulting.com>'
 __license__ = 'Apache 2.0'
 
 
+import time
 import numpy as np
 
 from mi.core.log import get_logger
@@ -43,6 +44,9 @@ class ParserConfigKey(BaseEnum):
     ORBNAME = "orbname"
     SELECT  = "select"
     REJECT  = "reject"
+    BATCH_SIZE = "batch_size" # most packets published per get_records
+    BATCH_TIME = "batch_time" # seconds to spend getting packets per get_records
+    STATE_INTERVAL = "state_interval" # seconds between tafter state updates
 
 
 class StateKey(BaseEnum):
@@ -51,6 +55,13 @@ class StateKey(BaseEnum):
     REJECT  = "reject"
 
 
+# the size of the reap thread packet queue, and the default batch size
+ORB_QUEUE_SIZE = 100
+DEFAULT_BATCH_TIME = 0.5
+# tafter is pushed to the driver after every batch
+DEFAULT_STATE_INTERVAL = 0
+
+
 class DataParticleType(BaseEnum):
     ANTELOPE_ORB_PACKET = 'antelope_orb_packet'
 
@@ -243,41 +254,83 @@ class AntelopeOrbParser(Parser):
 
         tafter = state[StateKey.TAFTER]
 
-        self._orbreapthr = OrbReapThr(orbname, select, reject, float(tafter), timeout=0, queuesize=100)
+        self._batch_size = config.get(ParserConfigKey.BATCH_SIZE, ORB_QUEUE_SIZE)
+        self._batch_time = config.get(ParserConfigKey.BATCH_TIME, DEFAULT_BATCH_TIME)
+        self._state_interval = config.get(ParserConfigKey.STATE_INTERVAL, DEFAULT_STATE_INTERVAL)
+        # tafter has been updated since it was last pushed to the driver
+        self._state_changed = False
+        self._state_time = time.time()
+        # packets got after one which failed, published before any new ones
+        self._pending = []
+
+        self._orbreapthr = OrbReapThr(orbname, select, reject, float(tafter), timeout=0, queuesize=ORB_QUEUE_SIZE)
         log.info("Connected to ORB %s %s %s %s" % (orbname, select, reject, tafter))
 
     def kill_threads(self):
+        # don't lose the tafter of packets already published
+        self._push_state()
         self._orbreapthr.stop_and_wait()
         self._orbreapthr.destroy()
 
-    def get_records(self):
+    def _push_state(self):
+        """
+        Push the state to the driver if tafter has been updated since it was
+        last pushed
+        """
+        if self._state_changed:
+            log.debug("State: %s", self._state)
+            self._state_changed = False
+            self._state_time = time.time()
+            self._state_callback(self._state, False) # push new state to driver
+
+    def get_records(self, num_records=None):
         """
-        Go ahead and execute the data parsing loop up to a point. This involves
-        getting data from the file, stuffing it in to the chunker, then parsing
-        it and publishing.
-        @param num_records The number of records to gather
-        @retval Return the list of particles requested, [] if none available
+        Get the packets queued by the reap thread, up to the batch size or
+        until the batch time is up, and publish them as one batch.  Tafter is
+        pushed to the driver at most every state interval seconds.  If a
+        packet fails, the packets before it are published and the packets
+        after it are kept for the next call.
+        @param num_records The most packets to get, defaults to the batch size
+        @retval Return the list of packets published, [] if none available
+        @throws SampleException if a packet can't be unstuffed
         """
         log.trace("GET RECORDS")
+        if self.stop:
+            return
+        num_records = num_records or self._batch_size
+        if self._pending:
+            get_rs = self._pending[:num_records]
+            self._pending = self._pending[num_records:]
+        else:
+            try:
+                get_rs = self._orbreapthr.get_many(num_records, self._batch_time)
+            except (Timeout, NoData), e:
+                log.debug("orbreapthr.get_many exception %r" % type(e))
+                return []
+
+        particles = []
         try:
-            if self.stop:
-                return
-            get_r = self._orbreapthr.get()
-            pktid, srcname, orbtimestamp, raw_packet = get_r
-            log.trace("get_r: %s %s %s %s", pktid, srcname, orbtimestamp, len(raw_packet))
-            particle = make_antelope_particle(
-                get_r,
-                preferred_timestamp = DataParticleKey.INTERNAL_TIMESTAMP,
-                new_sequence=False,
-            )
-            self._publish_sample(particle)
-            # TODO rate limit state updates?
-            self._state[StateKey.TAFTER] = orbtimestamp
-            log.debug("State: ", self._state)
-            self._state_callback(self._state, False) # push new state to driver
-        except (Timeout, NoData), e:
-            log.debug("orbreapthr.get exception %r" % type(e))
-            return None
-        return get_r
+            for get_r in get_rs:
+                pktid, srcname, orbtimestamp, raw_packet = get_r
+                log.trace("get_r: %s %s %s %s", pktid, srcname, orbtimestamp, len(raw_packet))
+                try:
+                    particles.append(make_antelope_particle(
+                        get_r,
+                        preferred_timestamp = DataParticleKey.INTERNAL_TIMESTAMP,
+                        new_sequence=False,
+                    ))
+                except Exception:
+                    self._pending = get_rs[len(particles) + 1:] + self._pending
+                    raise
+        finally:
+            # publish the packets before one which failed as if it had been got alone
+            if particles:
+                self._publish_sample(particles)
+                self._state[StateKey.TAFTER] = get_rs[len(particles) - 1][2]
+                self._state_changed = True
+            if len(particles) < len(get_rs) or \
+               time.time() - self._state_time >= self._state_interval:
+                self._push_state()
+        return get_rs
 
 
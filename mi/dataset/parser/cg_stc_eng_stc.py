@@ -342,6 +342,8 @@ class CgStcEngStcParserDataParticle(DataParticle):
     Class for parsing data from the cg_stc_eng_stc data set
     """
     _data_particle_type = CgDataParticleType.SAMPLE
+    # compiled from the param_dict the first time a particle is built
+    _extraction_plan = None
 
     def _build_parsed_values(self):
         """
@@ -350,14 +352,15 @@ class CgStcEngStcParserDataParticle(DataParticle):
         @throws SampleException If there is a problem with sample creation
         """
         result = []
-        # Instantiate the param_dict 
-        params = self._build_param_dict()
-        
+        # the param_dict is the same for every particle, only build it once
+        plan = self.__class__.__dict__.get('_extraction_plan')
+        if plan is None:
+            plan = self._build_param_dict().extraction_plan()
+            self.__class__._extraction_plan = plan
+
         # Go through the param_dict dictionary for every definition
-        params.update(self.raw_data)
-        encoding_errors = params.get_encoding_errors()
+        (all_params, encoding_errors) = plan.extract(self.raw_data)
         self._encoding_errors = encoding_errors
-        all_params = params.get_all()
         for (key, value) in all_params.iteritems():
             result.append({DataParticleKey.VALUE_ID: key, DataParticleKey.VALUE: value})
         log.debug("CgStcEngStcParserDataParticle %s", result)
@@ -12,7 +12,6 @@ files. It initially holds SBE52-specific logic, ultimately more than that.
 __author__ = 'Steve Foley'
 __license__ = 'Apache 2.0'
 
-import copy
 import re
 import time
 import ntplib
@@ -247,7 +246,7 @@ class CtdpfParser(BufferLoadingParser):
                     log.trace("Extracting sample chunk %s with read_state: %s", chunk, self._read_state)
                     self._increment_state(end, self._timestamp)    
                     self._increment_timestamp() # increment one samples worth of time
-                    result_particles.append((sample, copy.copy(self._read_state)))
+                    result_particles.append((sample, self._checkpoint()))
 
                 # Check for noise between records, but ignore newline.  This is detecting noise following
                 # the last successful chunk read which is why it is post sample generation.
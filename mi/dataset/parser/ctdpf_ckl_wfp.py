@@ -43,12 +43,14 @@ class CtdpfCklWfpParserDataParticle(DataParticle):
     """
 
     _data_particle_type = DataParticleType.DATA
+    _encoding_rules = [(CtdpfCklWfpParserDataParticleKey.CONDUCTIVITY, int),
+                       (CtdpfCklWfpParserDataParticleKey.TEMPERATURE, int),
+                       (CtdpfCklWfpParserDataParticleKey.PRESSURE, int)]
 
-    def _build_parsed_values(self):
+    def _build_raw_values(self):
         """
         Take something in the data format and turn it into
-        an array of dictionaries defining the data in the particle
-        with the appropriate tag.
+        a tuple of the values in the particle, in encoding rule order.
         @throws SampleException If there is a problem with sample creation
         """
         if len(self.raw_data) != DATA_RECORD_BYTES:
@@ -59,11 +61,7 @@ class CtdpfCklWfpParserDataParticle(DataParticle):
                  struct.unpack('>I', '\x00' + self.raw_data[3:6]) + \
                  struct.unpack('>I', '\x00' + self.raw_data[6:9])
 
-        result = [self._encode_value(CtdpfCklWfpParserDataParticleKey.CONDUCTIVITY, fields[0], int),
-                  self._encode_value(CtdpfCklWfpParserDataParticleKey.TEMPERATURE, fields[1], int),
-                  self._encode_value(CtdpfCklWfpParserDataParticleKey.PRESSURE, fields[2], int)]
-
-        return result
+        return fields
 
 
 class CtdpfCklWfpMetadataParserDataParticle(DataParticle):
@@ -13,7 +13,6 @@ __author__ = 'Roger Unwin'
 __license__ = 'Apache 2.0'
 
 import re
-import copy
 from functools import partial
 
 from mi.core.log import get_logger ; log = get_logger()
@@ -154,7 +153,7 @@ class CtdpfkParser(CtdpfParser):
                     log.trace("Extracting sample chunk %s with read_state: %s", chunk, self._read_state)
                     self._increment_state(end, self._timestamp)    
                     self._increment_timestamp() # increment one samples worth of time
-                    result_particles.append((sample, copy.copy(self._read_state)))
+                    result_particles.append((sample, self._checkpoint()))
 
                 # Check for noise between records, but ignore newline.  This is detecting noise following
                 # the last successful chunk read which is why it is post sample generation.
@@ -13,7 +13,6 @@ initial release
 __author__ = 'Emily Hahn'
 __license__ = 'Apache 2.0'
 
-import copy
 import re
 import ntplib
 import struct
@@ -95,7 +94,7 @@ class Flort_kn_stc_imodemParser(WfpEFileParser):
                 # create particle
                 log.trace("Extracting sample %s with read_state: %s", sample, self._read_state)
                 self._increment_state(SAMPLE_BYTES)
-                result_particle = (sample, copy.copy(self._read_state))
+                result_particle = (sample, self._checkpoint())
 
         return result_particle
 
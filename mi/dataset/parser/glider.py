@@ -11,17 +11,14 @@ __license__ = 'Apache 2.0'
 import re
 import numpy as np
 import ntplib
-import copy
 import time
 from datetime import datetime
 
 from math import copysign
-from functools import partial
 
 from mi.core.log import get_logger
 from mi.core.common import BaseEnum
 from mi.core.exceptions import SampleException, DatasetParserException, UnexpectedDataException
-from mi.core.instrument.chunker import StringChunker
 from mi.core.instrument.data_particle import DataParticle, DataParticleKey
 from mi.dataset.dataset_parser import BufferLoadingParser
 
@@ -72,6 +69,104 @@ class GliderParticleKey(BaseEnum):
 
         return result
 
+class GliderSchema(object):
+    """
+    Column layout of a glider data file, compiled once from the column labels
+    and byte sizes in the header so rows can be decoded without looking at
+    each label, and particles can find their columns by index.
+    """
+
+    def __init__(self, labels, num_bytes):
+        """
+        @param labels List of column labels
+        @param num_bytes List of the byte size of each column, 1 and 2 byte
+            columns are integers, others are floats
+        """
+        self.labels = labels
+        self.index = dict((label, column) for (column, label) in enumerate(labels))
+        self.latlon_columns = [column for (column, label) in enumerate(labels)
+                               if '_lat' in label or '_lon' in label]
+        latlon = set(self.latlon_columns)
+        self.int_columns = [column for (column, size) in enumerate(num_bytes)
+                            if size in (1, 2) and column not in latlon]
+        self._columns = {}
+
+    def columns(self, key_list):
+        """
+        Find the columns of the keys that are in this file
+        @param key_list List of keys
+        @retval (value ids, column indices) tuple of tuples, keys with no
+            column are left out
+        """
+        key = tuple(key_list)
+        columns = self._columns.get(key)
+        if columns is None:
+            present = [value_id for value_id in key if value_id in self.index]
+            columns = (tuple(present), tuple(self.index[value_id] for value_id in present))
+            self._columns[key] = columns
+        return columns
+
+
+class GliderRecord(object):
+    """
+    One row of a glider data file decoded into a list of values in column
+    order, with NaN for missing values
+    """
+    __slots__ = ('schema', 'values')
+
+    def __init__(self, schema, values):
+        self.schema = schema
+        self.values = values
+
+    def __getitem__(self, label):
+        """
+        @retval The value in the labelled column
+        @throws KeyError if the file has no such column
+        """
+        return self.values[self.schema.index[label]]
+
+    def value_pairs(self, key_list):
+        """
+        @param key_list List of keys
+        @retval (value ids, values) of the keys that are in this record, NaN
+            values are None
+        """
+        (value_ids, columns) = self.schema.columns(key_list)
+        values = self.values
+        # NaN is the only number not equal to itself
+        return (value_ids, [value if value == value else None
+                            for value in [values[column] for column in columns]])
+
+    def has_data(self, key_list):
+        """
+        @param key_list List of keys
+        @retval True if any of the keys has a value that is not NaN
+        """
+        values = self.values
+        for column in self.schema.columns(key_list)[1]:
+            if values[column] == values[column]:
+                return True
+        return False
+
+
+def line_sieve(raw_data):
+    """
+    Sieve function finding each newline terminated line, the same as
+    regex_sieve_function with r'.*\n' but linear in the length of a partial
+    line at the end of the data, which the regex rescans from each position
+    @param raw_data The data to search
+    @retval A list of (start, end) tuples of the lines
+    """
+    spans = []
+    start = 0
+    end = raw_data.find('\n')
+    while end >= 0:
+        spans.append((start, end + 1))
+        start = end + 1
+        end = raw_data.find('\n', start)
+    return spans
+
+
 class GliderParticle(DataParticle):
     """
     Base particle for glider data. Glider files are
@@ -89,46 +184,46 @@ class GliderParticle(DataParticle):
     common_parameters = GliderParticleKey.list()
 
     def _parsed_values(self, key_list):
-        log.debug(" # GliderParticle._parsed_values(): Build a particle with keys: %s", key_list)
+        value_ids, values = self._parsed_value_pairs(key_list)
+        return [{DataParticleKey.VALUE_ID: value_id, DataParticleKey.VALUE: value}
+                for (value_id, value) in zip(value_ids, values)]
+
+    def _parsed_value_pairs(self, key_list):
+        """
+        Find the keys from the particle key list that are in this record
+        @param key_list List of the keys this particle may contain
+        @retval (value ids, values) tuple of lists, NaN values are None
+        """
+        if isinstance(self.raw_data, GliderRecord):
+            return self.raw_data.value_pairs(key_list)
+
+        log.debug(" # GliderParticle._parsed_value_pairs(): Build a particle with keys: %s", key_list)
         if not isinstance(self.raw_data, dict):
             raise SampleException(
                 "%s: Object Instance is not a Glider Parsed Data \
                  dictionary" % self._data_particle_type)
 
-        result = []
+        value_ids = []
+        values = []
 
         # find if any of the variables from the particle key list are in
         # the data_dict and keep it
         for key in key_list:
             # if the item from the particle is in the raw_data (row) we just sampled...
-            if key in self.raw_data:
+            item = self.raw_data.get(key)
+            if item is not None:
                 # read the value of the item from the dictionary
-                value = self.raw_data[key]['Data']
-
-                log.trace("Evaluating key= %s, value= %s", key, value)
-                # check if this value is a string, implying it is one of the three
-                # file info data items in the particle (filename,fileopen time & mission name)
-                # - don't need to perform a NaN check on a string
-                if isinstance(value, str):
-                    # add the value to the record
-                    result.append({DataParticleKey.VALUE_ID: key,
-                                   DataParticleKey.VALUE: value})
-                    log.trace("Adding Engineering Key: %s, value: %s to particle", key, value)
-                else:
-                    # check to see that the value is not a 'NaN'
-                    if np.isnan(value):
-                        log.trace("NaN Value: %s", key)
-                        value = None
+                value = item['Data']
+                # strings are the file info data items in the particle (filename,
+                # fileopen time & mission name) and don't need a NaN check, NaN
+                # is the only number not equal to itself
+                if not isinstance(value, str) and value != value:
+                    value = None
 
-                    # add the value to the record
-                    result.append({DataParticleKey.VALUE_ID: key,
-                                   DataParticleKey.VALUE: value})
-                    log.trace("Adding Key: %s, value: %s to particle", key, value)
+                value_ids.append(key)
+                values.append(value)
 
-            else:
-                value = None
-
-        return result
+        return (value_ids, values)
 
 class CtdgvParticleKey(GliderParticleKey):
     # science data made available via telemetry or Glider recovery
@@ -142,14 +237,14 @@ class CtdgvDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.CTDGV_M_GLIDER_INSTRUMENT
     science_parameters = CtdgvParticleKey.science_parameter_list()
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Extracts CTDGV data from the glider data dictionary initialized with
         the particle class and puts the data into a CTDGV Data Particle.
 
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         """
-        return self._parsed_values(CtdgvParticleKey.list())
+        return self._parsed_value_pairs(CtdgvParticleKey.list())
 
 
 class DostaTelemeteredParticleKey(GliderParticleKey):
@@ -180,30 +275,30 @@ class DostaTelemeteredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.DOSTA_ABCDJM_GLIDER_INSTRUMENT
     science_parameters = DostaTelemeteredParticleKey.science_parameter_list()
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Takes a GliderParser object and extracts DOSTA data from the
         data dictionary and puts the data into a DOSTA Data Particle.
 
         @param gpd A GliderParser class instance.
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         """
-        return self._parsed_values(DostaTelemeteredParticleKey.list())
+        return self._parsed_value_pairs(DostaTelemeteredParticleKey.list())
 
 
 class DostaRecoveredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.DOSTA_ABCDJM_GLIDER_RECOVERED
     science_parameters = DostaRecoveredParticleKey.science_parameter_list()
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Takes a GliderParser object and extracts DOSTA data from the
         data dictionary and puts the data into a DOSTA Data Particle.
 
         @param gpd A GliderParser class instance.
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         """
-        return self._parsed_values(DostaRecoveredParticleKey.list())
+        return self._parsed_value_pairs(DostaRecoveredParticleKey.list())
 
 
 class FlordParticleKey(GliderParticleKey):
@@ -222,16 +317,16 @@ class FlordDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.FLORD_M_GLIDER_INSTRUMENT
     science_parameters = FlordParticleKey.science_parameter_list()
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Takes a GliderParser object and extracts FLORD data from the
         data dictionary and puts the data into a FLORD Data Particle.
 
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         @throws SampleException if the data is not a glider data dictionary
             produced by GliderParser._read_data
         """
-        return self._parsed_values(FlordParticleKey.list())
+        return self._parsed_value_pairs(FlordParticleKey.list())
 
 
 class FlortTelemeteredParticleKey(GliderParticleKey):
@@ -257,32 +352,32 @@ class FlortTelemeteredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.FLORT_M_GLIDER_INSTRUMENT
     science_parameters = FlortTelemeteredParticleKey.science_parameter_list()
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Takes a GliderParser object and extracts FLORD data from the
         data dictionary and puts the data into a FLORD Data Particle.
 
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         @throws SampleException if the data is not a glider data dictionary
             produced by GliderParser._read_data
         """
-        return self._parsed_values(FlortTelemeteredParticleKey.list())
+        return self._parsed_value_pairs(FlortTelemeteredParticleKey.list())
 
 
 class FlortRecoveredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.FLORT_M_GLIDER_RECOVERED
     science_parameters = FlortRecoveredParticleKey.science_parameter_list()
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Takes a GliderParser object and extracts FLORD data from the
         data dictionary and puts the data into a FLORD Data Particle.
 
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         @throws SampleException if the data is not a glider data dictionary
             produced by GliderParser._read_data
         """
-        return self._parsed_values(FlortRecoveredParticleKey.list())
+        return self._parsed_value_pairs(FlortRecoveredParticleKey.list())
 
 
 class ParadTelemeteredParticleKey(GliderParticleKey):
@@ -302,32 +397,32 @@ class ParadTelemeteredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.PARAD_M_GLIDER_INSTRUMENT
     science_parameters = ParadTelemeteredParticleKey.science_parameter_list()
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Takes a GliderParser object and extracts engineering data from the
         data dictionary and puts the data into a engineering Data Particle.
 
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         @throws SampleException if the data is not a glider data dictionary
             produced by GliderParser._read_data
         """
-        return self._parsed_values(ParadTelemeteredParticleKey.list())
+        return self._parsed_value_pairs(ParadTelemeteredParticleKey.list())
 
 
 class ParadRecoveredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.PARAD_M_GLIDER_RECOVERED
     science_parameters = ParadRecoveredParticleKey.science_parameter_list()
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Takes a GliderParser object and extracts engineering data from the
         data dictionary and puts the data into a engineering Data Particle.
 
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         @throws SampleException if the data is not a glider data dictionary
             produced by GliderParser._read_data
         """
-        return self._parsed_values(ParadRecoveredParticleKey.list())
+        return self._parsed_value_pairs(ParadRecoveredParticleKey.list())
 
 
 class EngineeringRecoveredParticleKey(GliderParticleKey):
@@ -670,32 +765,32 @@ class EngineeringTelemeteredDataParticle(GliderParticle):
     keys_exclude_sci_times.remove(GliderParticleKey.SCI_M_PRESENT_TIME)
     keys_exclude_sci_times.remove(GliderParticleKey.SCI_M_PRESENT_SECS_INTO_MISSION)
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Takes a GliderParser object and extracts engineering data from the
         data dictionary and puts the data into a engineering Data Particle.
 
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         @throws SampleException if the data is not a glider data dictionary
             produced by GliderParser._read_data
         """
         # need to exclude sci_m_present_times
-        return self._parsed_values(EngineeringTelemeteredDataParticle.keys_exclude_sci_times)
+        return self._parsed_value_pairs(EngineeringTelemeteredDataParticle.keys_exclude_sci_times)
 
 class EngineeringMetadataDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.GLIDER_ENG_METADATA
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Takes a GliderParser object and extracts engineering metadata from the
         header and puts the data into a Data Particle.
 
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         @throws SampleException if the data is not a glider data dictionary
             produced by GliderParser._read_data
         """
         # need to exclude sci_m_present_times
-        return self._parsed_values(EngineeringMetadataParticleKey.list())
+        return self._parsed_value_pairs(EngineeringMetadataParticleKey.list())
 
 class EngineeringScienceTelemeteredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.GLIDER_ENG_SCI_TELEMETERED
@@ -705,16 +800,16 @@ class EngineeringScienceTelemeteredDataParticle(GliderParticle):
     keys_exclude_times.remove(GliderParticleKey.M_PRESENT_TIME)
     keys_exclude_times.remove(GliderParticleKey.M_PRESENT_SECS_INTO_MISSION)
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Takes a GliderParser object and extracts engineering data from the
         data dictionary and puts the data into a engineering Data Particle.
 
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         @throws SampleException if the data is not a glider data dictionary
             produced by GliderParser._read_data
         """
-        return self._parsed_values(EngineeringScienceTelemeteredDataParticle.keys_exclude_times)
+        return self._parsed_value_pairs(EngineeringScienceTelemeteredDataParticle.keys_exclude_times)
 
 
 class EngineeringRecoveredDataParticle(GliderParticle):
@@ -725,16 +820,16 @@ class EngineeringRecoveredDataParticle(GliderParticle):
     keys_exclude_sci_times.remove(GliderParticleKey.SCI_M_PRESENT_TIME)
     keys_exclude_sci_times.remove(GliderParticleKey.SCI_M_PRESENT_SECS_INTO_MISSION)
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Takes a GliderParser object and extracts engineering data from the
         data dictionary and puts the data into a engineering Data Particle.
 
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         @throws SampleException if the data is not a glider data dictionary
             produced by GliderParser._read_data
         """
-        return self._parsed_values(EngineeringRecoveredDataParticle.keys_exclude_sci_times)
+        return self._parsed_value_pairs(EngineeringRecoveredDataParticle.keys_exclude_sci_times)
 
 
 class EngineeringScienceRecoveredDataParticle(GliderParticle):
@@ -745,24 +840,24 @@ class EngineeringScienceRecoveredDataParticle(GliderParticle):
     keys_exclude_times.remove(GliderParticleKey.M_PRESENT_TIME)
     keys_exclude_times.remove(GliderParticleKey.M_PRESENT_SECS_INTO_MISSION)
 
-    def _build_parsed_values(self):
+    def _build_value_pairs(self):
         """
         Takes a GliderParser object and extracts engineering data from the
         data dictionary and puts the data into a engineering Data Particle.
 
-        @param result A returned list with sub dictionaries of the data
+        @retval (value ids, values) tuple of lists
         @throws SampleException if the data is not a glider data dictionary
             produced by GliderParser._read_data
         """
-        return self._parsed_values(EngineeringScienceRecoveredDataParticle.keys_exclude_times)
+        return self._parsed_value_pairs(EngineeringScienceRecoveredDataParticle.keys_exclude_times)
 
 class GliderParser(BufferLoadingParser):
     """
     GliderParser parses a Slocum Electric Glider data file that has been
     converted to ASCII from binary and merged with it's corresponding flight or
     science data file, and holds the self describing header data in a header
-    dictionary and the data in a data dictionary using the column labels as the
-    dictionary keys. These dictionaries are used to build the particles.
+    dictionary and a column schema. Each row is decoded into a GliderRecord of
+    values in column order, which the particles are built from.
     """
     def __init__(self,
                  config,
@@ -781,15 +876,13 @@ class GliderParser(BufferLoadingParser):
         # specific to the gliders with ascii data, parse the header rows of the input file
         self._read_header()
 
-        # regex for first order parsing of input data from the chunker
-        record_regex = re.compile(r'.*\n')
         self._whitespace_regex = re.compile(r'\s*$')
 
+        # first order parsing of input data from the chunker, one record per line
         super(GliderParser, self).__init__(config,
                                            self._stream_handle,
                                            state,
-                                           partial(StringChunker.regex_sieve_function,
-                                                   regex_list=[record_regex]),
+                                           line_sieve,
                                            state_callback,
                                            publish_callback,
                                            exception_callback,
@@ -892,6 +985,8 @@ class GliderParser(BufferLoadingParser):
         num_of_bytes = map(int, num_of_bytes)
         self._header_dict['num_of_bytes'] = num_of_bytes
 
+        self._schema = GliderSchema(self._header_dict['labels'], num_of_bytes)
+
         log.debug("Label count: %d", len(self._header_dict['labels']))
         log.debug("Data units: %s", self._header_dict['data_units'])
         log.debug("Bytes: %s", self._header_dict['num_of_bytes'])
@@ -934,18 +1029,14 @@ class GliderParser(BufferLoadingParser):
 
     def _read_data(self, data_record):
         """
-        Read in the column labels, data type, number of bytes of each
-        data type, and the data from an ASCII glider data file.
+        Decode a row of an ASCII glider data file using the column schema
+        read from the header.
+        @param data_record The row
+        @retval GliderRecord of the row
+        @throws SampleException if the row doesn't have a value for each column
         """
-
-        data_dict = {}
         num_columns = self._header_dict['sensors_per_cycle']
-        data_labels = self._header_dict['labels']
-        num_bytes = self._header_dict['num_of_bytes']
-
-        data = data_record.strip().split()
-
-        log.trace("Split data: %s", data)
+        data = data_record.split()
 
         if num_columns != len(data):
 
@@ -958,48 +1049,29 @@ class GliderParser(BufferLoadingParser):
                                   'Described: %d, Actual: %d' %
                                   (num_columns, len(data)))
 
-        # extract record to dictionary
-        for ii in range(num_columns):
-            log.trace("_read_data: index: %d label: %s, value: %s", ii, data_labels[ii], data[ii])
+        # everything is a float to start with, including NaN in any column
+        values = map(float, data)
 
-            valuePreConversion = data[ii]
-
-            if valuePreConversion == "NaN":
-                # data is NaN, convert it to a float
-                value = float(valuePreConversion)
-            else:
+        for column in self._schema.int_columns:
+            if values[column] == values[column]:
+                values[column] = int(data[column])
 
-                # determine what type of data the value is, based on the number of bytes attribute
-                if (num_bytes[ii] == 1) or (num_bytes[ii] == 2):
-                        stringConverter = int
-                elif (num_bytes[ii] == 4) or (num_bytes[ii] == 8):
-                        stringConverter = float
+        for column in self._schema.latlon_columns:
+            if values[column] == values[column]:
+                # convert latitude/longitude strings to decimal degrees
+                values[column] = self._string_to_ddegrees(data[column])
+                log.debug("Converted lat/lon %s from %s to %10.5f",
+                          self._schema.labels[column], data[column], values[column])
 
-                # check to see if this is a latitude/longitude string
-                if ('_lat' in data_labels[ii]) or ('_lon' in data_labels[ii]):
-                    # convert latitude/longitude strings to decimal degrees
-                    value = self._string_to_ddegrees(data[ii])
-
-                    log.debug("Converted lat/lon %s from %s to %10.5f", data_labels[ii], data[ii], value)
-
-                else:
-                    # convert the string to and int or float
-                    value = stringConverter(data[ii])
+        return GliderRecord(self._schema, values)
 
-            data_dict[data_labels[ii]] = {
-                'Name': data_labels[ii],
-                'Data': value
-            }
-
-        log.trace("Data dict parsed: %s", data_dict)
-
-        return data_dict
-
-    def get_block(self, size=1024):
+    def get_block(self, size=None):
         """
         Need to overload the base class behavior so we can get the last
         record if it doesn't end with a newline it would be ignored.
         """
+        if size is None:
+            size = self._read_size
         len = super(GliderParser, self).get_block(size)
         log.debug("Buffer read bytes: %d", len)
 
@@ -1050,8 +1122,8 @@ class GliderParser(BufferLoadingParser):
                 # from the parsed data, m_present_time is the unix timestamp
                 try:
                     if not exception_detected:
-                        record_time = data_dict['m_present_time']['Data']
-                        timestamp = ntplib.system_to_ntp_time(data_dict['m_present_time']['Data'])
+                        record_time = data_dict['m_present_time']
+                        timestamp = ntplib.system_to_ntp_time(record_time)
                         log.debug("Converting record timestamp %f to ntp timestamp %f", record_time, timestamp)
                 except KeyError:
                     exception_detected = True
@@ -1065,9 +1137,9 @@ class GliderParser(BufferLoadingParser):
                     # create the particle
                     particle = self._extract_sample(self._particle_class, None, data_dict, timestamp)
                     self._increment_state(end)
-                    result_particles.append((particle, copy.copy(self._read_state)))
+                    result_particles.append((particle, self._checkpoint()))
                 else:
-                    log.debug("No science data found in particle. %s", data_dict)
+                    log.debug("No science data found in particle.")
                     self._increment_state(end)
 
             # collect the non-data from the file
@@ -1096,19 +1168,12 @@ class GliderParser(BufferLoadingParser):
             # if it is not use the _exception_callback
             self._exception_callback(UnexpectedDataException("Found un-expected non-data: %s", non_data))
 
-    def _has_science_data(self, data_dict):
+    def _has_science_data(self, record):
         """
-        Examine the data_dict to see if it contains science data.
+        Examine the record to see if it contains science data.
         """
-        log.debug("Looking for data in science parameters: %s", self._particle_class.science_parameters)
-        for key in data_dict.keys():
-            if key in self._particle_class.science_parameters:
-                value = data_dict[key]['Data']
-                if not np.isnan(value):
-                    log.debug("Found science value for key: %s, value: %s", key, value)
-                    return True
-                else:
-                    log.debug("Science data value is nan: %s %s", key, value)
+        if record.has_data(self._particle_class.science_parameters):
+            return True
 
         log.debug("No science data found!")
         return False
@@ -1219,7 +1284,7 @@ class GliderEngineeringParser(GliderParser):
                 timestamp = self.fileopen_str_to_timestamp(data_dict['glider_eng_fileopen_time']['Data'])
                 particle = self._extract_sample(EngineeringMetadataDataParticle, None, data_dict, timestamp)
                 self._read_state[StateKey.SENT_METADATA] = True
-                result_particles.append((particle, copy.copy(self._read_state)))
+                result_particles.append((particle, self._checkpoint()))
             except ValueError:
                 # converting fileopen string to timestamp will throw a ValueError if the time is not parseable
                 log.warn("Unable to parse timestamp from file open time %s, not returning metadata particle",
@@ -1256,13 +1321,13 @@ class GliderEngineeringParser(GliderParser):
                     exception_detected = True
                     self._exception_callback(e)
                     log.warn("GliderEngineeringParser.parse_chunks(): Sample Exception %s", e)
-                    data_dict = {}
+                    data_dict = None
 
                 # from the parsed data, m_present_time is the unix timestamp
                 try:
                     if not exception_detected:
-                        record_time = data_dict['m_present_time']['Data']
-                        timestamp = ntplib.system_to_ntp_time(data_dict['m_present_time']['Data'])
+                        record_time = data_dict['m_present_time']
+                        timestamp = ntplib.system_to_ntp_time(record_time)
                         log.debug("Converting record timestamp %f to ntp timestamp %f", record_time, timestamp)
                 except KeyError:
                     exception_detected = True
@@ -1282,7 +1347,7 @@ class GliderEngineeringParser(GliderParser):
                     self._increment_state(end)
 
                     incremented = True
-                    result_particles.append((particle, copy.copy(self._read_state)))
+                    result_particles.append((particle, self._checkpoint()))
 
                 if self._contains_eng_data(data_dict, EngineeringScienceTelemeteredDataParticle):
                     # create the particle eng science telemetered
@@ -1292,10 +1357,10 @@ class GliderEngineeringParser(GliderParser):
                     if not incremented:
                         self._increment_state(end)
 
-                    result_particles.append((particle, copy.copy(self._read_state)))
+                    result_particles.append((particle, self._checkpoint()))
 
                 elif not incremented:
-                    log.debug("No particle data found in particle. %s", data_dict)
+                    log.debug("No particle data found in particle.")
                     self._increment_state(end)
 
             # collect the non-data from the file
@@ -1353,19 +1418,14 @@ class GliderEngineeringParser(GliderParser):
         utctime = localtime - time.timezone
         return ntplib.system_to_ntp_time(float(utctime))
 
-    def _contains_eng_data(self, data_dict, particle_class):
+    def _contains_eng_data(self, record, particle_class):
         """
-        Examine the data_dict to see if it contains data from the engineering telemetered particle being worked on
+        Examine the record to see if it contains data from the engineering telemetered particle being worked on
         """
 
-        for key in data_dict.keys():
-
-            # only check for particle params that do not include the two m_ time oriented attributes
-            if key in particle_class.science_parameters:
-                # return true as soon as the first particle non-NaN attribute from the data dict
-                value = data_dict[key]['Data']
-                if not np.isnan(value):
-                    return True
+        # only check for particle params that do not include the two m_ time oriented attributes
+        if record is not None and record.has_data(particle_class.science_parameters):
+            return True
 
         log.debug("No engineering attributes in the particle found!")
         return False
\ No newline at end of file
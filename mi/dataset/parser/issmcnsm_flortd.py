@@ -13,7 +13,6 @@ Initial release
 __author__ = 'Emily Hahn'
 __license__ = 'Apache 2.0'
 
-import copy
 import re
 import ntplib
 import time
@@ -248,7 +247,7 @@ class Issmcnsm_flortdParser(BufferLoadingParser):
                     # create particle
                     log.trace("Extracting sample chunk %s with read_state: %s", chunk, self._read_state)
                     self._increment_state(data_increment, self._timestamp)    
-                    result_particles.append((sample, copy.copy(self._read_state)))
+                    result_particles.append((sample, self._checkpoint()))
 
             (nd_timestamp, non_data, non_start, non_end) = self._chunker.get_next_non_data_with_index(clean=True)
             (timestamp, chunk, start, end) = self._chunker.get_next_data_with_index()
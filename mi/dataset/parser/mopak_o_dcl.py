@@ -13,7 +13,6 @@ initial release
 __author__ = 'Emily Hahn'
 __license__ = 'Apache 2.0'
 
-import copy
 import re
 import ntplib
 import struct
@@ -343,7 +342,7 @@ class MopakODclParser(BufferLoadingParser):
                     self._increment_state(RATE_BYTES)
 
                 if sample:
-                    result_particles.append((sample, copy.copy(self._read_state)))
+                    result_particles.append((sample, self._checkpoint()))
 
             (nd_timestamp, non_data, non_start, non_end) = self._chunker.get_next_non_data_with_index(clean=False)
             (timestamp, chunk, start, end) = self._chunker.get_next_data_with_index(clean=True)
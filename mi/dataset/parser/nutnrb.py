@@ -13,7 +13,6 @@ test
 __author__ = 'Roger Unwin'
 __license__ = 'Apache 2.0'
 
-import copy
 import re
 import ntplib
 
@@ -191,7 +190,7 @@ class NutnrbParser(BufferLoadingParser):
                 if sample:
                     # create particle
                     self._increment_state(end)
-                    result_particles.append((sample, copy.copy(self._read_state)))
+                    result_particles.append((sample, self._checkpoint()))
 
             (timestamp, chunk, start, end) = self._chunker.get_next_data_with_index()
             (nd_timestamp, non_data) = self._chunker.get_next_non_data(clean=True)
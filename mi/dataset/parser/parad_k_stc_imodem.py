@@ -13,7 +13,6 @@ New driver started for PARAD_K_STC_IMODEM
 __author__ = 'Mike Nicoletti'
 __license__ = 'Apache 2.0'
 
-import copy
 import re
 import ntplib
 import struct
@@ -109,7 +108,7 @@ class Parad_k_stc_imodemParser(WfpEFileParser):
             if sample:
                 # create particle
                 self._increment_state(SAMPLE_BYTES)
-                result_particle = (sample, copy.copy(self._read_state))
+                result_particle = (sample, self._checkpoint())
 
         return result_particle
 
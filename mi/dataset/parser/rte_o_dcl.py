@@ -13,7 +13,6 @@ Initial Release
 __author__ = 'Jeff Roy'
 __license__ = 'Apache 2.0'
 
-import copy
 import re
 import ntplib
 import time
@@ -191,7 +190,7 @@ class RteODclParser(BufferLoadingParser):
                 self._increment_state(len(chunk)) 
                 if sample:
                     # create particle
-                    result_particles.append((sample, copy.copy(self._read_state)))
+                    result_particles.append((sample, self._checkpoint()))
                     log.debug("Extracting sample chunk %s with read_state: %s", chunk, self._read_state)
             else:
                 # this is a metadata chunk, just increment the state
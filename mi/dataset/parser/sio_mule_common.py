@@ -12,15 +12,20 @@ __author__ = 'Emily Hahn'
 __license__ = 'Apache 2.0'
 
 import re
-import struct
+import os
 import gevent
 import time
 import ntplib
 
+from bisect import bisect_left, bisect_right
+
 from mi.core.common import BaseEnum
+from mi.core.checksum import crc16_x25
+from mi.core.instrument.chunker import IncrementalChunker
 from mi.core.log import get_logger; log = get_logger()
 from mi.core.exceptions import DatasetParserException, NotImplementedException
 from mi.dataset.dataset_parser import Parser
+from mi.dataset.mapped_file import MappedFile
 
 # SIO Main controller header and data for ctdmo in binary
 # groups: ID, Number of Data Bytes, POSIX timestamp, block number, data
@@ -45,6 +50,128 @@ END_IDX = 1
 SAMPLES_PARSED = 2
 SAMPLES_RETURNED = 3
 
+# telemetered data escapes bytes, replace each escape sequence with the byte it stands for
+ESCAPE_MATCHER = re.compile(b'\x18[\x6b\x58]')
+ESCAPED_BYTES = {b'\x18\x6b': b'\x2b', b'\x18\x58': b'\x18'}
+# escape sequences are replaced in blocks of this size, a sequence split between
+# two blocks is left as it is
+ESCAPE_BLOCK_SIZE = 1024
+# bytes read at a time when first scanning a file
+SCAN_READ_SIZE = 65536
+
+
+class SioFileData(object):
+    """
+    Random access to the data in an SIO file, read from the file as it is
+    sliced rather than held in memory.  Positions are positions in the data
+    after escape sequences are replaced, which are found in one pass over
+    the file up front.
+    """
+
+    def __init__(self, stream_handle, replace_escapes):
+        """
+        @param stream_handle An already open file-like filehandle, read from
+        its current position
+        @param replace_escapes True if escape sequences need to be replaced
+        """
+        self._stream_handle = stream_handle
+        self._base = stream_handle.tell()
+        # position after replacement of each replaced escape sequence, in order
+        self._escapes = []
+        self._length = 0
+
+        if replace_escapes:
+            self._replace_escapes = True
+            raw_length = 0
+            while True:
+                data = stream_handle.read(SCAN_READ_SIZE)
+                if not data:
+                    break
+                for block_start in range(0, len(data), ESCAPE_BLOCK_SIZE):
+                    for match in ESCAPE_MATCHER.finditer(data, block_start, block_start + ESCAPE_BLOCK_SIZE):
+                        raw_position = raw_length + match.start()
+                        self._escapes.append(raw_position - len(self._escapes))
+                raw_length += len(data)
+                # scan in small steps in order to not block processing
+                gevent.sleep(0)
+            self._length = raw_length - len(self._escapes)
+        else:
+            self._replace_escapes = False
+            stream_handle.seek(0, os.SEEK_END)
+            self._length = stream_handle.tell() - self._base
+
+    def __len__(self):
+        return self._length
+
+    def _raw_position(self, position):
+        """
+        @param position A position in the replaced data
+        @retval the position of the same byte in the file, relative to where it was first read
+        """
+        return position + bisect_left(self._escapes, position)
+
+    def __getitem__(self, index):
+        """
+        @param index slice of the data to read
+        @retval string of the data in the slice, with escape sequences replaced
+        """
+        (start, end, step) = index.indices(self._length)
+        if end <= start:
+            return b''
+        raw_start = self._raw_position(start)
+        raw_end = self._raw_position(end)
+
+        self._stream_handle.seek(self._base + raw_start)
+        raw_data = self._stream_handle.read(raw_end - raw_start)
+        if not self._replace_escapes or bisect_left(self._escapes, end) == bisect_left(self._escapes, start):
+            return raw_data
+
+        # replace within the same blocks the escapes were found in
+        blocks = []
+        block_start = 0
+        block_end = ESCAPE_BLOCK_SIZE - raw_start % ESCAPE_BLOCK_SIZE
+        while block_start < len(raw_data):
+            blocks.append(ESCAPE_MATCHER.sub(lambda match: ESCAPED_BYTES[match.group(0)],
+                                             raw_data[block_start:block_end]))
+            block_start = block_end
+            block_end += ESCAPE_BLOCK_SIZE
+        return b''.join(blocks)
+
+
+def remove_interval(intervals, start, end):
+    """
+    Remove an interval from a sorted list of separate [start, end] intervals,
+    if one of the intervals contains it, splitting that interval around it.
+    The list is changed in place.
+    @param intervals sorted list of [start, end] intervals
+    @param start The start of the interval to remove
+    @param end The end of the interval to remove
+    """
+    idx = bisect_right(intervals, [start, float('inf')]) - 1
+    if idx >= 0 and intervals[idx][END_IDX] >= end:
+        interval = intervals[idx]
+        remaining = []
+        # keep any data on either side
+        if start > interval[START_IDX]:
+            remaining.append([interval[START_IDX], start])
+        if end < interval[END_IDX]:
+            remaining.append([end, interval[END_IDX]])
+        intervals[idx:idx + 1] = remaining
+
+
+def next_interval(intervals, position):
+    """
+    Find the first interval in a sorted list of separate intervals which
+    ends after a position
+    @param intervals sorted list of [start, end, ...] intervals
+    @param position The position
+    @retval index into intervals, len(intervals) if there are none
+    """
+    idx = bisect_right(intervals, [position, float('inf')]) - 1
+    if idx < 0 or intervals[idx][END_IDX] <= position:
+        idx += 1
+    return idx
+
 class SioMuleParser(Parser):
 
     def __init__(self, config, stream_handle, state, sieve_fn,
@@ -74,6 +201,9 @@ class SioMuleParser(Parser):
                                          state_callback,
                                          publish_callback,
                                          exception_callback)
+        # a block of unprocessed data may hold a whole file of packets, which are
+        # taken out of the chunker one at a time
+        self._chunker = IncrementalChunker(self.sieve_function)
         self._position = [0,0] # store both the start and end point for this read of data within the file
         self._record_buffer = [] # holds list of records
         self._recovered_flag = recovered_flag
@@ -84,6 +214,14 @@ class SioMuleParser(Parser):
         # use None flag in unprocessed data to initialize this we read the entire file and get the size of the data
         self._read_state = {StateKey.UNPROCESSED_DATA: None,
                             StateKey.IN_PROCESS_DATA:[]}
+        # count of in process packets by (start, end)
+        self._in_process_index = {}
+        # number of in process packets at the start of the list known to have samples
+        self._settled_packets = 0
+        # index of the last in process packet with samples returned
+        self._last_returned_packet = -1
+        # unprocessed data is kept sorted with adjacent blocks combined once it is changed
+        self._unprocessed_sorted = True
 
         if state:
             self.set_state(self._state)
@@ -108,8 +246,7 @@ class SioMuleParser(Parser):
                           match.group(0)[1:32], match.end(0), end_packet_idx,
                           match.start(0), data_len)
                 if end_packet == '\x03':
-                    packet_data = raw_data[match.end(0):end_packet_idx]
-                    chksum = self.calc_checksum(packet_data)
+                    chksum = '%04X' % crc16_x25(raw_data, match.end(0), end_packet_idx)
                     if chksum == checksum:
                         # even if this is not the right instrument, keep track that
                         # this packet was processed
@@ -117,6 +254,7 @@ class SioMuleParser(Parser):
                             self._read_state[StateKey.IN_PROCESS_DATA].append([match.start(0),
                                                                                end_packet_idx+1,
                                                                                None, 0])
+                            self._index_packet(match.start(0), end_packet_idx+1, 1)
                         return_list.append((match.start(0), end_packet_idx+1))
                     else:
                         log.debug("Calculated checksum %s != received checksum %s for header %s and packet %d to %d",
@@ -131,31 +269,7 @@ class SioMuleParser(Parser):
         """
         Calculate SIO header checksum of data
         """
-        crc = 65535
-        if len(data) == 0:
-            return '0000'
-        for iData in range(0,len(data)):
-            short = struct.unpack('H', data[iData] + '\x00')
-            point = 255 & short[0]
-            crc = crc ^ point
-            for i in range(7, -1, -1):
-                if crc & 1:
-                    crc = (crc >> 1) ^ 33800
-                else:
-                    crc >>= 1
-        crc = ~crc
-        # convert to unsigned
-        if crc < 0:
-            crc += 65536
-        # get rid of the '0x' from the hex string
-        crc = "%s" % hex(crc)[2:].upper()
-        # make sure we have the right format for comparing, must be 4 hex digits
-        if len(crc) == 3:
-            crc = '0' + crc
-        elif len(crc) == 2:
-            crc = '00' + crc
-        elif len(crc) == 1:
-            crc = '000' + crc
+        crc = "%04X" % crc16_x25(data)
         log.trace("calculated checksum %s", crc)
         return crc
 
@@ -163,13 +277,26 @@ class SioMuleParser(Parser):
         """
         Determine if this packet is already in the in process data
         """
-        for packet in self._read_state[StateKey.IN_PROCESS_DATA]:
-            if packet[START_IDX] == start + self._position[START_IDX] and \
-            packet[END_IDX] == end + self._position[START_IDX]:
-                log.trace('Already added packet %s', packet)
-                return True
+        key = (start + self._position[START_IDX], end + self._position[START_IDX])
+        if self._in_process_index.get(key):
+            log.trace('Already added packet %s', key)
+            return True
         return False
 
+    def _index_packet(self, start, end, count):
+        """
+        Add or remove an in process packet from the index used to find packets
+        @param start The start of the packet
+        @param end The end of the packet
+        @param count 1 to add the packet, -1 to remove it
+        """
+        key = (start, end)
+        remaining = self._in_process_index.get(key, 0) + count
+        if remaining > 0:
+            self._in_process_index[key] = remaining
+        else:
+            self._in_process_index.pop(key, None)
+
     def set_state(self, state_obj):
         """
         Set the value of the state object for this parser
@@ -197,6 +324,13 @@ class SioMuleParser(Parser):
         self._state = state_obj
         self._read_state = state_obj
 
+        self._in_process_index = {}
+        for packet in state_obj[StateKey.IN_PROCESS_DATA]:
+            self._index_packet(packet[START_IDX], packet[END_IDX], 1)
+        self._settled_packets = 0
+        self._last_returned_packet = -1
+        self._unprocessed_sorted = False
+
         # it is possible to be in the middle of processing a packet.  Since we have to
         # process a whole packet, which may contain multiple samples, we have to
         # re-read the entire packet, then throw out the already received samples
@@ -217,54 +351,73 @@ class SioMuleParser(Parser):
         @param returned_records Number of records to return 
         """
         log.trace("Incrementing current state: %s", self._read_state)
-
-        while self._mid_sample_packets > 0 and len(self._chunk_sample_count) > 0:
-            # if we were in the middle of processing, we need to drop the parsed
-            # packets sample count because that in process packet already exists
-            self._chunk_sample_count.pop(0)
-            # decrease the mid sample number remaining
-            self._mid_sample_packets -= 1
-
-        for packet_idx in range (0, len(self._read_state[StateKey.IN_PROCESS_DATA])):
-            if self._read_state[StateKey.IN_PROCESS_DATA][packet_idx][SAMPLES_PARSED] is None and \
-            len(self._chunk_sample_count) > 0:
-                self._read_state[StateKey.IN_PROCESS_DATA][packet_idx][SAMPLES_PARSED] = self._chunk_sample_count.pop(0)
+        in_process = self._read_state[StateKey.IN_PROCESS_DATA]
+
+        # if we were in the middle of processing, we need to drop the parsed
+        # packets sample count because that in process packet already exists
+        n_dropped = min(self._mid_sample_packets, len(self._chunk_sample_count))
+        del self._chunk_sample_count[:n_dropped]
+        self._mid_sample_packets -= n_dropped
+
+        # only packets found since the last increment can be missing their sample count
+        n_counts = 0
+        for packet_idx in xrange(self._settled_packets, len(in_process)):
+            if n_counts == len(self._chunk_sample_count):
+                break
+            packet = in_process[packet_idx]
+            if packet[SAMPLES_PARSED] is None:
+                self._index_packet(packet[START_IDX], packet[END_IDX], -1)
+                packet[SAMPLES_PARSED] = self._chunk_sample_count[n_counts]
+                n_counts += 1
                 # adjust for current file position, only do this once when filling in sample count
-                self._read_state[StateKey.IN_PROCESS_DATA][packet_idx][START_IDX] += self._position[START_IDX]
-                self._read_state[StateKey.IN_PROCESS_DATA][packet_idx][END_IDX] += self._position[START_IDX]
+                packet[START_IDX] += self._position[START_IDX]
+                packet[END_IDX] += self._position[START_IDX]
+                self._index_packet(packet[START_IDX], packet[END_IDX], 1)
+        del self._chunk_sample_count[:n_counts]
 
-        n_removed = 0
         # need to adjust position to be relative to the entire file, not just the
         # currently read section, so add the initial position to the in process packets
         log.debug('records to be returned %d', returned_records)
         total_remain = returned_records
         adj_packets = []
-        for packet_idx in range(0, len(self._read_state[StateKey.IN_PROCESS_DATA])):
-            adj_packet_idx = packet_idx - n_removed
-            this_packet = self._read_state[StateKey.IN_PROCESS_DATA][adj_packet_idx]
-            if this_packet[SAMPLES_PARSED] > 0:
-                # this packet has data samples in it
-                this_packet_remain = this_packet[SAMPLES_PARSED] - this_packet[SAMPLES_RETURNED]
-                # increase the number of samples that have been pulled out
-                self._read_state[StateKey.IN_PROCESS_DATA][adj_packet_idx][SAMPLES_RETURNED] += total_remain
-                # find out if packet is done, if so remove it
-                if this_packet[SAMPLES_RETURNED] >= this_packet[SAMPLES_PARSED]:
-                    # this packet has had all the samples pulled out from it, remove it from in process
-                    adj_packets.append([this_packet[START_IDX], this_packet[END_IDX]])
-                    self._read_state[StateKey.IN_PROCESS_DATA].pop(adj_packet_idx)
-                    n_removed += 1
-                elif this_packet[SAMPLES_RETURNED] < 0:
-                    self._read_state[StateKey.IN_PROCESS_DATA][adj_packet_idx][SAMPLES_RETURNED] = 0
-
-                total_remain -= this_packet_remain
 
+        # settled packets all have samples, once there are no more records to return
+        # the rest of them are left as they are unless they have returned samples
+        kept_settled = []
+        last_returned = -1
+        packet_idx = 0
+        while packet_idx < self._settled_packets and \
+                (total_remain > 0 or packet_idx <= self._last_returned_packet):
+            packet = in_process[packet_idx]
+            (keep, total_remain) = self._return_samples(packet, total_remain)
+            if keep:
+                kept_settled.append(packet)
+                if packet[SAMPLES_RETURNED] > 0:
+                    last_returned = len(kept_settled) - 1
+            else:
+                adj_packets.append([packet[START_IDX], packet[END_IDX]])
+                self._index_packet(packet[START_IDX], packet[END_IDX], -1)
+            packet_idx += 1
+
+        # packets found since the last increment are all checked
+        kept_new = []
+        n_kept_before = len(kept_settled) + self._settled_packets - packet_idx
+        for packet in in_process[self._settled_packets:]:
+            (keep, total_remain) = self._return_samples(packet, total_remain)
+            if keep:
+                kept_new.append(packet)
+                if packet[SAMPLES_RETURNED] > 0:
+                    last_returned = n_kept_before + len(kept_new) - 1
             else:
-                # this packet has no samples, no need to process further
-                adj_packets.append([this_packet[START_IDX], this_packet[END_IDX]])
-                self._read_state[StateKey.IN_PROCESS_DATA].pop(adj_packet_idx)
-                n_removed += 1
+                adj_packets.append([packet[START_IDX], packet[END_IDX]])
+                self._index_packet(packet[START_IDX], packet[END_IDX], -1)
 
-        if len(adj_packets) > 0 and self._read_state[StateKey.IN_PROCESS_DATA] == []:
+        in_process[self._settled_packets:] = kept_new
+        in_process[:packet_idx] = kept_settled
+        self._settled_packets = len(in_process)
+        self._last_returned_packet = last_returned
+
+        if len(adj_packets) > 0 and in_process == []:
             # this is the last of the in process data, now process unprocessed data, so
             # go back to the beginning of the file
             log.debug('Resetting position to the start')
@@ -272,28 +425,42 @@ class SioMuleParser(Parser):
             # clear out the chunker so we don't wrap around data
             self._chunker.clean_all_chunks()
 
-        log.trace('In process %s', self._read_state[StateKey.IN_PROCESS_DATA])
+        log.trace('In process %s', in_process)
 
         # first combine the in process data packet indicies
         combined_packets = self._combine_adjacent_packets(adj_packets)
-        # loop over combined packets and remove them from unprocessed data
+        unprocessed = self._read_state[StateKey.UNPROCESSED_DATA]
+        if combined_packets and not self._unprocessed_sorted:
+            unprocessed[:] = self._combine_adjacent_packets(sorted(unprocessed))
+            self._unprocessed_sorted = True
+        # remove the combined packets from the unprocessed data they are in
         for packet in combined_packets:
-            # find which unprocessed section this packet is in
-            for unproc in self._read_state[StateKey.UNPROCESSED_DATA]:
-                if packet[START_IDX] >= unproc[START_IDX] and packet[END_IDX] <= unproc[END_IDX]:
-                    # packet is within this unprocessed data, remove it
-                    self._read_state[StateKey.UNPROCESSED_DATA].remove(unproc)
-                    # add back any data still unprocessed on either side
-                    if packet[START_IDX] > unproc[START_IDX]:
-                        self._read_state[StateKey.UNPROCESSED_DATA].append([unproc[START_IDX], packet[START_IDX]])
-                    if packet[END_IDX] < unproc[END_IDX]:
-                        self._read_state[StateKey.UNPROCESSED_DATA].append([packet[END_IDX], unproc[END_IDX]])
-                    # once we have found which unprocessed section this packet is in,
-                    # move on to next packet
-                    break
-            self._read_state[StateKey.UNPROCESSED_DATA] = sorted(self._read_state[StateKey.UNPROCESSED_DATA])
-            self._read_state[StateKey.UNPROCESSED_DATA] = self._combine_adjacent_packets(
-                self._read_state[StateKey.UNPROCESSED_DATA])
+            remove_interval(unprocessed, packet[START_IDX], packet[END_IDX])
+
+    @staticmethod
+    def _return_samples(packet, total_remain):
+        """
+        Mark samples in an in process packet as returned
+        @param packet The in process packet
+        @param total_remain The number of samples left to return
+        @retval tuple of True if the packet is still in process, and the number
+        of samples left to return after this packet
+        """
+        if packet[SAMPLES_PARSED] > 0:
+            # this packet has data samples in it
+            this_packet_remain = packet[SAMPLES_PARSED] - packet[SAMPLES_RETURNED]
+            # increase the number of samples that have been pulled out
+            packet[SAMPLES_RETURNED] += total_remain
+            total_remain -= this_packet_remain
+            # find out if packet is done, if so remove it
+            if packet[SAMPLES_RETURNED] >= packet[SAMPLES_PARSED]:
+                return (False, total_remain)
+            elif packet[SAMPLES_RETURNED] < 0:
+                packet[SAMPLES_RETURNED] = 0
+            return (True, total_remain)
+
+        # this packet has no samples, no need to process further
+        return (False, total_remain)
 
     def _combine_adjacent_packets(self, packets):
         """
@@ -323,25 +490,18 @@ class SioMuleParser(Parser):
         Loop through all the in process or unprocessed data until the requested number of records are found
         @param num records number of records to get
         """
-        if self.all_data == None:
-            # need to read in the entire data file first and store it because escape sequences shift position of
-            # in process and unprocessed blocks
-            log.debug("Reading in all data in smaller blocks")
-            self.all_data = ''
-
-            eof = False
-            while not eof:
-                # read data in small blocks in order to not block processing
-                next_data = self._stream_handle.read(1024)
-                if next_data:
-                    if not self._recovered_flag:
-                        # if this is telemetered, need to replace escape chars, recovered does not
-                        next_data = next_data.replace(b'\x18\x6b', b'\x2b')
-                        next_data = next_data.replace(b'\x18\x58', b'\x18')
-                    self.all_data = self.all_data + next_data
-                    gevent.sleep(0)
-                else:
-                    eof = True
+        if self.all_data is None:
+            # escape sequences shift position of in process and unprocessed blocks, so
+            # positions are in the data with escape sequences replaced
+            if self._recovered_flag and isinstance(self._stream_handle, MappedFile):
+                # recovered data has no escape chars to replace, use the mapped file in place
+                log.debug("Using memory mapped data")
+                self.all_data = self._stream_handle.buffer
+            else:
+                # read blocks from the file as they are needed, if this is telemetered
+                # escape chars need to be replaced, recovered does not
+                log.debug("Reading data from the file as it is needed")
+                self.all_data = SioFileData(self._stream_handle, not self._recovered_flag)
             log.debug("length of all data %d", len(self.all_data))
 
         # if unprocessed data has not been initialized yet, set it to the entire file
@@ -357,7 +517,8 @@ class SioMuleParser(Parser):
                 data = self._get_next_unprocessed_data(self._read_state[StateKey.IN_PROCESS_DATA])
             else:
                 # there is no in process data, read the unprocessed data
-                data = self._get_next_unprocessed_data(self._read_state[StateKey.UNPROCESSED_DATA])
+                data = self._get_next_unprocessed_data(self._read_state[StateKey.UNPROCESSED_DATA],
+                                                       self._unprocessed_sorted)
 
             if data and len(self._record_buffer) < num_records:
                 # there is more data, add it to the chunker
@@ -438,18 +599,22 @@ class SioMuleParser(Parser):
 
         return return_list
 
-    def _get_next_unprocessed_data(self, unproc):
+    def _get_next_unprocessed_data(self, unproc, sorted_blocks=False):
         """
         Using the UNPROCESSED_DATA state, determine if there are any more unprocessed blocks,
         and if there are read in the next one
         @param unproc The unprocessed state
+        @param sorted_blocks True if the blocks are sorted and separate, so they can be searched
         @retval The next unprocessed data packet, or [] if no more unprocessed data
         """
         # see if there is more unprocessed data at a later file position (don't go backwards)
-        next_idx = 0
         log.trace('Getting next unprocessed from %s, last position %d', unproc, self._position[END_IDX])
-        while len(unproc) > next_idx and unproc[next_idx][END_IDX] <= self._position[END_IDX]:
-            next_idx = next_idx + 1
+        if sorted_blocks:
+            next_idx = next_interval(unproc, self._position[END_IDX])
+        else:
+            next_idx = 0
+            while len(unproc) > next_idx and unproc[next_idx][END_IDX] <= self._position[END_IDX]:
+                next_idx = next_idx + 1
 
         if len(unproc) > next_idx:
             data = self.all_data[unproc[next_idx][START_IDX]:unproc[next_idx][END_IDX]]
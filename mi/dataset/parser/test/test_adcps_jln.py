@@ -14,17 +14,39 @@ from nose.plugins.attrib import attr
 import yaml
 import numpy
 import os
+import copy
+import struct
+import time
 
 from mi.core.log import get_logger; log = get_logger()
 from mi.idk.config import Config
 from mi.dataset.test.test_parser import ParserUnitTestCase
 from mi.dataset.dataset_driver import DataSetDriverConfigKeys
-from mi.dataset.parser.adcp_pd0 import AdcpPd0Parser, StateKey
+from mi.dataset.parser.adcp_pd0 import AdcpPd0Parser, StateKey, ID_BYTES, BEAMS_PER_CELL
+from mi.dataset.parser.adcps_jln import AdcpsJlnParticle
 
 RESOURCE_PATH = os.path.join(Config().base_dir(), 'mi', 'dataset',
                              'driver', 'adcps_jln', 'stc', 'resource')
 
 
+class StructAdcpsJlnParticle(AdcpsJlnParticle):
+    """
+    Particle decoding depth cells one cell at a time with struct, the way the
+    PD0 parser did before the numpy decode, used to check and time it
+    """
+    def parse_depth_cells(self, data, dtype, keys):
+        cell_format = '<%d%s' % (BEAMS_PER_CELL, 'h' if dtype.itemsize == 2 else 'B')
+        columns = [[] for _ in keys]
+        offset = ID_BYTES
+        for row in range(0, self.num_depth_cells):
+            for column, value in zip(columns, struct.unpack_from(cell_format, data, offset)):
+                column.append(value)
+            offset += BEAMS_PER_CELL * dtype.itemsize
+
+        for key, column in zip(keys, columns):
+            self.final_result.append(self._encode_value(key, column, list))
+
+
 @attr('UNIT', group='mi')
 class AdcpsJlnParserUnitTestCase(ParserUnitTestCase):
     """
@@ -397,3 +419,100 @@ class AdcpsJlnParserUnitTestCase(ParserUnitTestCase):
         self.assert_result(self.test01, particles[0])
 
         fid.close()
+
+    def test_streaming(self):
+        """
+        Read ADCP_CCE1T_20.000 with a read size and high water mark set and
+        verify only a few ensembles are read ahead, and that the particles
+        and final state match reading the whole file at once
+        """
+        fid = open(os.path.join(RESOURCE_PATH, 'ADCP_CCE1T_20.000'), 'rb')
+        self.parser = AdcpPd0Parser(self.config, {StateKey.POSITION: 0}, fid,
+                                    self.state_callback, self.pub_callback, self.exception_callback)
+        expected = [particle.generate_dict()['values'] for particle in self.parser.get_records(20)]
+        fid.close()
+
+        config = dict(self.config)
+        config[DataSetDriverConfigKeys.READ_SIZE] = 4096
+        config[DataSetDriverConfigKeys.HIGH_WATER_MARK] = 3
+        fid = open(os.path.join(RESOURCE_PATH, 'ADCP_CCE1T_20.000'), 'rb')
+        self.parser = AdcpPd0Parser(config, {StateKey.POSITION: 0}, fid,
+                                    self.state_callback, self.pub_callback, self.exception_callback)
+
+        particles = self.parser.get_records(1)
+        self.assertEqual(len(particles), 1)
+        #ensembles in this file are 1254 bytes long, 4096 byte reads hold 3 of them
+        self.assertEqual(fid.tell(), 4096)
+        self.assertEqual(len(self.parser._record_buffer), 2)
+        self.assertFalse(self.fid_ingested_value)
+
+        result = particles
+        while particles:
+            particles = self.parser.get_records(4)
+            self.assertLessEqual(len(self.parser._record_buffer), 4)
+            result.extend(particles)
+        fid.close()
+
+        self.assertEqual([particle.generate_dict()['values'] for particle in result], expected)
+        self.assertEqual(self.state_callback_value, {StateKey.POSITION: 25080})
+        self.assertTrue(self.fid_ingested_value)
+
+    def test_checkpoints(self):
+        """
+        Read ADCP_CCE1T_20.000 a few records at a time and verify the states
+        sent to the driver from checkpoints match copying the state for
+        every record, and that checkpoints are discarded as records are yanked
+        """
+        def read_states(copy_state):
+            states = []
+            fid = open(os.path.join(RESOURCE_PATH, 'ADCP_CCE1T_20.000'), 'rb')
+            parser = AdcpPd0Parser(self.config, {StateKey.POSITION: 0}, fid,
+                                   lambda state, ingested: states.append((state, ingested)),
+                                   self.pub_callback, self.exception_callback)
+            if copy_state:
+                # how records were buffered before checkpoints
+                parser._checkpoint = lambda: copy.copy(parser._read_state)
+            for num_records in [1, 3, 2, 5, 1, 10]:
+                parser.get_records(num_records)
+                if not copy_state:
+                    self.assertLessEqual(parser._checkpoints._count - parser._checkpoints._discarded,
+                                         len(parser._record_buffer))
+            fid.close()
+            return states
+
+        states = read_states(False)
+        self.assertEqual(states, read_states(True))
+        self.assertEqual(states[-1], ({StateKey.POSITION: 25080}, True))
+
+    def test_depth_cell_performance(self):
+        """
+        Verify the numpy depth cell decode gives the same particle values as
+        the per cell struct decode for every ensemble in ADCP_CCE1T_20.000,
+        and compare how long each takes
+        """
+        fid = open(os.path.join(RESOURCE_PATH, 'ADCP_CCE1T_20.000'), 'rb')
+        in_buffer = fid.read()
+        #parser needs a stream handle even though it won't use it
+        self.parser = AdcpPd0Parser(self.config, self.start_state, fid,
+                                    self.state_callback, self.pub_callback, self.exception_callback)
+        ensembles = [in_buffer[start:end] for (start, end) in self.parser.sieve_function(in_buffer)]
+        fid.close()
+        self.assertEqual(len(ensembles), 20)
+
+        for ensemble in ensembles:
+            self.assertEqual(AdcpsJlnParticle(ensemble)._build_parsed_values(),
+                             StructAdcpsJlnParticle(ensemble)._build_parsed_values())
+
+        passes = 50
+
+        def timed(particle_class):
+            start = time.time()
+            for _ in range(passes):
+                for ensemble in ensembles:
+                    particle_class(ensemble)._build_parsed_values()
+            return time.time() - start
+
+        struct_time = timed(StructAdcpsJlnParticle)
+        numpy_time = timed(AdcpsJlnParticle)
+        log.info("PD0 decode of %d ensembles x %d: struct %.4fs numpy %.4fs",
+                 len(ensembles), passes, struct_time, numpy_time)
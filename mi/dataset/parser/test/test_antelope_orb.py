@@ -7,6 +7,7 @@
 @brief Test code for antelope_orb data parser.
 """
 
+import time
 import logging
 from mi.core.log import get_logger
 log = get_logger()
@@ -27,6 +28,7 @@ try:
 
     from mi.core.kudu import _pkt
     from mi.core.kudu.brttpkt import NoData
+    from mi.core.kudu.fakeorb import FakeOrb, FakeOrbReapThr
 except Exception as e:
     log.error("Failed to import antelope lib: %s", e, exc_info=True)
 
@@ -58,8 +60,8 @@ class AntelopeOrbParserUnitTestCase(ParserUnitTestCase):
 
         self.parser_config = {
             ParserConfigKey.ORBNAME: ParserConfigKey.ORBNAME,
-            ParserConfigKey.SELECT: ParserConfigKey.SELECT,
-            ParserConfigKey.REJECT: ParserConfigKey.REJECT,
+            ParserConfigKey.SELECT: '.*',
+            ParserConfigKey.REJECT: '',
         }
 
         self.parser_state = None
@@ -74,26 +76,35 @@ class AntelopeOrbParserUnitTestCase(ParserUnitTestCase):
         self.PKT_CHAN = PKT_CHAN = 'chan'
         self.PKT_LOC = PKT_LOC = 'loc'
 
-        from mi.core.kudu import _pkt
+        self.orb = FakeOrb(ParserConfigKey.ORBNAME)
+        self.addCleanup(self.orb.close)
+        self.orb.packets.append((PKT_ID,) + self.stuff_packet(PKT_TIME))
+        self.parser = self.build_parser(self.parser_config)
+
+    def stuff_packet(self, pkt_time):
+        """
+        @retval (srcname, time, packet) of a packet of one channel at pkt_time
+        """
         pkt = _pkt._newPkt()
-        _pkt._Pkt_pkttype_set(pkt, PKT_TYPE)
+        _pkt._Pkt_pkttype_set(pkt, self.PKT_TYPE)
         pktchan = _pkt._newPktChannel()
-        _pkt._PktChannel_data_set(pktchan, PKT_DATA)
-        _pkt._PktChannel_samprate_set(pktchan, PKT_SAMPRATE)
-        _pkt._PktChannel_time_set(pktchan, PKT_TIME)
-        _pkt._PktChannel_net_set(pktchan, PKT_NET)
-        _pkt._PktChannel_sta_set(pktchan, PKT_STA)
-        _pkt._PktChannel_chan_set(pktchan, PKT_CHAN)
-        _pkt._PktChannel_loc_set(pktchan, PKT_LOC)
+        _pkt._PktChannel_data_set(pktchan, self.PKT_DATA)
+        _pkt._PktChannel_samprate_set(pktchan, self.PKT_SAMPRATE)
+        _pkt._PktChannel_time_set(pktchan, pkt_time)
+        _pkt._PktChannel_net_set(pktchan, self.PKT_NET)
+        _pkt._PktChannel_sta_set(pktchan, self.PKT_STA)
+        _pkt._PktChannel_chan_set(pktchan, self.PKT_CHAN)
+        _pkt._PktChannel_loc_set(pktchan, self.PKT_LOC)
         _pkt._Pkt_channels_set(pkt, [pktchan,])
         pkttype, packet, srcname, time = _pkt._stuffPkt(pkt)
         _pkt._freePkt(pkt)
+        return srcname, time, packet
 
-        with patch('mi.dataset.parser.antelope_orb.OrbReapThr') as MockOrbReapThr:
-            self.parser = AntelopeOrbParser(self.parser_config, self.parser_state,
+    def build_parser(self, config):
+        with patch('mi.dataset.parser.antelope_orb.OrbReapThr', FakeOrbReapThr):
+            return AntelopeOrbParser(config, self.parser_state,
                             self.state_callback, self.pub_callback,
                             self.error_callback)
-        self.parser._orbreapthr.get = MagicMock(return_value=(PKT_ID, srcname, time, packet))
 
     def test_get_records(self):
         r = self.parser.get_records()
@@ -145,18 +156,109 @@ class AntelopeOrbParserUnitTestCase(ParserUnitTestCase):
     def test_get_exception(self):
         def f(*args, **kwargs):
             raise Exception()
-        self.parser._orbreapthr.get = f
+        self.parser._orbreapthr.get_many = f
         self.assertRaises(Exception, self.parser.get_records)
 
     def test_get_error(self):
         from mi.core.kudu.brttpkt import GetError
         def f(*args, **kwargs):
             raise NoData()
-        self.parser._orbreapthr.get = f
-        self.parser.get_records()
+        self.parser._orbreapthr.get_many = f
+        self.assertEqual(self.parser.get_records(), [])
 
     def test_sample_exception(self):
-        self.parser._orbreapthr.get = MagicMock(return_value=(0, '', 0, 'asdf'))
+        self.parser._orbreapthr.get_many = MagicMock(return_value=[(0, '', 0, 'asdf')])
+        self.assertRaises(SampleException, self.parser.get_records)
+
+    def test_batch(self):
+        """
+        Test queued packets are published in batches, and a bad packet stops
+        the batch after the packets before it are published, leaving the
+        packets after it for the next call
+        """
+        for i in range(1, 250):
+            self.orb.put(*self.stuff_packet(self.PKT_TIME + i))
+        self.orb.put('', self.PKT_TIME + 250, 'asdf')
+        self.orb.put(*self.stuff_packet(self.PKT_TIME + 251))
+
+        self.assertEqual(len(self.parser.get_records()), 100)
+        self.assertEqual(len(self.publish_callback_values), 1)
+        self.assertEqual(len(self.publish_callback_values[0]), 100)
+        self.assertEqual(len(self.state_callback_values), 1)
+        self.assertEqual(self.parser._orbreapthr.calls, 1)
+        self.assert_state(self.PKT_TIME + 99)
+
+        self.assertEqual(len(self.parser.get_records(10)), 10)
+        self.assertEqual(len(self.publish_callback_values[1]), 10)
+        self.assert_state(self.PKT_TIME + 109)
+
+        self.parser.get_records()
         self.assertRaises(SampleException, self.parser.get_records)
+        self.assertEqual(len(self.publish_callback_values[3]), 40)
+        self.assert_state(self.PKT_TIME + 249)
+        self.assertEqual(len(self.state_callback_values), 4)
+
+        self.assertEqual(len(self.parser.get_records()), 1)
+        self.assertEqual(self.parser.get_records(), [])
+        self.assertEqual(len(self.state_callback_values), 5)
+
+    def test_state_interval(self):
+        """
+        Test tafter is pushed to the driver at most every state interval, and
+        when the parser is stopped
+        """
+        for i in range(1, 10):
+            self.orb.put(*self.stuff_packet(self.PKT_TIME + i))
+        self.parser_config[ParserConfigKey.BATCH_SIZE] = 2
+        self.parser_config[ParserConfigKey.STATE_INTERVAL] = 60
+        parser = self.build_parser(self.parser_config)
+
+        while parser.get_records():
+            pass
+        self.assertEqual(len(self.publish_callback_values), 5)
+        self.assertEqual(self.state_callback_values, [])
+
+        # as if the state was last pushed a minute ago
+        parser._state_time -= 60
+        parser.get_records()
+        self.assertEqual(len(self.state_callback_values), 1)
+        self.assertEqual(self.state_callback_values[0][StateKey.TAFTER], self.PKT_TIME + 9)
+
+        self.orb.put(*self.stuff_packet(self.PKT_TIME + 10))
+        parser.get_records()
+        self.assertEqual(len(self.state_callback_values), 1)
+        parser.kill_threads()
+        self.assertEqual(len(self.state_callback_values), 2)
+        self.assertEqual(parser._state[StateKey.TAFTER], self.PKT_TIME + 10)
+
+    def test_batch_rate(self):
+        """
+        Compare getting packets from a busy ORB a packet at a time against
+        batches
+        """
+        for i in range(1, 5000):
+            self.orb.put(*self.stuff_packet(self.PKT_TIME + i))
+
+        def drain(batch_size):
+            del self.publish_callback_values[:]
+            del self.state_callback_values[:]
+            self.parser_config[ParserConfigKey.BATCH_SIZE] = batch_size
+            parser = self.build_parser(self.parser_config)
+            start_time = time.time()
+            while parser.get_records():
+                pass
+            elapsed = time.time() - start_time
+            self.assertEqual(sum(len(particles) for particles in self.publish_callback_values), 5000)
+            self.assertEqual(parser._state[StateKey.TAFTER], self.PKT_TIME + 4999)
+            return (elapsed, parser._orbreapthr.calls, len(self.state_callback_values))
+
+        (before, before_calls, before_states) = drain(1)
+        (after, after_calls, after_states) = drain(100)
+        log.info("Got 5000 packets in %.2fs with %d gets and %d state updates a packet at a time, "
+                 "%.2fs with %d gets and %d state updates in batches",
+                 before, before_calls, before_states, after, after_calls, after_states)
+        self.assertEqual(before_states, 5000)
+        self.assertEqual(after_states, 50)
+        self.assertEqual(after_calls, 51)
 
 
@@ -8,6 +8,7 @@
 """
 import os
 import re
+import time
 import ntplib
 
 from nose.plugins.attrib import attr
@@ -272,4 +273,44 @@ class CgParserUnitTestCase(ParserUnitTestCase):
 	res_dict = result[0].generate_dict()
 	errors = result[0].get_encoding_errors()
 	log.debug("encoding errors: %s", errors)
-	self.assertNotEqual(errors, [])
\ No newline at end of file
+	self.assertNotEqual(errors, [])
+
+    def test_extraction_plan(self):
+        """
+        Compare the compiled extraction plan with updating a new parameter
+        dictionary from each file, for values and encoding errors, and log
+        how long each takes
+        """
+        def update_param_dict(particle, data):
+            # how every particle was built before it had a plan
+            params = particle._build_param_dict()
+            params.update(data)
+            return (params.get_all(), params.get_encoding_errors())
+
+        particle = CgStcEngStcParserDataParticle('', internal_timestamp=self.timestamp_a)
+        plan = particle._build_param_dict().extraction_plan()
+        for file_name in ['stc_status.txt', 'stc_status_all.txt', 'stc_status_bad_encode.txt',
+                          'stc_status_missing_time.txt', 'stc_status_second.txt']:
+            fid = open(os.path.join(RESOURCE_PATH, file_name))
+            data = fid.read()
+            fid.close()
+            (values, errors) = plan.extract(data)
+            (expected_values, expected_errors) = update_param_dict(particle, data)
+            self.assertEqual(values.items(), expected_values.items())
+            self.assertEqual(errors, expected_errors)
+            if file_name == 'stc_status_bad_encode.txt':
+                self.assertNotEqual(errors, [])
+
+        # the particle only builds its plan once
+        self.particle_a.generate_dict()
+        self.assertIs(CgStcEngStcParserDataParticle._extraction_plan, self.particle_a._extraction_plan)
+
+        start_time = time.time()
+        for i in range(20):
+            update_param_dict(particle, data)
+        before = time.time() - start_time
+        start_time = time.time()
+        for i in range(20):
+            CgStcEngStcParserDataParticle(data, internal_timestamp=self.timestamp_a).generate_dict()
+        after = time.time() - start_time
+        log.info("20 STC particles built in %.3fs updating a parameter dictionary, %.3fs now", before, after)
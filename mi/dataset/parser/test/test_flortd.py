@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import gevent
+import mmap
 import unittest
 import os
 import time
@@ -12,6 +13,7 @@ from mi.dataset.test.test_parser import ParserUnitTestCase
 from mi.dataset.parser.sio_mule_common import StateKey
 from mi.dataset.parser.flortd import FlortdParser, FlortdParserDataParticle
 from mi.dataset.dataset_driver import DataSetDriverConfigKeys
+from mi.dataset.mapped_file import MappedFile
 from mi.core.instrument.data_particle import DataParticleKey
 
 from mi.idk.config import Config
@@ -310,3 +312,24 @@ class FlortdParserUnitTestCase(ParserUnitTestCase):
                            [[0,69], [1329,1332],[2294,2363],[4092,4161],[4351,4927],[6131,6150]],
                            self.particle_b)
         self.stream_handle.close()
+
+    def test_mapped_file(self):
+        """
+        Read recovered data in place from a memory mapped file and verify
+        the records and state match reading the file normally
+        """
+        path = os.path.join(RESOURCE_PATH, 'node59p1_shorter.dat')
+        results = []
+        for stream_handle in (open(path), MappedFile(path)):
+            self.state_callback_value = None
+            self.parser = FlortdParser(self.config, None, stream_handle,
+                                       self.state_callback, self.pub_callback,
+                                       self.exception_callback, recovered_flag=True)
+            result = self.parser.get_records(6)
+            results.append((result, self.state_callback_value))
+            stream_handle.close()
+
+        self.assertEqual(len(results[0][0]), 6)
+        self.assertEqual(results[0], results[1])
+        # the mapped parser scanned the file in place
+        self.assertTrue(isinstance(self.parser.all_data, mmap.mmap))
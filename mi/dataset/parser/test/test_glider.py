@@ -8,11 +8,15 @@
 """
 
 from StringIO import StringIO
+import json
 import gevent
 import os
 import numpy as np
 import ntplib
 import unittest
+import time
+from functools import partial
+import re
 
 from mi.core.log import get_logger
 log = get_logger()
@@ -38,6 +42,8 @@ from mi.dataset.parser.glider import EngineeringTelemeteredDataParticle
 from mi.dataset.parser.glider import EngineeringMetadataDataParticle
 from mi.dataset.parser.glider import EngineeringMetadataParticleKey
 from mi.dataset.parser.glider import DataParticleType, GliderParticle
+from mi.dataset.parser.glider import GliderRecord, line_sieve
+from mi.core.instrument.chunker import StringChunker
 from mi.dataset.parser.test.glider_test_results import positions, glider_test_data
 
 
@@ -255,6 +261,8 @@ class GliderParserUnitTestCase(ParserUnitTestCase):
 
         particles = self.get_published_value()
         self.assertEqual(len(particles), 1)
+        # the value pairs encoder must produce the same JSON as the particle dictionary
+        self.assertEqual(particles[0].generate(), json.dumps(particles[0].generate_dict()))
 
         # Verify the data
         if values_dict:
@@ -559,3 +567,118 @@ class ENGGliderTest(GliderParserUnitTestCase):
         self.assert_generate_particle(EngineeringTelemeteredDataParticle, record_2, 12479)
         self.assert_generate_particle(EngineeringScienceTelemeteredDataParticle, record_sci_2, 12479)
         self.assert_no_more_data()
+
+
+@attr('UNIT', group='mi')
+class GliderDecodeTest(GliderParserUnitTestCase):
+    """
+    Test cases for decoding rows with the column schema from the header
+    """
+    config = ENGGliderTest.config
+
+    def test_decode_row(self):
+        """
+        Verify rows decode to typed values by column and particles find
+        their values by column
+        """
+        self.set_data(HEADER4, ENGSCI_RECORD)
+        self.reset_eng_parser()
+        row = ENGSCI_RECORD.strip().split('\n')[0]
+        record = self.parser._read_data(row)
+        self.assertIsInstance(record, GliderRecord)
+
+        # 1 byte columns are ints, lat/lon are in decimal degrees
+        self.assertEqual(record['c_air_pump'], 1)
+        self.assertIsInstance(record['c_air_pump'], int)
+        self.assertEqual(record['c_ballast_pumped'], 260.0)
+        self.assertIsInstance(record['c_ballast_pumped'], float)
+        self.assertEqual(record['c_wpt_lat'], 43.5)
+        self.assertEqual(record['c_wpt_lon'], -126.0)
+        self.assertTrue(np.isnan(record['sci_bsipar_par']))
+        self.assertRaises(KeyError, record.__getitem__, 'sci_bogus')
+
+        self.assertEqual(record.value_pairs(['c_battpos', 'sci_bogus', 'sci_bsipar_par', 'c_air_pump']),
+                         (('c_battpos', 'sci_bsipar_par', 'c_air_pump'), [0.7, None, 1]))
+        self.assertTrue(record.has_data(['sci_bsipar_par', 'c_battpos']))
+        self.assertFalse(record.has_data(['sci_bsipar_par', 'sci_bogus']))
+
+        self.assertRaises(SampleException, self.parser._read_data, row + ' 1')
+
+    def test_line_sieve(self):
+        """
+        Verify the line sieve finds the same records as the record regex
+        """
+        for data in [CHUNKER_TEST, ENGSCI_RECORD + '\n\n1 2', '', 'no newline']:
+            self.assertEqual(line_sieve(data),
+                             StringChunker.regex_sieve_function(data, regex_list=[re.compile(r'.*\n')]))
+
+    def test_decode_rate(self):
+        """
+        Check rows decoded into a record give the same particle values as
+        building a dictionary for each value, and log the rows per second
+        decoded each way
+        """
+        def dict_read_data(parser, data_record):
+            data_dict = {}
+            labels = parser._header_dict['labels']
+            num_bytes = parser._header_dict['num_of_bytes']
+            data = data_record.strip().split()
+            for ii in range(len(data)):
+                if data[ii] == 'NaN':
+                    value = float(data[ii])
+                elif ('_lat' in labels[ii]) or ('_lon' in labels[ii]):
+                    value = parser._string_to_ddegrees(data[ii])
+                    log.debug("Converted lat/lon %s from %s to %10.5f", labels[ii], data[ii], value)
+                elif num_bytes[ii] in (1, 2):
+                    value = int(data[ii])
+                else:
+                    value = float(data[ii])
+                data_dict[labels[ii]] = {'Name': labels[ii], 'Data': value}
+            return data_dict
+
+        def dict_has_data(data_dict, particle_class):
+            for key in data_dict.keys():
+                if key in particle_class.science_parameters and not np.isnan(data_dict[key]['Data']):
+                    return True
+            return False
+
+        def rows_per_second(read_data, has_data, rows, count=5):
+            particle_classes = [EngineeringTelemeteredDataParticle, EngineeringScienceTelemeteredDataParticle]
+            values = []
+            start_time = time.time()
+            for i in range(count):
+                for row in rows:
+                    data = read_data(row)
+                    for particle_class in particle_classes:
+                        if has_data(data, particle_class):
+                            values.append(particle_class(data)._build_value_pairs())
+            return (count * len(rows) / (time.time() - start_time), values)
+
+        self.set_data_file(os.path.join(os.path.dirname(__file__), '..', '..', 'driver', 'moas', 'gl', 'engineering',
+                                        'resource', 'unit_247_2012_051_0_0-engDataOnly.mrg'))
+        self.reset_eng_parser()
+        rows = [row for row in self.test_data.read().split('\n') if row.strip()]
+        self.assertEqual(len(rows), 100)
+
+        (before, dict_values) = rows_per_second(partial(dict_read_data, self.parser), dict_has_data, rows)
+        (after, values) = rows_per_second(self.parser._read_data,
+                                          lambda record, particle_class: record.has_data(particle_class.science_parameters),
+                                          rows)
+
+        self.assertEqual([(list(value_ids), row_values) for (value_ids, row_values) in values], dict_values)
+
+        # whole lines, and a partial record at the end of the buffer
+        data = '\n'.join(rows[:3]) + '\n' + rows[3][:len(rows[3]) / 2]
+        line_regex = re.compile(r'.*\n')
+        self.assertEqual(line_sieve(data), StringChunker.regex_sieve_function(data, regex_list=[line_regex]))
+
+        partial_row = rows[0][:len(rows[0]) / 2]
+        start_time = time.time()
+        StringChunker.regex_sieve_function(partial_row, regex_list=[line_regex])
+        regex_time = time.time() - start_time
+        start_time = time.time()
+        self.assertEqual(line_sieve(partial_row), [])
+        line_time = time.time() - start_time
+
+        log.info("Glider rows per second: %d decoded to value dictionaries, %d decoded by column; "
+                 "partial record sieve %.6fs by regex, %.6fs by line", before, after, regex_time, line_time)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+"""
+@package mi.dataset.parser.test.test_sio_mule_common
+@file mi/dataset/parser/test/test_sio_mule_common.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief Test code for the state and file handling common to SIO mule parsers
+"""
+
+import os
+import copy
+import time
+import shutil
+import tempfile
+from StringIO import StringIO
+from nose.plugins.attrib import attr
+
+from mi.core.log import get_logger ; log = get_logger()
+
+from mi.core.instrument.chunker import StringChunker
+from mi.dataset.test.test_parser import ParserUnitTestCase
+from mi.dataset.dataset_driver import DataSetDriverConfigKeys
+from mi.dataset.parser.sio_mule_common import SioFileData, StateKey
+from mi.dataset.parser.sio_mule_common import remove_interval, next_interval
+from mi.dataset.parser.ctdmo import CtdmoParser
+
+from mi.idk.config import Config
+RESOURCE_PATH = os.path.join(Config().base_dir(), 'mi',
+                             'dataset', 'driver', 'mflm',
+                             'ctd', 'resource')
+
+@attr('UNIT', group='mi')
+class SioMuleCommonUnitTestCase(ParserUnitTestCase):
+
+    def test_file_data(self):
+        """
+        Test slices of the file data match slices of the whole file with escape
+        sequences replaced in 1024 byte blocks
+        """
+        # the sequence at 1023 is split between blocks and is not replaced
+        raw_data = ''.join(chr(i % 256) for i in range(3000))
+        raw_data = raw_data[:10] + '\x18\x6b' + raw_data[12:500] + '\x18\x58\x18\x6b' + \
+            raw_data[504:1023] + '\x18\x58' + raw_data[1025:2000] + '\x18\x18\x58' + raw_data[2003:]
+        blocks = [raw_data[i:i + 1024] for i in range(0, len(raw_data), 1024)]
+        all_data = ''.join(block.replace('\x18\x6b', '\x2b').replace('\x18\x58', '\x18') for block in blocks)
+
+        file_data = SioFileData(StringIO(raw_data), True)
+        self.assertEqual(len(file_data), len(all_data))
+        self.assertEqual(file_data[0:len(all_data)], all_data)
+        for (start, end) in [(0, 11), (10, 11), (11, 500), (499, 1030), (1020, 1024), (1500, 2500), (2500, 3000)]:
+            self.assertEqual(file_data[start:end], all_data[start:end])
+
+        file_data = SioFileData(StringIO(raw_data), False)
+        self.assertEqual(len(file_data), len(raw_data))
+        self.assertEqual(file_data[499:1030], raw_data[499:1030])
+
+    def test_intervals(self):
+        """
+        Test removing from and searching sorted intervals
+        """
+        intervals = [[0, 12], [336, 394], [1429, 7500]]
+        remove_interval(intervals, 1429, 1500)
+        remove_interval(intervals, 2000, 2100)
+        remove_interval(intervals, 7000, 7500)
+        remove_interval(intervals, 0, 12)
+        # not within any interval
+        remove_interval(intervals, 390, 400)
+        self.assertEqual(intervals, [[336, 394], [1500, 2000], [2100, 7000]])
+
+        self.assertEqual(next_interval(intervals, 0), 0)
+        self.assertEqual(next_interval(intervals, 393), 0)
+        self.assertEqual(next_interval(intervals, 394), 1)
+        self.assertEqual(next_interval(intervals, 2050), 2)
+        self.assertEqual(next_interval(intervals, 7000), 3)
+
+    def test_parse_rate(self):
+        """
+        Compare parsing a large file through the string chunker with the
+        incremental chunker and in process packet index, check the records
+        and the state after every batch match, and log how long each takes
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'node59p1_part.dat')
+        with open(os.path.join(RESOURCE_PATH, 'node59p1.dat'), 'rb') as source:
+            with open(path, 'wb') as part:
+                part.write(source.read(1000000))
+
+        config = {
+            DataSetDriverConfigKeys.PARTICLE_MODULE: 'mi.dataset.parser.ctdmo',
+            DataSetDriverConfigKeys.PARTICLE_CLASS: ['CtdmoParserDataParticle',
+                                                     'CtdmoOffsetParserDataParticle'],
+            'inductive_id': 55
+        }
+
+        def parse(string_chunker):
+            states = []
+            stream_handle = open(path, 'rb')
+            parser = CtdmoParser(config, None, stream_handle, lambda state: states.append(copy.deepcopy(state)),
+                                 lambda particles: None, lambda exception: None)
+            if string_chunker:
+                parser._chunker = StringChunker(parser.sieve_function)
+            records = []
+            start_time = time.time()
+            while True:
+                result = parser.get_records(10)
+                if not result:
+                    break
+                records.extend(particle.raw_data for particle in result)
+            elapsed = time.time() - start_time
+            stream_handle.close()
+            return (records, states, elapsed)
+
+        (before_records, before_states, before) = parse(True)
+        (after_records, after_states, after) = parse(False)
+        self.assertEqual(after_records, before_records)
+        self.assertEqual(after_states, before_states)
+        self.assertEqual(after_states[-1][StateKey.IN_PROCESS_DATA], [])
+
+        log.info("Parsed %d CTDMO records in %.2fs through the string chunker, %.2fs now",
+                 len(after_records), before, after)
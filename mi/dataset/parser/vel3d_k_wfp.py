@@ -25,12 +25,12 @@ __license__ = 'Apache 2.0'
 # The last record in the file is a time record containing the start and end times.
 #
 
-import copy
 import ntplib
 import re
 import struct
 
 from mi.core.log import get_logger; log = get_logger()
+from mi.core.checksum import sum16_le
 from mi.core.common import BaseEnum
 from mi.core.instrument.data_particle import DataParticle, DataParticleKey
 from mi.core.exceptions import \
@@ -320,16 +320,8 @@ class Vel3dKWfpParser(BufferLoadingParser):
           Calculated checksum
         """
 
-        checksum = 0xB58C  # initial value per Nortek's Integrator's Guide
-        index = 0
-        for x in range(0, values):
-            checksum += struct.unpack('<H', input_buffer[index: index + 2])[0]
-            index += 2
-
-        #
-        # Modulo 65535
-        #
-        return checksum & 0xFFFF
+        # initial value per Nortek's Integrator's Guide, modulo 65535
+        return sum16_le(input_buffer, 0, values * 2, seed=0xB58C)
 
     def calculate_timestamp(self):
         """
@@ -454,7 +446,7 @@ class Vel3dKWfpParser(BufferLoadingParser):
                 # If a particle was created, add it to the list of particles.
                 #
                 if sample:
-                    result_particles.append((sample, copy.copy(self._read_state)))
+                    result_particles.append((sample, self._checkpoint()))
 
             (nd_timestamp, non_data, non_start, non_end) = self._chunker.get_next_non_data_with_index(clean=False)
             (timestamp, chunk, start, end) = self._chunker.get_next_data_with_index(clean=True)
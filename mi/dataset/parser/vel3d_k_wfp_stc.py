@@ -24,7 +24,6 @@ Initial Release
 __author__ = 'Steve Myerson (Raytheon)'
 __license__ = 'Apache 2.0'
 
-import copy
 import gevent
 import ntplib
 import re
@@ -460,7 +459,7 @@ class Vel3dKWfpStcParser(BufferLoadingParser):
                             None, velocity_fields, ntp_time)
 
                         result_particles.append((particle,
-                            copy.copy(self._read_state)))
+                            self._checkpoint()))
 
                     #
                     # Ran off the end of the file.  Tell 'em the bad news.
@@ -497,7 +496,7 @@ class Vel3dKWfpStcParser(BufferLoadingParser):
                         Vel3dKWfpStcMetadataParticle, None, time_fields, ntp_time)
 
                     self._increment_state(TIME_RECORD_SIZE)
-                    result_particles.append((particle, copy.copy(self._read_state)))
+                    result_particles.append((particle, self._checkpoint()))
 
                 else:
                     log.warn("EOF reading time record")
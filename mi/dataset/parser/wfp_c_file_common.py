@@ -13,7 +13,6 @@ initial release
 __author__ = 'Emily Hahn'
 __license__ = 'Apache 2.0'
 
-import copy
 import re
 import ntplib
 import struct
@@ -217,7 +216,7 @@ class WfpCFileCommonParser(BufferLoadingParser):
             timestamp = float(ntplib.system_to_ntp_time(self._start_time))
             sample = self.extract_metadata_particle(self.footer_data, timestamp)
             self._read_state[StateKey.METADATA_SENT] = True
-            result_particles.append((sample, copy.copy(self._read_state)))
+            result_particles.append((sample, self._checkpoint()))
 
         (timestamp, chunk) = self._chunker.get_next_data()
 
@@ -232,7 +231,7 @@ class WfpCFileCommonParser(BufferLoadingParser):
                 if sample:
                     # create particle
                     self._increment_state(DATA_RECORD_BYTES, 1)
-                    result_particles.append((sample, copy.copy(self._read_state)))
+                    result_particles.append((sample, self._checkpoint()))
 
             (timestamp, chunk) = self._chunker.get_next_data()
 
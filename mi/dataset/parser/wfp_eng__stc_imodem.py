@@ -13,7 +13,6 @@ initial release
 __author__ = 'Mark Worden'
 __license__ = 'Apache 2.0'
 
-import copy
 import ntplib
 import struct
 
@@ -89,7 +88,7 @@ class WfpEngStcImodemParser(WfpEFileParser):
                 # create particle
                 self._increment_state(HEADER_BYTES)
                 log.debug("Extracting header %s with read_state: %s", sample, self._read_state)
-                self._saved_header = (sample, copy.copy(self._read_state))
+                self._saved_header = (sample, self._checkpoint())
         else:
             raise SampleException("File header does not match header regex")
 
@@ -128,7 +127,7 @@ class WfpEngStcImodemParser(WfpEFileParser):
         if sample:
             # create particle
             log.trace("Extracting sample %s with read_state: %s", sample, self._read_state)
-            result_particle = (sample, copy.copy(self._read_state))
+            result_particle = (sample, self._checkpoint())
 
         return result_particle
 
@@ -11,7 +11,6 @@ files. It initially holds WFP-specific logic, ultimately more than that.
 __author__ = 'Roger Unwin'
 __license__ = 'Apache 2.0'
 
-import copy
 import re
 import time
 import ntplib
@@ -281,7 +280,7 @@ class WfpParser(BufferLoadingParser):
                     # create particle
                     self._increment_state(end)
 
-                    result_particles.append((sample, copy.copy(self._read_state)))
+                    result_particles.append((sample, self._checkpoint()))
             else:
                 log.error("Unhandled chunk: %s", chunk)
                 #raise SampleException("Unhandled chunk: %s", chunk)
@@ -534,7 +533,7 @@ class Vel3dkParser(WfpParser):
                     # create particle
                     self._increment_state(end)
 
-                    result_particles.append((sample, copy.copy(self._read_state)))
+                    result_particles.append((sample, self._checkpoint()))
             else:
                 log.error("Unhandled chunk: %s", chunk)
                 #raise SampleException("Unhandled chunk: %s", chunk)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""
+@package mi.dataset.test.test_dataset_parser
+@file mi/dataset/test/test_dataset_parser.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief Test code for the state checkpoints of the buffer loading parser
+"""
+
+import sys
+import copy
+import time
+from nose.plugins.attrib import attr
+
+from mi.core.log import get_logger ; log = get_logger()
+
+from mi.dataset.test.test_parser import ParserUnitTestCase
+from mi.dataset.dataset_parser import StateCheckpoints
+
+@attr('UNIT', group='mi')
+class StateCheckpointsUnitTestCase(ParserUnitTestCase):
+
+    def test_checkpoints(self):
+        """
+        Test the state at each checkpoint is built back, including keys
+        added to or removed from the state, and discarded checkpoints
+        """
+        checkpoints = StateCheckpoints()
+        state = {'position': 0, 'records_read': 0}
+        self.assertEqual(checkpoints.add(state), 0)
+        state['position'] = 100
+        state['records_read'] = 1
+        self.assertEqual(checkpoints.add(state), 1)
+        state['metadata_sent'] = True
+        self.assertEqual(checkpoints.add(state), 2)
+        del state['records_read']
+        self.assertEqual(checkpoints.add(state), 3)
+
+        self.assertEqual(checkpoints.state_at(0), {'position': 0, 'records_read': 0})
+        self.assertEqual(checkpoints.state_at(1), {'position': 100, 'records_read': 1})
+        self.assertEqual(checkpoints.state_at(2), {'position': 100, 'records_read': 1, 'metadata_sent': True})
+        self.assertEqual(checkpoints.state_at(3), {'position': 100, 'metadata_sent': True})
+
+        # a built state doesn't change with the state it was taken from
+        state['position'] = 200
+        built = checkpoints.state_at(3)
+        self.assertEqual(built['position'], 100)
+
+        checkpoints.discard(1)
+        self.assertRaises(IndexError, checkpoints.state_at, 1)
+        self.assertEqual(checkpoints.state_at(2), {'position': 100, 'records_read': 1, 'metadata_sent': True})
+        self.assertEqual(checkpoints.add(state), 4)
+        self.assertEqual(checkpoints.state_at(4), {'position': 200, 'metadata_sent': True})
+        self.assertRaises(IndexError, checkpoints.state_at, 5)
+
+        # discarded checkpoints are removed once they are most of them
+        for i in range(100):
+            state['position'] += 1
+            token = checkpoints.add(state)
+            checkpoints.discard(token - 1)
+        self.assertLessEqual(len(checkpoints._columns[0][1]), 3)
+        self.assertEqual(checkpoints.state_at(token), {'position': 300, 'metadata_sent': True})
+
+    def test_replaced_key(self):
+        """
+        Test a key removed and another added in the same change is held,
+        and new keys are only looked for when the state has one
+        """
+        checkpoints = StateCheckpoints()
+        state = {'position': 0, 'records_read': 0}
+        self.assertEqual(checkpoints.add(state), 0)
+        del state['records_read']
+        state['metadata_sent'] = True
+        self.assertEqual(checkpoints.add(state), 1)
+        self.assertEqual(checkpoints.state_at(0), {'position': 0, 'records_read': 0})
+        self.assertEqual(checkpoints.state_at(1), {'position': 0, 'metadata_sent': True})
+
+        added = []
+        add_keys = checkpoints._add_keys
+        def counted_add_keys(state):
+            added.append(state.keys())
+            return add_keys(state)
+        checkpoints._add_keys = counted_add_keys
+
+        # the state has fewer keys than the checkpoints hold from here on
+        for i in range(10):
+            state['position'] += 10
+            token = checkpoints.add(state)
+        self.assertEqual(added, [])
+        state['records_read'] = 10
+        self.assertEqual(checkpoints.add(state), token + 1)
+        self.assertEqual(added, [])
+        state['file_size'] = 1000
+        self.assertEqual(checkpoints.add(state), token + 2)
+        self.assertEqual(len(added), 1)
+        self.assertEqual(checkpoints.state_at(token), {'position': 100, 'metadata_sent': True})
+        self.assertEqual(checkpoints.state_at(token + 2),
+                         {'position': 100, 'metadata_sent': True, 'records_read': 10, 'file_size': 1000})
+
+    def test_checkpoint_size(self):
+        """
+        Compare the memory and time taken holding the state of every record
+        in a large buffer as checkpoints against a copy of the state per record
+        """
+        n_records = 100000
+        state = {'position': 0, 'records_read': 0, 'metadata_sent': True}
+
+        start_time = time.time()
+        copies = []
+        for i in xrange(n_records):
+            state['position'] += 10
+            copies.append(copy.copy(state))
+        copy_time = time.time() - start_time
+        copy_size = sum(sys.getsizeof(copied) for copied in copies)
+
+        state['position'] = 0
+        start_time = time.time()
+        checkpoints = StateCheckpoints()
+        tokens = []
+        for i in xrange(n_records):
+            state['position'] += 10
+            tokens.append(checkpoints.add(state))
+        checkpoint_time = time.time() - start_time
+        checkpoint_size = sum(sys.getsizeof(values) for (key, values) in checkpoints._columns)
+
+        self.assertEqual(checkpoints.state_at(tokens[-1]), copies[-1])
+        self.assertEqual(checkpoints.state_at(tokens[500]), copies[500])
+        log.info("%d record states held in %d bytes as copies in %.3fs, %d bytes as checkpoints in %.3fs",
+                 n_records, copy_size, copy_time, checkpoint_size, checkpoint_time)
+        self.assertGreater(copy_size, checkpoint_size * 5)
@@ -7,11 +7,25 @@
 @brief Test code for the dataset driver base classes
 """
 
+import os
+import re
+import copy
+import time
+import shutil
+import tempfile
+import cPickle as pickle
+
 from nose.plugins.attrib import attr
 
+from mi.core.log import get_logger ; log = get_logger()
 from mi.core.unit_test import MiUnitTestCase
 from mi.core.exceptions import DataSourceLocationException
+from mi.core.exceptions import InstrumentParameterException
+from mi.core.exceptions import SampleException
 from mi.dataset.dataset_driver import DataSourceLocation
+from mi.dataset.dataset_driver import DataSourceConfigKey, DataSetDriverConfigKeys
+from mi.dataset.dataset_driver import DriverParameter, DriverStateKey, HarvesterType
+from mi.dataset.dataset_driver import SimpleDataSetDriver, MultipleHarvesterDataSetDriver
 
 @attr('UNIT', group='mi')
 class DataSourceLocationUnitTestCase(MiUnitTestCase):
@@ -57,4 +71,312 @@ class DataSourceLocationUnitTestCase(MiUnitTestCase):
         self.assertEqual(dsl.parser_position, parser_pos1)
         
         
-                
\ No newline at end of file
+                
+
+class LineParser(object):
+    """
+    Parser publishing each line of a file, lines of 'bad' raise a
+    SampleException and lines of 'match' publish a regex match, which can't
+    be pickled
+    """
+    def __init__(self, state, stream_handle, state_callback, publish_callback):
+        self._lines = stream_handle.read().splitlines()
+        stream_handle.close()
+        self._position = state['position'] if state else 0
+        self._state_callback = state_callback
+        self._publish_callback = publish_callback
+
+    def get_records(self, num_records):
+        lines = self._lines[self._position:self._position + num_records]
+        if not lines:
+            return []
+        if 'bad' in lines:
+            raise SampleException("bad line")
+        self._position += len(lines)
+        self._publish_callback([re.match('.*', line) if line == 'match' else line for line in lines])
+        self._state_callback({'position': self._position}, self._position == len(self._lines))
+        return lines
+
+
+class LineDataSetDriver(SimpleDataSetDriver):
+    def _build_parser(self, parser_state, infile):
+        return LineParser(parser_state, infile, self._save_parser_state, self._data_callback)
+
+
+class MultipleLineDataSetDriver(MultipleHarvesterDataSetDriver):
+    def _build_parser(self, parser_state, infile, data_key=None):
+        return LineParser(parser_state, infile,
+                          lambda state, ingested: self._save_parser_state(state, data_key, ingested),
+                          self._data_callback)
+
+
+@attr('UNIT', group='mi')
+class ParserPoolUnitTestCase(MiUnitTestCase):
+    """
+    Test files parsed by a pool of workers are published the same as files
+    parsed one at a time
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        # a few files are parsed in the driver, the match can't be returned
+        # from a worker and the bad line stops parsing its file
+        self.files = []
+        for i in range(7):
+            lines = ['%d-%d' % (i, j) for j in range(5)]
+            if i == 2:
+                lines[3] = 'bad'
+            if i == 4:
+                lines[1] = 'match'
+            file_name = 'file_%d.dat' % i
+            with open(os.path.join(self.directory, file_name), 'w') as f:
+                f.write('\n'.join(lines))
+            self.files.append(file_name)
+
+    def _ingest(self, driver, queue, poll):
+        """
+        Queue all the files for the driver and poll until it has parsed them
+        @retval list of the callbacks made by the driver
+        """
+        for file_name in self.files:
+            queue(file_name)
+        del self.callbacks[:]
+        while self.files_left():
+            poll()
+        return self.callbacks
+
+    def _callbacks(self):
+        self.callbacks = []
+        def data_callback(particles):
+            self.callbacks.append(('data', [getattr(p, 'string', p) for p in particles]))
+        def state_callback(state):
+            self.callbacks.append(('state', copy.deepcopy(state)))
+        def event_callback(**kwargs):
+            self.callbacks.append(('event', kwargs))
+        def exception_callback(e):
+            self.callbacks.append(('exception', e))
+        return (data_callback, state_callback, event_callback, exception_callback)
+
+    def _simple_driver(self, workers):
+        config = {DataSourceConfigKey.HARVESTER: {DataSetDriverConfigKeys.DIRECTORY: self.directory,
+                                                  DataSetDriverConfigKeys.PATTERN: '*.dat'},
+                  DataSourceConfigKey.DRIVER: {DriverParameter.BATCHED_PARTICLE_COUNT: 2,
+                                               DriverParameter.RECORDS_PER_SECOND: 10000,
+                                               DriverParameter.PARSER_WORKERS: workers}}
+        driver = LineDataSetDriver(config, None, *self._callbacks())
+        self.files_left = lambda: driver._new_file_queue
+        return self._ingest(driver, driver._new_file_callback, driver._poll)
+
+    def _multiple_driver(self, workers):
+        config = {DataSourceConfigKey.HARVESTER: {'key': {DataSetDriverConfigKeys.DIRECTORY: self.directory,
+                                                          DataSetDriverConfigKeys.PATTERN: '*.dat'}},
+                  DataSourceConfigKey.DRIVER: {DriverParameter.BATCHED_PARTICLE_COUNT: 2,
+                                               DriverParameter.PARSER_WORKERS: workers}}
+        driver = MultipleLineDataSetDriver(config, None, *(self._callbacks() + (['key'],)))
+        self.files_left = lambda: driver._new_file_queue['key']
+        return self._ingest(driver, lambda file_name: driver._new_file_callback(file_name, 'key'),
+                            lambda: driver._poll('key'))
+
+    def test_parser_workers(self):
+        """
+        Test particles, events and driver state are published in file order
+        """
+        expected = self._simple_driver(1)
+        self.assertIn(('data', ['4-0', 'match']), expected)
+        self.assertEqual(len([c for c in expected if c[0] == 'event' and
+                              c[1]['event_type'] == "ResourceAgentErrorEvent"]), 1)
+        self.assertTrue(all(expected[-1][1][f][DriverStateKey.INGESTED] for f in self.files))
+
+        self.assertEqual(self._simple_driver(3), expected)
+        self.assertEqual(self._simple_driver(10), expected)
+
+        expected = self._multiple_driver(1)
+        self.assertEqual(self._multiple_driver(4), expected)
+
+        self.assertRaises(InstrumentParameterException, self._simple_driver, 0)
+
+    def test_harvester_type_config(self):
+        """
+        Test an inotify harvester type is set in the driver's own copy of the
+        harvester config, not the config it was given
+        """
+        harvester_config = {'key': {DataSetDriverConfigKeys.DIRECTORY: self.directory,
+                                    DataSetDriverConfigKeys.PATTERN: '*.dat'}}
+        config = {DataSourceConfigKey.HARVESTER: copy.deepcopy(harvester_config),
+                  DataSourceConfigKey.DRIVER: {}}
+        driver = MultipleLineDataSetDriver(config, None, *(self._callbacks() + (['key'],)),
+                                           harvester_type={'key': HarvesterType.INOTIFY_DIRECTORY})
+        self.assertEqual(driver._harvester_config['key'][DataSetDriverConfigKeys.HARVESTER_TYPE],
+                         HarvesterType.INOTIFY_DIRECTORY)
+        self.assertEqual(config[DataSourceConfigKey.HARVESTER], harvester_config)
+
+
+@attr('UNIT', group='mi')
+class StateCommitUnitTestCase(MiUnitTestCase):
+    """
+    Test the driver state sent to the agent is coalesced, flushed, sent as
+    deltas to a delta consumer and compacted by the state commit policy
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.files = self._write_files(6, 5)
+
+    def _write_files(self, n_files, n_lines):
+        files = []
+        for i in range(n_files):
+            file_name = 'file_%03d.dat' % i
+            with open(os.path.join(self.directory, file_name), 'w') as f:
+                f.write('\n'.join('%d-%d' % (i, j) for j in range(n_lines)))
+            files.append(file_name)
+        return files
+
+    def _driver(self, driver_config, memento=None):
+        """
+        Build a driver publishing a line at a time with the driver config
+        @retval (driver, list of the states sent to the agent)
+        """
+        config = {DataSourceConfigKey.HARVESTER: {DataSetDriverConfigKeys.DIRECTORY: self.directory,
+                                                  DataSetDriverConfigKeys.PATTERN: '*.dat'},
+                  DataSourceConfigKey.DRIVER: dict(driver_config, **{DriverParameter.RECORDS_PER_SECOND: 100000})}
+        states = []
+        driver = LineDataSetDriver(config, memento, lambda particles: None,
+                                   lambda state: states.append(copy.deepcopy(state)),
+                                   lambda **kwargs: None, lambda e: None)
+        return (driver, states)
+
+    def _ingest(self, driver, files):
+        for file_name in files:
+            driver._new_file_callback(file_name)
+        while driver._new_file_queue:
+            driver._poll()
+
+    def test_coalesce(self):
+        """
+        Test state changes are coalesced by count and time, and flushed when a
+        file is done and when sampling stops
+        """
+        (driver, every_change) = self._driver({})
+        self._ingest(driver, self.files)
+        # a change for each file found and each line
+        self.assertEqual(len(every_change), 6 + 6 * 5)
+
+        (driver, states) = self._driver({DriverParameter.STATE_COMMIT_COUNT: 100})
+        self._ingest(driver, self.files)
+        # the file states are committed as each file is done
+        self.assertEqual(len(states), 6)
+        self.assertEqual(states[-1], every_change[-1])
+
+        driver._new_file_callback('file_000.dat')
+        self.assertEqual(len(states), 6)
+        driver._commit_state()
+        self.assertEqual(len(states), 6)
+        driver.stop_sampling()
+        self.assertEqual(len(states), 7)
+        driver.stop_sampling()
+        self.assertEqual(len(states), 7)
+
+        (driver, states) = self._driver({DriverParameter.STATE_COMMIT_COUNT: 100,
+                                         DriverParameter.STATE_COMMIT_INTERVAL: 30})
+        driver._new_file_callback('file_000.dat')
+        driver._new_file_callback('file_001.dat')
+        self.assertEqual(len(states), 0)
+        # as if the last commit was 30 seconds ago
+        driver._state_commit_time -= 30
+        driver._commit_state()
+        self.assertEqual(len(states), 1)
+        self.assertEqual(sorted(states[-1].keys()), ['file_000.dat', 'file_001.dat', DriverStateKey.VERSION])
+
+        self.assertRaises(InstrumentParameterException, self._driver, {DriverParameter.STATE_COMMIT_COUNT: 0})
+        self.assertRaises(InstrumentParameterException, self._driver, {DriverParameter.STATE_COMMIT_INTERVAL: -1})
+        self.assertRaises(InstrumentParameterException, self._driver, {DriverParameter.STATE_DELTA: 1})
+
+    def test_delta(self):
+        """
+        Test deltas sent to the delta callback only hold the changed file
+        entries and merged they give the whole state, while the state
+        callback still gets the whole state
+        """
+        (driver, every_change) = self._driver({})
+        self._ingest(driver, self.files)
+
+        (driver, states) = self._driver({DriverParameter.STATE_DELTA: True})
+        deltas = []
+        driver.set_state_delta_callback(lambda delta: deltas.append(copy.deepcopy(delta)))
+        self._ingest(driver, self.files)
+        self.assertEqual(states, every_change)
+        self.assertEqual(len(deltas), len(every_change))
+        state = {}
+        for delta in deltas:
+            self.assertEqual(delta[DriverStateKey.VERSION], every_change[-1][DriverStateKey.VERSION])
+            self.assertEqual(len(delta[DriverStateKey.DELTA]), 1)
+            state.update(delta[DriverStateKey.DELTA])
+        state[DriverStateKey.VERSION] = deltas[-1][DriverStateKey.VERSION]
+        self.assertEqual(state, every_change[-1])
+
+        # without the parameter set nothing is sent to the delta callback
+        (driver, states) = self._driver({})
+        deltas = []
+        driver.set_state_delta_callback(deltas.append)
+        self._ingest(driver, self.files)
+        self.assertEqual(states, every_change)
+        self.assertEqual(deltas, [])
+
+    def test_compact(self):
+        """
+        Test the parser state is cleared from all but the most recently
+        ingested files, including files ingested before the driver started
+        """
+        (driver, states) = self._driver({DriverParameter.INGESTED_STATE_LIMIT: 2})
+        self._ingest(driver, self.files[:4])
+        state = states[-1]
+        for file_name in self.files[:2]:
+            self.assertTrue(state[file_name][DriverStateKey.INGESTED])
+            self.assertEqual(state[file_name][DriverStateKey.PARSER_STATE], None)
+            self.assertIn(DriverStateKey.FILE_CHECKSUM, state[file_name])
+        for file_name in self.files[2:4]:
+            self.assertEqual(state[file_name][DriverStateKey.PARSER_STATE], {'position': 5})
+
+        # restart from a memento where no file state was compacted
+        (driver, every_change) = self._driver({})
+        self._ingest(driver, self.files[:4])
+        (driver, states) = self._driver({DriverParameter.INGESTED_STATE_LIMIT: 1}, every_change[-1])
+        self._ingest(driver, self.files[4:])
+        state = states[-1]
+        self.assertEqual([f for f in self.files if state[f][DriverStateKey.PARSER_STATE] is not None],
+                         self.files[5:])
+        self.assertTrue(all(state[f][DriverStateKey.INGESTED] for f in self.files))
+
+    def test_commit_cost(self):
+        """
+        Compare the size of the whole driver state sent on every change
+        against coalesced commits of compacted ingested file states, and of
+        the deltas, while ingesting many small files
+        """
+        files = self._write_files(400, 10)
+
+        def ingest(driver_config):
+            (driver, states) = self._driver(driver_config)
+            deltas = []
+            driver._state_callback = lambda state: states.append(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+            driver.set_state_delta_callback(lambda delta: deltas.append(pickle.dumps(delta,
+                                                                                     pickle.HIGHEST_PROTOCOL)))
+            start_time = time.time()
+            self._ingest(driver, files)
+            driver.stop_sampling()
+            return (sum(len(state) for state in states), sum(len(delta) for delta in deltas),
+                    time.time() - start_time, driver._driver_state)
+
+        (before_size, before_delta_size, before_time, before_state) = ingest({})
+        (after_size, after_delta_size, after_time, after_state) = ingest(
+            {DriverParameter.STATE_COMMIT_COUNT: 50,
+             DriverParameter.STATE_COMMIT_INTERVAL: 5,
+             DriverParameter.STATE_DELTA: True,
+             DriverParameter.INGESTED_STATE_LIMIT: 10})
+        self.assertEqual(sorted(after_state.keys()), sorted(before_state.keys()))
+        self.assertEqual(before_delta_size, 0)
+        log.info("Sent %d bytes of driver state in %.2fs for every change, %d bytes coalesced and %d bytes "
+                 "of deltas in %.2fs", before_size, before_time, after_size, after_delta_size, after_time)
+        self.assertGreater(before_size, after_size)
+        self.assertGreater(after_size, after_delta_size * 10)
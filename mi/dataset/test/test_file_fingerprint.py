@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+"""
+@package mi.dataset.test.test_file_fingerprint
+@file mi/dataset/test/test_file_fingerprint.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief Test code for the file checksum cache
+"""
+
+import os
+import hashlib
+import tempfile
+
+from mi.core.log import get_logger ; log = get_logger()
+from nose.plugins.attrib import attr
+from mi.core.unit_test import MiUnitTest
+from mi.dataset.file_fingerprint import FingerprintCache
+
+
+class RecordingFingerprintCache(FingerprintCache):
+    """
+    Fingerprint cache that records where each hash started reading
+    """
+    def __init__(self, *args, **kwargs):
+        super(RecordingFingerprintCache, self).__init__(*args, **kwargs)
+        self.hash_starts = []
+
+    def _hash_file(self, filehandle):
+        self.hash_starts.append(filehandle.tell())
+        return super(RecordingFingerprintCache, self)._hash_file(filehandle)
+
+
+@attr('UNIT', group='mi')
+class TestFingerprintCache(MiUnitTest):
+
+    def setUp(self):
+        (handle, self.path) = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        # small blocks so the multi block paths are used
+        self.cache = RecordingFingerprintCache(block_size=1000)
+
+    def write(self, data, mode='wb', mtime=None):
+        with open(self.path, mode) as filehandle:
+            filehandle.write(data)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_checksum(self):
+        """
+        Test checksums match hashing the whole file and are only computed
+        when the file changes
+        """
+        data = os.urandom(10000)
+        self.write(data, mtime=1000)
+        self.assertEqual(self.cache.checksum(self.path), hashlib.md5(data).hexdigest())
+        self.assertEqual(self.cache.checksum(self.path, os.stat(self.path)), hashlib.md5(data).hexdigest())
+        self.assertEqual(self.cache.hash_starts, [0])
+
+        # same size and mtime is not re-hashed
+        self.write('x' * 10000, mtime=1000)
+        self.assertEqual(self.cache.checksum(self.path), hashlib.md5(data).hexdigest())
+        self.assertEqual(self.cache.hash_starts, [0])
+
+        self.write('x' * 10000, mtime=2000)
+        self.assertEqual(self.cache.checksum(self.path), hashlib.md5('x' * 10000).hexdigest())
+        self.assertEqual(self.cache.hash_starts, [0, 0])
+
+        self.cache.forget(self.path)
+        self.cache.checksum(self.path)
+        self.assertEqual(self.cache.hash_starts, [0, 0, 0])
+
+    def test_append(self):
+        """
+        Test a file that grew is hashed again from the start, so a change to
+        the data before the old end of file is not missed
+        """
+        data = os.urandom(10000)
+        self.write(data, mtime=1000)
+        self.cache.checksum(self.path)
+
+        more = os.urandom(2500)
+        self.write(more, mode='ab', mtime=2000)
+        self.assertEqual(self.cache.checksum(self.path), hashlib.md5(data + more).hexdigest())
+        self.assertEqual(self.cache.hash_starts, [0, 0])
+
+        # grown again, with a byte near the start changed
+        changed = chr((ord(data[0]) + 1) % 256) + data[1:] + more + 'abc'
+        self.write(changed, mtime=3000)
+        self.assertEqual(self.cache.checksum(self.path), hashlib.md5(changed).hexdigest())
+        self.assertEqual(self.cache.hash_starts, [0, 0, 0])
+
+    def test_max_entries(self):
+        """
+        Test the least recently used checksums are dropped once the cache
+        is full
+        """
+        cache = RecordingFingerprintCache(max_entries=2)
+        paths = []
+        for i in range(3):
+            (handle, path) = tempfile.mkstemp()
+            os.write(handle, 'file %d' % i)
+            os.close(handle)
+            self.addCleanup(os.remove, path)
+            paths.append(path)
+
+        cache.checksum(paths[0])
+        cache.checksum(paths[1])
+        # use the first again so the second is the least recently used
+        cache.checksum(paths[0])
+        cache.checksum(paths[2])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(len(cache.hash_starts), 3)
+
+        cache.checksum(paths[0])
+        self.assertEqual(len(cache.hash_starts), 3)
+        self.assertEqual(cache.checksum(paths[1]), hashlib.md5('file 1').hexdigest())
+        self.assertEqual(len(cache.hash_starts), 4)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+"""
+@package mi.dataset.test.test_mapped_file
+@file mi/dataset/test/test_mapped_file.py
+@author Ocean Observatories Initiative <contactooici@oceanobservatories.org>
+@brief Test code for the memory mapped dataset parser input
+"""
+
+import os
+import re
+import struct
+import tempfile
+
+from mi.core.log import get_logger ; log = get_logger()
+from nose.plugins.attrib import attr
+from mi.core.unit_test import MiUnitTest
+from mi.dataset.mapped_file import MappedFile
+
+DATA = 'first line\nsecond line\n\x01CT1234\x03\x00\x01\x02no newline'
+
+
+@attr('UNIT', group='mi')
+class TestMappedFile(MiUnitTest):
+
+    def setUp(self):
+        (handle, self.path) = tempfile.mkstemp()
+        os.write(handle, DATA)
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def test_read(self):
+        """
+        Test reading, seeking and telling match a regular file
+        """
+        expected = open(self.path, 'rb')
+        mapped = MappedFile(self.path)
+
+        self.assertEqual(mapped.read(5), expected.read(5))
+        self.assertEqual(mapped.readline(), expected.readline())
+        self.assertEqual(mapped.tell(), expected.tell())
+        self.assertEqual(mapped.readline(3), expected.readline(3))
+        self.assertEqual(mapped.read(), expected.read())
+        self.assertEqual(mapped.read(10), '')
+        self.assertEqual(mapped.readline(), '')
+
+        mapped.seek(-4, os.SEEK_END)
+        expected.seek(-4, os.SEEK_END)
+        self.assertEqual(mapped.read(), expected.read())
+        mapped.seek(3)
+        mapped.seek(2, os.SEEK_CUR)
+        self.assertEqual(mapped.tell(), 5)
+        self.assertRaises(IOError, mapped.seek, -1)
+
+        self.assertEqual(len(mapped), len(DATA))
+        mapped.close()
+        expected.close()
+        self.assertTrue(mapped.closed)
+
+    def test_in_place(self):
+        """
+        Test the mapped bytes can be scanned and unpacked without reading them
+        """
+        with MappedFile(self.path) as mapped:
+            match = re.search('\x01(CT)([0-9]{4})\x03', mapped.buffer)
+            self.assertEqual(match.group(2), '1234')
+            self.assertEqual(struct.unpack_from('>H', mapped.buffer, match.end()), (1,))
+
+            view = mapped.view(match.start(), match.end())
+            self.assertEqual(len(view), 8)
+            self.assertEqual(view[1:3], 'CT')
+            self.assertEqual(str(mapped.view(len(DATA) - 10)), 'no newline')
+
+            # reading still starts from the beginning
+            self.assertEqual(mapped.tell(), 0)
+
+    def test_empty_file(self):
+        """
+        Test a zero length file, which can't be mapped, reads as empty
+        """
+        open(self.path, 'wb').close()
+        with MappedFile(self.path) as mapped:
+            self.assertEqual(len(mapped), 0)
+            self.assertEqual(mapped.read(), '')
+            self.assertEqual(mapped.readline(), '')
+            self.assertEqual(mapped.buffer, '')
@@ -17,7 +17,8 @@ from mi.core.log import get_logger ; log = get_logger()
 from nose.plugins.attrib import attr
 from mi.core.unit_test import MiUnitTest
 from mi.dataset.harvester import SingleDirectoryHarvester
-from mi.dataset.dataset_driver import DriverStateKey, DataSetDriverConfigKeys
+from mi.dataset.dataset_driver import DriverStateKey, DataSetDriverConfigKeys, HarvesterType
+from mi.dataset.file_fingerprint import FINGERPRINTS
 
 TESTDIR = '/tmp/dsatest'
 STOREDIR = '/tmp/stored_dsatest'
@@ -104,6 +105,56 @@ class TestSingleDirHarvester(MiUnitTest):
 
         file_harvester.shutdown()
 
+    def test_inotify_harvester(self):
+        """
+        Test that the inotify harvester finds files as soon as they are written, without
+        waiting for the polling interval, still honors the file modification wait time, and
+        stops as soon as it is shut down
+        """
+        config = CONFIG.copy()
+        config[DataSetDriverConfigKeys.HARVESTER_TYPE] = HarvesterType.INOTIFY_DIRECTORY
+        config[DataSetDriverConfigKeys.FREQUENCY] = 30
+        config[DataSetDriverConfigKeys.FILE_MOD_WAIT_TIME] = 0
+        file_harvester = SingleDirectoryHarvester(config, None,
+                                                  self.new_file_found_callback,
+                                                  self.modified_files_found_callback,
+                                                  self.file_exception_callback)
+        file_harvester.start()
+        # give the harvester a moment to add its watch
+        time.sleep(0.5)
+
+        # found well within the 30 second polling interval
+        start_time = time.time()
+        open(os.path.join(TESTDIR, 'unit_' + INDICIES[0] + '.txt'), 'w').close()
+        self.wait_for_file(0, 0.01, 5)
+        log.debug("Found file after %f seconds", time.time() - start_time)
+
+        # files that don't match the pattern are ignored
+        open(os.path.join(TESTDIR, 'ignored.dat'), 'w').close()
+        os.remove(os.path.join(TESTDIR, 'ignored.dat'))
+        file_harvester.shutdown()
+        file_harvester.join(5)
+        self.assertFalse(file_harvester.is_alive())
+        self.clean_directory(TESTDIR, CONFIG[DataSetDriverConfigKeys.PATTERN])
+
+        # with a modification wait time the file is found once it is up
+        config[DataSetDriverConfigKeys.FILE_MOD_WAIT_TIME] = 2
+        file_harvester = SingleDirectoryHarvester(config, None,
+                                                  self.new_file_found_callback,
+                                                  self.modified_files_found_callback,
+                                                  self.file_exception_callback)
+        file_harvester.start()
+        time.sleep(0.5)
+
+        start_time = time.time()
+        open(os.path.join(TESTDIR, 'unit_' + INDICIES[1] + '.txt'), 'w').close()
+        self.wait_for_file(self.found_file_count, 0.01, 10)
+        found_time = time.time() - start_time
+        log.debug("Found file after %f seconds", found_time)
+        self.assertGreaterEqual(found_time, 2)
+
+        file_harvester.shutdown()
+
     def test_harvester_without_frequency(self):
         """
         Test that we can use a default frequency
@@ -368,6 +419,31 @@ class TestSingleDirHarvester(MiUnitTest):
 
         file_harvester.shutdown()
 
+    def test_forget_removed_files(self):
+        """
+        Test cached checksums are dropped for files that are removed
+        """
+        file_paths = []
+        for index in INDICIES[:2]:
+            file_path = os.path.join(TESTDIR, 'unit_' + index + '.txt')
+            with open(file_path, 'w') as filehandle:
+                filehandle.write(index)
+            FINGERPRINTS.checksum(file_path)
+            file_paths.append(file_path)
+
+        config = CONFIG.copy()
+        config[DataSetDriverConfigKeys.FILE_MOD_WAIT_TIME] = 0
+        file_harvester = SingleDirectoryHarvester(config, None,
+                                                  self.new_file_found_callback,
+                                                  self.modified_files_found_callback,
+                                                  self.file_exception_callback)
+        file_harvester._check_for_files()
+
+        os.remove(file_paths[0])
+        file_harvester._check_for_files()
+        self.assertNotIn(file_paths[0], FINGERPRINTS._fingerprints)
+        self.assertIn(file_paths[1], FINGERPRINTS._fingerprints)
+
     def test_harvester_exception(self):
         """
         Verify exceptions
@@ -366,6 +366,45 @@ class DriverTestMixin(MiUnitTest, ParticleTestMixin):
                 self.assertEqual(default, pd.get_default_value(name),
                                  "%s default value incorrect: %s != %s" % (name, default, pd.get_default_value(name)))
 
+    def assert_param_dict_update(self, indexed, reference, lines):
+        """
+        Verify updating a parameter dictionary from each line of an
+        instrument dump gives the same results and values as trying every
+        parameter on every line, while running fewer parameter regexes.
+
+        @param indexed: ProtocolParameterDict to update line by line
+        @param reference: ProtocolParameterDict with the same parameters,
+        updated by trying each parameter on each line
+        @param lines: list of strings to update from
+        """
+        def counted(update, calls):
+            def update_counted(input):
+                calls.append(input)
+                return update(input)
+            return update_counted
+
+        (indexed_calls, reference_calls) = ([], [])
+        for val in indexed._param_dict.values():
+            val.update = counted(val.update, indexed_calls)
+        for val in reference._param_dict.values():
+            val.update = counted(val.update, reference_calls)
+
+        for line in lines:
+            found = False
+            for val in reference._param_dict.values():
+                if val.update(line):
+                    found = True
+            self.assertEqual(indexed.update(line), found, msg="update result differs for %r" % line)
+
+        indexed_values = dict((name, val.value.value) for (name, val) in indexed._param_dict.iteritems())
+        reference_values = dict((name, val.value.value) for (name, val) in reference._param_dict.iteritems())
+        self.assertEqual(indexed_values, reference_values)
+        self.assertTrue(any(value is not None for value in indexed_values.values()))
+
+        log.debug("%d lines against %d parameters: %d parameter updates tried instead of %d",
+                  len(lines), len(reference_values), len(indexed_calls), len(reference_calls))
+        self.assertLess(len(indexed_calls), len(reference_calls))
+
     def assert_parameters(self, current_parameters, param_dict, verify_values=False):
         """
         Verify the parameters contain all parameters in the parameter enum and verify the
@@ -5,7 +5,6 @@
 @brief BOTPT
 Release notes:
 """
-import json
 import re
 import time
 import datetime
@@ -400,12 +399,7 @@ class Protocol(CommandResponseInstrumentProtocol):
                 particle = particle_class(line, port_timestamp=timestamp, quality_flag=DataParticleValue.OUT_OF_RANGE)
             else:
                 particle = particle_class(line, port_timestamp=timestamp)
-            parsed_sample = particle.generate()
-
-            if publish and self._driver_event:
-                self._driver_event(DriverAsyncEvent.SAMPLE, parsed_sample)
-
-            sample = json.loads(parsed_sample)
+            sample = self._publish_sample(particle, publish)
 
         return sample
 
@@ -598,27 +592,6 @@ class Protocol(CommandResponseInstrumentProtocol):
         Overriding _wakeup; does not apply to this instrument
         """
 
-    def add_to_buffer(self, data):
-        """
-        Overriding base class to reduce logging due to NANO high data rate
-        @param data: data to be added to buffers
-        """
-        # Update the line and prompt buffers.
-        self._linebuf += data
-        self._promptbuf += data
-        self._last_data_timestamp = time.time()
-
-        # If our buffer exceeds the max allowable size then drop the leading
-        # characters on the floor.
-        max_size = self._max_buffer_size()
-        if len(self._linebuf) > max_size:
-            self._linebuf = self._linebuf[max_size * -1:]
-
-        # If our buffer exceeds the max allowable size then drop the leading
-        # characters on the floor.
-        if len(self._promptbuf) > max_size:
-            self._promptbuf = self._linebuf[max_size * -1:]
-
     def _max_buffer_size(self):
         """
         Overriding base class to increase max buffer size
@@ -1219,15 +1219,9 @@ class NortekInstrumentProtocol(CommandResponseInstrumentProtocol):
         @param add_structs Additional structures to include in the structure search.
         Should be in the format [[structure_sync_bytes, structure_len]*]
         """
-        return_list = []
         sieve_matchers = NORTEK_COMMON_REGEXES + cls.velocity_data_regex
 
-        for matcher in sieve_matchers:
-            for match in matcher.finditer(raw_data):
-                return_list.append((match.start(), match.end()))
-                log.debug("sieve_function: regex found %r", raw_data[match.start():match.end()])
-
-        return return_list
+        return StringChunker.compiled_sieve_function(raw_data, regex_list=sieve_matchers)
 
     def _got_chunk_base(self, structure, timestamp):
         """
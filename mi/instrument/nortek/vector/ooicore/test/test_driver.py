@@ -36,6 +36,7 @@ from mi.instrument.nortek.test.test_driver import NortekUnitTest, NortekIntTest,
     user_config2
 
 from mi.core.instrument.instrument_driver import DriverConfigKey, DriverEvent, ResourceAgentState
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
 
 from mi.core.instrument.data_particle import DataParticleKey, DataParticleValue
 from mi.core.instrument.chunker import StringChunker
@@ -43,6 +44,7 @@ from mi.core.instrument.chunker import StringChunker
 from mi.core.exceptions import SampleException
 
 from mi.instrument.nortek.driver import ProtocolState, TIMEOUT, Parameter, NEWLINE, EngineeringParameter
+from mi.instrument.nortek.driver import InstrumentPrompts
 
 from mi.instrument.nortek.driver import ProtocolEvent
 
@@ -321,6 +323,21 @@ class UnitFromIDK(NortekUnitTest):
                                           velocity_sample(),
                                           expected_particle)
 
+    def test_publish_sample(self):
+        """
+        Verify velocity samples found by the protocol are published as the
+        particle dictionary
+        """
+        events = []
+        protocol = Protocol(InstrumentPrompts, NEWLINE, lambda event, value=None: events.append((event, value)))
+        protocol._got_chunk(velocity_sample(), 3555423720.711772)
+
+        samples = [value for (event, value) in events if event == DriverAsyncEvent.SAMPLE]
+        self.assertEqual(len(samples), 1)
+        self.assertIsInstance(samples[0], dict)
+        self.assertEqual(samples[0][DataParticleKey.STREAM_NAME], DataParticleType.VELOCITY)
+        self.assertEqual(samples[0][DataParticleKey.VALUES], velocity_particle)
+
     def test_system_sample_format(self):
         """
         Verify driver can get system sample data out in a reasonable
@@ -15,7 +15,6 @@ from mi.core.log import get_logger
 log = get_logger()
 
 import re
-import json
 import time
 import pprint
 
@@ -770,11 +769,9 @@ class Protocol(CommandResponseInstrumentProtocol):
         sample = None
         if regex.match(line):
             particle = particle_class(line, port_timestamp=timestamp)
-            parsed_sample = particle.generate()
+            sample = self._publish_sample(particle, publish)
             if publish and self._driver_event:
-                self._driver_event(DriverAsyncEvent.SAMPLE, parsed_sample)
-                log.info("Parsed sample %r", pprint.pformat(parsed_sample))
-            sample = json.loads(parsed_sample)
+                log.info("Parsed sample %r", pprint.pformat(sample))
         return sample
 
     def _build_param_dict(self):
@@ -0,0 +1,18 @@
+from mi.instrument.seabird.sbe16plus_v2.driver import NEWLINE
+
+SAMPLE_DS = 'SBE 16plus V 2.5  SERIAL NO. 6841    28 Feb 2013 16:39:31' + NEWLINE + \
+            'vbatt = 23.4, vlith =  8.0, ioper =  61.4 ma, ipump =   0.3 ma,' + NEWLINE + \
+            'status = not logging' + NEWLINE + \
+            'samples = 0, free = 4386542' + NEWLINE + \
+            'sample interval = 10 seconds, number of measurements per sample = 4' + NEWLINE + \
+            'pump = run pump during sample, delay before sampling = 0.0 seconds, delay after sampling = 0.0 seconds' + NEWLINE + \
+            'transmit real-time = yes' + NEWLINE + \
+            'battery cutoff =  7.5 volts' + NEWLINE + \
+            'pressure sensor = strain gauge, range = 160.0' + NEWLINE + \
+            'SBE 38 = no, SBE 50 = no, WETLABS = no, OPTODE = no, SBE63 = no, Gas Tension Device = no' + NEWLINE + \
+            'Ext Volt 0 = yes, Ext Volt 1 = yes' + NEWLINE + \
+            'Ext Volt 2 = yes, Ext Volt 3 = yes' + NEWLINE + \
+            'Ext Volt 4 = yes, Ext Volt 5 = yes' + NEWLINE + \
+            'echo characters = yes' + NEWLINE + \
+            'output format = raw HEX' + NEWLINE + \
+            'serial sync mode disabled' + NEWLINE
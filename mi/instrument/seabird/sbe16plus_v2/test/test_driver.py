@@ -51,6 +51,7 @@ from mi.instrument.seabird.sbe16plus_v2.driver import SBE16InstrumentDriver
 from mi.instrument.seabird.sbe16plus_v2.driver import DataParticleType
 from mi.instrument.seabird.sbe16plus_v2.driver import ConfirmedParameter
 from mi.instrument.seabird.sbe16plus_v2.driver import NEWLINE
+from mi.instrument.seabird.sbe16plus_v2.test.sample_data import SAMPLE_DS
 from mi.instrument.seabird.sbe16plus_v2.driver import SBE16DataParticleKey
 from mi.instrument.seabird.sbe16plus_v2.driver import SBE16StatusParticleKey
 from mi.instrument.seabird.sbe16plus_v2.driver import SBE16CalibrationParticleKey
@@ -98,22 +99,7 @@ class SeaBird16plusMixin(DriverTestMixin):
     VALID_SAMPLE = "#0409DB0A738C81747A84AC0006000A2E541E18BE6ED9" + NEWLINE
     VALID_SAMPLE2 = "0409DB0A738C81747A84AC0006000A2E541E18BE6ED9" + NEWLINE
     
-    VALID_DS_RESPONSE =  'SBE 16plus V 2.5  SERIAL NO. 6841    28 Feb 2013 16:39:31' + NEWLINE + \
-        'vbatt = 23.4, vlith =  8.0, ioper =  61.4 ma, ipump =   0.3 ma,' + NEWLINE + \
-        'status = not logging' + NEWLINE + \
-        'samples = 0, free = 4386542' + NEWLINE + \
-        'sample interval = 10 seconds, number of measurements per sample = 4' + NEWLINE + \
-        'pump = run pump during sample, delay before sampling = 0.0 seconds, delay after sampling = 0.0 seconds' + NEWLINE + \
-        'transmit real-time = yes' + NEWLINE + \
-        'battery cutoff =  7.5 volts' + NEWLINE + \
-        'pressure sensor = strain gauge, range = 160.0' + NEWLINE + \
-        'SBE 38 = no, SBE 50 = no, WETLABS = no, OPTODE = no, SBE63 = no, Gas Tension Device = no' + NEWLINE + \
-        'Ext Volt 0 = yes, Ext Volt 1 = yes' + NEWLINE + \
-        'Ext Volt 2 = yes, Ext Volt 3 = yes' + NEWLINE + \
-        'Ext Volt 4 = yes, Ext Volt 5 = yes' + NEWLINE + \
-        'echo characters = yes' + NEWLINE + \
-        'output format = raw HEX' + NEWLINE + \
-        'serial sync mode disabled' + NEWLINE
+    VALID_DS_RESPONSE = SAMPLE_DS
     
     VALID_DCAL_QUARTZ = 'SBE 16plus V 2.5  SERIAL NO. 6841    28 Feb 2013 18:37:40' + NEWLINE + \
         'temperature:  18-May-12' + NEWLINE + \
@@ -461,6 +447,15 @@ class SBEUnitTestCase(SeaBirdUnitTest, SeaBird16plusMixin):
         self.assert_enum_has_no_duplicates(Capability())
         self.assert_enum_complete(Capability(), ProtocolEvent())
 
+    def test_param_dict_update(self):
+        """
+        Verify the indexed parameter dictionary update matches the status
+        dump the same way trying every parameter does
+        """
+        self.assert_param_dict_update(SBE16Protocol(Prompt, NEWLINE, Mock())._param_dict,
+                                      SBE16Protocol(Prompt, NEWLINE, Mock())._param_dict,
+                                      SAMPLE_DS.split(NEWLINE))
+
     def test_driver_schema(self):
         """
         get the driver schema and verify it is configured properly
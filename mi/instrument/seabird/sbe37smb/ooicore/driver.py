@@ -766,13 +766,7 @@ class SBE37Protocol(CommandResponseInstrumentProtocol):
                           STATUS_DATA_REGEX_MATCHER,
                           CALIBRATION_DATA_REGEX_MATCHER]
 
-        return_list = []
-
-        for matcher in sieve_matchers:
-            for match in matcher.finditer(raw_data):
-                return_list.append((match.start(), match.end()))
-
-        return return_list
+        return StringChunker.compiled_sieve_function(raw_data, regex_list=sieve_matchers)
     def _filter_capabilities(self, events):
         """
         """ 
@@ -63,6 +63,9 @@ from mi.instrument.seabird.sbe37smb.ooicore.driver import SBE37DeviceCalibration
 from mi.instrument.seabird.sbe37smb.ooicore.driver import SBE37DeviceStatusParticle
 from mi.instrument.seabird.sbe37smb.ooicore.driver import SBE37DeviceStatusParticleKey
 from mi.instrument.seabird.sbe37smb.ooicore.driver import SBE37Driver
+from mi.instrument.seabird.sbe37smb.ooicore.driver import SBE37Protocol
+from mi.instrument.seabird.sbe37smb.ooicore.driver import NEWLINE
+from mi.instrument.seabird.sbe37smb.ooicore.driver import SAMPLE_PATTERN_MATCHER
 
 from mi.core.instrument.instrument_driver import DriverParameter
 from mi.core.instrument.data_particle import DataParticleKey, DataParticleValue
@@ -422,6 +425,16 @@ class SBEUnitTestCase(SeaBirdUnitTest, SBEMixin):
         SBE37Parameter.RTCA1 : 1.0,
         SBE37Parameter.RTCA2 : 1.0
         }
+
+    def test_param_dict_update(self):
+        """
+        Verify the indexed parameter dictionary update matches the status
+        and calibration dumps the same way trying every parameter does
+        """
+        lines = (SAMPLE_DS + SAMPLE_DC).split(NEWLINE)
+        self.assert_param_dict_update(SBE37Protocol(SBE37Prompt, NEWLINE, Mock())._param_dict,
+                                      SBE37Protocol(SBE37Prompt, NEWLINE, Mock())._param_dict,
+                                      lines)
     
     def test_zero_data(self):
         particle = SBE37DataParticle('#87.9140,5.42747, 556.864,   37.1829, 1506.961, 02 Jan 2001, 15:34:51',
@@ -466,6 +479,27 @@ class SBEUnitTestCase(SeaBirdUnitTest, SBEMixin):
         self.assert_particle_published(driver, SAMPLE_DC, self.assert_particle_device_calibration, True)
         self.assert_particle_published(driver, SAMPLE_DS, self.assert_particle_device_status, True)
 
+    def test_publish_sample(self):
+        """
+        Verify samples found by the protocol are published as the particle
+        dictionary that _extract_sample returns
+        """
+        events = []
+        protocol = SBE37Protocol(SBE37Prompt, NEWLINE, lambda event, value=None: events.append((event, value)))
+        protocol._got_chunk(SAMPLE.strip(), 3600000000.0)
+
+        samples = [value for (event, value) in events if event == DriverAsyncEvent.SAMPLE]
+        self.assertEqual(len(samples), 1)
+        value = samples[0]
+        self.assertIsInstance(value, dict)
+        self.assertEqual(value[DataParticleKey.STREAM_NAME], DataParticleType.PARSED)
+
+        count = len(events)
+        sample = protocol._extract_sample(SBE37DataParticle, SAMPLE_PATTERN_MATCHER, SAMPLE.strip(),
+                                          3600000000.0, publish=False)
+        self.assertEqual(len(events), count)
+        self.assertEqual(value[DataParticleKey.VALUES], sample[DataParticleKey.VALUES])
+
     def test_driver_schema(self):
         """
         get the driver schema and verify it is configured properly
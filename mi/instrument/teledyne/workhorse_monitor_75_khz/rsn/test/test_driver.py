@@ -25,6 +25,7 @@ from mi.idk.unit_test import InstrumentDriverTestCase
 from mi.instrument.teledyne.workhorse_monitor_75_khz.test.test_data import RSN_SAMPLE_RAW_DATA 
 from mi.instrument.teledyne.workhorse_monitor_75_khz.test.test_data import RSN_CALIBRATION_RAW_DATA
 from mi.instrument.teledyne.workhorse_monitor_75_khz.test.test_data import RSN_PS0_RAW_DATA
+from mi.instrument.teledyne.workhorse_monitor_75_khz.test.test_data import get_params_output
 
 from mi.idk.unit_test import DriverTestMixin
 
@@ -463,6 +464,17 @@ class UnitFromIDK(WorkhorseDriverUnitTest, ADCPTMixin):
     def setUp(self):
         WorkhorseDriverUnitTest.setUp(self)
 
+    def test_param_dict_update(self):
+        """
+        Verify the indexed parameter dictionary update matches the
+        parameter dump, whole and line by line, the same way trying every
+        parameter does
+        """
+        lines = [get_params_output] + get_params_output.split(NEWLINE)
+        self.assert_param_dict_update(Protocol(Prompt, NEWLINE, Mock())._param_dict,
+                                      Protocol(Prompt, NEWLINE, Mock())._param_dict,
+                                      lines)
+
     def test_driver_schema(self):
         """
         get the driver schema and verify it is configured properly